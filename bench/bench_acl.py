@@ -0,0 +1,90 @@
+"""
+ACL lookups/sec against rule-set size for the compiled classifier.
+
+    PYTHONPATH=. python -m bench.bench_acl [--sizes 10,100,1000,10000,100000]
+
+A linear first-match scan is measured alongside for sets up to --linear-max.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import List, Tuple
+
+from src.controller.acl import AclClassifier, AclRule, parse_rules
+
+Packet = Tuple[str, str, int, int]
+
+
+def make_rules(count: int, rng: random.Random) -> List[AclRule]:
+    lines = []
+    for _ in range(count):
+        def prefix() -> str:
+            kind = rng.random()
+            if kind < 0.1:
+                return "any"
+            if kind < 0.3:
+                return f"10.{rng.randint(0, 255)}.0.0/16"
+            if kind < 0.6:
+                return f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.0/24"
+            return f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+
+        port = rng.randint(1, 60000)
+        ports = rng.choice(["any", str(port), f"{port}-{port + rng.randint(1, 1000)}"])
+        proto = rng.choice(["tcp", "udp", "any"])
+        priority = rng.choice([100, 100, 100, 200])
+        lines.append(f"{rng.choice(['allow', 'deny'])} {prefix()} {prefix()} {proto} {ports} priority={priority}")
+    return parse_rules(lines)
+
+
+def make_packets(count: int, rng: random.Random) -> List[Packet]:
+    def ip() -> str:
+        return f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+    return [(ip(), ip(), rng.choice((6, 17)), rng.randint(1, 65535)) for _ in range(count)]
+
+
+def linear_lookup(ranked: List[AclRule], packet: Packet):
+    for rule in ranked:
+        if rule.matches(*packet):
+            return rule
+    return None
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="10,100,1000,10000,100000")
+    ap.add_argument("--lookups", type=int, default=50_000)
+    ap.add_argument("--linear-max", type=int, default=1000)
+    args = ap.parse_args()
+
+    rng = random.Random(11)
+    packets = make_packets(args.lookups, rng)
+    print(f"{'rules':>8}{'compile s':>12}{'tuples':>8}{'lookups/s':>14}{'linear/s':>14}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        rules = make_rules(size, rng)
+
+        start = time.perf_counter()
+        classifier = AclClassifier(rules)
+        compile_s = time.perf_counter() - start
+
+        lookup = classifier.lookup
+        start = time.perf_counter()
+        for packet in packets:
+            lookup(*packet)
+        rate = len(packets) / (time.perf_counter() - start)
+
+        linear = "-"
+        if size <= args.linear_max:
+            ranked = sorted(rules, key=lambda r: (-r.priority, r.order))
+            sample = packets[: max(1, len(packets) // 10)]
+            start = time.perf_counter()
+            for packet in sample:
+                linear_lookup(ranked, packet)
+            linear = f"{len(sample) / (time.perf_counter() - start):,.0f}"
+
+        print(f"{size:>8,}{compile_s:>12.3f}{classifier.tuple_count:>8}{rate:>14,.0f}{linear:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Event journal ingest rate and query latency.
+
+    PYTHONPATH=. python -m bench.bench_journal [--events 10000000] [--rate 1000] [--dir /tmp/journal]
+
+Appends `--events` events spaced 1/`--rate` seconds apart through the
+background writer, then times narrow time-range queries (the sparse index
+finds the start) and a filtered query over a whole hour.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import shutil
+import tempfile
+import time
+
+from src.web.journal import EventJournal
+
+T0 = 1_700_000_000.0
+MESSAGES = (("WARN", "ACL DROP"), ("WARN", "DDoS flagged"), ("INFO", "Switch connected"), ("INFO", "ACL reloaded"))
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(p / 100 * len(samples)))]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--events", type=int, default=10_000_000)
+    ap.add_argument("--rate", type=float, default=1000.0, help="simulated events per second")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--dir", default=None, help="journal directory (default: a temporary one)")
+    args = ap.parse_args()
+
+    directory = args.dir or tempfile.mkdtemp(prefix="journal-")
+    journal = EventJournal(directory, retention_s=10 * 365 * 86400.0, max_bytes=1 << 40).start()
+    try:
+        step = 1.0 / args.rate
+        start = time.perf_counter()
+        for i in range(args.events):
+            level, msg = MESSAGES[i & 3]
+            while not journal.append(T0 + i * step, level, msg, {"src": "10.0.0.1", "dst_port": i & 0xFFFF}):
+                time.sleep(0.001)  # writer is behind; a real caller would drop instead
+        journal.flush()
+        elapsed = time.perf_counter() - start
+        stats = journal.stats()
+        print(f"ingest   {args.events / elapsed:>12,.0f} events/s   "
+              f"{stats['bytes'] / 2**20:,.0f} MiB in {stats['segments']} segment(s)")
+
+        span = args.events * step
+        rng = random.Random(1)
+        narrow = []
+        for _ in range(args.queries):
+            lo = T0 + rng.random() * span
+            t = time.perf_counter()
+            journal.query(lo, lo + 1.0)
+            narrow.append(time.perf_counter() - t)
+        print(f"1 s range     p50 {percentile(narrow, 50) * 1e3:8.2f} ms   p99 {percentile(narrow, 99) * 1e3:8.2f} ms")
+
+        wide = []
+        for _ in range(max(1, args.queries // 20)):
+            lo = T0 + rng.random() * max(0.0, span - 3600)
+            t = time.perf_counter()
+            journal.query(lo, lo + 3600, level="WARN", msg="DDoS", limit=1000)
+            wide.append(time.perf_counter() - t)
+        print(f"1 h filtered  p50 {percentile(wide, 50) * 1e3:8.2f} ms   p99 {percentile(wide, 99) * 1e3:8.2f} ms")
+    finally:
+        journal.close()
+        if args.dir is None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+End-to-end load test: emulated OpenFlow 1.3 switches against a running controller.
+
+    python run_controller.py &
+    PYTHONPATH=. python -m bench.bench_openflow [--switches 16] [--rate 2000] [--seconds 10] [--mix normal]
+    PYTHONPATH=. python -m bench.bench_openflow --ramp [--rate 500] [--max-p99-ms 100]
+
+Opens `--switches` TCP connections to the controller, completes the
+handshake as that many switches and injects Packet-Ins at `--rate` per
+second in total, spread evenly over the switches. Reports the
+Packet-In -> PacketOut round trip percentiles and what the controller
+sent back. With `--ramp` the rate grows by `--step` each interval until
+fewer than 95% of Packet-Ins are answered or p99 exceeds `--max-p99-ms`,
+and the last rate that held is reported as the sustainable throughput.
+
+Each host sends at most rate/hosts packets per second; keep that under the
+controller's per-source admission rate (100/s by default) or most traffic
+is shed on purpose. ACL-denied and shed Packet-Ins get no PacketOut and
+show up as unanswered.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+from typing import Iterator, List, Tuple
+
+from bench.corpus import build_frame
+from bench.switch_emulator import EmulatedSwitch
+
+
+def host(i: int) -> Tuple[str, str]:
+    return f"00:00:00:00:{i >> 8:02x}:{i & 0xFF:02x}", f"10.0.{i >> 8}.{i & 0xFF}"
+
+
+def traffic(mix: str, hosts: int, seed: int = 1) -> Iterator[Tuple[int, bytes]]:
+    """Endless (source host, frame) pairs; each frame carries a sequence number so it is unique."""
+    rng = random.Random(seed)
+    seq = 0
+    scan_port = 1
+    while True:
+        seq += 1
+        tag = seq.to_bytes(8, "big")
+        src, dst = rng.sample(range(1, hosts + 1), 2)
+        if mix == "port_scan" and rng.random() < 0.8:
+            src, dst = hosts, 2
+            port, scan_port = scan_port, scan_port % 65535 + 1
+            frame = build_frame(host(src)[0], host(dst)[0], host(src)[1], host(dst)[1], 6, 40000, port, payload=tag)
+        elif mix == "acl_flood" and rng.random() < 0.9:
+            src, dst = 1, 2
+            frame = build_frame(host(1)[0], host(2)[0], host(1)[1], host(2)[1], 6,
+                                rng.randint(32768, 60999), 22, payload=tag)
+        elif rng.random() < 0.1:
+            frame = build_frame(host(src)[0], "ff:ff:ff:ff:ff:ff", ethertype=0x0806, payload=tag)
+        else:
+            proto = 6 if rng.random() < 0.7 else 17
+            frame = build_frame(host(src)[0], host(dst)[0], host(src)[1], host(dst)[1], proto,
+                                rng.randint(32768, 60999), rng.choice((53, 80, 443, 8080)), payload=tag)
+        yield src, frame
+
+
+def percentile(samples: List[float], p: float) -> float:
+    if not samples:
+        return float("nan")
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(p / 100 * len(samples)))]
+
+
+async def connect(args) -> List[EmulatedSwitch]:
+    switches = [EmulatedSwitch(dpid, ports=args.ports, meters=not args.no_meters) for dpid in range(1, args.switches + 1)]
+    await asyncio.gather(*(sw.connect(args.host, args.port) for sw in switches))
+    await asyncio.wait_for(asyncio.gather(*(sw.ready.wait() for sw in switches)), timeout=30)
+    await asyncio.sleep(0.5)  # let the table-miss, meter and ACL flows arrive
+    return switches
+
+
+async def run_interval(switches: List[EmulatedSwitch], flows, rate: float, seconds: float, ports: int):
+    """Inject at `rate` for `seconds`; returns (sent, answered, rtts) for this interval."""
+    for sw in switches:
+        sw.rtts = []
+    sent_before = sum(sw.packet_ins for sw in switches)
+    tick = 0.01
+    per_tick = rate * tick
+    owed = 0.0
+    start = time.perf_counter()
+    next_tick = start
+    i = 0
+    while time.perf_counter() - start < seconds:
+        owed += per_tick
+        while owed >= 1.0:
+            src, frame = next(flows)
+            sw = switches[i % len(switches)]
+            i += 1
+            if not sw.closed:
+                sw.inject((src - 1) % ports + 1, frame)
+            owed -= 1.0
+        next_tick += tick
+        await asyncio.sleep(max(0.0, next_tick - time.perf_counter()))
+    await asyncio.gather(*(sw.drain() for sw in switches if not sw.closed))
+    await asyncio.sleep(min(1.0, switches[0].timeout_s))  # late replies
+    for sw in switches:
+        sw.expire()
+    rtts = [r for sw in switches for r in sw.rtts]
+    return sum(sw.packet_ins for sw in switches) - sent_before, len(rtts), rtts
+
+
+def report(label: str, sent: int, answered: int, rtts: List[float], seconds: float) -> None:
+    print(f"{label:<12}{sent / seconds:>10,.0f} pkt-in/s{answered / max(1, sent) * 100:>8.1f}% answered"
+          f"   rtt p50 {percentile(rtts, 50) * 1e3:7.2f}  p90 {percentile(rtts, 90) * 1e3:7.2f}"
+          f"  p99 {percentile(rtts, 99) * 1e3:7.2f}  max {percentile(rtts, 100) * 1e3:7.2f} ms")
+
+
+async def main_async(args) -> None:
+    switches = await connect(args)
+    print(f"{len(switches)} switch(es) connected to {args.host}:{args.port}, mix {args.mix}, {args.hosts} hosts")
+    flows = traffic(args.mix, args.hosts)
+    try:
+        if not args.ramp:
+            sent, answered, rtts = await run_interval(switches, flows, args.rate, args.seconds, args.ports)
+            report(f"{args.rate:,.0f}/s", sent, answered, rtts, args.seconds)
+        else:
+            rate, sustained = args.rate, 0.0
+            while True:
+                sent, answered, rtts = await run_interval(switches, flows, rate, args.seconds, args.ports)
+                report(f"{rate:,.0f}/s", sent, answered, rtts, args.seconds)
+                if answered < 0.95 * sent or percentile(rtts, 99) * 1e3 > args.max_p99_ms:
+                    break
+                sustained = rate
+                rate *= args.step
+            print(f"sustainable: {sustained:,.0f} Packet-Ins/s across {len(switches)} switch(es)")
+        print(f"controller sent {sum(sw.flow_mods for sw in switches):,} FlowMods, "
+              f"{sum(sw.packet_outs for sw in switches):,} PacketOuts, "
+              f"{sum(sw.barriers for sw in switches):,} barriers, "
+              f"{sum(sw.meter_mods for sw in switches):,} MeterMods, "
+              f"{sum(sw.errors for sw in switches):,} errors")
+    finally:
+        for sw in switches:
+            sw.close()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=6653)
+    ap.add_argument("--switches", type=int, default=16)
+    ap.add_argument("--ports", type=int, default=8, help="ports per switch")
+    ap.add_argument("--hosts", type=int, default=200, help="distinct source hosts (at most 65535)")
+    ap.add_argument("--rate", type=float, default=2000.0, help="Packet-Ins per second across all switches")
+    ap.add_argument("--seconds", type=float, default=10.0, help="run length, or length of each ramp step")
+    ap.add_argument("--mix", choices=("normal", "port_scan", "acl_flood"), default="normal")
+    ap.add_argument("--no-meters", action="store_true", help="report no meter support to the controller")
+    ap.add_argument("--ramp", action="store_true")
+    ap.add_argument("--step", type=float, default=1.5, help="ramp rate multiplier")
+    ap.add_argument("--max-p99-ms", type=float, default=100.0)
+    args = ap.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
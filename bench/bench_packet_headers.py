@@ -0,0 +1,57 @@
+"""
+Packets/sec of the struct-based header fast path against the full Ryu parse.
+
+    PYTHONPATH=. python -m bench.bench_packet_headers [--pcap FILE] [--record FILE]
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Callable, List, Optional
+
+from bench.corpus import read_pcap, synthetic_corpus, write_pcap
+from src.controller.packet_headers import PacketHeaders, extract_headers, parse_headers, parse_headers_ryu
+
+
+def measure(fn: Callable[[bytes], Optional[PacketHeaders]], frames: List[bytes], rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for frame in frames:
+            fn(frame)
+        best = min(best, time.perf_counter() - start)
+    return len(frames) / best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pcap", help="replay frames from a recorded pcap instead of the synthetic corpus")
+    ap.add_argument("--record", help="write the synthetic corpus to this pcap and exit")
+    ap.add_argument("--frames", type=int, default=50_000)
+    ap.add_argument("--rounds", type=int, default=5)
+    args = ap.parse_args()
+
+    frames = list(read_pcap(args.pcap)) if args.pcap else synthetic_corpus(args.frames)
+    if args.record:
+        write_pcap(args.record, frames)
+        print(f"recorded {len(frames)} frames to {args.record}")
+        return
+
+    fast_hits = sum(parse_headers(f) is not None for f in frames)
+    print(f"corpus: {len(frames)} frames, fast path handles {fast_hits} ({100.0 * fast_hits / max(len(frames), 1):.1f}%)")
+    print(f"{'fast path (parse_headers)':<32}{measure(parse_headers, frames, args.rounds):>14,.0f} pkt/s")
+    print(f"{'with fallback (extract_headers)':<32}{measure(extract_headers, frames, args.rounds):>14,.0f} pkt/s")
+
+    try:
+        import ryu  # noqa: F401
+    except ImportError:
+        print(f"{'ryu packet.Packet':<32}{'skipped (ryu not installed)':>14}")
+        return
+
+    mismatches = sum(parse_headers(f) != parse_headers_ryu(f) for f in frames if parse_headers(f) is not None)
+    print(f"{'ryu packet.Packet':<32}{measure(parse_headers_ryu, frames, args.rounds):>14,.0f} pkt/s")
+    print(f"fast/ryu mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Packet-In decision latency with analytics inline or behind a bounded queue.
+
+    PYTHONPATH=. python -m bench.bench_pipeline [--frames 20000] [--burst 2000] [--capacity 65536]
+
+Runs the app's Packet-In decision path (admission, parsing, MAC learning,
+ACL check, forwarding choice, counters) over each scenario corpus two ways:
+with scan detection, source history and event logging (to a store backed
+by the on-disk journal) inline as before, and with them put on an
+AnalyticsQueue that is drained in batches after each burst, since the
+worker only runs once the event loop has nothing queued. Frames arrive in
+bursts of `--burst` queued at once; a Packet-In's decision latency is the
+time from the start of its burst to its forwarding decision. Reported:
+p50 and p99 decision latency, CPU per Packet-In including the worker, and
+records shed. A small `--capacity` shows the overload policy.
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from typing import List, Sequence
+
+from bench.corpus import SCENARIOS
+from src.controller.acl import AclPolicy, parse_rules
+from src.controller.admission import ADMIT, PacketInAdmission
+from src.controller.analytics import DETECT, EVENT, AnalyticsQueue
+from src.controller.flow_granularity import FlowGranularity
+from src.controller.l2_learning import L2Learning
+from src.controller.packet_headers import extract_headers
+from src.controller.port_scan import PortScanDetector
+from src.web.journal import EventJournal
+from src.web.store import DashboardStore
+
+
+class Pipeline:
+    def __init__(self, journal_dir: str, capacity: int, decoupled: bool) -> None:
+        self.decoupled = decoupled
+        self.admission = PacketInAdmission(rate_pps=1e9, burst=1e9)
+        self.acl = AclPolicy(parse_rules(["deny 10.0.0.1 10.0.0.2 tcp 22"]))
+        self.l2 = L2Learning()
+        self.detector = PortScanDetector(5.0, 40)
+        self.granularity = FlowGranularity()
+        self.journal = EventJournal(journal_dir).start()
+        self.store = DashboardStore(max_points=120, max_events=60, journal=self.journal)
+        self.analytics = AnalyticsQueue(capacity)
+
+    def log(self, level: str, msg: str, **extra) -> None:
+        if self.decoupled:
+            self.analytics.put(EVENT, (level, msg, extra))
+        else:
+            self.store.log(level, msg, **extra)
+
+    def decide(self, frame: bytes) -> None:
+        """SdnSecurityApp._packet_in up to the FlowMod and PacketOut, which both variants send alike."""
+        if self.admission.admit(frame[6:12]) != ADMIT:
+            return
+        hdr = extract_headers(frame)
+        if hdr is None:
+            return
+        in_port = frame[11] if 1 <= frame[11] <= 3 else 4
+        old_port = self.l2.learn_mac(1, hdr.src_mac, in_port)
+        if old_port is not None:
+            self.log("WARN", "MAC moved", dpid=1, mac=hdr.src_mac, old_port=old_port, port=in_port)
+        if not hdr.is_ipv4:
+            self.l2.port(1, hdr.dst_mac)
+            return
+        src_ip, dst_ip, proto, dst_port = hdr.src_ip, hdr.dst_ip, hdr.proto, hdr.dst_port
+        if self.acl.is_denied(src_ip, dst_ip, proto, dst_port):
+            self.store.record(flow=1, acl_drop=1)
+            self.log("WARN", "ACL DROP", src=src_ip, dst=dst_ip, proto=proto, dst_port=dst_port)
+            return
+        record = (time.time(), src_ip, dst_ip, proto, dst_port)
+        if self.decoupled:
+            self.analytics.put(DETECT, record)
+        else:
+            self.analyze([(DETECT, record)])
+        self.l2.port(1, hdr.dst_mac)
+        self.store.record(flow=1, allowed=1)
+        self.granularity.rule(src_ip, dst_ip, proto, dst_port)
+
+    def analyze(self, batch) -> None:
+        """SdnSecurityApp._analyze without the FlowMods an alert sends."""
+        for kind, record in batch:
+            if kind == EVENT:
+                level, msg, extra = record
+                self.store.log(level, msg, **extra)
+                continue
+            now, src_ip, dst_ip, proto, dst_port = record
+            if dst_port is not None and proto in (6, 17) and self.detector.should_alert(dst_ip, dst_port, now=now):
+                self.store.record(ddos_flag=1)
+                self.store.log("WARN", "DDoS flagged", dst=dst_ip, src=src_ip, dst_port=dst_port, kind="vertical")
+                self.granularity.demote(src_ip)
+            else:
+                self.granularity.observe(src_ip, dst_ip)
+
+
+def run(frames: Sequence[bytes], burst: int, capacity: int, decoupled: bool) -> dict:
+    with tempfile.TemporaryDirectory(prefix="pipeline-journal-") as journal_dir:
+        pipeline = Pipeline(journal_dir, capacity, decoupled)
+        latencies: List[float] = []
+        cpu = 0.0
+        try:
+            for i in range(0, len(frames), burst):
+                start = time.perf_counter()
+                for frame in frames[i:i + burst]:
+                    pipeline.decide(frame)
+                    latencies.append(time.perf_counter() - start)
+                batch = pipeline.analytics.drain(512)
+                while batch:
+                    pipeline.analyze(batch)
+                    batch = pipeline.analytics.drain(512)
+                cpu += time.perf_counter() - start
+        finally:
+            pipeline.journal.close()
+    latencies.sort()
+    return {
+        "p50_ms": latencies[len(latencies) // 2] * 1e3,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1e3,
+        "cpu_us": cpu / len(frames) * 1e6,
+        "shed": pipeline.analytics.shed,
+        "flags": pipeline.store.snapshot()["counters"]["ddos_flags_total"],
+        "events": pipeline.store.events_total,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--frames", type=int, default=20_000)
+    ap.add_argument("--burst", type=int, default=2000)
+    ap.add_argument("--capacity", type=int, default=65536)
+    ap.add_argument("--rounds", type=int, default=3)
+    args = ap.parse_args()
+
+    print(f"{args.frames:,} Packet-Ins in bursts of {args.burst:,}; queue capacity {args.capacity:,}")
+    for name in sorted(SCENARIOS):
+        frames = SCENARIOS[name](args.frames)
+        for variant, decoupled in (("inline", False), ("queued", True)):
+            r = min((run(frames, args.burst, args.capacity, decoupled) for _ in range(args.rounds)),
+                    key=lambda r: r["p50_ms"])
+            shed = f"   shed: {r['shed'][EVENT]:,} events, {r['shed'][DETECT]:,} detector" if decoupled else ""
+            print(f"  {name:<10}{variant:<8}decision p50 {r['p50_ms']:6.2f} ms  p99 {r['p99_ms']:6.2f} ms   "
+                  f"{r['cpu_us']:5.1f} us/Packet-In   {r['flags']:>3} flags {r['events']:>6,} events{shed}")
+
+
+if __name__ == "__main__":
+    main()
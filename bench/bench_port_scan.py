@@ -0,0 +1,97 @@
+"""
+Drive PortScanDetector with synthetic events spread across many destinations.
+
+    PYTHONPATH=. python -m bench.bench_port_scan [--events 1000000] [--destinations 100000] [--memory]
+
+The default run reproduces a /16 sweep with a few vertical scans mixed in and
+compares against the previous deque-per-destination implementation.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from typing import List, Tuple
+
+from src.controller.port_scan import PortScanDetector
+
+
+class LegacyPortScanDetector:
+    """The original detector: full rescan of a capped deque on every packet, no eviction."""
+
+    def __init__(self, window_s: float, threshold_ports: int) -> None:
+        self.window_s = window_s
+        self.threshold_ports = threshold_ports
+        self._dst_ports = defaultdict(lambda: deque(maxlen=600))
+        self._alerted = defaultdict(bool)
+
+    def flag(self, dst_ip: str, dst_port: int, now: float) -> bool:
+        ports = self._dst_ports[dst_ip]
+        ports.append((now, dst_port))
+        while ports and (now - ports[0][0]) > self.window_s:
+            ports.popleft()
+        flagged = len({port for _, port in ports}) >= self.threshold_ports
+        if not flagged:
+            self._alerted[dst_ip] = False
+        return flagged
+
+    @property
+    def tracked_destinations(self) -> int:
+        return len(self._dst_ports)
+
+
+def make_events(count: int, destinations: int, rate: float, seed: int = 7) -> List[Tuple[str, int, float]]:
+    rng = random.Random(seed)
+    targets = [f"10.{(i >> 16) & 0xFF}.{(i >> 8) & 0xFF}.{i & 0xFF}" for i in range(destinations)]
+    scanned = targets[:10]
+    events = []
+    for i in range(count):
+        now = i / rate
+        if rng.random() < 0.2:
+            events.append((rng.choice(scanned), rng.randint(1, 65535), now))
+        else:
+            events.append((rng.choice(targets), rng.choice((22, 53, 80, 443)), now))
+    return events
+
+
+def run(detector, events) -> Tuple[float, int]:
+    flagged = 0
+    start = time.perf_counter()
+    for dst_ip, dst_port, now in events:
+        flagged += detector.flag(dst_ip, dst_port, now)
+    return time.perf_counter() - start, flagged
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--events", type=int, default=1_000_000)
+    ap.add_argument("--destinations", type=int, default=100_000)
+    ap.add_argument("--rate", type=float, default=20_000.0, help="synthetic packets per second")
+    ap.add_argument("--memory", action="store_true", help="also report tracemalloc peak (slow)")
+    ap.add_argument("--skip-legacy", action="store_true")
+    args = ap.parse_args()
+
+    events = make_events(args.events, args.destinations, args.rate)
+    print(f"{len(events):,} events across {args.destinations:,} destinations at {args.rate:,.0f} pkt/s")
+
+    contenders = [("incremental", lambda: PortScanDetector(5.0, 40))]
+    if not args.skip_legacy:
+        contenders.append(("legacy deque", lambda: LegacyPortScanDetector(5.0, 40)))
+
+    for name, factory in contenders:
+        detector = factory()
+        elapsed, flagged = run(detector, events)
+        print(f"{name:<14}{len(events) / elapsed:>12,.0f} events/s  flagged={flagged:,}  "
+              f"tracked destinations={detector.tracked_destinations:,}")
+        if args.memory:
+            tracemalloc.start()
+            run(factory(), events)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{'':<14}peak traced memory {peak / 2**20:,.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
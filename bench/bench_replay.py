@@ -0,0 +1,115 @@
+"""
+Controller benchmark suite: every traffic scenario replayed through SdnSecurityApp.
+
+    PYTHONPATH=. python -m bench.bench_replay [--frames 20000] [--save-baseline] [--compare]
+
+For each scenario (normal mix, port scan, SSH flood against the ACL) prints
+Packet-Ins/sec, FlowMods and PacketOuts emitted, ACL drops, DDoS flags,
+store cost, analytics enqueue and worker cost per Packet-In, analytics
+records shed, and peak traced memory, all with admission shedding off so
+every frame runs the full pipeline. A separate pass with the app's
+per-MAC admission buckets reports how many of the same frames they shed
+at `--pps` (`admission_shed`).
+`--save-baseline` writes the results to `--baseline`; `--compare` prints the
+change against that file and exits non-zero when throughput or memory
+regress by more than `--tolerance`. Needs Ryu and eventlet (see
+bench/replay.py).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+from typing import Any, Dict
+
+from bench.corpus import SCENARIOS
+from bench.replay import replay
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "replay.json")
+
+# metric -> True if higher is better; only these fail --compare
+GATED = {"packet_ins_per_s": True, "peak_kib": False}
+
+
+def run_scenario(name: str, frames: int, switches: int, pps: float) -> Dict[str, Any]:
+    corpus = SCENARIOS[name](frames)
+    result = replay(corpus, switches, pps)
+    del result["shed"]
+    result["admission_shed"] = replay(corpus, switches, pps, admission=True)["shed"]
+    stages = result.pop("stage_us")
+    result["enqueue_us"] = stages.get("enqueue", 0.0)
+    result["handler_us"] = stages.get("total", 0.0)
+
+    # a second pass under tracemalloc; tracing slows it down, so throughput comes from the first
+    tracemalloc.start()
+    try:
+        replay(corpus, switches, pps)
+        result["peak_kib"] = tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+    del result["seconds"]
+    return result
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], tolerance: float) -> bool:
+    ok = True
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name}: no baseline")
+            continue
+        for key, value in result.items():
+            old = base.get(key)
+            if not old:
+                continue
+            change = (value - old) / old
+            marker = ""
+            if key in GATED:
+                worse = -change if GATED[key] else change
+                if worse > tolerance:
+                    marker = "  REGRESSION"
+                    ok = False
+            if marker or abs(change) > 0.01:
+                print(f"{name:<10}{key:<18}{old:>14,.1f} -> {value:>14,.1f}  {change * 100:+6.1f}%{marker}")
+    return ok
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--frames", type=int, default=20_000)
+    ap.add_argument("--switches", type=int, default=1)
+    ap.add_argument("--pps", type=float, default=1000.0)
+    ap.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="default: all")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--compare", action="store_true")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = ap.parse_args()
+
+    results = {}
+    for name in args.scenario or sorted(SCENARIOS):
+        results[name] = run_scenario(name, args.frames, args.switches, args.pps)
+
+    columns = list(next(iter(results.values())))
+    print(f"{'scenario':<10}" + "".join(f"{c:>18}" for c in columns))
+    for name, result in results.items():
+        print(f"{name:<10}" + "".join(
+            f"{result[c]:>18,.2f}" if isinstance(result[c], float) else f"{result[c]:>18,}" for c in columns
+        ))
+
+    if args.compare:
+        with open(args.baseline, encoding="utf-8") as f:
+            ok = compare(results, json.load(f), args.tolerance)
+        if not ok:
+            sys.exit(1)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"frames": args.frames, **results}, f, indent=2, sort_keys=True)
+        print(f"baseline saved to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,478 @@
+"""
+Controller restart: cold start against a warm restart from a checkpoint.
+
+    PYTHONPATH=. python -m bench.bench_restart [--hosts 60] [--rate 20] [--downtime 2] [--crash]
+
+SdnSecurityApp runs in the replay harness (bench/replay.py) behind a
+simulated switch: a flow table built from the FlowMods the app sends, with
+idle and hard timeouts, FlowRemoved messages and flow-stats replies, whose
+table-miss and IPv4 punt flows turn frames into Packet-Ins. `--hosts` hosts
+open connections of five TCP packets, each preceded by an ARP exchange when
+the host's ARP cache has expired. At 300 s, while a scan is under way, the
+app is stopped (`stop()` writes the checkpoint) and for `--downtime`
+seconds the switch keeps forwarding with its flows and Packet-Ins are
+lost. Then a new app connects, either empty or built on the same
+checkpoint, and adopts the switch's flows from its first flow-stats reply.
+With `--crash` nothing is written on the way down, so the new app starts
+from the last periodic checkpoint, up to 30 s old. Reported for the two
+minutes after the restart: Packet-Ins, flooded frames, FlowMods, time until
+flooding is back to its pre-restart level, switch flows the app does not
+know about, and how long after the restart the scan is flagged. Needs Ryu
+and eventlet, like the replay harness.
+
+A checkpoint does not save Packet-Ins or FlowMods: the switch kept its
+flows either way, and new connections still reach the controller. What it
+saves is flooding (the MAC table comes back, so nothing waits to be
+relearned), flows the app does not know about, and scan detection time
+(the open scan windows come back). The run exits non-zero unless the warm
+restart beats the cold start on those: at most half the floods, steady no
+later, no untracked flows and, without `--crash`, the scan flagged sooner.
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import random
+import struct
+import sys
+import tempfile
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+
+from bench.corpus import build_frame, ip_bytes, mac_bytes
+from bench.fake_datapath import FAKE_OFPROTO, FakeDatapath
+from bench.replay import DRAIN_S, Replay, ReplayClock, build_app
+from src.controller.acl import ip_to_int
+from src.controller.flow_granularity import FINE_PRIORITY, PAIR_PRIORITY, SUBNET_PRIORITY
+from src.controller.flow_rules import IPV4_ETH_TYPE
+from src.controller.l2_learning import ARP_ETH_TYPE, ARP_REPLY, ARP_REQUEST, L2_PRIORITY
+
+OFP = FAKE_OFPROTO
+RESTART_S = 300.0
+AFTER_S = 120.0
+HOST_ARP_S = 60.0
+BROADCAST = "ff:ff:ff:ff:ff:ff"
+# forwarding flows the app records in its shadow table
+FORWARDING = (L2_PRIORITY, SUBNET_PRIORITY, PAIR_PRIORITY, FINE_PRIORITY)
+# host numbers start here, clear of the default ACL's 10.0.0.1 and 10.0.0.2
+FIRST_HOST = 10
+SCANNER, TARGET = FIRST_HOST, FIRST_HOST + 1
+# (time, source host, destination host, destination port) of a TCP packet
+Frame = Tuple[float, int, int, int]
+
+_ARP = struct.Struct("!HHBBH6s4s6s4s")
+
+
+def mac(h: int) -> str:
+    return "02:00:00:00:%02x:%02x" % (h >> 8, h & 0xFF)
+
+
+def ip(h: int) -> str:
+    return f"10.0.{h >> 8}.{h & 0xFF}"
+
+
+def arp_frame(op: int, src: int, dst: int) -> bytes:
+    """A request from `src` for `dst`'s address (broadcast), or `src`'s reply to `dst`."""
+    to_mac = BROADCAST if op == ARP_REQUEST else mac(dst)
+    target_mac = b"\0" * 6 if op == ARP_REQUEST else mac_bytes(mac(dst))
+    payload = _ARP.pack(1, IPV4_ETH_TYPE, 6, 4, op, mac_bytes(mac(src)), ip_bytes(ip(src)), target_mac, ip_bytes(ip(dst)))
+    return build_frame(mac(src), to_mac, ethertype=ARP_ETH_TYPE, payload=payload)
+
+
+def traffic(hosts: int, rate: float, seconds: float, seed: int = 8) -> List[Frame]:
+    rng = random.Random(seed)
+    services = [22, 53, 80, 443, 3306, 5432, 6379, 8080, 8443, 9000]
+    frames: List[Frame] = []
+    t = 0.0
+    while t < seconds:
+        t += rng.expovariate(rate)
+        src, dst = rng.sample(range(FIRST_HOST + 2, FIRST_HOST + 2 + hosts), 2)
+        port = rng.choice(services)
+        frames += [(t + i * 0.2, src, dst, port) for i in range(5)]
+    # one host scans another across the restart, fast enough to cross the threshold only after it
+    start = RESTART_S - 1.5
+    frames += [(start + i * 0.05, SCANNER, TARGET, 1000 + i) for i in range(200)]
+    frames.sort()
+    return frames
+
+
+class Counters:
+    """Per-second Packet-In, flood and FlowMod counts, kept across the restart."""
+
+    def __init__(self) -> None:
+        self.counts: Dict[str, Dict[int, int]] = {"packet_ins": {}, "floods": {}, "flow_mods": {}}
+
+    def add(self, name: str, now: float) -> None:
+        bucket = self.counts[name]
+        bucket[int(now)] = bucket.get(int(now), 0) + 1
+
+    def total(self, name: str, start: float, end: float) -> int:
+        return sum(n for sec, n in self.counts[name].items() if start <= sec < end)
+
+
+def _masked(name: str, value: object) -> Tuple[Optional[int], object]:
+    """(mask, masked value) of one match field; IPv4 addresses compare as integers."""
+    if isinstance(value, tuple):
+        value, mask = value
+        if name.startswith("ipv4"):
+            value, mask = ip_to_int(value), ip_to_int(mask)
+        return mask, value & mask
+    if name.startswith("ipv4"):
+        return 0xFFFFFFFF, ip_to_int(value)
+    return None, value
+
+
+class _Flow:
+    __slots__ = ("priority", "fields", "out", "instructions", "idle", "hard", "cookie", "flags",
+                 "installed", "last_hit", "packets")
+
+    def __init__(self, msg, now: float) -> None:
+        self.priority = msg.fields.get("priority", 0)
+        self.fields = dict(msg.match.fields)
+        self.idle = msg.fields.get("idle_timeout", 0)
+        self.hard = msg.fields.get("hard_timeout", 0)
+        self.cookie = msg.fields.get("cookie", 0)
+        self.flags = msg.fields.get("flags", 0)
+        self.installed = self.last_hit = now
+        self.packets = 0
+        # None drops; flow-stats replies carry the instructions the way Ryu parses them
+        self.out: Optional[int] = None
+        self.instructions = []
+        for inst in msg.fields.get("instructions", ()):
+            if inst.msg_type == "OFPInstructionMeter":
+                self.instructions.append(SimpleNamespace(type=OFP.OFPIT_METER))
+                continue
+            kind, actions = inst.args
+            ports = [action.args[0] for action in actions]
+            if ports and self.out is None:
+                self.out = ports[0]
+            self.instructions.append(SimpleNamespace(
+                type=kind, actions=[SimpleNamespace(type=OFP.OFPAT_OUTPUT, port=port) for port in ports],
+            ))
+
+    def expired(self, now: float) -> Optional[int]:
+        if self.hard and now - self.installed >= self.hard:
+            return OFP.OFPRR_HARD_TIMEOUT
+        if self.idle and now - self.last_hit >= self.idle:
+            return OFP.OFPRR_IDLE_TIMEOUT
+        return None
+
+
+class Switch:
+    """One OpenFlow 1.3 switch with a single table, as the app sees it through a FakeDatapath."""
+
+    def __init__(self, clock: ReplayClock, counters: Counters) -> None:
+        self.dp = FakeDatapath(1)
+        self.clock = clock
+        self.counters = counters
+        self.app = None
+        self._seen = 0
+        self.flows: Dict[Tuple[int, tuple], _Flow] = {}
+        # priority -> ((field, mask), ...) -> masked values -> flow key, highest priority first
+        self._index: Dict[int, Dict[tuple, Dict[tuple, Tuple[int, tuple]]]] = {}
+
+    def attach(self, app) -> None:
+        self.app = app
+        self._seen = len(self.dp.sent)
+
+    def process(self) -> List[int]:
+        """Apply what the app sent since the last call; returns the ports its PacketOuts went to."""
+        outputs: List[int] = []
+        stats_requested = False
+        sent = self.dp.sent
+        while self._seen < len(sent):
+            msg = sent[self._seen]
+            self._seen += 1
+            if msg.msg_type == "OFPFlowMod":
+                self.counters.add("flow_mods", self.clock())
+                command = msg.fields.get("command", OFP.OFPFC_ADD)
+                if command == OFP.OFPFC_ADD:
+                    self._install(_Flow(msg, self.clock()))
+                elif command in (OFP.OFPFC_DELETE, OFP.OFPFC_DELETE_STRICT):
+                    self._delete(msg, strict=command == OFP.OFPFC_DELETE_STRICT)
+            elif msg.msg_type == "OFPPacketOut":
+                outputs += [action.args[0] for action in msg.actions]
+            elif msg.msg_type == "OFPFlowStatsRequest":
+                stats_requested = True
+        if stats_requested:
+            self._reply_flow_stats()
+        return outputs
+
+    @staticmethod
+    def _signature(fields: Dict[str, object]) -> Tuple[tuple, tuple]:
+        masked = sorted((name, _masked(name, value)) for name, value in fields.items())
+        return tuple((name, mask) for name, (mask, _) in masked), tuple(value for _, (_, value) in masked)
+
+    def _install(self, flow: _Flow) -> None:
+        key = (flow.priority, tuple(sorted(flow.fields.items())))
+        if key in self.flows:
+            self._unindex(key)
+        self.flows[key] = flow
+        signature, values = self._signature(flow.fields)
+        if flow.priority not in self._index:
+            self._index[flow.priority] = {}
+            self._index = dict(sorted(self._index.items(), reverse=True))
+        self._index[flow.priority].setdefault(signature, {})[values] = key
+
+    def _unindex(self, key: Tuple[int, tuple]) -> _Flow:
+        flow = self.flows.pop(key)
+        signature, values = self._signature(flow.fields)
+        del self._index[flow.priority][signature][values]
+        return flow
+
+    def _remove(self, key: Tuple[int, tuple], reason: int) -> None:
+        flow = self._unindex(key)
+        if self.app is not None and flow.flags & OFP.OFPFF_SEND_FLOW_REM:
+            self.app.flow_removed_handler(SimpleNamespace(msg=SimpleNamespace(
+                datapath=self.dp, priority=flow.priority, match=flow.fields, reason=reason,
+            )))
+
+    def _delete(self, msg, strict: bool) -> None:
+        fields = msg.match.fields
+        out_port = msg.fields.get("out_port", OFP.OFPP_ANY)
+        cookie_mask = msg.fields.get("cookie_mask", 0)
+        cookie = msg.fields.get("cookie", 0) & cookie_mask
+        doomed = []
+        for key, flow in self.flows.items():
+            if strict:
+                if flow.priority != msg.fields.get("priority", 0) or flow.fields != fields:
+                    continue
+            elif any(flow.fields.get(name) != value for name, value in fields.items()):
+                continue
+            if out_port != OFP.OFPP_ANY and flow.out != out_port:
+                continue
+            if flow.cookie & cookie_mask != cookie:
+                continue
+            doomed.append(key)
+        for key in doomed:
+            self._remove(key, OFP.OFPRR_DELETE)
+
+    def _reply_flow_stats(self) -> None:
+        body = [
+            SimpleNamespace(table_id=0, priority=flow.priority, match=dict(flow.fields), cookie=flow.cookie,
+                            idle_timeout=flow.idle, hard_timeout=flow.hard, instructions=flow.instructions,
+                            packet_count=flow.packets, byte_count=flow.packets * 100)
+            for flow in self.flows.values()
+        ]
+        adopt = self.dp.id in self.app._resync
+        self.app.flow_stats_reply_handler(SimpleNamespace(msg=SimpleNamespace(datapath=self.dp, body=body, flags=0)))
+        # the handler leaves the shadow table to a greenthread; the harness runs it in order instead
+        self.app.reconcile_flows(self.dp, body, adopt)
+
+    def expire(self, now: float) -> None:
+        for key, reason in [(key, flow.expired(now)) for key, flow in self.flows.items()]:
+            if reason is not None:
+                self._remove(key, reason)
+
+    def lookup(self, packet: Dict[str, object], now: float) -> Optional[_Flow]:
+        for tables in self._index.values():
+            for signature, table in tables.items():
+                values = []
+                for name, mask in signature:
+                    value = packet.get(name)
+                    if value is None:
+                        break
+                    values.append(value if mask is None else value & mask)
+                else:
+                    key = table.get(tuple(values))
+                    if key is None:
+                        continue
+                    flow = self.flows[key]
+                    reason = flow.expired(now)
+                    if reason is not None:
+                        self._remove(key, reason)
+                        continue
+                    flow.last_hit = now
+                    flow.packets += 1
+                    return flow
+        return None
+
+
+class Network:
+    """Hosts behind the switch, with the app (or nothing, while it is down) behind its controller port."""
+
+    def __init__(self, clock: ReplayClock, journal_dir: str) -> None:
+        self.clock = clock
+        self.journal_dir = journal_dir
+        self.counters = Counters()
+        self.switch = Switch(clock, self.counters)
+        self.app = None
+        self.harness: Optional[Replay] = None
+        self.alerts: List[float] = []
+        self._flushed = self._drained = 0.0
+
+    def start(self, checkpoint: str) -> None:
+        self.app = build_app(self.journal_dir, self.clock, checkpoint, admission=True)
+        self.harness = Replay(self.app, self.clock, datapaths=[self.switch.dp])
+        log = self.app.store.log
+
+        def watch(level, msg, **extra):
+            if msg == "DDoS flagged":
+                self.alerts.append(self.clock())
+            return log(level, msg, **extra)
+
+        self.app.store.log = watch
+        self.switch.attach(self.app)
+        self.harness.connect()
+        self.switch.process()
+
+    def stop(self, crash: bool) -> None:
+        self.settle()
+        if not crash:
+            self.app.stop()
+        self.app.journal.close()
+        self.app = self.harness = self.switch.app = None
+
+    def settle(self) -> None:
+        """The app's analytics worker and flush loop, each at its own interval."""
+        app, now = self.app, self.clock()
+        if app is None:
+            return
+        if now - self._drained >= DRAIN_S:
+            self._drained = now
+            self.harness.drain()
+        if now - self._flushed >= app.flow_flush_s:
+            self._flushed = now
+            self.harness.flush()
+        self.switch.process()
+
+    def send(self, host: int, frame: bytes, packet: Dict[str, object]) -> List[int]:
+        """Put a frame on the wire; returns the ports it leaves the switch on."""
+        now = self.clock()
+        flow = self.switch.lookup(dict(packet, in_port=host), now)
+        if flow is None:
+            return []
+        if flow.out == OFP.OFPP_CONTROLLER:
+            self.counters.add("packet_ins", now)
+            if self.app is None:
+                return []
+            self.harness.packet_in(self.switch.dp, frame, host)
+            outputs = self.switch.process()
+        else:
+            outputs = [] if flow.out is None else [flow.out]
+        if OFP.OFPP_FLOOD in outputs:
+            self.counters.add("floods", now)
+        return outputs
+
+    def resolve(self, src: int, dst: int) -> None:
+        """`src` asks for `dst`'s address; a flooded request is answered by `dst` itself."""
+        outputs = self.send(src, arp_frame(ARP_REQUEST, src, dst),
+                            {"eth_dst": BROADCAST, "eth_src": mac(src), "eth_type": ARP_ETH_TYPE})
+        if OFP.OFPP_FLOOD in outputs:
+            self.send(dst, arp_frame(ARP_REPLY, dst, src),
+                      {"eth_dst": mac(src), "eth_src": mac(dst), "eth_type": ARP_ETH_TYPE})
+
+    def connect(self, src: int, dst: int, port: int) -> None:
+        frame = build_frame(mac(src), mac(dst), ip(src), ip(dst), 6, 40000, port)
+        self.send(src, frame, {
+            "eth_dst": mac(dst), "eth_src": mac(src), "eth_type": IPV4_ETH_TYPE,
+            "ipv4_src": ip_to_int(ip(src)), "ipv4_dst": ip_to_int(ip(dst)), "ip_proto": 6, "tcp_dst": port,
+        })
+
+
+def run(frames: List[Frame], downtime: float, warm: bool, crash: bool, tmp: str, name: str) -> Dict[str, float]:
+    clock = ReplayClock(start=0.0)
+    journal_dir = os.path.join(tmp, name)
+    checkpoint = os.path.join(tmp, f"{name}.npz")
+    net = Network(clock, journal_dir)
+    net.start(checkpoint)
+    checkpoint_s = net.app.checkpoint_s
+    next_checkpoint = checkpoint_s
+    next_second = 1.0
+    # (host, peer) -> when the host's ARP entry expires
+    arp_cache: Dict[Tuple[int, int], float] = {}
+    up_at = RESTART_S + downtime
+    restarted = False
+    for t, src, dst, port in frames:
+        if t >= up_at + AFTER_S:
+            break
+        while next_second <= t:
+            clock.now = next_second
+            net.switch.expire(next_second)
+            if net.app is not None and net.app.checkpointer is not None and next_checkpoint <= next_second:
+                # the app's checkpoint loop, written inline
+                net.app.checkpointer.save(net.app.checkpointer.capture())
+                next_checkpoint += checkpoint_s
+            next_second += 1.0
+        if t >= RESTART_S and not restarted:
+            restarted = True
+            clock.now = RESTART_S
+            net.stop(crash)
+        if t >= up_at and net.app is None:
+            clock.now = up_at
+            net.start(checkpoint if warm else "")
+            next_checkpoint = up_at + checkpoint_s
+        clock.now = t
+        net.settle()
+        if arp_cache.get((src, dst), 0.0) <= t:
+            net.resolve(src, dst)
+            arp_cache[(src, dst)] = t + HOST_ARP_S
+        net.connect(src, dst, port)
+
+    counters = net.counters
+    floods = counters.counts["floods"]
+    baseline = counters.total("floods", RESTART_S - 60, RESTART_S) / 60
+    steady = AFTER_S
+    for sec in range(int(up_at), int(up_at + AFTER_S) - 10):
+        if max(floods.get(x, 0) for x in range(sec, sec + 10)) <= max(2.0, 2 * baseline):
+            steady = sec - up_at
+            break
+    app, dp = net.app, net.switch.dp
+    untracked = sum(1 for key, flow in net.switch.flows.items()
+                    if flow.priority in FORWARDING and not app.shadow.present(1, key, app.flow_tag(dp, flow)))
+    alerts = [a for a in net.alerts if a >= up_at]
+    net.stop(crash=True)
+    return {
+        "packet_ins": counters.total("packet_ins", up_at, up_at + AFTER_S),
+        "floods": counters.total("floods", up_at, up_at + AFTER_S),
+        "flow_mods": counters.total("flow_mods", up_at, up_at + AFTER_S),
+        "steady_s": max(0.0, steady),
+        "untracked": untracked,
+        "scan_s": alerts[0] - up_at if alerts else float("nan"),
+    }
+
+
+def check(cold: Dict[str, float], warm: Dict[str, float], crash: bool) -> List[str]:
+    """The improvements a warm restart must show over a cold start; returns the ones missing."""
+    failures = []
+    if warm["floods"] > cold["floods"] / 2:
+        failures.append(f"floods {warm['floods']:,} warm vs {cold['floods']:,} cold")
+    if warm["steady_s"] > cold["steady_s"]:
+        failures.append(f"steady after {warm['steady_s']:.0f} s warm vs {cold['steady_s']:.0f} s cold")
+    if warm["untracked"]:
+        failures.append(f"{warm['untracked']} untracked flows after a warm restart")
+    # a periodic checkpoint can be older than the scan window, so --crash need not flag sooner
+    if not crash and not warm["scan_s"] < cold["scan_s"] and not math.isnan(cold["scan_s"]):
+        failures.append(f"scan flagged after {warm['scan_s']:.2f} s warm vs {cold['scan_s']:.2f} s cold")
+    return failures
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--hosts", type=int, default=60)
+    ap.add_argument("--rate", type=float, default=20.0, help="new connections per second")
+    ap.add_argument("--downtime", type=float, default=2.0)
+    ap.add_argument("--crash", action="store_true", help="no checkpoint on shutdown; use the last periodic one")
+    args = ap.parse_args()
+
+    frames = traffic(args.hosts, args.rate, RESTART_S + args.downtime + AFTER_S)
+    print(f"{len(frames):,} packets, {args.hosts} hosts, restart at {RESTART_S:.0f} s, "
+          f"down {args.downtime:g} s{', crash' if args.crash else ''}; counts for {AFTER_S:.0f} s after")
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="restart-") as tmp:
+        for name, warm in (("cold start", False), ("warm restart", True)):
+            r = results[warm] = run(frames, args.downtime, warm, args.crash, tmp, name.replace(" ", "-"))
+            print(f"  {name:<13}{r['packet_ins']:>7,} Packet-Ins {r['floods']:>7,} floods "
+                  f"{r['flow_mods']:>6,} FlowMods   steady after {r['steady_s']:>4.0f} s   "
+                  f"{r['untracked']:>4} untracked flows   scan flagged after {r['scan_s']:.2f} s")
+
+    failures = check(results[False], results[True], args.crash)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
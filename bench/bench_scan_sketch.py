@@ -0,0 +1,115 @@
+"""
+Sketch scan detector against exact sliding windows: accuracy, speed, memory.
+
+    PYTHONPATH=. python -m bench.bench_scan_sketch [--events 1000000] [--destinations 10000,100000,1000000] [--memory]
+
+Background traffic from 2,000 clients to `--destinations` hosts on common
+ports, with vertical scans (random ports on a few targets) and horizontal
+sweeps (port 445 across random hosts) mixed in. The exact reference for
+vertical scans is PortScanDetector; for horizontal sweeps it is the same
+detector keyed by (source, port) with the destination as the element.
+Accuracy is counted per packet: how often the sketch flags when the exact
+window does not (false positives) and the reverse (false negatives).
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+import tracemalloc
+from typing import List, Tuple
+
+from src.controller.port_scan import PortScanDetector
+from src.controller.scan_sketch import SketchScanDetector
+
+Event = Tuple[str, str, int, float]
+
+
+def ip(i: int) -> str:
+    return f"10.{(i >> 16) & 0xFF}.{(i >> 8) & 0xFF}.{i & 0xFF}"
+
+
+def make_events(count: int, destinations: int, rate: float, seed: int = 7) -> List[Event]:
+    rng = random.Random(seed)
+    clients = [ip(0xC00000 + i) for i in range(2000)]
+    targets = [ip(i) for i in range(destinations)]
+    vertical_targets = targets[:10]
+    sweepers = [ip(0xE00000 + i) for i in range(3)]
+    events: List[Event] = []
+    for i in range(count):
+        now = i / rate
+        r = rng.random()
+        if r < 0.1:
+            events.append((ip(0xD00000 + rng.randrange(5)), rng.choice(vertical_targets), rng.randint(1, 65535), now))
+        elif r < 0.15:
+            events.append((rng.choice(sweepers), rng.choice(targets), 445, now))
+        else:
+            events.append((rng.choice(clients), rng.choice(targets), rng.choice((22, 53, 80, 443)), now))
+    return events
+
+
+def accuracy(events: List[Event], window_s: float, ports: int, hosts: int) -> Tuple[float, float, float, float]:
+    exact_v = PortScanDetector(window_s, ports)
+    exact_h = PortScanDetector(window_s, hosts)
+    sketch_v = SketchScanDetector(window_s, ports, threshold_hosts=None)
+    sketch_h = SketchScanDetector(window_s, 1 << 30, threshold_hosts=hosts)
+    fp_v = fn_v = fp_h = fn_h = 0
+    for src, dst, port, now in events:
+        truth = exact_v.flag(dst, port, now)
+        guess = sketch_v.flag(dst, port, now)
+        fp_v += guess and not truth
+        fn_v += truth and not guess
+        truth = exact_h.flag(f"{src}/{port}", hash(dst), now)
+        guess = sketch_h.flag(dst, port, now, src_ip=src)
+        fp_h += guess and not truth
+        fn_h += truth and not guess
+    n = len(events)
+    return fp_v / n, fn_v / n, fp_h / n, fn_h / n
+
+
+def throughput(detector, events: List[Event], with_src: bool) -> float:
+    start = time.perf_counter()
+    if with_src:
+        for src, dst, port, now in events:
+            detector.should_alert(dst, port, now, src_ip=src)
+    else:
+        for _, dst, port, now in events:
+            detector.should_alert(dst, port, now)
+    return len(events) / (time.perf_counter() - start)
+
+
+def peak_memory(factory, events: List[Event], with_src: bool) -> float:
+    tracemalloc.start()
+    throughput(factory(), events, with_src)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 2**20
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--events", type=int, default=1_000_000)
+    ap.add_argument("--destinations", default="10000,100000,1000000")
+    ap.add_argument("--rate", type=float, default=20_000.0, help="synthetic packets per second")
+    ap.add_argument("--memory", action="store_true", help="also report tracemalloc peak (slow)")
+    args = ap.parse_args()
+
+    for destinations in (int(d) for d in args.destinations.split(",")):
+        events = make_events(args.events, destinations, args.rate)
+        print(f"{len(events):,} events, {destinations:,} destinations, {args.rate:,.0f} pkt/s")
+        fp_v, fn_v, fp_h, fn_h = accuracy(events, 5.0, 40, 20)
+        print(f"  vertical   false positives {fp_v:8.4%}   false negatives {fn_v:8.4%}")
+        print(f"  horizontal false positives {fp_h:8.4%}   false negatives {fn_h:8.4%}")
+        contenders = (
+            ("exact", lambda: PortScanDetector(5.0, 40), False),
+            ("sketch", lambda: SketchScanDetector(5.0, 40, 20), True),
+        )
+        for name, factory, with_src in contenders:
+            line = f"  {name:<8}{throughput(factory(), events, with_src):>12,.0f} events/s"
+            if args.memory:
+                line += f"   peak {peak_memory(factory, events, with_src):8.1f} MiB"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
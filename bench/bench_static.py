@@ -0,0 +1,76 @@
+"""
+Dashboard asset serving: a file read per request against the in-memory cache.
+
+    PYTHONPATH=. python -m bench.bench_static [--requests 100000] [--revisit 0.8]
+
+Replays page loads of the real dashboard (index.html, app.js, styles.css)
+through the static layer without the HTTP server. Before: every request
+opens and reads the file and sends it uncompressed. After: StaticAssets
+serves the cached gzip copy to clients that accept it and a 304 to the
+`--revisit` share that send back the ETag they already hold.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from src.web.static_assets import STATIC_DIR, StaticAssets, content_type
+
+PAGE = ("index.html", "app.js", "styles.css")
+Request = Tuple[str, bool, bool]
+
+
+def requests(count: int, revisit: float, seed: int = 3) -> List[Request]:
+    rng = random.Random(seed)
+    # (asset, accepts gzip, revalidating)
+    return [(PAGE[i % len(PAGE)], rng.random() < 0.95, rng.random() < revisit) for i in range(count)]
+
+
+def run_read(reqs: List[Request]) -> Tuple[float, int]:
+    sent = 0
+    start = time.perf_counter()
+    for name, _, _ in reqs:
+        path = os.path.join(STATIC_DIR, name)
+        with open(path, "rb") as f:
+            body = f.read()
+        headers = [("Content-Type", content_type(path))]
+        sent += len(body) + sum(len(k) + len(v) for k, v in headers)
+    return time.perf_counter() - start, sent
+
+
+def run_cached(reqs: List[Request]) -> Tuple[float, int]:
+    assets = StaticAssets(STATIC_DIR)
+    etags: Dict[Tuple[str, bool], Optional[str]] = {}
+    for name in PAGE:
+        for gz in (False, True):
+            headers = dict(assets.respond(name, assets.get(name), "gzip" if gz else None)[1])
+            etags[(name, gz)] = headers["ETag"]
+    sent = 0
+    start = time.perf_counter()
+    for name, gz, revalidating in reqs:
+        asset = assets.get(name)
+        status, headers, body = assets.respond(
+            name, asset, "gzip, deflate" if gz else None, etags[(name, gz)] if revalidating else None,
+        )
+        sent += len(body) + sum(len(k) + len(v) for k, v in headers)
+    return time.perf_counter() - start, sent
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--requests", type=int, default=100_000)
+    ap.add_argument("--revisit", type=float, default=0.8, help="share of requests carrying If-None-Match")
+    args = ap.parse_args()
+
+    reqs = requests(args.requests, args.revisit)
+    print(f"{len(reqs):,} asset requests, {args.revisit:.0%} revalidating")
+    for name, fn in (("read per request", run_read), ("cached", run_cached)):
+        elapsed, sent = fn(reqs)
+        print(f"  {name:<18}{len(reqs) / elapsed:>12,.0f} req/s   {sent / len(reqs):>8,.0f} bytes/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+DashboardStore contention: packet-path writers against dashboard readers.
+
+    PYTHONPATH=. python -m bench.bench_store [--writers 4] [--readers 2] [--seconds 3]
+
+Compares the per-packet `inc_flow(); inc_allowed()` pattern on a locked
+store (the original implementation, reproduced below) with one
+`record(flow=1, allowed=1)` call per packet.
+"""
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+from typing import Callable, List
+
+from src.web.store import DashboardStore
+
+
+class LockedCounters:
+    """The original lock-per-increment counters."""
+
+    def __init__(self, store: DashboardStore) -> None:
+        self._lock = threading.Lock()
+        self.store = store
+        self.sec_flows = self.sec_allowed = self.allowed_total = 0
+
+    def inc_flow(self) -> None:
+        with self._lock:
+            self.sec_flows += 1
+
+    def inc_allowed(self) -> None:
+        with self._lock:
+            self.allowed_total += 1
+            self.sec_allowed += 1
+
+    def snapshot(self):
+        with self._lock:
+            return self.store.snapshot()
+
+
+def run(packet: Callable[[], None], read: Callable[[], object], writers: int, readers: int, seconds: float):
+    stop = threading.Event()
+    written: List[int] = [0] * writers
+    read_counts: List[int] = [0] * readers
+
+    def writer(i: int) -> None:
+        n = 0
+        while not stop.is_set():
+            for _ in range(1000):
+                packet()
+            n += 1000
+        written[i] = n
+
+    def reader(i: int) -> None:
+        n = 0
+        while not stop.is_set():
+            read()
+            n += 1
+        read_counts[i] = n
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return sum(written) / seconds, sum(read_counts) / seconds
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--writers", type=int, default=4)
+    ap.add_argument("--readers", type=int, default=2)
+    ap.add_argument("--seconds", type=float, default=3.0)
+    args = ap.parse_args()
+
+    locked = LockedCounters(DashboardStore())
+
+    def locked_packet() -> None:
+        locked.inc_flow()
+        locked.inc_allowed()
+
+    store = DashboardStore()
+
+    def record_packet() -> None:
+        store.record(flow=1, allowed=1)
+
+    print(f"{args.writers} writer(s), {args.readers} snapshot reader(s), {args.seconds:.0f}s each")
+    for name, packet, read in (
+        ("locked inc_*", locked_packet, locked.snapshot),
+        ("record()", record_packet, store.snapshot),
+    ):
+        writes, reads = run(packet, read, args.writers, args.readers, args.seconds)
+        print(f"{name:<14}{writes:>14,.0f} packets/s{reads:>12,.0f} snapshots/s")
+
+
+if __name__ == "__main__":
+    main()
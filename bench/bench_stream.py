@@ -0,0 +1,87 @@
+"""
+Dashboard fan-out: SSE push against per-client polling.
+
+    PYTHONPATH=. python -m bench.bench_stream [--clients 500] [--slow 50] [--ticks 60]
+
+Each tick records some traffic and logs an event, then either every client
+polls the full snapshot (what the dashboard did before the stream) or the
+hub publishes once to all subscribers. Slow subscribers never drain their
+queue, so they overflow and are resynchronized with a full snapshot.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+
+from src.web.store import DashboardStore
+from src.web.stream import StreamHub
+
+
+def traffic(store: DashboardStore, tick: int) -> None:
+    store.record(flow=50, allowed=48, acl_drop=2)
+    store.log("INFO", "bench event", tick=tick)
+    store.tick_1s()
+
+
+def run_polling(clients: int, ticks: int):
+    store = DashboardStore()
+    sent = 0
+    start = time.perf_counter()
+    for t in range(ticks):
+        traffic(store, t)
+        for _ in range(clients):
+            sent += len(json.dumps(store.snapshot(), ensure_ascii=False).encode("utf-8"))
+    return time.perf_counter() - start, sent, {}
+
+
+def run_stream(clients: int, slow: int, ticks: int, max_queue: int):
+    store = DashboardStore()
+    hub = StreamHub(store, max_queue=max_queue, max_clients=clients)
+    subs = [hub.subscribe() for _ in range(clients)]
+    stop = threading.Event()
+    received = [0]
+
+    def drain(fast) -> None:
+        while not stop.is_set():
+            for sub in fast:
+                while not sub.queue.empty():
+                    received[0] += len(sub.queue.get_nowait())
+            time.sleep(0.001)
+
+    reader = threading.Thread(target=drain, args=(subs[slow:],))
+    reader.start()
+    publish_s = 0.0
+    start = time.perf_counter()
+    for t in range(ticks):
+        traffic(store, t)
+        t0 = time.perf_counter()
+        hub.publish()
+        publish_s += time.perf_counter() - t0
+        time.sleep(0.002)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    reader.join()
+    stats = dict(hub.stats(), publish_ms=1000 * publish_s / ticks)
+    return elapsed, received[0], stats
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--clients", type=int, default=500)
+    ap.add_argument("--slow", type=int, default=50, help="subscribers that never read")
+    ap.add_argument("--ticks", type=int, default=60)
+    ap.add_argument("--max-queue", type=int, default=16)
+    args = ap.parse_args()
+
+    print(f"{args.clients} clients ({args.slow} slow), {args.ticks} ticks")
+    elapsed, sent, _ = run_polling(args.clients, args.ticks)
+    print(f"{'polling':<10}{1000 * elapsed / args.ticks:>10.2f} ms/tick{sent / args.ticks / 1024:>12,.0f} KiB/tick")
+    elapsed, received, stats = run_stream(args.clients, args.slow, args.ticks, args.max_queue)
+    print(f"{'stream':<10}{stats['publish_ms']:>10.2f} ms/tick{received / args.ticks / 1024:>12,.0f} KiB/tick"
+          f"   frames built {stats['frames_built']}, resyncs {stats['resyncs']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Dashboard time series: rolled-up NumPy rings against per-second deques.
+
+    PYTHONPATH=. python -m bench.bench_timeseries [--days 7]
+
+Feeds `--days` of per-second points for the four dashboard series into
+TimeSeries and into four deques plus a label deque sized to keep the same
+span at one-second resolution (what extending the old store would take).
+Reported: cost per tick, memory, and the time to answer a 120-bucket query
+at each resolution.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime
+
+from src.web.store import SERIES
+from src.web.timeseries import TimeSeries
+
+
+def run_deques(points: int, seed: int = 1) -> float:
+    rng = random.Random(seed)
+    labels = deque(maxlen=points)
+    series = [deque(maxlen=points) for _ in SERIES]
+    start = time.perf_counter()
+    for sec in range(points):
+        labels.append(datetime.fromtimestamp(sec).strftime("%H:%M:%S"))
+        for d in series:
+            d.append(rng.randrange(1000))
+    return time.perf_counter() - start
+
+
+def run_rings(points: int, seed: int = 1) -> tuple:
+    rng = random.Random(seed)
+    ts = TimeSeries(SERIES)
+    start = time.perf_counter()
+    for sec in range(points):
+        ts.add(sec, [rng.randrange(1000) for _ in SERIES])
+    return time.perf_counter() - start, ts
+
+
+def peak_mib(fn, *args) -> float:
+    tracemalloc.start()
+    result = fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return peak / 2**20
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--days", type=float, default=7.0)
+    args = ap.parse_args()
+
+    points = int(args.days * 86400)
+    print(f"{points:,} per-second points ({args.days:g} days), {len(SERIES)} series")
+    # the store adds one point per second, so per-tick cost only has to stay far below that
+    elapsed = run_deques(points)
+    print(f"  {'deques':<8}{elapsed / points * 1e6:>8.1f} us/tick   {peak_mib(run_deques, points):8.1f} MiB")
+    elapsed, ts = run_rings(points)
+    print(f"  {'rings':<8}{elapsed / points * 1e6:>8.1f} us/tick   {ts.nbytes() / 2**20:8.1f} MiB")
+    for resolution in ts.resolutions:
+        end = points - 1
+        start = end - 120 * resolution + 1
+        t0 = time.perf_counter()
+        for _ in range(100):
+            result = ts.query(start, end, resolution)
+        per_query = (time.perf_counter() - t0) / 100
+        kept = ts.retention(resolution) / 3600
+        span = f"{kept:g} h" if kept < 48 else f"{kept / 24:g} days"
+        print(f"  {resolution:>5} s buckets: {len(result['t']):>4} per query in {per_query * 1e6:5.0f} us"
+              f"   history kept: {span}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import random
+import struct
+from typing import Iterable, Iterator, List, Optional
+
+PCAP_MAGIC = 0xA1B2C3D4
+PCAP_MAGIC_NS = 0xA1B23C4D
+LINKTYPE_ETHERNET = 1
+
+_PCAP_HEADER = struct.Struct("<IHHiIII")
+_PCAP_RECORD = struct.Struct("<IIII")
+
+
+def mac_bytes(mac: str) -> bytes:
+    return bytes(int(part, 16) for part in mac.split(":"))
+
+
+def ip_bytes(ip: str) -> bytes:
+    return bytes(int(part) for part in ip.split("."))
+
+
+def build_frame(
+    src_mac: str,
+    dst_mac: str,
+    src_ip: Optional[str] = None,
+    dst_ip: Optional[str] = None,
+    proto: int = 6,
+    src_port: int = 40000,
+    dst_port: int = 80,
+    vlan: Optional[int] = None,
+    ethertype: int = 0x0800,
+    payload: bytes = b"",
+) -> bytes:
+    """Build an Ethernet frame, optionally VLAN-tagged, carrying IPv4 TCP/UDP/ICMP."""
+    eth = mac_bytes(dst_mac) + mac_bytes(src_mac)
+    if vlan is not None:
+        eth += struct.pack("!HH", 0x8100, vlan)
+    if src_ip is None:
+        return eth + struct.pack("!H", ethertype) + payload.ljust(46, b"\0")
+
+    if proto == 6:
+        l4 = struct.pack("!HHIIBBHHH", src_port, dst_port, 0, 0, 5 << 4, 0x02, 65535, 0, 0)
+    elif proto == 17:
+        l4 = struct.pack("!HHHH", src_port, dst_port, 8 + len(payload), 0)
+    else:
+        l4 = struct.pack("!BBHHH", 8, 0, 0, 0, 0)
+    l4 += payload
+    ip = struct.pack(
+        "!BBHHHBBH4s4s",
+        0x45, 0, 20 + len(l4), 0, 0, 64, proto, 0, ip_bytes(src_ip), ip_bytes(dst_ip),
+    )
+    return eth + struct.pack("!H", 0x0800) + ip + l4
+
+
+def synthetic_corpus(count: int, seed: int = 1) -> List[bytes]:
+    """A mixed lab corpus: mostly TCP/UDP between h1-h3, some ARP, ICMP and VLAN frames."""
+    rng = random.Random(seed)
+    hosts = [(f"00:00:00:00:00:0{i}", f"10.0.0.{i}") for i in (1, 2, 3)]
+    frames: List[bytes] = []
+    for _ in range(count):
+        (smac, sip), (dmac, dip) = rng.sample(hosts, 2)
+        kind = rng.random()
+        if kind < 0.55:
+            frames.append(build_frame(smac, dmac, sip, dip, 6, rng.randint(32768, 60999), rng.choice((22, 80, 443, rng.randint(1000, 31000)))))
+        elif kind < 0.80:
+            frames.append(build_frame(smac, dmac, sip, dip, 17, rng.randint(32768, 60999), rng.choice((53, 123, 5353))))
+        elif kind < 0.90:
+            frames.append(build_frame(smac, "ff:ff:ff:ff:ff:ff", ethertype=0x0806))
+        elif kind < 0.97:
+            frames.append(build_frame(smac, dmac, sip, dip, 1))
+        else:
+            frames.append(build_frame(smac, dmac, sip, dip, 6, 40000, 443, vlan=10))
+    return frames
+
+
+def port_scan_corpus(count: int, seed: int = 1, background: float = 0.2) -> List[bytes]:
+    """h3 sweeping TCP ports on h2, mixed with a share of normal lab traffic."""
+    rng = random.Random(seed)
+    normal = synthetic_corpus(count, seed)
+    frames: List[bytes] = []
+    port = 1
+    for i in range(count):
+        if rng.random() < background:
+            frames.append(normal[i])
+            continue
+        frames.append(build_frame("00:00:00:00:00:03", "00:00:00:00:00:02", "10.0.0.3", "10.0.0.2", 6,
+                                  rng.randint(32768, 60999), port))
+        port = port % 65535 + 1
+    return frames
+
+
+def acl_flood_corpus(count: int, seed: int = 1, background: float = 0.1) -> List[bytes]:
+    """h1 hammering SSH on h2 (denied by the default policy) from ever-changing source ports."""
+    rng = random.Random(seed)
+    normal = synthetic_corpus(count, seed)
+    frames: List[bytes] = []
+    for i in range(count):
+        if rng.random() < background:
+            frames.append(normal[i])
+        else:
+            frames.append(build_frame("00:00:00:00:00:01", "00:00:00:00:00:02", "10.0.0.1", "10.0.0.2", 6,
+                                      rng.randint(32768, 60999), 22))
+    return frames
+
+
+SCENARIOS = {
+    "normal": synthetic_corpus,
+    "port_scan": port_scan_corpus,
+    "acl_flood": acl_flood_corpus,
+}
+
+
+def write_pcap(path: str, frames: Iterable[bytes]) -> None:
+    with open(path, "wb") as f:
+        f.write(_PCAP_HEADER.pack(PCAP_MAGIC, 2, 4, 0, 0, 65535, LINKTYPE_ETHERNET))
+        for i, frame in enumerate(frames):
+            f.write(_PCAP_RECORD.pack(i // 1000, (i % 1000) * 1000, len(frame), len(frame)))
+            f.write(frame)
+
+
+def read_pcap(path: str) -> Iterator[bytes]:
+    """Yield Ethernet frames from a classic (non-ng) pcap file."""
+    with open(path, "rb") as f:
+        header = f.read(_PCAP_HEADER.size)
+        if len(header) < _PCAP_HEADER.size:
+            return
+        magic = struct.unpack("<I", header[:4])[0]
+        if magic in (PCAP_MAGIC, PCAP_MAGIC_NS):
+            record = _PCAP_RECORD
+        elif magic in (0xD4C3B2A1, 0x4D3CB2A1):
+            record = struct.Struct(">IIII")
+        else:
+            raise ValueError(f"{path}: not a pcap file")
+        while True:
+            raw = f.read(record.size)
+            if len(raw) < record.size:
+                return
+            _, _, incl_len, _ = record.unpack(raw)
+            yield f.read(incl_len)
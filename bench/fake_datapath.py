@@ -0,0 +1,96 @@
+"""
+Stand-ins for Ryu's Datapath, ofproto and ofproto_parser that record every
+message the controller emits instead of writing it to a socket.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from types import SimpleNamespace
+from typing import Any, List
+
+
+class FakeMsg:
+    __slots__ = ("msg_type", "args", "fields", "xid")
+
+    def __init__(self, msg_type: str, args: tuple, fields: dict) -> None:
+        self.msg_type = msg_type
+        self.args = args
+        self.fields = fields
+        self.xid = None
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self.fields[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __repr__(self) -> str:
+        return f"{self.msg_type}({self.fields})"
+
+
+class FakeParser:
+    """Any OFP* constructor returns a FakeMsg carrying its arguments."""
+
+    def __getattr__(self, name: str):
+        if not name.startswith("OFP"):
+            raise AttributeError(name)
+
+        def build(*args: Any, **fields: Any) -> FakeMsg:
+            fields.pop("datapath", None)
+            if args and isinstance(args[0], FakeDatapath):
+                args = args[1:]
+            return FakeMsg(name, args, fields)
+
+        return build
+
+
+FAKE_OFPROTO = SimpleNamespace(
+    OFP_VERSION=0x04,
+    OFP_NO_BUFFER=0xFFFFFFFF,
+    OFPP_FLOOD=0xFFFFFFFB,
+    OFPP_CONTROLLER=0xFFFFFFFD,
+    OFPP_ANY=0xFFFFFFFF,
+    OFPG_ANY=0xFFFFFFFF,
+    OFPTT_ALL=0xFF,
+    OFPCML_NO_BUFFER=0xFFFF,
+    OFPIT_APPLY_ACTIONS=4,
+    OFPIT_METER=6,
+    OFPAT_OUTPUT=0,
+    OFPMPF_REPLY_MORE=1,
+    OFPFC_ADD=0,
+    OFPFC_MODIFY=1,
+    OFPFC_MODIFY_STRICT=2,
+    OFPFC_DELETE=3,
+    OFPFC_DELETE_STRICT=4,
+    OFPFF_SEND_FLOW_REM=1,
+    OFPMC_ADD=0,
+    OFPMC_MODIFY=1,
+    OFPMC_DELETE=2,
+    OFPMF_PKTPS=2,
+    OFPMF_BURST=4,
+    OFPRR_IDLE_TIMEOUT=0,
+    OFPRR_HARD_TIMEOUT=1,
+    OFPRR_DELETE=2,
+)
+
+
+class FakeDatapath:
+    def __init__(self, dpid: int = 1) -> None:
+        self.id = dpid
+        self.ofproto = FAKE_OFPROTO
+        self.ofproto_parser = FakeParser()
+        self.sent: List[FakeMsg] = []
+        self._xid = 0
+
+    def set_xid(self, msg: FakeMsg) -> int:
+        self._xid += 1
+        msg.xid = self._xid
+        return self._xid
+
+    def send_msg(self, msg: FakeMsg) -> None:
+        if msg.xid is None:
+            self.set_xid(msg)
+        self.sent.append(msg)
+
+    def counts(self) -> Counter:
+        return Counter(m.msg_type for m in self.sent)
@@ -0,0 +1,263 @@
+"""
+Replay frames through SdnSecurityApp's handlers without Mininet or Open vSwitch.
+
+    PYTHONPATH=. python -m bench.replay --scenario port_scan [--frames 20000] [--switches 1]
+    PYTHONPATH=. python -m bench.replay --pcap capture.pcap
+
+Each frame becomes a Packet-In on a FakeDatapath that records every message
+the app emits. Replay time advances 1/`--pps` seconds per frame: admission
+buckets, FlowMod dedupe, MAC/ARP aging, the shadow flow table, source
+history and scan-detector windows run on that clock, the flow programmer is
+flushed and barriers are answered as often as the app's flush loop would,
+the analytics queue is drained as often as its worker would, and the store
+ticks once per replayed second. Admission buckets shed nothing unless
+`--admission` is given. Needs Ryu and eventlet, which the app module
+imports.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from collections import Counter
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Sequence
+
+from bench.corpus import SCENARIOS, read_pcap
+from bench.fake_datapath import FakeDatapath
+from src.controller.admission import PacketInAdmission
+from src.controller.analytics import DETECT
+from src.controller.checkpoint import Checkpointer
+from src.controller.flow_granularity import FlowGranularity
+from src.controller.flow_programmer import FlowProgrammer
+from src.controller.l2_learning import L2Learning
+from src.controller.shadow_table import ShadowFlowTable
+
+# how often the analytics worker gets the hub between Packet-Ins
+DRAIN_S = 0.005
+
+
+class ReplayClock:
+    def __init__(self, start: float = 1000.0, epoch: float = 1_700_000_000.0) -> None:
+        self.now = start
+        # wall-clock time at replay time 0
+        self.epoch = epoch
+
+    def __call__(self) -> float:
+        return self.now
+
+    def wall(self) -> float:
+        return self.epoch + self.now
+
+
+class _WSGIRegistry:
+    """Takes the app's DashboardWSGI registration; nothing is served."""
+
+    def __init__(self) -> None:
+        self.controllers: List[tuple] = []
+
+    def register(self, controller, data=None) -> None:
+        self.controllers.append((controller, data))
+
+
+class _Timed:
+    """Wraps a bound method and accumulates the time spent in it."""
+
+    def __init__(self, fn: Callable[..., Any]) -> None:
+        self.fn = fn
+        self.calls = 0
+        self.seconds = 0.0
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return self.fn(*args, **kwargs)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.calls += 1
+
+
+def build_app(journal_dir: str, clock: ReplayClock, checkpoint: str = "", admission: bool = False):
+    """
+    A fresh app with its clocked parts on `clock`. It loads a checkpoint,
+    and `stop` writes one, only when given a `checkpoint` path. The
+    per-source admission buckets only shed when `admission` is set: a
+    corpus from a few hosts replayed faster than their 100 pps would
+    otherwise measure the shed path instead of the pipeline.
+    """
+    from src.controller.sdn_security_app import SdnSecurityApp
+
+    # never restore whatever var/checkpoint.npz the last real controller run left behind
+    env = dict(os.environ, SDN_JOURNAL_DIR=journal_dir, SDN_CHECKPOINT="")
+    app = SdnSecurityApp(wsgi=_WSGIRegistry(), env=env)
+    buckets = app.admission
+    rate, burst = (buckets.rate_pps, buckets.burst) if admission else (1e9, 1e9)
+    app.admission = PacketInAdmission(rate, burst, buckets.penalty_s, buckets.max_sources, clock=clock)
+    programmer = app.flow_programmer
+    app.flow_programmer = FlowProgrammer(programmer.batch_size, programmer.dedupe_s, clock=clock)
+    l2 = app.l2
+    app.l2 = L2Learning(l2.mac_capacity, l2.mac_age_s, l2.arp.capacity, l2.arp.max_age_s, clock=clock)
+    shadow = app.shadow
+    app.shadow = ShadowFlowTable(shadow.capacity, shadow.evict_below, clock=clock)
+    g = app.granularity
+    app.granularity = FlowGranularity(
+        g.promote_after_s, g.promote_after_flows, g.subnet_min_sources, g.subnet_prefix, g.probation_s,
+        g.max_sources, g.max_peers, coarse_ok=g.coarse_ok, clock=clock,
+    )
+    if checkpoint:
+        app.checkpointer = Checkpointer(checkpoint, app.l2, app.port_scan_detector, app.store,
+                                        clock=clock, wall=clock.wall, quarantine=app.quarantine)
+        app._restore_checkpoint()
+    # time every Packet-In while replaying
+    app.metrics.histogram("sdn_packet_in_seconds", "Packet-In handler time by stage.", sample_every=1)
+    return app
+
+
+def _restamped(put: Callable[[str, tuple], bool], wall: Callable[[], float]) -> Callable[[str, tuple], bool]:
+    """AnalyticsQueue.put with detector records stamped on replay time instead of time.time()."""
+
+    def restamp(kind: str, record: tuple) -> bool:
+        if kind == DETECT:
+            record = (wall(),) + record[1:]
+        return put(kind, record)
+
+    return restamp
+
+
+class Replay:
+    def __init__(self, app, clock: ReplayClock, switches: int = 1, pps: float = 1000.0,
+                 datapaths: Sequence[FakeDatapath] = ()) -> None:
+        self.app = app
+        self.clock = clock
+        self.pps = pps
+        # a restarted app reconnects the switches the previous one had
+        self.datapaths = list(datapaths) or [FakeDatapath(dpid) for dpid in range(1, switches + 1)]
+        self._answered = {dp.id: len(dp.sent) for dp in self.datapaths}
+        self.store_record = app.store.record = _Timed(app.store.record)
+        self.store_log = app.store.log = _Timed(app.store.log)
+        self.analyze = _Timed(app._analyze)
+        app.analytics.put = _restamped(app.analytics.put, clock.wall)
+
+    def connect(self) -> None:
+        for dp in self.datapaths:
+            self.app.switch_features_handler(SimpleNamespace(msg=SimpleNamespace(datapath=dp)))
+            self.app.meter_features_handler(SimpleNamespace(msg=SimpleNamespace(
+                datapath=dp, body=[SimpleNamespace(max_meter=64)],
+            )))
+        self._answer_barriers()
+
+    def _answer_barriers(self) -> None:
+        for dp in self.datapaths:
+            start = self._answered[dp.id]
+            for msg in dp.sent[start:]:
+                if msg.msg_type == "OFPBarrierRequest":
+                    self.app.barrier_reply_handler(SimpleNamespace(msg=SimpleNamespace(datapath=dp, xid=msg.xid)))
+            self._answered[dp.id] = len(dp.sent)
+
+    def packet_in(self, dp: FakeDatapath, frame: bytes, in_port: int) -> None:
+        self.app.packet_in_handler(SimpleNamespace(msg=SimpleNamespace(datapath=dp, match={"in_port": in_port},
+                                                                        data=frame)))
+
+    def flush(self) -> None:
+        """What the app's flush loop does: send queued FlowMods; the switches answer the barriers."""
+        self.app.flow_programmer.flush()
+        self._answer_barriers()
+
+    def drain(self) -> None:
+        """What the analytics worker does, without pausing between batches."""
+        app = self.app
+        batch = app.analytics.drain(app.analytics_batch)
+        while batch:
+            self.analyze(batch)
+            batch = app.analytics.drain(app.analytics_batch)
+
+    def feed(self, frames: Sequence[bytes]) -> Dict[str, Any]:
+        app = self.app
+        step = 1.0 / self.pps
+        flush_every = max(1, int(self.pps * app.flow_flush_s))
+        drain_every = max(1, int(self.pps * DRAIN_S))
+        tick_every = max(1, int(self.pps))
+        dps = self.datapaths
+
+        start = time.perf_counter()
+        for i, frame in enumerate(frames):
+            # hosts h1-h3 sit behind ports 1-3, keyed by the last byte of their MAC
+            self.packet_in(dps[i % len(dps)], frame, frame[11] if 1 <= frame[11] <= 3 else 4)
+            self.clock.now += step
+            if (i + 1) % drain_every == 0:
+                self.drain()
+            if (i + 1) % flush_every == 0:
+                self.flush()
+            if (i + 1) % tick_every == 0:
+                app.store.tick_1s()
+        self.drain()
+        self.flush()
+        elapsed = time.perf_counter() - start
+        return self.result(len(frames), elapsed)
+
+    def result(self, frames: int, elapsed: float) -> Dict[str, Any]:
+        sent: Counter = Counter()
+        for dp in self.datapaths:
+            sent.update(dp.counts())
+        stages = {
+            stage: total / max(1, count) * 1e6
+            for stage, (count, total) in self.app.metrics.histogram_totals("sdn_packet_in_seconds").items()
+        }
+        snapshot = self.app.store.snapshot()
+        return {
+            "frames": frames,
+            "seconds": elapsed,
+            "packet_ins_per_s": frames / elapsed if elapsed else 0.0,
+            "flow_mods": sent["OFPFlowMod"],
+            "packet_outs": sent["OFPPacketOut"],
+            "barriers": sent["OFPBarrierRequest"],
+            "acl_drops": snapshot["counters"]["acl_drops_total"],
+            "ddos_flags": snapshot["counters"]["ddos_flags_total"],
+            "shed": self.app.admission.shed,
+            "store_us": (self.store_record.seconds + self.store_log.seconds) / frames * 1e6 if frames else 0.0,
+            "analytics_us": self.analyze.seconds / frames * 1e6 if frames else 0.0,
+            "analytics_shed": sum(self.app.analytics.shed.values()),
+            "stage_us": stages,
+        }
+
+
+def replay(frames: Sequence[bytes], switches: int = 1, pps: float = 1000.0, admission: bool = False) -> Dict[str, Any]:
+    """Build a fresh app, connect `switches` fake switches and replay `frames` through it."""
+    with tempfile.TemporaryDirectory(prefix="replay-journal-") as journal_dir:
+        clock = ReplayClock()
+        app = build_app(journal_dir, clock, admission=admission)
+        try:
+            harness = Replay(app, clock, switches=switches, pps=pps)
+            harness.connect()
+            return harness.feed(frames)
+        finally:
+            app.journal.close()
+
+
+def load_frames(scenario: str, count: int, pcap: str = None) -> List[bytes]:
+    if pcap:
+        return list(read_pcap(pcap))
+    return SCENARIOS[scenario](count)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scenario", choices=sorted(SCENARIOS), default="normal")
+    ap.add_argument("--pcap", help="replay a recorded capture instead of a synthetic scenario")
+    ap.add_argument("--frames", type=int, default=20_000)
+    ap.add_argument("--switches", type=int, default=1)
+    ap.add_argument("--pps", type=float, default=1000.0, help="replayed Packet-Ins per simulated second")
+    ap.add_argument("--admission", action="store_true", help="shed sources over the app's per-MAC rate")
+    args = ap.parse_args()
+
+    result = replay(load_frames(args.scenario, args.frames, args.pcap), args.switches, args.pps, args.admission)
+    stages = result.pop("stage_us")
+    for key, value in result.items():
+        print(f"{key:<18}{value:>14,.2f}" if isinstance(value, float) else f"{key:<18}{value:>14,}")
+    for stage, us in sorted(stages.items(), key=lambda kv: -kv[1]):
+        print(f"  {stage:<16}{us:>14.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Minimal OpenFlow 1.3 switch for load-testing the controller over TCP.
+
+An EmulatedSwitch connects to the controller, answers the handshake (HELLO,
+FEATURES, port description and meter features), echo and barrier requests,
+and injects Packet-Ins. It installs nothing: every FlowMod and PacketOut is
+counted, and a PacketOut carrying the data of an injected Packet-In closes
+that packet's round trip.
+"""
+from __future__ import annotations
+
+import asyncio
+import struct
+import time
+from typing import Dict, List, Optional
+
+OFP_VERSION = 0x04
+
+OFPT_HELLO = 0
+OFPT_ERROR = 1
+OFPT_ECHO_REQUEST = 2
+OFPT_ECHO_REPLY = 3
+OFPT_FEATURES_REQUEST = 5
+OFPT_FEATURES_REPLY = 6
+OFPT_GET_CONFIG_REQUEST = 7
+OFPT_GET_CONFIG_REPLY = 8
+OFPT_PACKET_IN = 10
+OFPT_PACKET_OUT = 13
+OFPT_FLOW_MOD = 14
+OFPT_MULTIPART_REQUEST = 18
+OFPT_MULTIPART_REPLY = 19
+OFPT_BARRIER_REQUEST = 20
+OFPT_BARRIER_REPLY = 21
+OFPT_ROLE_REQUEST = 24
+OFPT_ROLE_REPLY = 25
+OFPT_METER_MOD = 29
+
+OFPMP_METER_FEATURES = 11
+OFPMP_PORT_DESC = 13
+
+OFP_NO_BUFFER = 0xFFFFFFFF
+OFPR_NO_MATCH = 0
+
+_HEADER = struct.Struct("!BBHI")
+_FEATURES = struct.Struct("!QIBB2xII")
+_MULTIPART = struct.Struct("!HH4x")
+_PORT = struct.Struct("!I4x6s2x16sIIIIIIII")
+_METER_FEATURES = struct.Struct("!IIIBB2x")
+_PACKET_IN = struct.Struct("!IHBBQ")
+# OXM in_port: class OPENFLOW_BASIC, field 0, 4-byte value; the match is padded to 8 bytes
+_MATCH_IN_PORT = struct.Struct("!HHII4x")
+_PACKET_OUT = struct.Struct("!IIH6x")
+
+
+def header(msg_type: int, length: int, xid: int) -> bytes:
+    return _HEADER.pack(OFP_VERSION, msg_type, length, xid)
+
+
+def message(msg_type: int, xid: int, body: bytes = b"") -> bytes:
+    return header(msg_type, _HEADER.size + len(body), xid) + body
+
+
+def packet_in(xid: int, in_port: int, frame: bytes) -> bytes:
+    body = (
+        _PACKET_IN.pack(OFP_NO_BUFFER, len(frame), OFPR_NO_MATCH, 0, 0)
+        + _MATCH_IN_PORT.pack(1, 12, 0x80000004, in_port)
+        + b"\0\0"
+        + frame
+    )
+    return message(OFPT_PACKET_IN, xid, body)
+
+
+def packet_out_data(body: bytes) -> bytes:
+    """Frame carried by a PacketOut body (the message without its header)."""
+    _, _, actions_len = _PACKET_OUT.unpack_from(body)
+    return body[_PACKET_OUT.size + actions_len:]
+
+
+class EmulatedSwitch:
+    def __init__(self, dpid: int, ports: int = 8, meters: bool = True, timeout_s: float = 2.0) -> None:
+        self.dpid = dpid
+        self.ports = ports
+        self.meters = meters
+        self.timeout_s = timeout_s
+        self.ready = asyncio.Event()
+        self.closed = False
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._xid = 0x10000000
+        # frame -> send time of the Packet-Ins still waiting for a PacketOut
+        self._outstanding: Dict[bytes, float] = {}
+
+        self.packet_ins = 0
+        self.flow_mods = 0
+        self.packet_outs = 0
+        self.barriers = 0
+        self.meter_mods = 0
+        self.errors = 0
+        self.lost = 0
+        self.rtts: List[float] = []
+
+    async def connect(self, host: str, port: int) -> None:
+        reader, self._writer = await asyncio.open_connection(host, port)
+        self._writer.write(message(OFPT_HELLO, 1))
+        asyncio.ensure_future(self._read_loop(reader))
+
+    def close(self) -> None:
+        self.closed = True
+        if self._writer is not None:
+            self._writer.close()
+
+    def _next_xid(self) -> int:
+        self._xid = (self._xid + 1) & 0xFFFFFFFF
+        return self._xid
+
+    def inject(self, in_port: int, frame: bytes) -> None:
+        """Send one Packet-In; `frame` should be unique among outstanding ones to time its round trip."""
+        self._outstanding[frame] = time.perf_counter()
+        self._writer.write(packet_in(self._next_xid(), in_port, frame))
+        self.packet_ins += 1
+
+    async def drain(self) -> None:
+        await self._writer.drain()
+
+    def expire(self) -> None:
+        """Count Packet-Ins that got no PacketOut within `timeout_s` (dropped, shed or lost)."""
+        deadline = time.perf_counter() - self.timeout_s
+        stale = [frame for frame, sent in self._outstanding.items() if sent < deadline]
+        for frame in stale:
+            del self._outstanding[frame]
+        self.lost += len(stale)
+
+    async def _read_loop(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while True:
+                raw = await reader.readexactly(_HEADER.size)
+                _, msg_type, length, xid = _HEADER.unpack(raw)
+                body = await reader.readexactly(length - _HEADER.size) if length > _HEADER.size else b""
+                self._handle(msg_type, xid, body)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.closed = True
+
+    def _handle(self, msg_type: int, xid: int, body: bytes) -> None:
+        w = self._writer
+        if msg_type == OFPT_PACKET_OUT:
+            self.packet_outs += 1
+            sent = self._outstanding.pop(packet_out_data(body), None)
+            if sent is not None:
+                self.rtts.append(time.perf_counter() - sent)
+        elif msg_type == OFPT_FLOW_MOD:
+            self.flow_mods += 1
+        elif msg_type == OFPT_BARRIER_REQUEST:
+            self.barriers += 1
+            w.write(message(OFPT_BARRIER_REPLY, xid))
+        elif msg_type == OFPT_ECHO_REQUEST:
+            w.write(message(OFPT_ECHO_REPLY, xid, body))
+        elif msg_type == OFPT_FEATURES_REQUEST:
+            w.write(message(OFPT_FEATURES_REPLY, xid, _FEATURES.pack(self.dpid, 0, 254, 0, 0x4F, 0)))
+        elif msg_type == OFPT_MULTIPART_REQUEST:
+            self._multipart(xid, body)
+        elif msg_type == OFPT_GET_CONFIG_REQUEST:
+            w.write(message(OFPT_GET_CONFIG_REPLY, xid, struct.pack("!HH", 0, 0xFFFF)))
+        elif msg_type == OFPT_ROLE_REQUEST:
+            w.write(message(OFPT_ROLE_REPLY, xid, body))
+        elif msg_type == OFPT_METER_MOD:
+            self.meter_mods += 1
+        elif msg_type == OFPT_ERROR:
+            self.errors += 1
+
+    def _multipart(self, xid: int, body: bytes) -> None:
+        mp_type, _ = struct.unpack_from("!HH", body)
+        if mp_type == OFPMP_PORT_DESC:
+            reply = b"".join(
+                _PORT.pack(
+                    n, struct.pack("!HI", 0x0200, self.dpid << 8 | n)[:6], f"s{self.dpid}-eth{n}".encode()[:15],
+                    0, 4, 0x2840, 0x2840, 0x2840, 0, 10_000_000, 10_000_000,
+                )
+                for n in range(1, self.ports + 1)
+            )
+            self.ready.set()
+        elif mp_type == OFPMP_METER_FEATURES:
+            reply = _METER_FEATURES.pack(64 if self.meters else 0, 0b11, 0b1111, 1, 0)
+        else:
+            reply = b""  # empty statistics
+        self._writer.write(message(OFPT_MULTIPART_REPLY, xid, _MULTIPART.pack(mp_type, 0) + reply))
@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+import heapq
+import ipaddress
+import os
+import socket
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+ALLOW = "allow"
+DENY = "deny"
+DEFAULT_PRIORITY = 100
+
+_PROTOCOLS = {"icmp": 1, "tcp": 6, "udp": 17}
+_WILDCARDS = ("any", "*")
+_MAX_PORT = 65535
+
+
+@dataclass(frozen=True)
+class AclRule:
+    """
+    One policy line. Address fields are (network, prefix_len) integers, None
+    fields are wildcards, and the port range is inclusive.
+    """
+
+    action: str
+    src: Tuple[int, int] = (0, 0)
+    dst: Tuple[int, int] = (0, 0)
+    proto: Optional[int] = None
+    port_lo: Optional[int] = None
+    port_hi: Optional[int] = None
+    priority: int = DEFAULT_PRIORITY
+    order: int = 0
+
+    @property
+    def denies(self) -> bool:
+        return self.action == DENY
+
+    @property
+    def has_port(self) -> bool:
+        return self.port_lo is not None
+
+    def src_cidr(self) -> str:
+        return _cidr(self.src)
+
+    def dst_cidr(self) -> str:
+        return _cidr(self.dst)
+
+    def matches(self, src_ip: str, dst_ip: str, proto: int, dst_port: Optional[int]) -> bool:
+        """Reference (linear) semantics the compiled classifier must agree with."""
+        if not _in_prefix(ip_to_int(src_ip), self.src) or not _in_prefix(ip_to_int(dst_ip), self.dst):
+            return False
+        if self.proto is not None and self.proto != proto:
+            return False
+        if self.port_lo is None:
+            return True
+        return dst_port is not None and self.port_lo <= dst_port <= self.port_hi
+
+
+def ip_to_int(ip: str) -> int:
+    return int.from_bytes(socket.inet_aton(ip), "big")
+
+
+def _mask(prefix_len: int) -> int:
+    return (0xFFFFFFFF << (32 - prefix_len)) & 0xFFFFFFFF
+
+
+def _in_prefix(addr: int, prefix: Tuple[int, int]) -> bool:
+    return (addr & _mask(prefix[1])) == prefix[0]
+
+
+def _cidr(prefix: Tuple[int, int]) -> str:
+    return f"{ipaddress.IPv4Address(prefix[0])}/{prefix[1]}"
+
+
+def _parse_prefix(token: str) -> Tuple[int, int]:
+    if token in _WILDCARDS:
+        return (0, 0)
+    net = ipaddress.IPv4Network(token, strict=False)
+    return (int(net.network_address), net.prefixlen)
+
+
+def _parse_proto(token: str) -> Optional[int]:
+    if token in _WILDCARDS:
+        return None
+    if token in _PROTOCOLS:
+        return _PROTOCOLS[token]
+    proto = int(token)
+    if not 0 <= proto <= 255:
+        raise ValueError(f"protocol out of range: {token}")
+    return proto
+
+
+def _parse_ports(token: str) -> Tuple[Optional[int], Optional[int]]:
+    if token in _WILDCARDS:
+        return (None, None)
+    lo, _, hi = token.partition("-")
+    port_lo = int(lo)
+    port_hi = int(hi) if hi else port_lo
+    if not 0 <= port_lo <= port_hi <= _MAX_PORT:
+        raise ValueError(f"invalid port range: {token}")
+    return (port_lo, port_hi)
+
+
+def parse_rules(lines: Iterable[str]) -> List[AclRule]:
+    """
+    Parse `action src dst proto port [priority=N]` lines, e.g.
+
+        deny  10.0.0.1     10.0.0.2  tcp  22
+        allow 10.0.0.0/24  any       udp  1000-2000  priority=200
+
+    Blank lines and `#` comments are ignored. Higher priorities win; rules of
+    equal priority are first-match in file order.
+    """
+    rules: List[AclRule] = []
+    for lineno, raw in enumerate(lines, start=1):
+        line = raw.split("#", 1)[0].strip()
+        if not line:
+            continue
+        tokens = line.lower().split()
+        try:
+            priority = DEFAULT_PRIORITY
+            if tokens[-1].startswith("priority="):
+                priority = int(tokens.pop().split("=", 1)[1])
+            if len(tokens) != 5:
+                raise ValueError("expected: action src dst proto port [priority=N]")
+            action, src, dst, proto_s, port_s = tokens
+            if action not in (ALLOW, DENY):
+                raise ValueError(f"unknown action: {action}")
+            proto = _parse_proto(proto_s)
+            port_lo, port_hi = _parse_ports(port_s)
+            if port_lo is not None and proto not in (None, 6, 17):
+                raise ValueError("ports are only valid for tcp, udp or any")
+            rules.append(AclRule(
+                action=action,
+                src=_parse_prefix(src),
+                dst=_parse_prefix(dst),
+                proto=proto,
+                port_lo=port_lo,
+                port_hi=port_hi,
+                priority=priority,
+                order=len(rules),
+            ))
+        except ValueError as e:
+            raise ValueError(f"line {lineno}: {e}: {raw.strip()!r}") from None
+    return rules
+
+
+def load_rules(path: str) -> List[AclRule]:
+    with open(path, "r", encoding="utf-8") as f:
+        return parse_rules(f)
+
+
+class _PortTable:
+    """Best rule per elementary port interval of one (src, dst, proto) bucket."""
+
+    __slots__ = ("any_port", "starts", "best")
+
+    def __init__(self, ranked: Sequence[Tuple[int, AclRule]]) -> None:
+        wildcard = [(rank, rule) for rank, rule in ranked if not rule.has_port]
+        self.any_port: Optional[Tuple[int, AclRule]] = min(wildcard, key=lambda r: r[0]) if wildcard else None
+
+        ranged = sorted(
+            ((rule.port_lo, rule.port_hi, rank, rule) for rank, rule in ranked if rule.has_port),
+            key=lambda r: r[0],
+        )
+        bounds = sorted({lo for lo, _, _, _ in ranged} | {hi + 1 for _, hi, _, _ in ranged})
+        self.starts: List[int] = []
+        self.best: List[Optional[Tuple[int, AclRule]]] = []
+
+        active: List[Tuple[int, int, AclRule]] = []
+        i = 0
+        for start in bounds:
+            while i < len(ranged) and ranged[i][0] <= start:
+                lo, hi, rank, rule = ranged[i]
+                heapq.heappush(active, (rank, hi, rule))
+                i += 1
+            while active and active[0][1] < start:
+                heapq.heappop(active)
+            best = (active[0][0], active[0][2]) if active else None
+            if self.any_port is not None and (best is None or self.any_port[0] < best[0]):
+                best = self.any_port
+            self.starts.append(start)
+            self.best.append(best)
+
+    def match(self, dst_port: Optional[int]) -> Optional[Tuple[int, AclRule]]:
+        if dst_port is None or not self.starts:
+            return self.any_port
+        i = bisect_right(self.starts, dst_port) - 1
+        return self.any_port if i < 0 else self.best[i]
+
+
+class AclClassifier:
+    """
+    Tuple-space search over (src prefix length, dst prefix length, proto
+    wildcard). Each tuple is one hash lookup on the masked addresses followed
+    by a bisect over that bucket's port intervals, and tuples are visited in
+    order of their best rule so the search stops as soon as no remaining tuple
+    can beat the current match.
+    """
+
+    def __init__(self, rules: Iterable[AclRule] = ()) -> None:
+        self.rules: Tuple[AclRule, ...] = tuple(rules)
+        ranked = sorted(self.rules, key=lambda r: (-r.priority, r.order))
+
+        spaces: Dict[Tuple[int, int, bool], Dict[Tuple[int, int, int], List[Tuple[int, AclRule]]]] = {}
+        for rank, rule in enumerate(ranked):
+            shape = (rule.src[1], rule.dst[1], rule.proto is None)
+            key = (rule.src[0], rule.dst[0], -1 if rule.proto is None else rule.proto)
+            spaces.setdefault(shape, {}).setdefault(key, []).append((rank, rule))
+
+        tuples = []
+        for (src_len, dst_len, any_proto), buckets in spaces.items():
+            table = {key: _PortTable(members) for key, members in buckets.items()}
+            best_rank = min(members[0][0] for members in buckets.values())
+            tuples.append((best_rank, _mask(src_len), _mask(dst_len), any_proto, table))
+        tuples.sort(key=lambda t: t[0])
+        self._tuples = tuples
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    @property
+    def tuple_count(self) -> int:
+        return len(self._tuples)
+
+    def lookup(self, src_ip: str, dst_ip: str, proto: int, dst_port: Optional[int]) -> Optional[AclRule]:
+        src = ip_to_int(src_ip)
+        dst = ip_to_int(dst_ip)
+        best: Optional[Tuple[int, AclRule]] = None
+        for best_rank, src_mask, dst_mask, any_proto, table in self._tuples:
+            if best is not None and best_rank >= best[0]:
+                break
+            bucket = table.get((src & src_mask, dst & dst_mask, -1 if any_proto else proto))
+            if bucket is None:
+                continue
+            hit = bucket.match(dst_port)
+            if hit is not None and (best is None or hit[0] < best[0]):
+                best = hit
+        return best[1] if best is not None else None
+
+
+class AclPolicy:
+    """
+    The live policy. `classifier` is replaced wholesale on reload, so a lookup
+    always runs against one complete rule set and never waits on a rebuild.
+    """
+
+    def __init__(self, rules: Iterable[AclRule] = (), path: Optional[str] = None) -> None:
+        self.path = path
+        self.classifier = AclClassifier(rules)
+        self._mtime: Optional[float] = None
+
+    @classmethod
+    def from_file(cls, path: str) -> "AclPolicy":
+        policy = cls(path=path)
+        policy.reload()
+        return policy
+
+    @property
+    def rules(self) -> Tuple[AclRule, ...]:
+        return self.classifier.rules
+
+    def lookup(self, src_ip: str, dst_ip: str, proto: int, dst_port: Optional[int]) -> Optional[AclRule]:
+        return self.classifier.lookup(src_ip, dst_ip, proto, dst_port)
+
+    def is_denied(self, src_ip: str, dst_ip: str, proto: int, dst_port: Optional[int]) -> bool:
+        rule = self.classifier.lookup(src_ip, dst_ip, proto, dst_port)
+        return rule is not None and rule.denies
+
+    def replace(self, rules: Iterable[AclRule]) -> None:
+        self.classifier = AclClassifier(rules)
+
+    def reload(self) -> None:
+        if self.path is None:
+            raise ValueError("policy has no backing file")
+        # remember the mtime first so a broken file is reported once, not on every poll
+        self._mtime = os.stat(self.path).st_mtime
+        self.classifier = AclClassifier(load_rules(self.path))
+
+    def reload_if_changed(self) -> bool:
+        """
+        Recompile from `path` when its mtime moved. A file that fails to parse
+        raises ValueError once and leaves the current policy in place.
+        """
+        if self.path is None:
+            return False
+        try:
+            if os.stat(self.path).st_mtime == self._mtime:
+                return False
+        except FileNotFoundError:
+            return False
+        self.reload()
+        return True
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+from dataclasses import replace
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
+
+from src.controller.acl import DENY, AclRule
+from src.controller.flow_rules import IPV4_ETH_TYPE, TCP_PROTOCOL, UDP_PROTOCOL
+
+ACL_DROP_PRIORITY = 150
+ACL_COOKIE = 0xAC1
+MAX_EXPANDED_PORTS = 64
+
+MatchKey = Tuple[Tuple[str, object], ...]
+
+
+def _prefix_field(prefix: Tuple[int, int]) -> Optional[object]:
+    addr, length = prefix
+    if length == 0:
+        return None
+    dotted = ".".join(str((addr >> shift) & 0xFF) for shift in (24, 16, 8, 0))
+    if length == 32:
+        return dotted
+    mask = (0xFFFFFFFF << (32 - length)) & 0xFFFFFFFF
+    return (dotted, ".".join(str((mask >> shift) & 0xFF) for shift in (24, 16, 8, 0)))
+
+
+def rule_match_fields(rule: AclRule, max_ports: int = MAX_EXPANDED_PORTS) -> Optional[List[Dict[str, object]]]:
+    """
+    OFPMatch kwargs that together cover `rule`, or None when the rule cannot
+    be expressed on the switch. OpenFlow 1.3 has no port ranges (tcp_dst is
+    not maskable), so ranges are expanded to one match per port up to
+    `max_ports`; a wildcard protocol with ports becomes a TCP and a UDP match.
+    """
+    base: Dict[str, object] = {"eth_type": IPV4_ETH_TYPE}
+    for field, prefix in (("ipv4_src", rule.src), ("ipv4_dst", rule.dst)):
+        value = _prefix_field(prefix)
+        if value is not None:
+            base[field] = value
+
+    if not rule.has_port:
+        if rule.proto is not None:
+            base["ip_proto"] = rule.proto
+        return [base]
+
+    protos = (rule.proto,) if rule.proto is not None else (TCP_PROTOCOL, UDP_PROTOCOL)
+    ports = range(rule.port_lo, rule.port_hi + 1)
+    if len(ports) * len(protos) > max_ports:
+        return None
+
+    matches = []
+    for proto in protos:
+        port_field = "tcp_dst" if proto == TCP_PROTOCOL else "udp_dst"
+        for port in ports:
+            matches.append(dict(base, ip_proto=proto, **{port_field: port}))
+    return matches
+
+
+def covering_match_fields(rule: AclRule, max_ports: int = MAX_EXPANDED_PORTS) -> List[Dict[str, object]]:
+    """
+    OFPMatch kwargs that together cover at least the traffic `rule` matches:
+    those of `rule_match_fields`, or, when its ports cannot be expanded, the
+    same match without them.
+    """
+    matches = rule_match_fields(rule, max_ports)
+    if matches is None:
+        matches = rule_match_fields(replace(rule, port_lo=None, port_hi=None), max_ports)
+    return matches
+
+
+def _overlaps(a: AclRule, b: AclRule) -> bool:
+    for pa, pb in ((a.src, b.src), (a.dst, b.dst)):
+        shorter = min(pa[1], pb[1])
+        mask = (0xFFFFFFFF << (32 - shorter)) & 0xFFFFFFFF
+        if (pa[0] & mask) != (pb[0] & mask):
+            return False
+    if a.proto is not None and b.proto is not None and a.proto != b.proto:
+        return False
+    if a.has_port and b.has_port:
+        return a.port_lo <= b.port_hi and b.port_lo <= a.port_hi
+    return True
+
+
+def _split_denies(rules: Iterable[AclRule], max_ports: int) -> Tuple[Dict[MatchKey, Dict[str, object]], List[AclRule]]:
+    ranked = sorted(rules, key=lambda r: (-r.priority, r.order))
+    drops: Dict[MatchKey, Dict[str, object]] = {}
+    reactive: List[AclRule] = []
+    allows: List[AclRule] = []
+    for rule in ranked:
+        if not rule.denies:
+            allows.append(rule)
+            continue
+        matches = rule_match_fields(rule, max_ports)
+        if matches is None or any(_overlaps(allow, rule) for allow in allows):
+            reactive.append(rule)
+            continue
+        for fields in matches:
+            drops[tuple(sorted(fields.items()))] = fields
+    return drops, reactive
+
+
+def offloaded_drops(rules: Iterable[AclRule], max_ports: int = MAX_EXPANDED_PORTS) -> Dict[MatchKey, Dict[str, object]]:
+    """
+    Drop matches to pre-install for a policy, keyed for diffing. Only deny
+    rules that no higher-ranked allow rule overlaps are offloaded; anything
+    else stays reactive so the controller's first-match answer still applies.
+    """
+    return _split_denies(rules, max_ports)[0]
+
+
+def reactive_denies(rules: Iterable[AclRule], max_ports: int = MAX_EXPANDED_PORTS) -> List[AclRule]:
+    """Deny rules that are not offloaded and so are enforced only on Packet-In."""
+    return _split_denies(rules, max_ports)[1]
+
+
+def overlaps_any(rules: Iterable[AclRule], src: Tuple[int, int], dst: Tuple[int, int]) -> bool:
+    """True if any of `rules` could match traffic from prefix `src` to prefix `dst`."""
+    probe = AclRule(DENY, src=src, dst=dst)
+    return any(_overlaps(rule, probe) for rule in rules)
+
+
+class AclFlowProgrammer:
+    """
+    Keeps each datapath's permanent ACL drop flows in step with the policy:
+    the full set when a switch connects, then add/delete FlowMods for the
+    difference on every policy change.
+    """
+
+    def __init__(self, priority: int = ACL_DROP_PRIORITY, max_ports: int = MAX_EXPANDED_PORTS) -> None:
+        self.priority = priority
+        self.max_ports = max_ports
+        self._installed: Dict[int, FrozenSet[MatchKey]] = {}
+
+    def installed(self, dpid: int) -> FrozenSet[MatchKey]:
+        return self._installed.get(dpid, frozenset())
+
+    def forget(self, dpid: int) -> None:
+        self._installed.pop(dpid, None)
+
+    def install_all(self, dp, rules: Sequence[AclRule]) -> int:
+        """Clear any ACL flows left from an earlier session, then push the whole policy."""
+        ofp = dp.ofproto
+        parser = dp.ofproto_parser
+        dp.send_msg(parser.OFPFlowMod(
+            datapath=dp,
+            command=ofp.OFPFC_DELETE,
+            table_id=ofp.OFPTT_ALL,
+            cookie=ACL_COOKIE,
+            cookie_mask=0xFFFFFFFFFFFFFFFF,
+            out_port=ofp.OFPP_ANY,
+            out_group=ofp.OFPG_ANY,
+            match=parser.OFPMatch(),
+        ))
+        self._installed[dp.id] = frozenset()
+        added, _ = self.sync(dp, rules)
+        return added
+
+    def sync(self, dp, rules: Sequence[AclRule]) -> Tuple[int, int]:
+        desired = offloaded_drops(rules, self.max_ports)
+        current = self._installed.get(dp.id, frozenset())
+        wanted: Set[MatchKey] = set(desired)
+
+        removed = current - wanted
+        for key in removed:
+            self._send(dp, dict(key), delete=True)
+        added = wanted - current
+        for key in added:
+            self._send(dp, desired[key], delete=False)
+
+        self._installed[dp.id] = frozenset(wanted)
+        return len(added), len(removed)
+
+    def _send(self, dp, fields: Dict[str, object], delete: bool) -> None:
+        ofp = dp.ofproto
+        parser = dp.ofproto_parser
+        match = parser.OFPMatch(**fields)
+        if delete:
+            mod = parser.OFPFlowMod(
+                datapath=dp,
+                command=ofp.OFPFC_DELETE_STRICT,
+                priority=self.priority,
+                cookie=ACL_COOKIE,
+                cookie_mask=0xFFFFFFFFFFFFFFFF,
+                out_port=ofp.OFPP_ANY,
+                out_group=ofp.OFPG_ANY,
+                match=match,
+            )
+        else:
+            # no instructions: matching packets are dropped on the switch
+            mod = parser.OFPFlowMod(
+                datapath=dp,
+                command=ofp.OFPFC_ADD,
+                priority=self.priority,
+                cookie=ACL_COOKIE,
+                match=match,
+                instructions=[],
+                idle_timeout=0,
+                hard_timeout=0,
+            )
+        dp.send_msg(mod)
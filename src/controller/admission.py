@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List
+
+ADMIT = "admit"
+SHED = "shed"
+PENALIZE = "penalize"
+
+PACKET_IN_METER_ID = 1
+
+
+class PacketInAdmission:
+    """
+    Per-source token buckets checked before a Packet-In is parsed. A source
+    that empties its bucket is shed; the first shed packet returns PENALIZE so
+    the caller can push a temporary drop rule to the switch, and the source
+    stays shed until `penalty_s` has passed.
+    """
+
+    def __init__(
+        self,
+        rate_pps: float = 100.0,
+        burst: float = 200.0,
+        penalty_s: float = 10.0,
+        max_sources: int = 100_000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.rate_pps = rate_pps
+        self.burst = burst
+        self.penalty_s = penalty_s
+        self.max_sources = max_sources
+        self._clock = clock
+        # source -> [tokens, last refill, penalized until], least recently seen first
+        self._buckets: "OrderedDict[Hashable, List[float]]" = OrderedDict()
+
+        self.admitted = 0
+        self.shed = 0
+        self.penalized = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "penalized": self.penalized,
+            "tracked_sources": len(self._buckets),
+        }
+
+    def admit(self, source: Hashable) -> str:
+        now = self._clock()
+        buckets = self._buckets
+        bucket = buckets.get(source)
+        if bucket is None:
+            bucket = buckets[source] = [self.burst, now, 0.0]
+            if len(buckets) > self.max_sources:
+                buckets.popitem(last=False)
+        else:
+            buckets.move_to_end(source)
+
+        if now < bucket[2]:
+            self.shed += 1
+            return SHED
+
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate_pps)
+        bucket[1] = now
+        if tokens >= 1.0:
+            bucket[0] = tokens - 1.0
+            self.admitted += 1
+            return ADMIT
+
+        bucket[0] = tokens
+        bucket[2] = now + self.penalty_s
+        self.shed += 1
+        self.penalized += 1
+        return PENALIZE
+
+
+def send_packet_in_meter(dp, rate_pps: int, burst: int, meter_id: int = PACKET_IN_METER_ID) -> None:
+    """Install (or replace) the OpenFlow 1.3 drop meter that caps controller-bound packets on `dp`."""
+    ofp = dp.ofproto
+    parser = dp.ofproto_parser
+    bands = [parser.OFPMeterBandDrop(rate=rate_pps, burst_size=burst)]
+    for command in (ofp.OFPMC_DELETE, ofp.OFPMC_ADD):
+        dp.send_msg(parser.OFPMeterMod(
+            datapath=dp,
+            command=command,
+            flags=ofp.OFPMF_PKTPS | ofp.OFPMF_BURST,
+            meter_id=meter_id,
+            bands=bands if command == ofp.OFPMC_ADD else [],
+        ))
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# record kinds, most valuable first: detector input, then dashboard events
+DETECT = "detect"
+EVENT = "event"
+
+
+class AnalyticsQueue:
+    """
+    Bounded FIFO between the Packet-In fast path and the analytics worker.
+    `put` never waits: past `shed_events_at` of capacity events are
+    refused, and when the queue is full detector records are refused too,
+    so an overloaded controller loses history and log lines before it
+    delays a forwarding decision. Refused records are only counted.
+    `on_ready` is called when a record lands in an empty queue, so the
+    worker can sleep until there is something to drain.
+    """
+
+    def __init__(self, capacity: int = 65536, shed_events_at: float = 0.5,
+                 on_ready: Optional[Callable[[], None]] = None) -> None:
+        self.capacity = capacity
+        self._on_ready = on_ready
+        self._limits = {DETECT: capacity, EVENT: int(capacity * shed_events_at)}
+        self._queue: "deque[Tuple[str, Any]]" = deque()
+        self.enqueued = 0
+        self.processed = 0
+        self.batches = 0
+        self.max_depth = 0
+        self.shed: Dict[str, int] = {DETECT: 0, EVENT: 0}
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def put(self, kind: str, record: Any) -> bool:
+        """Queue `record` unless the overload policy sheds it; False when shed."""
+        queue = self._queue
+        depth = len(queue)
+        if depth >= self._limits[kind]:
+            self.shed[kind] += 1
+            return False
+        queue.append((kind, record))
+        self.enqueued += 1
+        if not depth and self._on_ready is not None:
+            self._on_ready()
+        if depth >= self.max_depth:
+            self.max_depth = depth + 1
+        return True
+
+    def drain(self, max_batch: int) -> List[Tuple[str, Any]]:
+        """Up to `max_batch` records, oldest first."""
+        queue = self._queue
+        batch = [queue.popleft() for _ in range(min(max_batch, len(queue)))]
+        if batch:
+            self.batches += 1
+            self.processed += len(batch)
+        return batch
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": len(self._queue),
+            "max_depth": self.max_depth,
+            "capacity": self.capacity,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "batches": self.batches,
+            "shed": dict(self.shed),
+        }
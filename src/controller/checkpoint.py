@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+import zipfile
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from src.controller.l2_learning import L2Learning
+from src.controller.port_scan import PortScanDetector
+from src.controller.quarantine import Quarantine
+from src.controller.scan_sketch import SketchScanDetector
+from src.web.store import DashboardStore
+
+FORMAT_VERSION = 1
+
+Arrays = Dict[str, np.ndarray]
+
+
+def write_checkpoint(path: str, state: Dict[str, Any], arrays: Arrays) -> int:
+    """
+    Atomically replace `path` with a compressed .npz holding `state` as
+    JSON plus the named arrays; returns its size in bytes.
+    """
+    meta = json.dumps(dict(state, format=FORMAT_VERSION), separators=(",", ":"), default=str).encode("utf-8")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, __meta__=np.frombuffer(meta, dtype=np.uint8), **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return os.path.getsize(path)
+
+
+def read_checkpoint(path: str) -> Optional[Tuple[Dict[str, Any], Arrays]]:
+    """(state, arrays) from `write_checkpoint`, or None if there is no file. Raises ValueError if it is unusable."""
+    try:
+        with np.load(path, allow_pickle=False) as npz:
+            arrays = {name: npz[name] for name in npz.files}
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile) as e:
+        raise ValueError(f"unreadable checkpoint {path}: {e}") from e
+    meta = arrays.pop("__meta__", None)
+    if meta is None:
+        raise ValueError(f"checkpoint {path} has no metadata")
+    state = json.loads(meta.tobytes().decode("utf-8"))
+    if state.get("format") != FORMAT_VERSION:
+        raise ValueError(f"checkpoint {path} has format {state.get('format')}, expected {FORMAT_VERSION}")
+    return state, arrays
+
+
+class Checkpointer:
+    """
+    Snapshots the controller's soft state so a restart resumes warm: MAC
+    and ARP tables, open port-scan windows (or the scan sketch's cells),
+    quarantined sources, and dashboard counters, recent events and
+    time-series history. `capture` copies the state and is meant for the
+    event loop; `save` builds the sketch arrays, compresses and writes, and
+    can run in a native thread. Entries keep aging while the controller is
+    down, so an old checkpoint brings back counters and history but few
+    hosts.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        l2: L2Learning,
+        detector: object,
+        store: DashboardStore,
+        clock: Callable[[], float] = time.monotonic,
+        wall: Callable[[], float] = time.time,
+        quarantine: Optional[Quarantine] = None,
+    ) -> None:
+        self.path = path
+        self.l2 = l2
+        self.detector = detector
+        self.store = store
+        self.quarantine = quarantine
+        self._clock = clock
+        self._wall = wall
+        self.saves = 0
+        self.last_bytes = 0
+        self.last_save_s = 0.0
+
+    def capture(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        store_state, arrays = self.store.export_state()
+        state: Dict[str, Any] = {
+            "saved_at": self._wall(),
+            "l2": self.l2.export_state(self._clock()),
+            "store": store_state,
+        }
+        captured: Dict[str, Any] = {f"series_{name}": array for name, array in arrays.items()}
+        if isinstance(self.detector, PortScanDetector):
+            state["port_scan"] = self.detector.export_state(self._wall())
+        elif isinstance(self.detector, SketchScanDetector):
+            state["scan_sketch"], builders = self.detector.export_state()
+            captured.update((f"sketch_{name}", build) for name, build in builders.items())
+        if self.quarantine is not None:
+            state["quarantine"] = self.quarantine.export_state()
+        return state, captured
+
+    def save(self, captured: Tuple[Dict[str, Any], Dict[str, Any]]) -> int:
+        """Write a `capture`; arrays captured as builders (the sketch's cells) are built here."""
+        start = time.perf_counter()
+        state, arrays = captured
+        arrays = {name: array() if callable(array) else array for name, array in arrays.items()}
+        self.last_bytes = write_checkpoint(self.path, state, arrays)
+        self.last_save_s = time.perf_counter() - start
+        self.saves += 1
+        return self.last_bytes
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """
+        Restore the last checkpoint into the components. Returns what was
+        restored, or None when there is no checkpoint. Raises ValueError for
+        a corrupt one.
+        """
+        loaded = read_checkpoint(self.path)
+        if loaded is None:
+            return None
+        state, arrays = loaded
+        elapsed = max(0.0, self._wall() - state["saved_at"])
+        series = {name[len("series_"):]: array for name, array in arrays.items() if name.startswith("series_")}
+        self.store.restore_state(state["store"], series)
+        restored = {
+            "age_s": round(elapsed, 1),
+            "l2_entries": self.l2.restore_state(state["l2"], elapsed, self._clock()),
+            "scan_windows": 0,
+        }
+        if isinstance(self.detector, PortScanDetector) and "port_scan" in state:
+            restored["scan_windows"] = self.detector.restore_state(state["port_scan"])
+        elif isinstance(self.detector, SketchScanDetector) and "scan_sketch" in state:
+            sketch = {name[len("sketch_"):]: array for name, array in arrays.items() if name.startswith("sketch_")}
+            restored["scan_alerts"] = self.detector.restore_state(state["scan_sketch"], sketch)
+        if self.quarantine is not None and "quarantine" in state:
+            restored["quarantined"] = self.quarantine.restore_state(state["quarantine"])
+        return restored
+
+    def stats(self) -> Dict[str, Any]:
+        return {"saves": self.saves, "bytes": self.last_bytes, "last_save_ms": round(self.last_save_s * 1000, 1)}
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.controller.acl import ip_to_int
+from src.controller.flow_rules import IPV4_ETH_TYPE, forwarding_match_fields
+
+FINE = "fine"
+PAIR = "pair"
+SUBNET = "subnet"
+
+FINE_PRIORITY = 50
+PAIR_PRIORITY = 45
+SUBNET_PRIORITY = 40
+# punts an untrusted source's IPv4 traffic above its subnet's flows, below its own per-destination ones
+SOURCE_PUNT_PRIORITY = 42
+
+# coarse flows carry the source (or subnet) in the cookie so a demotion is one delete per switch;
+# fine flows are tagged too, so an ACL change can delete them by match without touching other flows
+FINE_COOKIE = 0xF0 << 40
+PAIR_COOKIE = 0xF1 << 40
+SUBNET_COOKIE = 0xF2 << 40
+COOKIE_MASK = 0xFFFFFFFFFFFFFFFF
+
+Prefix = Tuple[int, int]
+FlowRule = Tuple[Dict[str, object], int, int]
+
+
+def _dotted(addr: int) -> str:
+    return ".".join(str((addr >> shift) & 0xFF) for shift in (24, 16, 8, 0))
+
+
+class _Source:
+    __slots__ = ("first_seen", "clean", "trusted", "probation_until")
+
+    def __init__(self, now: float) -> None:
+        self.first_seen = now
+        self.clean = 0
+        self.trusted = False
+        self.probation_until = 0.0
+
+
+class _Subnet:
+    __slots__ = ("trusted", "probation_until")
+
+    def __init__(self) -> None:
+        self.trusted = 0
+        self.probation_until = 0.0
+
+
+class FlowGranularity:
+    """
+    Chooses how wide each forwarding flow is. New and suspicious sources get
+    port-specific flows, so every new destination port still reaches the
+    scan detector. A source seen for `promote_after_s` with at least
+    `promote_after_flows` clean Packet-Ins is trusted, and traffic to a
+    peer it has also talked to cleanly for `promote_after_s` gets one flow
+    per (source, destination); new peers stay port-specific until then.
+    Once `subnet_min_sources` sources of a /`subnet_prefix` are trusted,
+    such a flow covers the whole subnet, including its other hosts; those
+    that are not trusted get a punt flow above it (`needs_punt`). An
+    alert demotes the source and its subnet for `probation_s`.
+
+    `coarse_ok(src_prefix, dst_prefix)` vetoes a coarse flow that would hide
+    traffic the controller still has to judge (e.g. a reactive ACL deny).
+    Up to `max_sources` sources are remembered; forgetting one only makes
+    its flows finer.
+    """
+
+    def __init__(
+        self,
+        promote_after_s: float = 60.0,
+        promote_after_flows: int = 20,
+        subnet_min_sources: int = 4,
+        subnet_prefix: int = 24,
+        probation_s: float = 600.0,
+        max_sources: int = 65536,
+        max_peers: int = 262144,
+        coarse_ok: Optional[Callable[[Prefix, Prefix], bool]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.promote_after_s = promote_after_s
+        self.promote_after_flows = promote_after_flows
+        self.subnet_min_sources = subnet_min_sources
+        self.subnet_prefix = subnet_prefix
+        self.subnet_mask = (0xFFFFFFFF << (32 - subnet_prefix)) & 0xFFFFFFFF
+        self.probation_s = probation_s
+        self.max_sources = max_sources
+        self.max_peers = max_peers
+        self.coarse_ok = coarse_ok or (lambda src, dst: True)
+        self._clock = clock
+
+        # least recently seen first
+        self._sources: "OrderedDict[str, _Source]" = OrderedDict()
+        self._subnets: Dict[int, _Subnet] = {}
+        # (source, destination) -> first clean Packet-In, least recently seen first
+        self._peers: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self.trusted = 0
+        self.promotions = 0
+        self.demotions = 0
+
+    def _source(self, src_ip: str, now: float) -> _Source:
+        sources = self._sources
+        source = sources.get(src_ip)
+        if source is None:
+            source = sources[src_ip] = _Source(now)
+            if len(sources) > self.max_sources:
+                old_ip, old = sources.popitem(last=False)
+                subnet = self._subnet(old_ip)
+                if old.trusted:
+                    subnet.trusted -= 1
+                    self.trusted -= 1
+                if subnet.trusted == 0 and subnet.probation_until <= now:
+                    del self._subnets[ip_to_int(old_ip) & self.subnet_mask]
+        else:
+            sources.move_to_end(src_ip)
+        return source
+
+    def _subnet(self, src_ip: str) -> _Subnet:
+        net = ip_to_int(src_ip) & self.subnet_mask
+        subnet = self._subnets.get(net)
+        if subnet is None:
+            subnet = self._subnets[net] = _Subnet()
+        return subnet
+
+    def level(self, src_ip: str, dst_ip: str, now: Optional[float] = None) -> str:
+        now = self._clock() if now is None else now
+        source = self._sources.get(src_ip)
+        if source is None or not source.trusted or now < source.probation_until:
+            return FINE
+        since = self._peers.get((src_ip, dst_ip))
+        if since is None or now - since < self.promote_after_s:
+            return FINE
+        subnet = self._subnet(src_ip)
+        if subnet.trusted >= self.subnet_min_sources and now >= subnet.probation_until:
+            return SUBNET
+        return PAIR
+
+    def needs_punt(self, src_ip: str, now: Optional[float] = None) -> bool:
+        """
+        True when `src_ip` is not trusted but its subnet qualifies for subnet
+        flows, which would forward its traffic without a Packet-In.
+        """
+        now = self._clock() if now is None else now
+        subnet = self._subnets.get(ip_to_int(src_ip) & self.subnet_mask)
+        if subnet is None or subnet.trusted < self.subnet_min_sources or now < subnet.probation_until:
+            return False
+        source = self._sources.get(src_ip)
+        return source is None or not source.trusted or now < source.probation_until
+
+    def observe(self, src_ip: str, dst_ip: str, now: Optional[float] = None) -> None:
+        """A Packet-In from `src_ip` to `dst_ip` passed the ACL and the detector without an alert."""
+        now = self._clock() if now is None else now
+        source = self._source(src_ip, now)
+        source.clean += 1
+        peers = self._peers
+        peer = (src_ip, dst_ip)
+        if peer in peers:
+            peers.move_to_end(peer)
+        else:
+            peers[peer] = now
+            if len(peers) > self.max_peers:
+                peers.popitem(last=False)
+        if (
+            not source.trusted
+            and now >= source.probation_until
+            and source.clean >= self.promote_after_flows
+            and now - source.first_seen >= self.promote_after_s
+        ):
+            source.trusted = True
+            self._subnet(src_ip).trusted += 1
+            self.trusted += 1
+            self.promotions += 1
+
+    def demote(self, src_ip: str, now: Optional[float] = None) -> List[int]:
+        """
+        Put `src_ip` and its subnet back on port-specific flows; returns the
+        cookies of coarse flows that may cover it and should be deleted.
+        """
+        now = self._clock() if now is None else now
+        source = self._source(src_ip, now)
+        subnet = self._subnet(src_ip)
+        if source.trusted:
+            source.trusted = False
+            subnet.trusted -= 1
+            self.trusted -= 1
+            self.demotions += 1
+        source.clean = 0
+        source.first_seen = now
+        source.probation_until = now + self.probation_s
+        subnet.probation_until = now + self.probation_s
+        net = ip_to_int(src_ip) & self.subnet_mask
+        return [PAIR_COOKIE | ip_to_int(src_ip), SUBNET_COOKIE | net]
+
+    def demote_subnet(self, net_ip: str, now: Optional[float] = None) -> List[int]:
+        """
+        Stop covering the subnet holding `net_ip` with one flow, without
+        blaming any of its sources; returns the cookie of its subnet flows.
+        """
+        now = self._clock() if now is None else now
+        self._subnet(net_ip).probation_until = now + self.probation_s
+        self.demotions += 1
+        return [SUBNET_COOKIE | (ip_to_int(net_ip) & self.subnet_mask)]
+
+    def rule(self, src_ip: str, dst_ip: str, proto: int, dst_port: Optional[int],
+             now: Optional[float] = None) -> FlowRule:
+        """(match fields, priority, cookie) of the forwarding flow for this packet."""
+        level = self.level(src_ip, dst_ip, now)
+        if level != FINE:
+            dst = (ip_to_int(dst_ip), 32)
+            if level == SUBNET:
+                net = ip_to_int(src_ip) & self.subnet_mask
+                if self.coarse_ok((net, self.subnet_prefix), dst):
+                    fields = {"eth_type": IPV4_ETH_TYPE, "ipv4_src": (_dotted(net), _dotted(self.subnet_mask)),
+                              "ipv4_dst": dst_ip}
+                    return fields, SUBNET_PRIORITY, SUBNET_COOKIE | net
+            if self.coarse_ok((ip_to_int(src_ip), 32), dst):
+                fields = {"eth_type": IPV4_ETH_TYPE, "ipv4_src": src_ip, "ipv4_dst": dst_ip}
+                return fields, PAIR_PRIORITY, PAIR_COOKIE | ip_to_int(src_ip)
+        return forwarding_match_fields(src_ip, dst_ip, proto, dst_port), FINE_PRIORITY, FINE_COOKIE
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sources": len(self._sources),
+            "peers": len(self._peers),
+            "trusted": self.trusted,
+            "promotions": self.promotions,
+            "demotions": self.demotions,
+        }
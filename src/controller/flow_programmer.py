@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+FlowKey = Tuple[int, Tuple[Tuple[str, object], ...], Hashable]
+
+MAX_TRACKED_BARRIERS = 1024
+
+
+class _DatapathQueue:
+    __slots__ = ("dp", "pending", "recent", "barriers")
+
+    def __init__(self, dp) -> None:
+        self.dp = dp
+        # key -> FlowMod waiting for the next flush
+        self.pending: "OrderedDict[FlowKey, Any]" = OrderedDict()
+        # key -> time it was sent (or confirmed by a barrier), oldest first
+        self.recent: "OrderedDict[FlowKey, float]" = OrderedDict()
+        # barrier xid -> keys sent in that batch
+        self.barriers: "OrderedDict[int, List[FlowKey]]" = OrderedDict()
+
+
+class FlowProgrammer:
+    """
+    Sits between `add_flow` and `dp.send_msg`. A FlowMod whose match,
+    priority and tag (the caller's summary of its actions, e.g. the output
+    port) is already queued or was sent within `dedupe_s` is suppressed;
+    the rest are queued per datapath and flushed in batches, each followed by
+    an OFPBarrierRequest whose reply confirms the batch.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 64,
+        dedupe_s: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.batch_size = batch_size
+        self.dedupe_s = dedupe_s
+        self._clock = clock
+        self._queues: Dict[int, _DatapathQueue] = {}
+
+        self.sent = 0
+        self.suppressed = 0
+        self.batches = 0
+        self.confirmed = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "flow_mods_sent": self.sent,
+            "flow_mods_suppressed": self.suppressed,
+            "batches": self.batches,
+            "batches_confirmed": self.confirmed,
+            "pending": sum(len(q.pending) for q in self._queues.values()),
+        }
+
+    def _queue(self, dp) -> _DatapathQueue:
+        queue = self._queues.get(dp.id)
+        if queue is None or queue.dp is not dp:
+            queue = self._queues[dp.id] = _DatapathQueue(dp)
+        return queue
+
+    def forget(self, dpid: int) -> None:
+        self._queues.pop(dpid, None)
+
+    def add_flow(
+        self,
+        dp,
+        priority: int,
+        fields: Dict[str, object],
+        actions: Sequence[Any],
+        idle_timeout: int = 30,
+        tag: Hashable = None,
+        hard_timeout: int = 0,
+        meter_id: Optional[int] = None,
+        cookie: int = 0,
+        flags: int = 0,
+    ) -> bool:
+        """Queue a FlowMod; returns False when it duplicates one pending or recently sent."""
+        queue = self._queue(dp)
+        key: FlowKey = (priority, tuple(sorted(fields.items())), tag)
+        if key in queue.pending:
+            self.suppressed += 1
+            return False
+        sent_at = queue.recent.get(key)
+        if sent_at is not None and self._clock() - sent_at < self.dedupe_s:
+            self.suppressed += 1
+            return False
+
+        ofp = dp.ofproto
+        parser = dp.ofproto_parser
+        inst = [parser.OFPInstructionActions(ofp.OFPIT_APPLY_ACTIONS, actions)]
+        if meter_id is not None:
+            inst.insert(0, parser.OFPInstructionMeter(meter_id, ofp.OFPIT_METER))
+        queue.pending[key] = parser.OFPFlowMod(
+            datapath=dp,
+            priority=priority,
+            match=parser.OFPMatch(**fields),
+            instructions=inst,
+            idle_timeout=idle_timeout,
+            hard_timeout=hard_timeout,
+            cookie=cookie,
+            flags=flags
+        )
+        if len(queue.pending) >= self.batch_size:
+            self._flush(queue)
+        return True
+
+    def flush(self, dp=None) -> None:
+        """Send pending FlowMods for one datapath, or for all of them."""
+        if dp is not None:
+            queue = self._queues.get(dp.id)
+            if queue is not None:
+                self._flush(queue)
+            return
+        for queue in list(self._queues.values()):
+            self._flush(queue)
+
+    def cancel(self, dp, priority: int, fields: Dict[str, object]) -> int:
+        """Drop pending adds for this match, whatever their tag; returns how many."""
+        queue = self._queues.get(dp.id)
+        if queue is None:
+            return 0
+        match = tuple(sorted(fields.items()))
+        keys = [key for key in queue.pending if key[0] == priority and key[1] == match]
+        for key in keys:
+            del queue.pending[key]
+        return len(keys)
+
+    def send_now(self, dp, msg) -> None:
+        """
+        Send `msg` (typically a delete) without batching, after flushing what
+        is pending for `dp`, so no add queued before it reaches the switch
+        after it.
+        """
+        queue = self._queues.get(dp.id)
+        if queue is not None:
+            self._flush(queue)
+        dp.send_msg(msg)
+
+    def _flush(self, queue: _DatapathQueue) -> None:
+        now = self._clock()
+        self._prune(queue, now)
+        if not queue.pending:
+            return
+
+        dp = queue.dp
+        keys = list(queue.pending)
+        for mod in queue.pending.values():
+            dp.send_msg(mod)
+        queue.pending.clear()
+        for key in keys:
+            queue.recent.pop(key, None)
+            queue.recent[key] = now
+
+        barrier = dp.ofproto_parser.OFPBarrierRequest(dp)
+        dp.set_xid(barrier)
+        dp.send_msg(barrier)
+        queue.barriers[barrier.xid] = keys
+        while len(queue.barriers) > MAX_TRACKED_BARRIERS:
+            queue.barriers.popitem(last=False)
+
+        self.sent += len(keys)
+        self.batches += 1
+
+    def _prune(self, queue: _DatapathQueue, now: float) -> None:
+        recent = queue.recent
+        while recent:
+            key, sent_at = next(iter(recent.items()))
+            if now - sent_at < self.dedupe_s:
+                break
+            del recent[key]
+
+    def barrier_reply(self, dpid: int, xid: int) -> None:
+        """The switch has applied every FlowMod sent before barrier `xid`."""
+        queue = self._queues.get(dpid)
+        if queue is None:
+            return
+        keys = queue.barriers.pop(xid, None)
+        if keys is None:
+            return
+        now = self._clock()
+        for key in keys:
+            if key in queue.recent:
+                queue.recent.move_to_end(key)
+                queue.recent[key] = now
+        self.confirmed += 1
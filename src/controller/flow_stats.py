@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from itertools import repeat
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class RateAnomaly:
+    key: Hashable
+    bps: float
+    pps: float
+    zscore: float
+
+
+class RateTable:
+    """
+    Byte/packet counters per key (a flow entry or a switch port) kept in
+    NumPy arrays. Each `update` takes one poll's cumulative counters for a
+    batch of keys and, in vectorized passes, turns them into rates, scores
+    each rate against that key's EWMA mean and variance, and returns the
+    keys that just turned anomalous: a z-score of at least `z_threshold`
+    above `min_bps` after `warmup` samples, or any rate above `flood_bps`.
+    A key alerts once and re-arms when its z-score falls below half the
+    threshold; its baseline is frozen while it is in alert. Finding each
+    key's row is still one dict lookup per key, so hashing the keys, not
+    the arithmetic, sets the cost (about 2 µs per flow entry with key
+    building).
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.3,
+        z_threshold: float = 4.0,
+        min_bps: float = 1e6,
+        flood_bps: float = 1e9,
+        warmup: int = 3,
+        idle_s: float = 30.0,
+        capacity: int = 1024,
+    ) -> None:
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.min_bps = min_bps
+        self.flood_bps = flood_bps
+        self.warmup = warmup
+        self.idle_s = idle_s
+
+        self._index: Dict[Hashable, int] = {}
+        self._keys: List[Hashable] = []
+        self._alloc(capacity)
+
+    def _alloc(self, capacity: int) -> None:
+        old = getattr(self, "_packets", None)
+        n = len(self._keys)
+        arrays = {
+            "_packets": np.int64, "_bytes": np.int64, "_last_t": np.float64, "_samples": np.int32,
+            "_bps": np.float64, "_pps": np.float64, "_mean": np.float64, "_var": np.float64, "_alerted": bool,
+        }
+        for name, dtype in arrays.items():
+            fresh = np.zeros(capacity, dtype=dtype)
+            if old is not None:
+                fresh[:n] = getattr(self, name)[:n]
+            setattr(self, name, fresh)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _rows(self, keys: Sequence[Hashable]) -> np.ndarray:
+        index = self._index
+        rows = np.fromiter(map(index.get, keys, repeat(-1)), dtype=np.int64, count=len(keys))
+        missing = np.flatnonzero(rows < 0)
+        if len(missing):
+            start = len(self._keys)
+            needed = start + len(missing)
+            if needed > len(self._packets):
+                self._alloc(max(needed, 2 * len(self._packets)))
+            for row, i in enumerate(missing.tolist(), start):
+                key = keys[i]
+                index[key] = row
+                self._keys.append(key)
+                rows[i] = row
+        return rows
+
+    def update(self, keys: Sequence[Hashable], packets: np.ndarray, byte_counts: np.ndarray,
+               now: float) -> List[RateAnomaly]:
+        rows = self._rows(keys)
+        packets = np.asarray(packets, dtype=np.int64)
+        byte_counts = np.asarray(byte_counts, dtype=np.int64)
+
+        seen = self._samples[rows] > 0
+        dt = now - self._last_t[rows]
+        valid = seen & (dt > 0)
+        d_packets = packets - self._packets[rows]
+        d_bytes = byte_counts - self._bytes[rows]
+        # a counter that went backwards belongs to a reinstalled flow: count from zero
+        reset = d_bytes < 0
+        d_packets = np.where(reset, packets, d_packets)
+        d_bytes = np.where(reset, byte_counts, d_bytes)
+        safe_dt = np.where(valid, dt, 1.0)
+        bps = np.where(valid, d_bytes * 8.0 / safe_dt, 0.0)
+        pps = np.where(valid, d_packets / safe_dt, 0.0)
+
+        mean = self._mean[rows]
+        var = self._var[rows]
+        alerted = self._alerted[rows]
+        # floor the deviation so perfectly steady flows do not score infinite z on any change
+        std = np.maximum(np.sqrt(var), 0.1 * mean + 1.0)
+        z = (bps - mean) / std
+        warmed = self._samples[rows] > self.warmup
+        hot = valid & (((z >= self.z_threshold) & (bps >= self.min_bps) & warmed) | (bps >= self.flood_bps))
+        fire = hot & ~alerted
+        calm = valid & ~hot & (z < self.z_threshold / 2)
+
+        learn = valid & ~(alerted | hot)
+        a = self.alpha
+        diff = bps - mean
+        first = learn & (self._samples[rows] == 1)
+        new_mean = np.where(first, bps, mean + a * diff)
+        new_var = np.where(first, 0.0, (1 - a) * (var + a * diff * diff))
+        self._mean[rows] = np.where(learn, new_mean, mean)
+        self._var[rows] = np.where(learn, new_var, var)
+        self._alerted[rows] = (alerted | fire) & ~calm
+
+        self._packets[rows] = packets
+        self._bytes[rows] = byte_counts
+        self._last_t[rows] = now
+        self._samples[rows] += 1
+        self._bps[rows] = bps
+        self._pps[rows] = pps
+
+        return [
+            RateAnomaly(keys[i], float(bps[i]), float(pps[i]), float(z[i]))
+            for i in np.flatnonzero(fire)
+        ]
+
+    def top(self, k: int = 10) -> List[Tuple[Hashable, float, float]]:
+        """(key, bits/s, packets/s) of the `k` keys with the highest last byte rate."""
+        n = len(self._keys)
+        if n == 0:
+            return []
+        bps = self._bps[:n]
+        k = min(k, n)
+        rows = np.argpartition(bps, n - k)[n - k:]
+        rows = rows[np.argsort(bps[rows])[::-1]]
+        return [(self._keys[r], float(bps[r]), float(self._pps[r])) for r in rows]
+
+    def expire(self, now: float) -> int:
+        """Forget keys not reported for `idle_s` (removed flows, gone ports); returns how many."""
+        n = len(self._keys)
+        keep = self._last_t[:n] >= now - self.idle_s
+        removed = n - int(keep.sum())
+        if removed == 0:
+            return 0
+        kept = np.flatnonzero(keep)
+        for name in ("_packets", "_bytes", "_last_t", "_samples", "_bps", "_pps", "_mean", "_var", "_alerted"):
+            array = getattr(self, name)
+            array[: len(kept)] = array[kept]
+            array[len(kept):n] = 0
+        self._keys = [self._keys[r] for r in kept]
+        self._index = {key: row for row, key in enumerate(self._keys)}
+        return removed
+
+
+def flow_key(dpid: int, stat: Any) -> Tuple[Hashable, ...]:
+    """Identity of one flow entry in a flow-stats reply: where it lives and what it matches."""
+    return (dpid, stat.table_id, stat.priority, tuple(stat.match.items()))
+
+
+class VolumetricMonitor:
+    """
+    Volumetric DDoS detection from periodic flow and port statistics.
+    Replies are turned into counter arrays and scored by two RateTables,
+    one per flow entry and one per switch port (bytes received). Ingest is
+    thread-safe so replies can be processed in native threads while the
+    controller's event loop keeps running; `stats()` returns the summary
+    of the last ingest and never touches the arrays. Under eventlet, pass
+    the unpatched threading module as `threads`: a green lock taken from
+    native threads can deadlock the hub.
+    """
+
+    def __init__(self, top_n: int = 5, threads: Any = threading, **table_kwargs: Any) -> None:
+        self.flows = RateTable(**table_kwargs)
+        self.ports = RateTable(**table_kwargs)
+        self.top_n = top_n
+        self._lock = threads.Lock()
+        self._last_expire = 0.0
+        self._summary: Dict[str, Any] = {"flows": 0, "ports": 0, "anomalies": 0, "ingest_ms": 0.0, "top_flows": []}
+        self._anomalies = 0
+
+    def ingest_flows(self, dpid: int, body: Iterable[Any], now: Optional[float] = None) -> List[RateAnomaly]:
+        """Score one datapath's complete flow-stats reply (all parts concatenated)."""
+        body = list(body)
+        keys = [flow_key(dpid, stat) for stat in body]
+        packets = np.fromiter((stat.packet_count for stat in body), dtype=np.int64, count=len(body))
+        byte_counts = np.fromiter((stat.byte_count for stat in body), dtype=np.int64, count=len(body))
+        return self._ingest(self.flows, keys, packets, byte_counts, now)
+
+    def ingest_ports(self, dpid: int, body: Iterable[Any], now: Optional[float] = None) -> List[RateAnomaly]:
+        """Score one datapath's port-stats reply on bytes received per port."""
+        body = list(body)
+        keys = [(dpid, stat.port_no) for stat in body]
+        packets = np.fromiter((stat.rx_packets for stat in body), dtype=np.int64, count=len(body))
+        byte_counts = np.fromiter((stat.rx_bytes for stat in body), dtype=np.int64, count=len(body))
+        return self._ingest(self.ports, keys, packets, byte_counts, now)
+
+    def _ingest(self, table: RateTable, keys, packets, byte_counts, now: Optional[float]) -> List[RateAnomaly]:
+        now = time.time() if now is None else now
+        start = time.perf_counter()
+        with self._lock:
+            anomalies = table.update(keys, packets, byte_counts, now)
+            if now - self._last_expire >= table.idle_s / 2:
+                self.flows.expire(now)
+                self.ports.expire(now)
+                self._last_expire = now
+            self._anomalies += len(anomalies)
+            self._summary = {
+                "flows": len(self.flows),
+                "ports": len(self.ports),
+                "anomalies": self._anomalies,
+                "ingest_ms": round((time.perf_counter() - start) * 1e3, 2),
+                "top_flows": [
+                    {"dpid": key[0], "priority": key[2], "match": dict(key[3]), "bps": round(bps), "pps": round(pps)}
+                    for key, bps, pps in self.flows.top(self.top_n)
+                    if bps > 0
+                ],
+            }
+        return anomalies
+
+    def stats(self) -> Dict[str, Any]:
+        return self._summary
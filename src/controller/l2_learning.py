@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import struct
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+from src.controller.flow_rules import IPV4_ETH_TYPE
+
+ARP_ETH_TYPE = 0x0806
+ARP_REQUEST = 1
+ARP_REPLY = 2
+
+# eth_dst forwarding for known hosts sits under a catch-all that sends IPv4
+# to the controller, so IPv4 still meets the ACL and the scan detector
+L2_PRIORITY = 5
+IPV4_PUNT_PRIORITY = 10
+
+_ETH = struct.Struct("!6s6sH")
+# Ethernet/IPv4 ARP: htype, ptype, hlen, plen, op, sha, spa, tha, tpa
+_ARP = struct.Struct("!HHBBH6s4s6s4s")
+
+V = TypeVar("V")
+
+
+class AgingTable(Generic[V]):
+    """
+    Bounded key -> value map with aging. Entries expire `max_age_s` after
+    they were last put; past `capacity` the least recently put is evicted.
+    Re-putting an unchanged value within `refresh_s` is a no-op, so busy
+    hosts cost one dict lookup per frame. With `reverse`, a value -> keys
+    index is kept as well, so `keys_for` does not scan the table.
+    """
+
+    def __init__(self, capacity: int, max_age_s: float, refresh_s: float = 1.0, reverse: bool = False) -> None:
+        self.capacity = capacity
+        self.max_age_s = max_age_s
+        self.refresh_s = refresh_s
+        # key -> (value, last put), least recently put first
+        self._entries: "OrderedDict[Hashable, Tuple[V, float]]" = OrderedDict()
+        # value -> its keys, in put order; None without `reverse`
+        self._keys: Optional[Dict[V, Dict[Hashable, None]]] = {} if reverse else None
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def put(self, key: Hashable, value: V, now: float, replace: bool = True) -> Optional[V]:
+        """
+        Store `value`; returns the previous live value when it was different.
+        With `replace` false such a value is kept and `value` is dropped.
+        """
+        entries = self._entries
+        old = entries.get(key)
+        if old is not None and old[0] == value and now - old[1] < self.refresh_s:
+            return None
+        changed = old is not None and old[0] != value and now - old[1] < self.max_age_s
+        if changed and not replace:
+            return old[0]
+        if old is not None:
+            del entries[key]
+            if old[0] != value:
+                self._unindex(key, old[0])
+        entries[key] = (value, now)
+        if self._keys is not None and (old is None or old[0] != value):
+            self._keys.setdefault(value, {})[key] = None
+        self._expire(now)
+        if len(entries) > self.capacity:
+            evicted, (evicted_value, _) = entries.popitem(last=False)
+            self._unindex(evicted, evicted_value)
+            self.evicted += 1
+        return old[0] if changed else None
+
+    def get(self, key: Hashable, now: float) -> Optional[V]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if now - entry[1] >= self.max_age_s:
+            del self._entries[key]
+            self._unindex(key, entry[0])
+            return None
+        return entry[0]
+
+    def keys_for(self, value: V) -> List[Hashable]:
+        if self._keys is not None:
+            return list(self._keys.get(value, ()))
+        return [key for key, (v, _) in self._entries.items() if v == value]
+
+    def _unindex(self, key: Hashable, value: V) -> None:
+        if self._keys is None:
+            return
+        keys = self._keys.get(value)
+        if keys is not None:
+            keys.pop(key, None)
+            if not keys:
+                del self._keys[value]
+
+    def export(self, now: float) -> List[Tuple[Hashable, V, float]]:
+        """Live (key, value, age) entries, least recently put first."""
+        return [(key, value, now - seen) for key, (value, seen) in self._entries.items()
+                if now - seen < self.max_age_s]
+
+    def restore(self, items: List[Tuple[Hashable, V, float]], now: float) -> int:
+        """Put back exported entries (oldest first) with their ages; returns how many were still live."""
+        restored = 0
+        for key, value, age in items:
+            if age < self.max_age_s:
+                self.put(key, value, now - age)
+                restored += 1
+        # puts above may be out of order with entries already present
+        self._entries = OrderedDict(sorted(self._entries.items(), key=lambda kv: kv[1][1]))
+        self._expire(now)
+        return restored
+
+    def _expire(self, now: float) -> None:
+        entries = self._entries
+        while entries:
+            key, (value, seen) = next(iter(entries.items()))
+            if now - seen < self.max_age_s:
+                break
+            del entries[key]
+            self._unindex(key, value)
+
+
+class L2Learning:
+    """
+    Per-datapath MAC -> port tables and a network-wide IP -> MAC table
+    learned from ARP senders, both bounded and aged. `learn_mac` reports a
+    MAC that changed port, so the caller can remove stale flows. A live ARP
+    binding is never overwritten: `learn_arp` reports the conflicting MAC
+    and the IP is disputed, with no answer from `mac_for`, until
+    `arp_age_s` after the last conflict. A genuine change takes over once
+    the old binding ages out.
+    """
+
+    def __init__(
+        self,
+        mac_capacity: int = 4096,
+        mac_age_s: float = 300.0,
+        arp_capacity: int = 65536,
+        arp_age_s: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.mac_capacity = mac_capacity
+        self.mac_age_s = mac_age_s
+        self._macs: Dict[int, AgingTable[int]] = {}
+        self.arp: AgingTable[str] = AgingTable(arp_capacity, arp_age_s, reverse=True)
+        # IPs claimed by a second MAC while bound, which proxy ARP must not answer for
+        self.disputed: AgingTable[bool] = AgingTable(arp_capacity, arp_age_s, refresh_s=0.0)
+        self.moves = 0
+        self.arp_changes = 0
+        self.arp_replies = 0
+        self._clock = clock
+
+    def _table(self, dpid: int) -> AgingTable[int]:
+        table = self._macs.get(dpid)
+        if table is None:
+            table = self._macs[dpid] = AgingTable(self.mac_capacity, self.mac_age_s)
+        return table
+
+    def forget(self, dpid: int) -> None:
+        self._macs.pop(dpid, None)
+
+    def learn_mac(self, dpid: int, mac: str, port: int, now: Optional[float] = None) -> Optional[int]:
+        """Record where `mac` was seen; returns its previous port if it moved."""
+        now = self._clock() if now is None else now
+        moved = self._table(dpid).put(mac, port, now)
+        if moved is not None:
+            self.moves += 1
+        return moved
+
+    def port(self, dpid: int, mac: str, now: Optional[float] = None) -> Optional[int]:
+        now = self._clock() if now is None else now
+        table = self._macs.get(dpid)
+        return None if table is None else table.get(mac, now)
+
+    def learn_arp(self, ip: str, mac: str, now: Optional[float] = None) -> Optional[str]:
+        """Record an ARP sender binding; returns the live MAC it conflicts with, which is kept, if any."""
+        now = self._clock() if now is None else now
+        bound = self.arp.put(ip, mac, now, replace=False)
+        if bound is not None:
+            self.arp_changes += 1
+            self.disputed.put(ip, True, now)
+        return bound
+
+    def mac_for(self, ip: str, now: Optional[float] = None) -> Optional[str]:
+        """The MAC bound to `ip`, or None if unknown or disputed."""
+        now = self._clock() if now is None else now
+        if self.disputed.get(ip, now):
+            return None
+        return self.arp.get(ip, now)
+
+    def ips_for(self, mac: str) -> List[str]:
+        return self.arp.keys_for(mac)
+
+    def export_state(self, now: Optional[float] = None) -> Dict[str, object]:
+        now = self._clock() if now is None else now
+        return {
+            "macs": {str(dpid): table.export(now) for dpid, table in self._macs.items()},
+            "arp": self.arp.export(now),
+        }
+
+    def restore_state(self, state: Dict[str, object], elapsed: float = 0.0, now: Optional[float] = None) -> int:
+        """
+        Reload `export_state` output. `elapsed` is how long ago it was taken
+        (downtime included), so entries age as if the controller had kept
+        running. Returns the number of MAC and ARP entries still live.
+        """
+        now = self._clock() if now is None else now
+        restored = 0
+        for dpid, items in state.get("macs", {}).items():
+            restored += self._table(int(dpid)).restore([(k, v, age + elapsed) for k, v, age in items], now)
+        restored += self.arp.restore([(k, v, age + elapsed) for k, v, age in state.get("arp", [])], now)
+        return restored
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "macs": sum(len(t) for t in self._macs.values()),
+            "macs_evicted": sum(t.evicted for t in self._macs.values()),
+            "moves": self.moves,
+            "arp_bindings": len(self.arp),
+            "arp_changes": self.arp_changes,
+            "arp_disputed": len(self.disputed),
+            "arp_replies": self.arp_replies,
+        }
+
+
+def _ip_str(raw: bytes) -> str:
+    return "%d.%d.%d.%d" % (raw[0], raw[1], raw[2], raw[3])
+
+
+def parse_arp(data: bytes) -> Optional[Tuple[int, str, str, str]]:
+    """(opcode, sender MAC, sender IP, target IP) of an untagged Ethernet/IPv4 ARP frame, else None."""
+    if len(data) < _ETH.size + _ARP.size:
+        return None
+    if _ETH.unpack_from(data, 0)[2] != ARP_ETH_TYPE:
+        return None
+    htype, ptype, hlen, plen, op, sha, spa, _, tpa = _ARP.unpack_from(data, _ETH.size)
+    if htype != 1 or ptype != IPV4_ETH_TYPE or hlen != 6 or plen != 4:
+        return None
+    return op, sha.hex(":"), _ip_str(spa), _ip_str(tpa)
+
+
+def arp_reply(requester_mac: str, requester_ip: str, target_mac: str, target_ip: str) -> bytes:
+    """ARP reply frame telling `requester` that `target_ip` is at `target_mac`."""
+    to_mac = bytes.fromhex(requester_mac.replace(":", ""))
+    from_mac = bytes.fromhex(target_mac.replace(":", ""))
+    return _ETH.pack(to_mac, from_mac, ARP_ETH_TYPE) + _ARP.pack(
+        1, IPV4_ETH_TYPE, 6, 4, ARP_REPLY,
+        from_mac, bytes(map(int, target_ip.split("."))),
+        to_mac, bytes(map(int, requester_ip.split("."))),
+    )
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import struct
+from typing import Optional
+
+from src.controller.flow_rules import IPV4_ETH_TYPE, TCP_PROTOCOL, UDP_PROTOCOL
+
+
+VLAN_ETH_TYPE = 0x8100
+
+_ETH = struct.Struct("!6s6sH")
+_VLAN = struct.Struct("!HH")
+_IPV4 = struct.Struct("!B5xHxB2x4s4s")
+_L4_PORTS = struct.Struct("!HH")
+
+_ETH_LEN = _ETH.size
+_VLAN_LEN = _VLAN.size
+_IPV4_MIN_LEN = 20
+_FRAGMENT_OFFSET_MASK = 0x1FFF
+
+
+class PacketHeaders:
+    __slots__ = ("src_mac", "dst_mac", "ethertype", "src_ip", "dst_ip", "proto", "dst_port")
+
+    def __init__(
+        self,
+        src_mac: str,
+        dst_mac: str,
+        ethertype: int,
+        src_ip: Optional[str] = None,
+        dst_ip: Optional[str] = None,
+        proto: Optional[int] = None,
+        dst_port: Optional[int] = None,
+    ) -> None:
+        self.src_mac = src_mac
+        self.dst_mac = dst_mac
+        self.ethertype = ethertype
+        self.src_ip = src_ip
+        self.dst_ip = dst_ip
+        self.proto = proto
+        self.dst_port = dst_port
+
+    @property
+    def is_ipv4(self) -> bool:
+        return self.src_ip is not None
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, PacketHeaders):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{f}={getattr(self, f)!r}" for f in self.__slots__)
+        return f"PacketHeaders({fields})"
+
+
+def _ip_str(raw: bytes) -> str:
+    return "%d.%d.%d.%d" % (raw[0], raw[1], raw[2], raw[3])
+
+
+def parse_headers(data: bytes) -> Optional[PacketHeaders]:
+    """
+    Read the Ethernet/VLAN/IPv4/TCP/UDP fields the controller needs straight
+    from the frame bytes. Returns None for frames the fast path does not
+    handle (truncated headers, stacked VLAN tags); callers then fall back to
+    the full Ryu parser.
+    """
+    view = memoryview(data)
+    size = len(view)
+    if size < _ETH_LEN:
+        return None
+
+    dst, src, ethertype = _ETH.unpack_from(view, 0)
+    offset = _ETH_LEN
+    if ethertype == VLAN_ETH_TYPE:
+        if size < offset + _VLAN_LEN:
+            return None
+        ethertype = _VLAN.unpack_from(view, offset)[1]
+        offset += _VLAN_LEN
+        if ethertype == VLAN_ETH_TYPE:
+            return None
+
+    headers = PacketHeaders(src.hex(":"), dst.hex(":"), ethertype)
+    if ethertype != IPV4_ETH_TYPE:
+        return headers
+
+    if size < offset + _IPV4_MIN_LEN:
+        return None
+    ver_ihl, frag, proto, ip_src, ip_dst = _IPV4.unpack_from(view, offset)
+    ihl = (ver_ihl & 0x0F) * 4
+    if ver_ihl >> 4 != 4 or ihl < _IPV4_MIN_LEN:
+        return None
+
+    headers.src_ip = _ip_str(ip_src)
+    headers.dst_ip = _ip_str(ip_dst)
+    headers.proto = proto
+
+    # Only the first fragment carries the transport header.
+    if proto in (TCP_PROTOCOL, UDP_PROTOCOL) and not frag & _FRAGMENT_OFFSET_MASK:
+        l4 = offset + ihl
+        if size >= l4 + _L4_PORTS.size:
+            headers.dst_port = _L4_PORTS.unpack_from(view, l4)[1]
+    return headers
+
+
+def parse_headers_ryu(data: bytes) -> Optional[PacketHeaders]:
+    """Full Ryu parse of the same fields; slow, but handles any frame Ryu does."""
+    from ryu.lib.packet import packet, ethernet, ipv4, tcp, udp
+
+    pkt = packet.Packet(data)
+    eth = pkt.get_protocol(ethernet.ethernet)
+    if not eth:
+        return None
+
+    headers = PacketHeaders(eth.src, eth.dst, eth.ethertype)
+    ip = pkt.get_protocol(ipv4.ipv4)
+    if ip is None:
+        return headers
+
+    headers.ethertype = IPV4_ETH_TYPE
+    headers.src_ip = ip.src
+    headers.dst_ip = ip.dst
+    headers.proto = ip.proto
+    if ip.proto == TCP_PROTOCOL:
+        t = pkt.get_protocol(tcp.tcp)
+        headers.dst_port = t.dst_port if t else None
+    elif ip.proto == UDP_PROTOCOL:
+        u = pkt.get_protocol(udp.udp)
+        headers.dst_port = u.dst_port if u else None
+    return headers
+
+
+def extract_headers(data: bytes) -> Optional[PacketHeaders]:
+    headers = parse_headers(data)
+    if headers is None:
+        headers = parse_headers_ryu(data)
+    return headers
@@ -1,36 +1,180 @@
 from __future__ import annotations
 
 import time
-from collections import defaultdict, deque
-from typing import Deque, Dict, Tuple
+from collections import OrderedDict
+from typing import Dict
+
+
+class _DestinationWindow:
+    __slots__ = ("ports", "owners", "owned", "last_seen", "alerted")
+
+    def __init__(self) -> None:
+        # port -> last time it was seen, oldest first
+        self.ports: "OrderedDict[int, float]" = OrderedDict()
+        # port -> source that probed it last, and how many live ports each source holds that way
+        self.owners: Dict[int, str] = {}
+        self.owned: Dict[str, int] = {}
+        self.last_seen = 0.0
+        self.alerted = False
+
+    def own(self, port: int, src_ip: str | None) -> None:
+        previous = self.owners.get(port)
+        if previous == src_ip:
+            return
+        if previous is not None:
+            self.disown(port)
+        if src_ip is not None:
+            self.owners[port] = src_ip
+            self.owned[src_ip] = self.owned.get(src_ip, 0) + 1
+
+    def disown(self, port: int) -> None:
+        src_ip = self.owners.pop(port, None)
+        if src_ip is None:
+            return
+        left = self.owned[src_ip] - 1
+        if left:
+            self.owned[src_ip] = left
+        else:
+            del self.owned[src_ip]
 
 
 class PortScanDetector:
-    def __init__(self, window_s: float, threshold_ports: int) -> None:
+    """
+    Sliding-window count of distinct destination ports per target.
+
+    Each target keeps only the latest sighting per port, so the distinct count
+    is the size of that map and each packet costs O(1) amortized. Targets idle
+    for longer than the window are evicted, and the least recently active ones
+    are dropped once `max_entries` tracked ports are exceeded.
+
+    Each port also remembers the source that probed it last. While a
+    target is over the threshold, `is_scanner` names the sources holding
+    at least `source_ports` of its ports that way: a client of a busy
+    server only holds the few service ports it shares with everyone.
+    """
+
+    def __init__(self, window_s: float, threshold_ports: int, max_entries: int = 1_000_000,
+                 source_ports: int | None = None) -> None:
         self.window_s = window_s
         self.threshold_ports = threshold_ports
-        self._dst_ports: Dict[str, Deque[Tuple[float, int]]] = defaultdict(
-            lambda: deque(maxlen=600)
-        )
-        self._alerted: Dict[str, bool] = defaultdict(bool)
+        self.source_ports = source_ports or max(1, threshold_ports // 4)
+        self.max_entries = max_entries
+        # least recently active target first
+        self._destinations: "OrderedDict[str, _DestinationWindow]" = OrderedDict()
+        self._entries = 0
+        self.last_alert: str | None = None
+
+    @property
+    def tracked_destinations(self) -> int:
+        return len(self._destinations)
+
+    @property
+    def tracked_entries(self) -> int:
+        return self._entries
 
-    def flag(self, dst_ip: str, dst_port: int, now: float | None = None) -> bool:
+    def _evict_idle(self, now: float) -> None:
+        destinations = self._destinations
+        while destinations:
+            dst_ip, window = next(iter(destinations.items()))
+            if (now - window.last_seen) <= self.window_s:
+                break
+            del destinations[dst_ip]
+            self._entries -= len(window.ports)
+
+    def _enforce_cap(self) -> None:
+        destinations = self._destinations
+        while self._entries > self.max_entries and len(destinations) > 1:
+            _, window = destinations.popitem(last=False)
+            self._entries -= len(window.ports)
+
+    def _window(self, dst_ip: str, now: float) -> _DestinationWindow:
+        self._evict_idle(now)
+        window = self._destinations.get(dst_ip)
+        if window is None:
+            window = self._destinations[dst_ip] = _DestinationWindow()
+        else:
+            self._destinations.move_to_end(dst_ip)
+        window.last_seen = now
+        return window
+
+    def stats(self) -> dict:
+        return {
+            "backend": "exact",
+            "tracked_destinations": len(self._destinations),
+            "tracked_entries": self._entries,
+        }
+
+    def export_state(self, now: float | None = None) -> list:
+        """
+        Windows still open at `now` as [destination, [[port, seen, source], ...],
+        alerted], least recently active first.
+        """
         now = time.time() if now is None else now
-        ports = self._dst_ports[dst_ip]
-        ports.append((now, dst_port))
+        return [
+            [dst_ip, [[port, seen, window.owners.get(port)] for port, seen in window.ports.items()
+                      if now - seen <= self.window_s],
+             window.alerted]
+            for dst_ip, window in self._destinations.items()
+            if now - window.last_seen <= self.window_s
+        ]
 
-        while ports and (now - ports[0][0]) > self.window_s:
-            ports.popleft()
+    def restore_state(self, state: list) -> int:
+        """Reload `export_state` output; timestamps are wall-clock, so windows resume where they were."""
+        for dst_ip, ports, alerted in state:
+            window = self._destinations.pop(dst_ip, None)
+            if window is not None:
+                self._entries -= len(window.ports)
+            window = self._destinations[dst_ip] = _DestinationWindow()
+            # entries saved before sources were recorded have no third element
+            for port, seen, *src_ip in ports:
+                window.ports[port] = seen
+                window.own(port, src_ip[0] if src_ip else None)
+                window.last_seen = max(window.last_seen, seen)
+            window.alerted = alerted
+            self._entries += len(window.ports)
+        self._enforce_cap()
+        return len(state)
 
-        flagged = len({port for _, port in ports}) >= self.threshold_ports
+    def flag(self, dst_ip: str, dst_port: int, now: float | None = None, src_ip: str | None = None) -> bool:
+        # only vertical scans are tracked; src_ip is used to attribute them
+        now = time.time() if now is None else now
+        window = self._window(dst_ip, now)
+        ports = window.ports
+        if dst_port in ports:
+            ports.move_to_end(dst_port)
+        else:
+            self._entries += 1
+        ports[dst_port] = now
+        window.own(dst_port, src_ip)
+
+        while ports:
+            port, seen = next(iter(ports.items()))
+            if (now - seen) <= self.window_s:
+                break
+            del ports[port]
+            window.disown(port)
+            self._entries -= 1
+
+        flagged = len(ports) >= self.threshold_ports
         if not flagged:
-            self._alerted[dst_ip] = False
+            window.alerted = False
+        self._enforce_cap()
         return flagged
 
-    def should_alert(self, dst_ip: str, dst_port: int, now: float | None = None) -> bool:
-        if not self.flag(dst_ip, dst_port, now):
+    def should_alert(self, dst_ip: str, dst_port: int, now: float | None = None, src_ip: str | None = None) -> bool:
+        self.last_alert = None
+        if not self.flag(dst_ip, dst_port, now, src_ip):
             return False
-        if self._alerted[dst_ip]:
+        window = self._destinations[dst_ip]
+        if window.alerted:
             return False
-        self._alerted[dst_ip] = True
+        window.alerted = True
+        self.last_alert = "vertical"
         return True
+
+    def is_scanner(self, dst_ip: str, src_ip: str) -> bool:
+        """True while `dst_ip` is over the threshold and `src_ip` probed at least `source_ports` of its ports last."""
+        window = self._destinations.get(dst_ip)
+        if window is None or len(window.ports) < self.threshold_ports:
+            return False
+        return window.owned.get(src_ip, 0) >= self.source_ports
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import ipaddress
+import math
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# above ACL drops (150) and shed sources (200), so nothing a quarantined source sends is forwarded
+QUARANTINE_PRIORITY = 250
+
+
+class Quarantine:
+    """
+    Sources blocked on the switches after a scan alert. The first offence
+    blocks a source for `base_s`; each repeat multiplies that by `factor`,
+    up to `max_s`, and a source with no offence for `forget_s` starts over.
+    Sources in the `allow` CIDRs are never blocked.
+
+    The switch enforces a block with a drop flow whose hard timeout is the
+    block's length, so it ends without the controller; `expire` only tidies
+    this table. Times are wall-clock so blocks survive a warm restart.
+    """
+
+    def __init__(
+        self,
+        base_s: float = 60.0,
+        factor: float = 2.0,
+        max_s: float = 3600.0,
+        forget_s: float = 86400.0,
+        allow: Iterable[str] = (),
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.base_s = base_s
+        self.factor = factor
+        self.max_s = max_s
+        self.forget_s = forget_s
+        self.allow = [ipaddress.IPv4Network(cidr.strip(), strict=False) for cidr in allow if cidr.strip()]
+        self._clock = clock
+        # source -> [blocked until, offences, last offence]
+        self._sources: Dict[str, List[float]] = {}
+
+        self.quarantined = 0
+        self.released = 0
+        self.allowlisted = 0
+
+    def allowed(self, src_ip: str) -> bool:
+        addr = ipaddress.IPv4Address(src_ip)
+        return any(addr in net for net in self.allow)
+
+    def remaining(self, src_ip: str, now: Optional[float] = None) -> int:
+        """Whole seconds `src_ip` stays blocked, 0 if it is not. Cheap for sources never blocked."""
+        entry = self._sources.get(src_ip)
+        if entry is None:
+            return 0
+        left = entry[0] - (self._clock() if now is None else now)
+        return math.ceil(left) if left > 0 else 0
+
+    def offences(self, src_ip: str) -> int:
+        entry = self._sources.get(src_ip)
+        return 0 if entry is None else entry[1]
+
+    def offend(self, src_ip: str, now: Optional[float] = None) -> int:
+        """
+        Block `src_ip` for a scan and return the block's length in whole
+        seconds; 0 if it is allowlisted. An alert while already blocked
+        returns what is left without escalating.
+        """
+        now = self._clock() if now is None else now
+        if self.allowed(src_ip):
+            self.allowlisted += 1
+            return 0
+        entry = self._sources.get(src_ip)
+        if entry is not None and entry[0] > now:
+            return self.remaining(src_ip, now)
+        if entry is None or now - entry[2] > self.forget_s:
+            entry = self._sources[src_ip] = [0.0, 0, 0.0]
+        seconds = math.ceil(min(self.max_s, self.base_s * self.factor ** entry[1]))
+        entry[0] = now + seconds
+        entry[1] += 1
+        entry[2] = now
+        self.quarantined += 1
+        return seconds
+
+    def release(self, src_ip: str, forget: bool = False) -> bool:
+        """
+        End a block early; with `forget`, the source's offences go too.
+        False if it was not blocked.
+        """
+        entry = self._sources.get(src_ip)
+        if entry is None or entry[0] <= self._clock():
+            return False
+        if forget:
+            del self._sources[src_ip]
+        else:
+            entry[0] = 0.0
+        self.released += 1
+        return True
+
+    def expire(self, now: Optional[float] = None) -> List[str]:
+        """Sources whose block ended since the last call; offences past `forget_s` are dropped."""
+        now = self._clock() if now is None else now
+        ended = []
+        for src_ip, entry in list(self._sources.items()):
+            if entry[0] and entry[0] <= now:
+                entry[0] = 0.0
+                ended.append(src_ip)
+            if not entry[0] and now - entry[2] > self.forget_s:
+                del self._sources[src_ip]
+        return ended
+
+    def blocked(self, now: Optional[float] = None) -> Dict[str, int]:
+        """Source -> whole seconds left, for every source blocked now."""
+        now = self._clock() if now is None else now
+        return {src_ip: math.ceil(entry[0] - now) for src_ip, entry in self._sources.items() if entry[0] > now}
+
+    def entries(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Every source with offences on record, blocked ones first."""
+        now = self._clock() if now is None else now
+        rows = [
+            {
+                "src": src_ip,
+                "remaining_s": max(0, math.ceil(entry[0] - now)),
+                "offences": entry[1],
+                "last_offence": entry[2],
+            }
+            for src_ip, entry in self._sources.items()
+        ]
+        rows.sort(key=lambda row: (-row["remaining_s"], -row["last_offence"]))
+        return rows
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "blocked": len(self.blocked()),
+            "tracked_sources": len(self._sources),
+            "quarantined": self.quarantined,
+            "released": self.released,
+            "allowlisted": self.allowlisted,
+        }
+
+    def export_state(self) -> List[List[Any]]:
+        return [[src_ip] + entry for src_ip, entry in self._sources.items()]
+
+    def restore_state(self, state: List[List[Any]]) -> int:
+        for src_ip, until, offences, last in state:
+            self._sources[src_ip] = [until, offences, last]
+        return len(state)
@@ -0,0 +1,331 @@
+from __future__ import annotations
+
+import math
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+VERTICAL = "vertical"
+HORIZONTAL = "horizontal"
+
+_MIX = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+# fixed, so a key lands in the same cells in every process and a checkpoint stays meaningful
+_SEED = 0x5CA1AB1E
+
+
+def _mix(value: int) -> int:
+    # spread small integers (ports) over the whole bitmap
+    return ((value * _MIX) & _MASK64) >> 17
+
+
+def _hash(key: Hashable) -> int:
+    """Seeded CRC-32 of a string or a tuple of strings and ports, the same in every process."""
+    packed = "\0".join(map(str, key)) if isinstance(key, tuple) else str(key)
+    return zlib.crc32(packed.encode(), _SEED)
+
+
+class _SlicedSketch:
+    """
+    `depth` x `width` cells per time slice. Distinct cells are bitmaps
+    (linear counting); count cells are count-min counters with conservative
+    update. A key's cells
+    are OR-ed (or summed) over the live slices and the minimum over rows
+    is the estimate, so collisions only ever inflate it.
+    """
+
+    __slots__ = ("depth", "width", "slices", "bitmaps", "counts", "totals")
+
+    def __init__(self, depth: int, width: int, slices: int) -> None:
+        self.depth = depth
+        self.width = width
+        self.slices = slices
+        self.bitmaps: List[List[int]] = [[0] * (depth * width) for _ in range(slices)]
+        self.counts: List[List[int]] = [[0] * (depth * width) for _ in range(slices)]
+        # per-cell sum of counts over the live slices
+        self.totals: List[int] = [0] * (depth * width)
+
+    def clear(self, slot: int) -> None:
+        self.totals = [t - c for t, c in zip(self.totals, self.counts[slot])]
+        self.bitmaps[slot] = [0] * (self.depth * self.width)
+        self.counts[slot] = [0] * (self.depth * self.width)
+
+    def cells(self, h1: int) -> List[int]:
+        """The key's cell in each row, by double hashing from its `_hash`."""
+        h2 = (_mix(h1) | 1)
+        width = self.width
+        return [row * width + (h1 + row * h2) % width for row in range(self.depth)]
+
+    def count(self, slot: int, cells: List[int]) -> int:
+        """Add one packet to the key's cells; returns the key's packets in the window."""
+        current = self.counts[slot]
+        totals = self.totals
+        # conservative update: only the cells holding the slice minimum grow
+        low = min([current[i] for i in cells])
+        best = None
+        for i in cells:
+            if current[i] == low:
+                current[i] = low + 1
+                totals[i] += 1
+            if best is None or totals[i] < best:
+                best = totals[i]
+        return best
+
+    def add(self, slot: int, cells: List[int], bit: int) -> None:
+        current = self.bitmaps[slot]
+        for i in cells:
+            current[i] |= bit
+
+    def copy(self) -> Tuple[List[List[int]], List[List[int]]]:
+        return [list(b) for b in self.bitmaps], [list(c) for c in self.counts]
+
+    def restore(self, bitmaps: np.ndarray, counts: np.ndarray) -> None:
+        for slot in range(self.slices):
+            self.bitmaps[slot] = [int.from_bytes(cell.tobytes(), "little") for cell in bitmaps[slot]]
+            self.counts[slot] = counts[slot].tolist()
+        self.totals = counts.sum(axis=0).tolist()
+
+    def ones(self, cells: List[int]) -> int:
+        """Fewest set bits over the key's rows, with the live slices merged."""
+        best = None
+        for i in cells:
+            merged = 0
+            for bitmaps in self.bitmaps:
+                merged |= bitmaps[i]
+            ones = merged.bit_count()
+            if best is None or ones < best:
+                best = ones
+        return best
+
+
+class SketchScanDetector:
+    """
+    Fixed-memory scan detection for vertical scans (many ports on one
+    destination) and horizontal sweeps (one source, one port, many hosts).
+
+    The window is split into `slices` time slices; each slice holds a
+    count-min sketch of packets per key and a grid of `bits`-bit linear
+    counters of distinct ports (per destination) or hosts (per source and
+    port). The distinct estimate is only computed for keys whose packet
+    count can reach the threshold, and that count also feeds a small
+    heavy-hitter table. Memory does not depend on the number of hosts:
+    roughly 2 x slices x depth x width cells, and a quarter more for
+    source attribution.
+
+    Collisions only push estimates up; at the default sizes the spread
+    around 40 distinct values is about 7%. The window is approximate: it
+    covers the last `slices - 1` to `slices` slices.
+
+    A third grid counts distinct ports per (source, destination) so
+    `is_scanner` can name the sources behind a vertical scan; a sweep is
+    keyed by its source already, so its source is a scanner on any port.
+
+    Keys are hashed with a seeded CRC-32 rather than the per-process string
+    hash, so the same traffic fills the same cells in every run and the
+    sketch can be checkpointed.
+    """
+
+    def __init__(
+        self,
+        window_s: float,
+        threshold_ports: int,
+        threshold_hosts: Optional[int] = 20,
+        slices: int = 5,
+        depth: int = 3,
+        width: int = 16384,
+        bits: int = 128,
+        max_alerts: int = 10_000,
+        heavy_hitters: int = 16,
+        source_ports: Optional[int] = None,
+    ) -> None:
+        self.window_s = window_s
+        self.threshold_ports = threshold_ports
+        self.threshold_hosts = threshold_hosts
+        self.source_ports = source_ports or max(1, threshold_ports // 4)
+        self.slice_s = window_s / slices
+        self.bits = bits
+        self.max_alerts = max_alerts
+        self.max_heavy_hitters = heavy_hitters
+
+        self._ports = _SlicedSketch(depth, width, slices)
+        self._hosts = _SlicedSketch(depth, width, slices)
+        # only read for targets already in alert, so a quarter of the width is enough
+        self._pairs = _SlicedSketch(depth, max(1, width // 4), slices)
+        self._epoch: Optional[int] = None
+        # linear-counting estimate for each number of set bits
+        self._estimate = [
+            -bits * math.log((bits - ones) / bits) if ones < bits else bits * math.log(bits)
+            for ones in range(bits + 1)
+        ]
+        # keys currently in alert, oldest first; bounded so memory stays fixed
+        self._alerted: "OrderedDict[Tuple[str, Hashable], None]" = OrderedDict()
+        # source -> how many of its (source, port) sweeps are in alert
+        self._sweeping: Dict[str, int] = {}
+        # destination -> (packets in window, slice epoch it was last seen)
+        self._heavy: Dict[str, Tuple[int, int]] = {}
+        self.last_alert: Optional[str] = None
+
+    def _slot(self, now: float) -> int:
+        epoch = int(now // self.slice_s)
+        if self._epoch is None:
+            self._epoch = epoch
+        elif epoch > self._epoch:
+            slices = self._ports.slices
+            for e in range(max(self._epoch + 1, epoch - slices + 1), epoch + 1):
+                self._ports.clear(e % slices)
+                self._hosts.clear(e % slices)
+                self._pairs.clear(e % slices)
+            self._epoch = epoch
+            self._heavy = {dst: v for dst, v in self._heavy.items() if epoch - v[1] < slices}
+        return self._epoch % self._ports.slices
+
+    def _over(self, sketch: _SlicedSketch, key_hash: int, element: int, slot: int, threshold: int) -> Tuple[bool, int]:
+        cells = sketch.cells(key_hash)
+        packets = sketch.count(slot, cells)
+        sketch.add(slot, cells, 1 << (element % self.bits))
+        if packets < threshold:
+            return False, packets
+        return self._estimate[sketch.ones(cells)] >= threshold, packets
+
+    def _track_heavy(self, dst_ip: str, packets: int) -> None:
+        heavy = self._heavy
+        if dst_ip in heavy or len(heavy) < self.max_heavy_hitters:
+            heavy[dst_ip] = (packets, self._epoch)
+            return
+        smallest = min(heavy, key=lambda dst: heavy[dst][0])
+        if packets > heavy[smallest][0]:
+            del heavy[smallest]
+            heavy[dst_ip] = (packets, self._epoch)
+
+    def _observe(self, dst_ip: str, dst_port: int, now: Optional[float], src_ip: Optional[str]):
+        now = time.time() if now is None else now
+        slot = self._slot(now)
+        dst_hash = _hash(dst_ip)
+        vertical, packets = self._over(self._ports, dst_hash, _mix(dst_port), slot, self.threshold_ports)
+        if packets >= self.threshold_ports:
+            self._track_heavy(dst_ip, packets)
+        horizontal = False
+        if src_ip is not None:
+            self._pairs.add(slot, self._pairs.cells(_hash((src_ip, dst_ip))), 1 << (_mix(dst_port) % self.bits))
+        if src_ip is not None and self.threshold_hosts:
+            horizontal, _ = self._over(
+                self._hosts, _hash((src_ip, dst_port)), _mix(dst_hash), slot, self.threshold_hosts
+            )
+        return vertical, horizontal
+
+    def flag(self, dst_ip: str, dst_port: int, now: float | None = None, src_ip: str | None = None) -> bool:
+        vertical, horizontal = self._observe(dst_ip, dst_port, now, src_ip)
+        return vertical or horizontal
+
+    def _sweep(self, key: Tuple[str, Hashable], delta: int) -> None:
+        kind, target = key
+        if kind != HORIZONTAL:
+            return
+        src_ip = target[0]
+        left = self._sweeping.get(src_ip, 0) + delta
+        if left:
+            self._sweeping[src_ip] = left
+        else:
+            self._sweeping.pop(src_ip, None)
+
+    def _transition(self, key: Tuple[str, Hashable], flagged: bool) -> bool:
+        alerted = self._alerted
+        if not flagged:
+            if key in alerted:
+                del alerted[key]
+                self._sweep(key, -1)
+            return False
+        if key in alerted:
+            return False
+        alerted[key] = None
+        self._sweep(key, 1)
+        if len(alerted) > self.max_alerts:
+            self._sweep(alerted.popitem(last=False)[0], -1)
+        return True
+
+    def should_alert(self, dst_ip: str, dst_port: int, now: float | None = None, src_ip: str | None = None) -> bool:
+        """
+        True once when a destination or a (source, port) pair crosses its
+        threshold; `last_alert` says which. Alerts again only after the key
+        has dropped back under it.
+        """
+        vertical, horizontal = self._observe(dst_ip, dst_port, now, src_ip)
+        self.last_alert = None
+        if self._transition((VERTICAL, dst_ip), vertical):
+            self.last_alert = VERTICAL
+        if src_ip is not None and self._transition((HORIZONTAL, (src_ip, dst_port)), horizontal):
+            self.last_alert = self.last_alert or HORIZONTAL
+        return self.last_alert is not None
+
+    def is_scanner(self, dst_ip: str, src_ip: str) -> bool:
+        """
+        True while `src_ip` sweeps some port, or while `dst_ip` is in a
+        vertical-scan alert and `src_ip` sent it about `source_ports`
+        distinct ports or more.
+        """
+        if src_ip in self._sweeping:
+            return True
+        if (VERTICAL, dst_ip) not in self._alerted:
+            return False
+        return self._estimate[self._pairs.ones(self._pairs.cells(_hash((src_ip, dst_ip))))] >= self.source_ports
+
+    def _shape(self) -> List[Any]:
+        sketch = self._ports
+        return [sketch.slices, sketch.depth, sketch.width, self._pairs.width, self.bits, self.slice_s]
+
+    def export_state(self) -> Tuple[Dict[str, Any], Dict[str, Callable[[], np.ndarray]]]:
+        """
+        (slice epoch, alerts and heavy hitters; a builder per cell array).
+        The cells are copied here, on the caller's thread; the builders
+        turn the copies into arrays and can run in a native thread.
+        """
+        state = {
+            "shape": self._shape(),
+            "epoch": self._epoch,
+            "alerted": [[kind, list(key) if isinstance(key, tuple) else key] for kind, key in self._alerted],
+            "heavy": [[dst, packets, epoch] for dst, (packets, epoch) in self._heavy.items()],
+        }
+        nbytes = (self.bits + 7) // 8
+        arrays: Dict[str, Callable[[], np.ndarray]] = {}
+        for name, sketch in (("ports", self._ports), ("hosts", self._hosts), ("pairs", self._pairs)):
+            bitmaps, counts = sketch.copy()
+
+            def build_bitmaps(bitmaps=bitmaps):
+                packed = b"".join(cell.to_bytes(nbytes, "little") for rows in bitmaps for cell in rows)
+                return np.frombuffer(packed, dtype=np.uint8).reshape(len(bitmaps), -1, nbytes)
+
+            arrays[f"{name}_bitmaps"] = build_bitmaps
+            arrays[f"{name}_counts"] = lambda counts=counts: np.array(counts, dtype=np.int64)
+        return state, arrays
+
+    def restore_state(self, state: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> int:
+        """
+        Reload `export_state` output; slice epochs are wall-clock, so slices
+        that ended while the controller was down are cleared on the next
+        packet. Returns 0 without changing anything when the checkpoint was
+        taken with different sketch sizes.
+        """
+        if state["shape"] != self._shape():
+            return 0
+        for name, sketch in (("ports", self._ports), ("hosts", self._hosts), ("pairs", self._pairs)):
+            sketch.restore(arrays[f"{name}_bitmaps"], arrays[f"{name}_counts"])
+        self._epoch = state["epoch"]
+        self._alerted = OrderedDict(
+            ((kind, tuple(key) if isinstance(key, list) else key), None) for kind, key in state["alerted"]
+        )
+        self._sweeping = {}
+        for key in self._alerted:
+            self._sweep(key, 1)
+        self._heavy = {dst: (packets, epoch) for dst, packets, epoch in state["heavy"]}
+        return len(self._alerted)
+
+    def stats(self) -> Dict[str, object]:
+        top = sorted(self._heavy.items(), key=lambda kv: -kv[1][0])[:5]
+        return {
+            "backend": "sketch",
+            "alerted": len(self._alerted),
+            "heavy_hitters": {dst: packets for dst, (packets, _) in top},
+        }
@@ -2,7 +2,7 @@ import eventlet
 eventlet.monkey_patch()
 
 from collections import defaultdict
-from typing import Dict, Set, Tuple
+from typing import Dict
 
 import sys
 import os
@@ -10,170 +10,781 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'
 
 from ryu.base import app_manager
 from ryu.controller import ofp_event
-from ryu.controller.handler import CONFIG_DISPATCHER, MAIN_DISPATCHER, set_ev_cls
+from ryu.controller.handler import CONFIG_DISPATCHER, DEAD_DISPATCHER, MAIN_DISPATCHER, set_ev_cls
 from ryu.ofproto import ofproto_v1_3
 import time
 from ryu.lib import hub
-from ryu.lib.packet import packet, ethernet, ipv4, tcp, udp
 from ryu.app.wsgi import WSGIApplication
+from eventlet import patcher, tpool
 
+from src.web.journal import EventJournal
+from src.web.metrics import Metrics
+from src.web.profiler import Profiler
+from src.web.static_assets import STATIC_DIR, StaticAssets
 from src.web.store import DashboardStore
 from src.web.dashboard_wsgi import DashboardWSGI
-from src.controller.flow_rules import forwarding_match_fields
+from src.web.stream import StreamHub
+from src.controller.acl import AclPolicy
+from src.controller.admission import (
+    ADMIT, PACKET_IN_METER_ID, PENALIZE, PacketInAdmission, send_packet_in_meter
+)
+from src.controller.analytics import DETECT, EVENT, AnalyticsQueue
+from src.controller.acl_flows import (
+    ACL_DROP_PRIORITY, AclFlowProgrammer, covering_match_fields, overlaps_any, reactive_denies,
+)
+from src.controller.checkpoint import Checkpointer
+from src.controller.flow_programmer import FlowProgrammer
+from src.controller.flow_granularity import (
+    COOKIE_MASK, FINE_COOKIE, PAIR_COOKIE, PAIR_PRIORITY, SOURCE_PUNT_PRIORITY, SUBNET_COOKIE, SUBNET_PRIORITY,
+    FlowGranularity,
+)
+from src.controller.flow_rules import IPV4_ETH_TYPE, forwarding_match_fields
+from src.controller.flow_stats import VolumetricMonitor
+from src.controller.l2_learning import (
+    ARP_ETH_TYPE, ARP_REQUEST, IPV4_PUNT_PRIORITY, L2_PRIORITY, L2Learning, arp_reply, parse_arp,
+)
+from src.controller.packet_headers import extract_headers
 from src.controller.port_scan import PortScanDetector
+from src.controller.quarantine import QUARANTINE_PRIORITY, Quarantine
+from src.controller.shadow_table import ShadowFlowTable, match_key
+from src.controller.scan_sketch import SketchScanDetector
+
+
+ACL_RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "acl_rules.txt")
+JOURNAL_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../var/journal"))
+CHECKPOINT_FILE = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../var/checkpoint.npz"))
 
 
 class SdnSecurityApp(app_manager.RyuApp):
     OFP_VERSIONS = [ofproto_v1_3.OFP_VERSION]
     _CONTEXTS = {"wsgi": WSGIApplication}  # ensures kwargs["wsgi"] exists
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, env=None, **kwargs):
         super().__init__(*args, **kwargs)
-
-        self.store = DashboardStore(max_points=120, max_events=60)
+        # SDN_* settings; Ryu passes none, so they come from the process environment
+        env = os.environ if env is None else env
+
+        # full event history on disk; the store keeps only the latest events in memory.
+        # The writer is a native thread, so segment writes, fsyncs and rollovers never block the hub
+        self.journal = EventJournal(
+            env.get("SDN_JOURNAL_DIR", JOURNAL_DIR),
+            segment_bytes=64 * 1024 * 1024,
+            segment_s=3600.0,
+            retention_s=7 * 24 * 3600.0,
+            max_bytes=1024 * 1024 * 1024,
+            threads=patcher.original("threading"),
+            queues=patcher.original("queue"),
+        ).start()
+        self.store = DashboardStore(max_points=120, max_events=60, journal=self.journal)
+        # dashboard clients get one pushed delta per tick instead of polling
+        self.stream = StreamHub(self.store, max_queue=16, max_clients=1000)
+
+        # handler latency histograms and per-switch counters for /metrics; SDN_METRICS=0 turns them off
+        self.metrics = Metrics(enabled=env.get("SDN_METRICS", "1") != "0")
+        # one Packet-In in 16 is timed; the counters below stay exact
+        self.metrics.histogram("sdn_packet_in_seconds", "Packet-In handler time by stage (sampled).", sample_every=16)
+        self.metrics.histogram("sdn_switch_features_seconds", "Switch-features handler time by stage.")
+        self.metrics.counter("sdn_packet_in_total", "Packet-In messages received.", label="dpid")
+        self.metrics.counter("sdn_flow_mods_total", "FlowMods queued after deduplication.", label="dpid")
+        self.metrics.counter("sdn_packet_out_total", "PacketOut messages sent.", label="dpid")
+        self.metrics.gauge("sdn_event_queue_depth", "Events waiting in this app's Ryu event queue.",
+                           lambda: self.events.qsize())
+        self.metrics.gauge("sdn_analytics_queue_depth", "Packet-In analytics records waiting for the worker.",
+                           lambda: len(self.analytics))
+        self.metrics.counter("sdn_analytics_processed_total", "Packet-In analytics records processed.",
+                             fn=lambda: self.analytics.processed)
+        self.metrics.counter("sdn_analytics_shed_total", "Packet-In analytics records shed under overload.",
+                             label="kind", fn=lambda: self.analytics.shed)
+
+        # on-demand cProfile, stack sampling and tracemalloc under /debug, for local callers
+        # presenting SDN_DEBUG_TOKEN; without a token nothing is created
+        debug_token = env.get("SDN_DEBUG_TOKEN", "")
+        self.profiler = None
+        if debug_token:
+            self.profiler = Profiler(handler_file=__file__, threads=patcher.original("threading"))
+
+        # SDN_QUARANTINE=1: a scan alert drops its source on every switch for 1 min, doubling per
+        # repeat up to 1 h; SDN_QUARANTINE_ALLOW lists CIDRs that are never blocked
+        self.quarantine = None
+        if env.get("SDN_QUARANTINE", "0") == "1":
+            self.quarantine = Quarantine(
+                base_s=60.0, factor=2.0, max_s=3600.0, forget_s=86400.0,
+                allow=env.get("SDN_QUARANTINE_ALLOW", "").split(","),
+            )
+        # releasing a block is an admin action with its own token, so it does not switch on /debug
+        admin_token = env.get("SDN_ADMIN_TOKEN", "")
 
         # register WSGI controller
         wsgi = kwargs["wsgi"]
-        wsgi.register(DashboardWSGI, {"store": self.store})
-
-        # L2 learning
-        self.mac_to_port: Dict[int, Dict[str, int]] = defaultdict(dict)
-
-        # ACL rules (example): block SSH h1->h2
-        # tuple: (src_ip, dst_ip, proto, dst_port)
-        self.acl_block: Set[Tuple[str, str, int, int]] = {
-            ("10.0.0.1", "10.0.0.2", 6, 22)
-        }
+        wsgi.register(DashboardWSGI, {
+            "store": self.store, "stream": self.stream, "journal": self.journal, "metrics": self.metrics,
+            "assets": StaticAssets(STATIC_DIR), "profiler": self.profiler, "debug_token": debug_token,
+            "admin_token": admin_token, "quarantine": self.quarantine, "release_source": self.release_source,
+        })
+
+        # connected switches, for pushing policy changes
+        self.datapaths: Dict[int, object] = {}
+
+        # FlowMods are deduplicated and batched per datapath, each batch closed by a barrier
+        self.flow_programmer = FlowProgrammer(batch_size=64, dedupe_s=1.0)
+        self.flow_flush_s = 0.02
+        # what each switch holds; flows still installed are not resent, and the least
+        # recently active forwarding flows are evicted before the table overflows
+        self.flow_table_capacity = 4096
+        self.shadow = ShadowFlowTable(capacity=self.flow_table_capacity, evict_below=ACL_DROP_PRIORITY)
+
+        # Packet-In admission: a per-switch meter on the table-miss rule, then a
+        # per-source-MAC token bucket checked before parsing
+        self.packet_in_meter_pps = 1000
+        self.packet_in_meter_burst = 200
+        self.shed_priority = 200
+        self.admission = PacketInAdmission(rate_pps=100.0, burst=200.0, penalty_s=10.0)
+
+        # Packet-In handling is split: the handler decides and programs forwarding, while scan
+        # detection, source history and event logging are queued for a worker that drains them in
+        # batches. Under overload events are shed at half capacity, detector input when full.
+        self._analytics_ready = hub.Event()
+        self.analytics = AnalyticsQueue(capacity=65536, shed_events_at=0.5, on_ready=self._analytics_ready.set)
+        self.analytics_batch = 512
+
+        # L2 learning: bounded, aged MAC tables per switch and IP -> MAC bindings for the ARP proxy
+        self.l2 = L2Learning(mac_capacity=4096, mac_age_s=300.0, arp_capacity=65536, arp_age_s=300.0)
+        self.l2_idle_s = 60
+
+        # ACL policy (default: block SSH h1->h2), recompiled when the file changes
+        self.acl_path = env.get("SDN_ACL_FILE", ACL_RULES_FILE)
+        self.acl = AclPolicy.from_file(self.acl_path)
+        self.acl_reload_s = 2.0
+        # offloadable deny rules live on every switch as permanent drop flows
+        self.acl_flows = AclFlowProgrammer()
+        # the rest are judged per Packet-In, so no coarse forwarding flow may cover them
+        self._reactive_denies = reactive_denies(self.acl.rules)
 
         # DDoS heuristic:
         self.ddos_window_s = 5.0
         self.ddos_threshold_ports = 40
-        self.port_scan_detector = PortScanDetector(
-            self.ddos_window_s, self.ddos_threshold_ports
+        # SDN_SCAN_DETECTOR=sketch: fixed-memory detector that also catches horizontal sweeps
+        self.scan_threshold_hosts = 20
+        if env.get("SDN_SCAN_DETECTOR", "exact") == "sketch":
+            self.port_scan_detector = SketchScanDetector(
+                self.ddos_window_s, self.ddos_threshold_ports, self.scan_threshold_hosts
+            )
+        else:
+            self.port_scan_detector = PortScanDetector(
+                self.ddos_window_s, self.ddos_threshold_ports
+            )
+
+        # sources that keep behaving get wider forwarding flows; an alert narrows them again
+        self.granularity = FlowGranularity(
+            promote_after_s=60.0, promote_after_flows=20, subnet_min_sources=4, probation_s=600.0,
+            coarse_ok=lambda src, dst: not overlaps_any(self._reactive_denies, src, dst),
+        )
+
+        # volumetric DDoS: flow and port counters polled from every switch, scored off the event loop
+        self.stats_poll_s = 5.0
+        self.volumetric = VolumetricMonitor(
+            z_threshold=4.0, min_bps=10e6, flood_bps=1e9, idle_s=6 * self.stats_poll_s,
+            threads=patcher.original("threading"),
         )
+        # multipart replies collected per datapath until the last part arrives
+        self._flow_stats_parts: Dict[int, list] = defaultdict(list)
+        self._port_stats_parts: Dict[int, list] = defaultdict(list)
+
+        # warm restart: soft state is checkpointed off the packet path and reloaded here;
+        # SDN_CHECKPOINT= (empty) turns it off
+        checkpoint_path = env.get("SDN_CHECKPOINT", CHECKPOINT_FILE)
+        self.checkpoint_s = 30.0
+        self.checkpointer = None
+        if checkpoint_path:
+            self.checkpointer = Checkpointer(checkpoint_path, self.l2, self.port_scan_detector, self.store,
+                                             quarantine=self.quarantine)
+            self._restore_checkpoint()
+        # switches whose existing flows are adopted from their first flow-stats reply
+        self._resync = set()
+        # switches whose punt flows go through the Packet-In meter
+        self._metered = set()
 
         # tick loop: updated_at always moves
         hub.spawn(self._tick_loop)
+        hub.spawn(self._acl_reload_loop)
+        hub.spawn(self._flow_flush_loop)
+        hub.spawn(self._stats_poll_loop)
+        hub.spawn(self._analytics_loop)
+        if self.checkpointer is not None:
+            hub.spawn(self._checkpoint_loop)
 
         self.logger.info("UI:  http://127.0.0.1:8080/dashboard")
         self.logger.info("API: http://127.0.0.1:8080/api/dashboard")
+        self.logger.info("SSE: http://127.0.0.1:8080/api/stream")
 
     def _tick_loop(self):
         while True:
             hub.sleep(1)
+            self.store.set_stats("flow_programmer", self.flow_programmer.stats())
+            self.store.set_stats("admission", self.admission.stats())
+            self.store.set_stats("stream", self.stream.stats())
+            self.store.set_stats("journal", self.journal.stats())
+            self.store.set_stats("scan_detector", self.port_scan_detector.stats())
+            self.store.set_stats("volumetric", self.volumetric.stats())
+            self.store.set_stats("l2", self.l2.stats())
+            self.store.set_stats("flow_granularity", self.granularity.stats())
+            self.store.set_stats("flow_table", self.shadow.stats())
+            self.store.set_stats("analytics", self.analytics.stats())
+            if self.checkpointer is not None:
+                self.store.set_stats("checkpoint", self.checkpointer.stats())
+            if self.profiler is not None:
+                self.profiler.expire()
+            if self.quarantine is not None:
+                for src_ip in self.quarantine.expire():
+                    self.store.log("INFO", "Quarantine ended", src=src_ip)
+                self.store.set_stats("quarantine", self.quarantine.stats())
             self.store.tick_1s()
+            self.stream.publish()
+
+    def _analytics_loop(self):
+        ready = self._analytics_ready
+        while True:
+            # idle until a record lands in the empty queue
+            ready.wait()
+            ready.clear()
+            batch = self.analytics.drain(self.analytics_batch)
+            while batch:
+                self._analyze(batch)
+                # Packet-Ins that arrived meanwhile are handled before the next batch
+                hub.sleep(0)
+                batch = self.analytics.drain(self.analytics_batch)
+
+    def _analyze(self, batch):
+        detector = self.port_scan_detector
+        for kind, record in batch:
+            if kind == EVENT:
+                level, msg, extra = record
+                self.store.log(level, msg, **extra)
+                continue
+            now, src_ip, dst_ip, proto, dst_port = record
+            if dst_port is None or proto not in (6, 17):
+                self.granularity.observe(src_ip, dst_ip)
+                continue
+            alerted = detector.should_alert(dst_ip, dst_port, now=now, src_ip=src_ip)
+            if alerted:
+                self.store.record(ddos_flag=1)
+                self.store.log("WARN", "DDoS flagged", dst=dst_ip, src=src_ip, dst_port=dst_port,
+                               kind=detector.last_alert)
+                # back to port-specific flows so the rest of the scan keeps reaching the detector
+                self.demote_source(src_ip)
+            else:
+                self.granularity.observe(src_ip, dst_ip)
+            # the alerting probe may come from a bystander, and one alert covers every scanner of
+            # the target; each source is judged on the ports it probed itself, and one caught after
+            # the alert is logged as joining it rather than under a fresh alert
+            if (self.quarantine is not None and not self.quarantine.remaining(src_ip)
+                    and detector.is_scanner(dst_ip, src_ip)
+                    and (alerted or not self.quarantine.allowed(src_ip))):
+                reason = detector.last_alert if alerted else "ongoing scan"
+                self.quarantine_source(src_ip, reason, dst=dst_ip, dst_port=dst_port)
+
+    def log_later(self, level, msg, **extra):
+        """store.log for the Packet-In path: done by the analytics worker, and shed first under overload."""
+        self.analytics.put(EVENT, (level, msg, extra))
+
+    def _restore_checkpoint(self):
+        try:
+            restored = self.checkpointer.load()
+        except (ValueError, KeyError, TypeError) as e:
+            self.store.log("WARN", "Checkpoint ignored", error=str(e))
+            return
+        if restored is not None:
+            self.store.log("INFO", "Warm restart", **restored)
+
+    def _checkpoint_loop(self):
+        while True:
+            hub.sleep(self.checkpoint_s)
+            self._save_checkpoint()
+
+    def _save_checkpoint(self):
+        # copy on the event loop, compress and write in a native thread
+        captured = self.checkpointer.capture()
+        try:
+            tpool.execute(self.checkpointer.save, captured)
+        except OSError as e:
+            self.store.log("WARN", "Checkpoint failed", error=str(e))
+
+    def stop(self):
+        # queued analytics first, so the last checkpoint includes them; written inline since the hub is going away
+        self._analyze(self.analytics.drain(len(self.analytics)))
+        if self.checkpointer is not None:
+            try:
+                self.checkpointer.save(self.checkpointer.capture())
+            except OSError as e:
+                self.logger.warning("Checkpoint on shutdown failed: %s", e)
+        super().stop()
+
+    def _flow_flush_loop(self):
+        while True:
+            hub.sleep(self.flow_flush_s)
+            self.flow_programmer.flush()
+
+    def _acl_reload_loop(self):
+        while True:
+            hub.sleep(self.acl_reload_s)
+            self.reload_acl()
+
+    def reload_acl(self):
+        """Pick up an edited ACL file and bring every switch's flows in line with it."""
+        try:
+            # compile in a native thread; lookups keep using the old classifier until the swap
+            if not tpool.execute(self.acl.reload_if_changed):
+                return
+        except (OSError, ValueError) as e:
+            self.store.log("WARN", "ACL reload failed", error=str(e))
+            return
+        self.store.log("INFO", "ACL reloaded", rules=len(self.acl.rules))
+        reactive = reactive_denies(self.acl.rules)
+        # coarse flows were vetted against the old reactive denies; drop them all if those changed
+        stale_coarse = reactive != self._reactive_denies
+        self._reactive_denies = reactive
+        # a fine flow was allowed under the old policy; any that a reactive deny now covers must go,
+        # or it keeps forwarding without a Packet-In (offloaded denies outrank it on the switch)
+        fine_denied = [fields for rule in reactive for fields in covering_match_fields(rule)]
+        for dp in list(self.datapaths.values()):
+            added, removed = self.acl_flows.sync(dp, self.acl.rules)
+            if added or removed:
+                self.store.log("INFO", "ACL flows updated", dpid=dp.id, added=added, removed=removed)
+                self.shadow.set_reserved(dp.id, len(self.acl_flows.installed(dp.id)))
+            if stale_coarse:
+                self.delete_flows_by_cookie(dp, PAIR_COOKIE, 0xFF << 40)
+                self.delete_flows_by_cookie(dp, SUBNET_COOKIE, 0xFF << 40)
+            for fields in fine_denied:
+                self.delete_flows_by_cookie(dp, FINE_COOKIE, 0xFF << 40, fields)
+
+    def _stats_poll_loop(self):
+        while True:
+            hub.sleep(self.stats_poll_s)
+            for dp in list(self.datapaths.values()):
+                self.request_flow_stats(dp)
+                dp.send_msg(dp.ofproto_parser.OFPPortStatsRequest(dp, 0, dp.ofproto.OFPP_ANY))
+
+    def request_flow_stats(self, dp):
+        ofp = dp.ofproto
+        # queued FlowMods go first, so the reply lists every flow recorded before the request
+        self.flow_programmer.flush(dp)
+        dp.send_msg(dp.ofproto_parser.OFPFlowStatsRequest(dp, 0, ofp.OFPTT_ALL, ofp.OFPP_ANY, ofp.OFPG_ANY))
+        self.shadow.stats_requested(dp.id)
+
+    def _ingest_stats(self, kind, dpid, body):
+        # tens of thousands of entries: build and score the arrays in a native thread
+        if kind == "port":
+            anomalies = tpool.execute(self.volumetric.ingest_ports, dpid, body)
+        else:
+            anomalies = tpool.execute(self.volumetric.ingest_flows, dpid, body)
+        for anomaly in anomalies:
+            key = anomaly.key
+            where = {"port": key[1]} if kind == "port" else {"match": dict(key[3])}
+            self.store.record(ddos_flag=1)
+            self.store.log("WARN", "Volumetric anomaly", dpid=dpid, mbps=round(anomaly.bps / 1e6, 1),
+                           pps=round(anomaly.pps), zscore=round(anomaly.zscore, 1), **where)
+            # a coarse flow hides its ports from the detector; narrow it again
+            if kind == "flow" and key[2] == PAIR_PRIORITY:
+                self.demote_source(where["match"]["ipv4_src"])
+            elif kind == "flow" and key[2] == SUBNET_PRIORITY:
+                # the match holds the network address, not a source to blame
+                self.demote_subnet(where["match"]["ipv4_src"][0])
+
+    @set_ev_cls(ofp_event.EventOFPFlowStatsReply, MAIN_DISPATCHER)
+    def flow_stats_reply_handler(self, ev):
+        msg = ev.msg
+        dpid = msg.datapath.id
+        self._flow_stats_parts[dpid].extend(msg.body)
+        if not msg.flags & msg.datapath.ofproto.OFPMPF_REPLY_MORE:
+            body = self._flow_stats_parts.pop(dpid)
+            adopt = dpid in self._resync
+            self._resync.discard(dpid)
+            hub.spawn(self.reconcile_flows, msg.datapath, body, adopt)
+            hub.spawn(self._ingest_stats, "flow", dpid, body)
+
+    def reconcile_flows(self, dp, body, adopt=False):
+        """Apply a complete flow-stats reply to the shadow table, adopting its flows first if `adopt`."""
+        # keys and tags for every entry are built in a native thread; the shadow table is only
+        # touched here, on the hub, since Packet-In handlers record into it concurrently
+        rows = tpool.execute(self.flow_rows, dp, body, adopt)
+        if adopt:
+            self.adopt_flows(dp, rows)
+        self.shadow.reconcile(dp.id, ((row[0], row[-1]) for row in rows))
+
+    @classmethod
+    def flow_rows(cls, dp, body, adopt=False):
+        """
+        (key, packets) per flow-stats entry, or, when `adopt`, the (key,
+        fields, tag, idle timeout, hard timeout, packets) rows adopt_flows takes.
+        """
+        if not adopt:
+            return [(match_key(f.priority, f.match.items()), f.packet_count) for f in body]
+        return [
+            (match_key(f.priority, f.match.items()), dict(f.match.items()), cls.flow_tag(dp, f),
+             f.idle_timeout, f.hard_timeout, f.packet_count)
+            for f in body
+        ]
+
+    def adopt_flows(self, dp, rows):
+        """Record flows a switch kept across a controller restart instead of reinstalling them."""
+        adopted = self.shadow.adopt(dp.id, rows)
+        if adopted:
+            self.store.log("INFO", "Flows adopted", dpid=dp.id, flows=adopted)
+
+    @staticmethod
+    def flow_tag(dp, stat):
+        """The tag add_flow would have given this flow: "drop", its output port, or the punt tag."""
+        ofp = dp.ofproto
+        ports = []
+        metered = False
+        for inst in stat.instructions:
+            if inst.type == ofp.OFPIT_METER:
+                metered = True
+            for action in getattr(inst, "actions", ()):
+                if action.type == ofp.OFPAT_OUTPUT:
+                    ports.append(action.port)
+        if not ports:
+            return "drop"
+        if ports[0] == ofp.OFPP_CONTROLLER:
+            return "metered" if metered else None
+        return ports[0]
+
+    @set_ev_cls(ofp_event.EventOFPPortStatsReply, MAIN_DISPATCHER)
+    def port_stats_reply_handler(self, ev):
+        msg = ev.msg
+        dpid = msg.datapath.id
+        self._port_stats_parts[dpid].extend(msg.body)
+        if not msg.flags & msg.datapath.ofproto.OFPMPF_REPLY_MORE:
+            hub.spawn(self._ingest_stats, "port", dpid, self._port_stats_parts.pop(dpid))
 
     def ddos_flag(self, dst_ip: str, dst_port: int) -> bool:
         return self.port_scan_detector.flag(dst_ip, dst_port)
 
-    def add_flow(self, dp, priority, match, actions, idle_timeout=30):
+    def add_flow(self, dp, priority, fields, actions, idle_timeout=30, tag=None, **kwargs):
+        # tag summarises the actions (e.g. output port) so a changed decision is not deduplicated
+        key = match_key(priority, fields.items())
+        if self.shadow.present(dp.id, key, tag):
+            return
+        if self.flow_programmer.add_flow(dp, priority, fields, actions, idle_timeout=idle_timeout, tag=tag,
+                                         flags=dp.ofproto.OFPFF_SEND_FLOW_REM, **kwargs):
+            self.metrics.inc("sdn_flow_mods_total", dp.id)
+            victims = self.shadow.record(dp.id, key, fields, tag, idle_timeout, kwargs.get("hard_timeout", 0))
+            for victim_priority, victim_fields in victims:
+                # a victim still queued would otherwise be installed after its delete, uncounted
+                self.flow_programmer.cancel(dp, victim_priority, victim_fields)
+                self.delete_flow(dp, victim_priority, victim_fields)
+
+    def delete_flow(self, dp, priority, fields):
         ofp = dp.ofproto
         parser = dp.ofproto_parser
-        inst = [parser.OFPInstructionActions(ofp.OFPIT_APPLY_ACTIONS, actions)]
-        mod = parser.OFPFlowMod(
+        dp.send_msg(parser.OFPFlowMod(
             datapath=dp,
+            command=ofp.OFPFC_DELETE_STRICT,
+            table_id=ofp.OFPTT_ALL,
             priority=priority,
-            match=match,
-            instructions=inst,
-            idle_timeout=idle_timeout
-        )
-        dp.send_msg(mod)
+            out_port=ofp.OFPP_ANY,
+            out_group=ofp.OFPG_ANY,
+            match=parser.OFPMatch(**fields),
+        ))
+
+    def send_packet_out(self, dp, in_port, actions, data):
+        dp.send_msg(dp.ofproto_parser.OFPPacketOut(
+            datapath=dp,
+            buffer_id=dp.ofproto.OFP_NO_BUFFER,
+            in_port=in_port,
+            actions=actions,
+            data=data
+        ))
+        self.metrics.inc("sdn_packet_out_total", dp.id)
+
+    def install_punt_flows(self, dp, meter_id=None):
+        # IPv4 is punted above the L2 flows so known destinations never bypass the ACL and detector
+        ofp = dp.ofproto
+        parser = dp.ofproto_parser
+        actions = [parser.OFPActionOutput(ofp.OFPP_CONTROLLER, ofp.OFPCML_NO_BUFFER)]
+        tag = None if meter_id is None else "metered"
+        self.add_flow(dp, 0, {}, actions, idle_timeout=0, tag=tag, meter_id=meter_id)
+        self.add_flow(dp, IPV4_PUNT_PRIORITY, {"eth_type": IPV4_ETH_TYPE}, actions,
+                      idle_timeout=0, tag=tag, meter_id=meter_id)
+        self.flow_programmer.flush(dp)
+
+    def punt_source(self, dp, src_ip):
+        """Keep an untrusted source's IPv4 traffic coming here where its subnet's flows would forward it."""
+        if not self.granularity.needs_punt(src_ip):
+            return
+        ofp = dp.ofproto
+        actions = [dp.ofproto_parser.OFPActionOutput(ofp.OFPP_CONTROLLER, ofp.OFPCML_NO_BUFFER)]
+        meter_id = PACKET_IN_METER_ID if dp.id in self._metered else None
+        self.add_flow(dp, SOURCE_PUNT_PRIORITY, {"eth_type": IPV4_ETH_TYPE, "ipv4_src": src_ip}, actions,
+                      idle_timeout=30, tag=None if meter_id is None else "metered", meter_id=meter_id)
+
+    def delete_flows_to(self, dp, mac, old_port):
+        """Remove flows still sending a moved host's traffic to its old port."""
+        ofp = dp.ofproto
+        parser = dp.ofproto_parser
+        matches = [parser.OFPMatch(eth_dst=mac)]
+        matches += [parser.OFPMatch(eth_type=IPV4_ETH_TYPE, ipv4_dst=ip) for ip in self.l2.ips_for(mac)]
+        for match in matches:
+            self.flow_programmer.send_now(dp, parser.OFPFlowMod(
+                datapath=dp,
+                command=ofp.OFPFC_DELETE,
+                table_id=ofp.OFPTT_ALL,
+                out_port=old_port,
+                out_group=ofp.OFPG_ANY,
+                match=match,
+            ))
+
+    def delete_flows_by_cookie(self, dp, cookie, cookie_mask=COOKIE_MASK, fields=None):
+        # pending adds go out first, or they would outlive the delete; `fields` narrows it to flows it covers
+        ofp = dp.ofproto
+        parser = dp.ofproto_parser
+        self.flow_programmer.send_now(dp, parser.OFPFlowMod(
+            datapath=dp,
+            command=ofp.OFPFC_DELETE,
+            table_id=ofp.OFPTT_ALL,
+            cookie=cookie,
+            cookie_mask=cookie_mask,
+            out_port=ofp.OFPP_ANY,
+            out_group=ofp.OFPG_ANY,
+            match=parser.OFPMatch(**(fields or {})),
+        ))
+
+    def demote_source(self, src_ip):
+        for cookie in self.granularity.demote(src_ip):
+            for dp in list(self.datapaths.values()):
+                self.delete_flows_by_cookie(dp, cookie)
+
+    def demote_subnet(self, net_ip):
+        for cookie in self.granularity.demote_subnet(net_ip):
+            for dp in list(self.datapaths.values()):
+                self.delete_flows_by_cookie(dp, cookie)
+
+    def quarantine_source(self, src_ip, reason, **extra):
+        seconds = self.quarantine.offend(src_ip)
+        if not seconds:
+            self.store.log("INFO", "Quarantine skipped (allowlisted)", src=src_ip, reason=reason, **extra)
+            return
+        for dp in list(self.datapaths.values()):
+            self.install_quarantine(dp, src_ip, seconds)
+        self.store.log("WARN", "Source quarantined", src=src_ip, seconds=seconds, reason=reason,
+                       offences=self.quarantine.offences(src_ip), **extra)
+
+    def install_quarantine(self, dp, src_ip, seconds):
+        # the hard timeout ends the block on the switch; sent at once rather than with the next batch
+        self.add_flow(dp, QUARANTINE_PRIORITY, {"eth_type": IPV4_ETH_TYPE, "ipv4_src": src_ip}, [],
+                      idle_timeout=0, hard_timeout=seconds, tag="drop")
+        self.flow_programmer.flush(dp)
+
+    def release_source(self, src_ip, forget=False):
+        """Lift a quarantine on every switch; False if `src_ip` was not quarantined."""
+        if not self.quarantine.release(src_ip, forget=forget):
+            return False
+        fields = {"eth_type": IPV4_ETH_TYPE, "ipv4_src": src_ip}
+        key = match_key(QUARANTINE_PRIORITY, fields.items())
+        for dp in list(self.datapaths.values()):
+            self.delete_flow(dp, QUARANTINE_PRIORITY, fields)
+            # forgotten now so a new offence reinstalls the block before the FlowRemoved arrives
+            self.shadow.flow_removed(dp.id, key, dp.ofproto.OFPRR_DELETE)
+        self.store.log("INFO", "Quarantine released", src=src_ip, forget=forget)
+        return True
+
+    def answer_arp(self, dp, in_port, data):
+        """Learn the ARP sender and answer requests for known IPs; True when a reply was sent."""
+        arp = parse_arp(data)
+        if arp is None:
+            return False
+        op, sender_mac, sender_ip, target_ip = arp
+        if sender_ip != "0.0.0.0":
+            bound = self.l2.learn_arp(sender_ip, sender_mac)
+            if bound is not None:
+                # the live binding is kept and the IP is no longer answered for until the dispute ages out
+                self.log_later("WARN", "ARP binding disputed", ip=sender_ip, bound=bound, claimed=sender_mac)
+            # a new host ARPs before it sends IPv4, which a subnet flow would otherwise forward unseen
+            self.punt_source(dp, sender_ip)
+        if op != ARP_REQUEST or target_ip == sender_ip:
+            return False
+        target_mac = self.l2.mac_for(target_ip)
+        if target_mac is None or target_mac == sender_mac:
+            return False
+        parser = dp.ofproto_parser
+        reply = arp_reply(sender_mac, sender_ip, target_mac, target_ip)
+        self.send_packet_out(dp, dp.ofproto.OFPP_CONTROLLER, [parser.OFPActionOutput(in_port)], reply)
+        self.l2.arp_replies += 1
+        return True
 
     @set_ev_cls(ofp_event.EventOFPSwitchFeatures, CONFIG_DISPATCHER)
     def switch_features_handler(self, ev):
+        timer = self.metrics.timer("sdn_switch_features_seconds")
+        try:
+            self._switch_features(ev, timer)
+        finally:
+            timer.finish()
+
+    def _switch_features(self, ev, timer):
         dp = ev.msg.datapath
-        ofp = dp.ofproto
         parser = dp.ofproto_parser
 
-        # table-miss -> controller
-        match = parser.OFPMatch()
-        actions = [parser.OFPActionOutput(ofp.OFPP_CONTROLLER, ofp.OFPCML_NO_BUFFER)]
-        self.add_flow(dp, 0, match, actions, idle_timeout=0)
+        # table-miss and all IPv4 -> controller
+        self.install_punt_flows(dp)
+        timer.mark("table_miss")
+
+        # flows the switch kept from before a controller restart are adopted, not reinstalled
+        self._resync.add(dp.id)
+        self.request_flow_stats(dp)
+        timer.mark("resync_request")
+
+        # the table-miss rule is metered once the switch confirms it supports meters
+        if self.packet_in_meter_pps:
+            dp.send_msg(parser.OFPMeterFeaturesStatsRequest(dp, 0))
+        timer.mark("meter_request")
 
-        self.store.log("INFO", "Switch connected", dpid=dp.id)
+        # policy-denied traffic is dropped on the switch and never becomes a Packet-In
+        self.datapaths[dp.id] = dp
+        acl_flows = self.acl_flows.install_all(dp, self.acl.rules)
+        self.shadow.set_reserved(dp.id, acl_flows)
+        timer.mark("acl_flows")
+
+        if self.quarantine is not None:
+            for src_ip, seconds in self.quarantine.blocked().items():
+                self.install_quarantine(dp, src_ip, seconds)
+            timer.mark("quarantine")
+
+        self.store.log("INFO", "Switch connected", dpid=dp.id, acl_flows=acl_flows)
+
+    @set_ev_cls(ofp_event.EventOFPMeterFeaturesStatsReply, MAIN_DISPATCHER)
+    def meter_features_handler(self, ev):
+        dp = ev.msg.datapath
+        features = ev.msg.body[0] if ev.msg.body else None
+        if features is None or features.max_meter < PACKET_IN_METER_ID:
+            self.store.log("WARN", "Switch has no meters; Packet-In rate is unmetered", dpid=dp.id)
+            return
+
+        send_packet_in_meter(dp, self.packet_in_meter_pps, self.packet_in_meter_burst)
+        self.install_punt_flows(dp, meter_id=PACKET_IN_METER_ID)
+        self._metered.add(dp.id)
+        self.store.log("INFO", "Packet-In meter installed", dpid=dp.id, pps=self.packet_in_meter_pps)
+
+    @set_ev_cls(ofp_event.EventOFPStateChange, [MAIN_DISPATCHER, DEAD_DISPATCHER])
+    def state_change_handler(self, ev):
+        dp = ev.datapath
+        if ev.state == DEAD_DISPATCHER and dp.id is not None:
+            self.datapaths.pop(dp.id, None)
+            self.acl_flows.forget(dp.id)
+            self.flow_programmer.forget(dp.id)
+            self.l2.forget(dp.id)
+            self.shadow.forget(dp.id)
+            self._resync.discard(dp.id)
+            self._metered.discard(dp.id)
+            self._flow_stats_parts.pop(dp.id, None)
+            self._port_stats_parts.pop(dp.id, None)
+
+    @set_ev_cls(ofp_event.EventOFPFlowRemoved, MAIN_DISPATCHER)
+    def flow_removed_handler(self, ev):
+        msg = ev.msg
+        self.shadow.flow_removed(msg.datapath.id, match_key(msg.priority, msg.match.items()), msg.reason)
+
+    @set_ev_cls(ofp_event.EventOFPBarrierReply, MAIN_DISPATCHER)
+    def barrier_reply_handler(self, ev):
+        msg = ev.msg
+        self.flow_programmer.barrier_reply(msg.datapath.id, msg.xid)
 
     @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
     def packet_in_handler(self, ev):
+        timer = self.metrics.timer("sdn_packet_in_seconds")
+        try:
+            self._packet_in(ev, timer)
+        finally:
+            timer.finish()
+
+    def _packet_in(self, ev, timer):
         msg = ev.msg
         dp = msg.datapath
         ofp = dp.ofproto
         parser = dp.ofproto_parser
         in_port = msg.match["in_port"]
+        self.metrics.inc("sdn_packet_in_total", dp.id)
+
+        # admission control on the raw source MAC, before any parsing work
+        src_mac_raw = bytes(msg.data[6:12])
+        verdict = self.admission.admit(src_mac_raw)
+        timer.mark("admission")
+        if verdict != ADMIT:
+            if verdict == PENALIZE:
+                penalty_s = int(self.admission.penalty_s)
+                self.add_flow(dp, self.shed_priority, {"eth_src": src_mac_raw.hex(":")}, [],
+                              idle_timeout=0, hard_timeout=penalty_s, tag="shed")
+                self.log_later("WARN", "Packet-In source shed", dpid=dp.id, src=src_mac_raw.hex(":"), seconds=penalty_s)
+            return
 
-        pkt = packet.Packet(msg.data)
-        eth = pkt.get_protocol(ethernet.ethernet)
-        if not eth:
+        hdr = extract_headers(msg.data)
+        timer.mark("parse")
+        if hdr is None:
             return
 
         dpid = dp.id
-        src_mac = eth.src
-        dst_mac = eth.dst
+        src_mac = hdr.src_mac
+        dst_mac = hdr.dst_mac
 
         # learn
-        self.mac_to_port[dpid][src_mac] = in_port
-
-        ip = pkt.get_protocol(ipv4.ipv4)
-        if ip is None:
-            # L2 / ARP etc. -> simple L2 forward
-            out_port = self.mac_to_port[dpid].get(dst_mac, ofp.OFPP_FLOOD)
+        old_port = self.l2.learn_mac(dpid, src_mac, in_port)
+        if old_port is not None:
+            self.delete_flows_to(dp, src_mac, old_port)
+            self.log_later("WARN", "MAC moved", dpid=dpid, mac=src_mac, old_port=old_port, port=in_port)
+        timer.mark("learn")
+
+        if not hdr.is_ipv4:
+            # ARP for a known IP is answered here instead of flooded
+            if hdr.ethertype == ARP_ETH_TYPE and self.answer_arp(dp, in_port, msg.data):
+                timer.mark("packet_out")
+                return
+            known_port = self.l2.port(dpid, dst_mac)
+            out_port = ofp.OFPP_FLOOD if known_port is None else known_port
             actions = [parser.OFPActionOutput(out_port)]
-            dp.send_msg(parser.OFPPacketOut(
-                datapath=dp,
-                buffer_id=ofp.OFP_NO_BUFFER,
-                in_port=in_port,
-                actions=actions,
-                data=msg.data
-            ))
+            if known_port is not None:
+                # later non-IPv4 frames to this host are switched without a Packet-In
+                self.add_flow(dp, L2_PRIORITY, {"eth_dst": dst_mac}, actions, idle_timeout=self.l2_idle_s, tag=out_port)
+            self.send_packet_out(dp, in_port, actions, msg.data)
+            timer.mark("packet_out")
             return
 
-        src_ip = ip.src
-        dst_ip = ip.dst
-        proto = ip.proto
-
-        dst_port = None
-        if proto == 6:
-            t = pkt.get_protocol(tcp.tcp)
-            dst_port = t.dst_port if t else None
-        elif proto == 17:
-            u = pkt.get_protocol(udp.udp)
-            dst_port = u.dst_port if u else None
-
-        self.store.inc_flow()
-
-        # ACL DROP
-        if dst_port is not None and (src_ip, dst_ip, proto, dst_port) in self.acl_block:
-            match = parser.OFPMatch(
-                eth_type=0x0800,
-                ip_proto=6,
-                ipv4_src=src_ip,
-                ipv4_dst=dst_ip,
-                tcp_dst=dst_port
-            )
-            self.add_flow(dp, 150, match, [], idle_timeout=20)
-            self.store.inc_acl_drop()
-            self.store.log("WARN", "ACL DROP", src=src_ip, dst=dst_ip, proto=proto, dst_port=dst_port)
+        src_ip = hdr.src_ip
+        dst_ip = hdr.dst_ip
+        proto = hdr.proto
+        dst_port = hdr.dst_port
+
+        # a quarantined source reaching us here came through a switch without its drop flow yet
+        if self.quarantine is not None:
+            seconds = self.quarantine.remaining(src_ip)
+            if seconds:
+                self.install_quarantine(dp, src_ip, seconds)
+                return
+
+        # ACL DROP (rules that could not be offloaded at connect, e.g. wide port ranges)
+        denied = self.acl.is_denied(src_ip, dst_ip, proto, dst_port)
+        timer.mark("acl")
+        if denied:
+            fields = forwarding_match_fields(src_ip, dst_ip, proto, dst_port)
+            self.add_flow(dp, ACL_DROP_PRIORITY, fields, [], idle_timeout=20, tag="drop")
+            self.store.record(flow=1, acl_drop=1)
+            self.log_later("WARN", "ACL DROP", src=src_ip, dst=dst_ip, proto=proto, dst_port=dst_port)
             return
 
-        # DDoS flag (heuristic only - doesn't block traffic here, just flags)
-        if dst_port is not None and proto in (6, 17) and self.port_scan_detector.should_alert(dst_ip, dst_port):
-            self.store.inc_ddos_flag()
-            self.store.log("WARN", "DDoS flagged", dst=dst_ip)
+        # DDoS heuristic and source history run in the analytics worker; an alert demotes
+        # (and with quarantine, blocks) the source a few milliseconds later
+        self.analytics.put(DETECT, (time.time(), src_ip, dst_ip, proto, dst_port))
+        timer.mark("enqueue")
 
         # normal forwarding
-        out_port = self.mac_to_port[dpid].get(dst_mac, ofp.OFPP_FLOOD)
+        known_port = self.l2.port(dpid, dst_mac)
+        out_port = ofp.OFPP_FLOOD if known_port is None else known_port
         actions = [parser.OFPActionOutput(out_port)]
-        self.store.inc_allowed()
+        self.store.record(flow=1, allowed=1)
 
-        # Keep transport flows port-specific so new ports still reach the DDoS heuristic.
-        match = parser.OFPMatch(
-            **forwarding_match_fields(src_ip, dst_ip, proto, dst_port)
-        )
-        self.add_flow(dp, 50, match, actions, idle_timeout=30)
+        # Port-specific for new or suspicious sources so new ports still reach the DDoS heuristic.
+        self.punt_source(dp, src_ip)
+        fields, priority, cookie = self.granularity.rule(src_ip, dst_ip, proto, dst_port)
+        self.add_flow(dp, priority, fields, actions, idle_timeout=30, tag=out_port, cookie=cookie)
+        timer.mark("add_flow")
 
-        dp.send_msg(parser.OFPPacketOut(
-            datapath=dp,
-            buffer_id=ofp.OFP_NO_BUFFER,
-            in_port=in_port,
-            actions=actions,
-            data=msg.data
-        ))
+        self.send_packet_out(dp, in_port, actions, msg.data)
+        timer.mark("packet_out")
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Hashable, Iterable, List, Tuple
+
+MatchKey = Tuple[int, Tuple[Tuple[str, object], ...]]
+
+# OFPFlowRemoved reasons (OpenFlow 1.3)
+REMOVED_REASONS = {0: "idle_timeout", 1: "hard_timeout", 2: "delete", 3: "group_delete"}
+
+
+def match_key(priority: int, fields: Iterable[Tuple[str, object]]) -> MatchKey:
+    """Identity of a flow entry: OpenFlow allows one entry per priority and match."""
+    return priority, tuple(sorted((name, tuple(v) if isinstance(v, list) else v) for name, v in fields))
+
+
+class _Entry:
+    __slots__ = ("fields", "tag", "idle_timeout", "hard_timeout", "installed_at", "packets")
+
+    def __init__(self, fields: Dict[str, object], tag: Hashable, idle_timeout: int, hard_timeout: int,
+                 now: float) -> None:
+        self.fields = fields
+        self.tag = tag
+        self.idle_timeout = idle_timeout
+        self.hard_timeout = hard_timeout
+        self.installed_at = now
+        self.packets = 0
+
+
+class _Datapath:
+    __slots__ = ("entries", "probation", "active", "ghosts", "reserved", "requests")
+
+    def __init__(self) -> None:
+        self.entries: Dict[MatchKey, _Entry] = {}
+        # evictable keys not yet seen carrying traffic, oldest first; evicted before `active`
+        self.probation: "OrderedDict[MatchKey, None]" = OrderedDict()
+        # evictable keys whose packet count grew in a poll, least recently active first
+        self.active: "OrderedDict[MatchKey, None]" = OrderedDict()
+        # keys recently evicted from probation; one that comes back goes straight to `active`
+        self.ghosts: "OrderedDict[MatchKey, None]" = OrderedDict()
+        # entries installed outside add_flow (e.g. ACL drops) that still use table space
+        self.reserved = 0
+        # send times of flow-stats requests still waiting for their reply, oldest first
+        self.requests: Deque[float] = deque(maxlen=8)
+
+
+class ShadowFlowTable:
+    """
+    What the controller believes each switch's flow table holds. Entries are
+    recorded when a FlowMod is queued and removed on FlowRemoved messages
+    (flows are sent with OFPFF_SEND_FLOW_REM) or when a complete flow-stats
+    reply no longer lists them.
+
+    Flows below `evict_below` priority with an idle timeout are evictable.
+    When a new flow would take a datapath past `capacity`, `record` returns
+    flows for the caller to delete: first those never seen carrying traffic
+    (oldest first), then those whose packet count last grew longest ago, so
+    a burst of one-off flows cannot push out busy ones. A flow reinstalled
+    soon after being evicted counts as active straight away (as in 2Q).
+    """
+
+    def __init__(self, capacity: int = 4096, evict_below: int = 100,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.capacity = capacity
+        self.evict_below = evict_below
+        self._clock = clock
+        self._datapaths: Dict[int, _Datapath] = {}
+
+        self.installed = 0
+        self.skipped = 0
+        self.evicted = 0
+        self.lost = 0
+        self.adopted = 0
+        self.removed: Dict[str, int] = {reason: 0 for reason in REMOVED_REASONS.values()}
+
+    def _dp(self, dpid: int) -> _Datapath:
+        dp = self._datapaths.get(dpid)
+        if dp is None:
+            dp = self._datapaths[dpid] = _Datapath()
+        return dp
+
+    def forget(self, dpid: int) -> None:
+        self._datapaths.pop(dpid, None)
+
+    def set_reserved(self, dpid: int, count: int) -> None:
+        self._dp(dpid).reserved = count
+
+    def occupancy(self, dpid: int) -> int:
+        dp = self._datapaths.get(dpid)
+        return 0 if dp is None else len(dp.entries) + dp.reserved
+
+    def present(self, dpid: int, key: MatchKey, tag: Hashable = None) -> bool:
+        """True if the switch holds this flow with the same actions, so a reinstall can be skipped."""
+        dp = self._datapaths.get(dpid)
+        entry = None if dp is None else dp.entries.get(key)
+        if entry is None or entry.tag != tag:
+            return False
+        self.skipped += 1
+        return True
+
+    def record(self, dpid: int, key: MatchKey, fields: Dict[str, object], tag: Hashable = None,
+               idle_timeout: int = 0, hard_timeout: int = 0) -> List[Tuple[int, Dict[str, object]]]:
+        """
+        Note a flow being installed (or replaced); returns (priority, fields)
+        of flows to evict so the table stays within `capacity`.
+        """
+        dp = self._dp(dpid)
+        is_new = key not in dp.entries
+        dp.entries[key] = _Entry(fields, tag, idle_timeout, hard_timeout, self._clock())
+        dp.active.pop(key, None)
+        dp.probation.pop(key, None)
+        if key[0] < self.evict_below and idle_timeout > 0:
+            if key in dp.ghosts:
+                del dp.ghosts[key]
+                dp.active[key] = None
+            else:
+                dp.probation[key] = None
+        self.installed += 1
+        if not is_new:
+            return []
+
+        victims = []
+        while len(dp.entries) + dp.reserved > self.capacity:
+            # the new flow is the newest in probation, so it only goes when nothing else can
+            if len(dp.probation) > (key in dp.probation):
+                victim, _ = dp.probation.popitem(last=False)
+                dp.ghosts[victim] = None
+                if len(dp.ghosts) > self.capacity:
+                    dp.ghosts.popitem(last=False)
+            elif dp.active:
+                victim, _ = dp.active.popitem(last=False)
+            else:
+                break
+            victims.append((victim[0], dp.entries.pop(victim).fields))
+        self.evicted += len(victims)
+        return victims
+
+    def adopt(self, dpid: int, flows: Iterable[Tuple[MatchKey, Dict[str, object], Hashable, int, int, int]]) -> int:
+        """
+        Take over flows a switch already holds, e.g. after a controller
+        restart, given as (key, fields, tag, idle timeout, hard timeout,
+        packets). Flows already recorded are left alone; ones that carried
+        traffic rank as active. Returns how many were adopted.
+        """
+        dp = self._dp(dpid)
+        now = self._clock()
+        adopted = 0
+        for key, fields, tag, idle_timeout, hard_timeout, packets in flows:
+            if key in dp.entries:
+                continue
+            entry = dp.entries[key] = _Entry(fields, tag, idle_timeout, hard_timeout, now)
+            entry.packets = packets
+            if key[0] < self.evict_below and idle_timeout > 0:
+                (dp.active if packets else dp.probation)[key] = None
+            adopted += 1
+        self.adopted += adopted
+        return adopted
+
+    def flow_removed(self, dpid: int, key: MatchKey, reason: int) -> bool:
+        """Apply a FlowRemoved message; returns False for flows it had no record of."""
+        dp = self._datapaths.get(dpid)
+        if dp is None or dp.entries.pop(key, None) is None:
+            return False
+        dp.probation.pop(key, None)
+        dp.active.pop(key, None)
+        name = REMOVED_REASONS.get(reason, "delete")
+        self.removed[name] += 1
+        return True
+
+    def stats_requested(self, dpid: int) -> None:
+        """A flow-stats request for every flow was just sent to `dpid`."""
+        self._dp(dpid).requests.append(self._clock())
+
+    def reconcile(self, dpid: int, flows: Iterable[Tuple[MatchKey, int]]) -> int:
+        """
+        Apply a complete flow-stats reply, given as (key, packet count) pairs,
+        to the oldest outstanding request. Flows whose packet count grew
+        become the most recently active; recorded flows installed before the
+        request but missing from the reply are dropped. Returns how many.
+        """
+        dp = self._datapaths.get(dpid)
+        if dp is None or not dp.requests:
+            return 0
+        requested_at = dp.requests.popleft()
+        entries = dp.entries
+        probation, active = dp.probation, dp.active
+        seen = set()
+        for key, packets in flows:
+            entry = entries.get(key)
+            if entry is None:
+                continue
+            seen.add(key)
+            if packets != entry.packets:
+                entry.packets = packets
+                if key in active:
+                    active.move_to_end(key)
+                elif key in probation:
+                    del probation[key]
+                    active[key] = None
+        missing = [key for key, entry in entries.items() if key not in seen and entry.installed_at < requested_at]
+        for key in missing:
+            del entries[key]
+            probation.pop(key, None)
+            active.pop(key, None)
+        self.lost += len(missing)
+        return len(missing)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "capacity": self.capacity,
+            "occupancy": {str(dpid): len(dp.entries) + dp.reserved for dpid, dp in self._datapaths.items()},
+            "installed": self.installed,
+            "skipped": self.skipped,
+            "evicted": self.evicted,
+            "lost": self.lost,
+            "adopted": self.adopted,
+            "removed": dict(self.removed),
+        }
@@ -1,33 +1,60 @@
 from __future__ import annotations
+import hmac
+import ipaddress
+import json
+import math
 import os
+import time
 from typing import Any, Dict
 
+from eventlet import tpool
 from ryu.app.wsgi import ControllerBase, Response, route
 
-STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
+from src.web.static_assets import STATIC_DIR, StaticAssets
 
+# the API is bound to 127.0.0.1; routes that change or expose controller internals also check the peer
+LOOPBACK = ("127.0.0.1", "::1")
 
-def _read_file(path: str) -> bytes:
-    with open(path, "rb") as f:
-        return f.read()
 
-
-def _content_type(path: str) -> str:
-    if path.endswith(".html"):
-        return "text/html; charset=utf-8"
-    if path.endswith(".css"):
-        return "text/css; charset=utf-8"
-    if path.endswith(".js"):
-        return "application/javascript; charset=utf-8"
-    if path.endswith(".json"):
-        return "application/json; charset=utf-8"
-    return "application/octet-stream"
+def _epoch_seconds(value: str) -> int:
+    """Whole epoch seconds from a query parameter; ValueError unless it is a finite number."""
+    seconds = float(value)
+    if not math.isfinite(seconds):
+        raise ValueError(value)
+    return int(seconds)
 
 
 class DashboardWSGI(ControllerBase):
     def __init__(self, req, link, data: Dict[str, Any], **config):
         super().__init__(req, link, data, **config)
         self.store = data["store"]
+        self.stream = data.get("stream")
+        self.journal = data.get("journal")
+        self.metrics = data.get("metrics")
+        self.assets = data["assets"]
+        self.profiler = data.get("profiler")
+        self.debug_token = data.get("debug_token") or ""
+        self.admin_token = data.get("admin_token") or ""
+        self.quarantine = data.get("quarantine")
+        self.release_source = data.get("release_source")
+
+    def _asset(self, req, name: str):
+        asset = self.assets.get(name)
+        if asset is None:
+            return Response(status=404, body=b"Not found")
+        status, headers, body = self.assets.respond(
+            name, asset, req.headers.get("Accept-Encoding"), req.headers.get("If-None-Match"),
+        )
+        resp = Response(status=status, body=body)
+        # webob adds a default Content-Type; an asset response sets its own (or none, on a 304)
+        del resp.headers["Content-Type"]
+        resp.headers.extend(headers)
+        return resp
+
+    @staticmethod
+    def _json(obj: Any, status: int = 200):
+        body = json.dumps(obj, separators=(",", ":"))
+        return Response(status=status, content_type="application/json; charset=utf-8", body=body.encode("utf-8"))
 
     @route("root", "/", methods=["GET"])
     def root(self, req, **kwargs):
@@ -36,19 +63,222 @@ class DashboardWSGI(ControllerBase):
 
     @route("ui", "/dashboard", methods=["GET"])
     def dashboard(self, req, **kwargs):
-        html_path = os.path.join(STATIC_DIR, "index.html")
-        return Response(content_type="text/html; charset=utf-8", body=_read_file(html_path))
+        return self._asset(req, "index.html")
 
     @route("static", "/static/{fname:.*}", methods=["GET"])
     def static(self, req, fname: str, **kwargs):
         safe = os.path.normpath(fname).replace("\\", "/")
         if safe.startswith("..") or "/.." in safe:
             return Response(status=403, body=b"Forbidden")
-        path = os.path.join(STATIC_DIR, safe)
-        if not os.path.isfile(path):
-            return Response(status=404, body=b"Not found")
-        return Response(content_type=_content_type(path), body=_read_file(path))
+        return self._asset(req, safe)
 
     @route("api", "/api/dashboard", methods=["GET"])
     def api_dashboard(self, req, **kwargs):
-        return Response(content_type="application/json; charset=utf-8", body=self.store.snapshot_json())
+        since = req.GET.get("since")
+        if since is not None:
+            try:
+                version, body = self.store.delta_payload(int(since))
+            except ValueError:
+                return Response(status=400, body=b"since must be an integer version")
+        else:
+            version, body = self.store.snapshot_payload()
+
+        etag = str(version) if since is None else f"{version}-{since}"
+        if etag in req.if_none_match:
+            resp = Response(status=304)
+        else:
+            resp = Response(content_type="application/json; charset=utf-8", body=body)
+        resp.etag = etag
+        resp.cache_control = "no-cache"
+        return resp
+
+    @route("timeseries", "/api/timeseries", methods=["GET"])
+    def api_timeseries(self, req, **kwargs):
+        try:
+            resolution = int(req.GET.get("resolution", 1))
+            start = req.GET.get("from")
+            start = None if start is None else _epoch_seconds(start)
+            end = req.GET.get("to")
+            end = None if end is None else _epoch_seconds(end)
+            points = min(int(req.GET.get("points", 120)), 10_000)
+        except (ValueError, OverflowError):
+            return Response(status=400, body=b"resolution/points must be integers and from/to epoch seconds")
+        try:
+            series = self.store.timeseries(resolution, start=start, end=end, points=points)
+        except ValueError as e:
+            return Response(status=400, body=str(e).encode("utf-8"))
+        body = json.dumps(series, separators=(",", ":"))
+        return Response(content_type="application/json; charset=utf-8", body=body.encode("utf-8"))
+
+    @route("stream", "/api/stream", methods=["GET"])
+    def api_stream(self, req, **kwargs):
+        if self.stream is None:
+            return Response(status=404, body=b"Not found")
+        sub = self.stream.subscribe()
+        if sub is None:
+            return Response(status=503, body=b"Too many stream clients")
+        resp = Response(content_type="text/event-stream", app_iter=self.stream.iterate(sub))
+        resp.cache_control = "no-cache"
+        # ask reverse proxies not to buffer the stream
+        resp.headers["X-Accel-Buffering"] = "no"
+        return resp
+
+    @route("events", "/api/events", methods=["GET"])
+    def api_events(self, req, **kwargs):
+        if self.journal is None:
+            return Response(status=404, body=b"Event journal is disabled")
+        now = time.time()
+        try:
+            start = float(req.GET.get("from", now - 3600))
+            end = float(req.GET.get("to", now))
+            limit = min(int(req.GET.get("limit", 1000)), 10_000)
+        except ValueError:
+            return Response(status=400, body=b"from/to must be epoch seconds and limit an integer")
+        # the segment scans run in a native thread so the hub keeps serving Packet-Ins
+        events = tpool.execute(self.journal.query, start, end, level=req.GET.get("level"), msg=req.GET.get("msg"),
+                               limit=limit)
+        body = json.dumps(
+            {"from": start, "to": end, "count": len(events), "truncated": len(events) >= limit, "events": events},
+            ensure_ascii=False, separators=(",", ":"),
+        )
+        return Response(content_type="application/json; charset=utf-8", body=body.encode("utf-8"))
+
+    @route("quarantine", "/api/quarantine", methods=["GET"])
+    def api_quarantine(self, req, **kwargs):
+        if self.quarantine is None:
+            return Response(status=404, body=b"Quarantine is disabled")
+        return self._json({
+            "sources": self.quarantine.entries(),
+            "allow": [str(net) for net in self.quarantine.allow],
+            "stats": self.quarantine.stats(),
+        })
+
+    @route("quarantine_release", "/api/quarantine/release", methods=["POST"])
+    def api_quarantine_release(self, req, **kwargs):
+        if self.quarantine is None:
+            return Response(status=404, body=b"Quarantine is disabled")
+        # a bearer token, unlike loopback alone, cannot be supplied by a cross-site form post
+        if not self.admin_token:
+            return Response(status=403, body=b"Release needs SDN_ADMIN_TOKEN")
+        refusal = self._token_refusal(req, b"Release is", self.admin_token)
+        if refusal is not None:
+            return refusal
+        src = req.params.get("src", "")
+        try:
+            ipaddress.IPv4Address(src)
+        except ValueError:
+            return Response(status=400, body=b"src must be an IPv4 address")
+        if not self.release_source(src, forget=req.params.get("forget") in ("1", "true")):
+            return Response(status=404, body=b"Source is not quarantined")
+        return self._json({"released": src})
+
+    @route("metrics", "/metrics", methods=["GET"])
+    def metrics(self, req, **kwargs):
+        if self.metrics is None or not self.metrics.enabled:
+            return Response(status=404, body=b"Metrics are disabled")
+        return Response(content_type="text/plain; version=0.0.4; charset=utf-8", body=self.metrics.render())
+
+    def _debug_refusal(self, req):
+        """None when `req` may use the /debug endpoints, otherwise the response refusing it."""
+        if self.profiler is None or not self.debug_token:
+            return Response(status=404, body=b"Debug endpoints are disabled")
+        return self._token_refusal(req, b"Debug endpoints are", self.debug_token)
+
+    def _token_refusal(self, req, what: bytes, expected: str):
+        """None for a loopback client presenting `expected` as a bearer token, otherwise the refusal."""
+        if req.remote_addr not in LOOPBACK:
+            return Response(status=403, body=what + b" local only")
+        scheme, _, token = req.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), expected.encode()):
+            resp = Response(status=401, body=b"Bearer token required")
+            resp.headers["WWW-Authenticate"] = "Bearer"
+            return resp
+        return None
+
+    @route("debug_profile", "/debug/profile", methods=["GET"])
+    def debug_profile(self, req, **kwargs):
+        refusal = self._debug_refusal(req)
+        if refusal is not None:
+            return refusal
+        try:
+            top = min(int(req.GET.get("top", 30)), 1000)
+        except ValueError:
+            return Response(status=400, body=b"top must be an integer")
+        return self._json(dict(self.profiler.status(), result=self.profiler.summary(top)))
+
+    @route("debug_profile_start", "/debug/profile/start", methods=["POST"])
+    def debug_profile_start(self, req, **kwargs):
+        refusal = self._debug_refusal(req)
+        if refusal is not None:
+            return refusal
+        try:
+            status = self.profiler.start(
+                req.params.get("mode", "cpu"),
+                seconds=float(req.params.get("seconds", 30)),
+                interval_ms=float(req.params.get("interval_ms", 5)),
+            )
+        except ValueError as e:
+            return Response(status=400, body=str(e).encode("utf-8"))
+        except RuntimeError as e:
+            return Response(status=409, body=str(e).encode("utf-8"))
+        return self._json(status)
+
+    @route("debug_profile_stop", "/debug/profile/stop", methods=["POST"])
+    def debug_profile_stop(self, req, **kwargs):
+        refusal = self._debug_refusal(req)
+        if refusal is not None:
+            return refusal
+        summary = self.profiler.stop()
+        if summary is None:
+            return Response(status=409, body=b"No profile is running")
+        return self._json(summary)
+
+    @route("debug_profile_download", "/debug/profile/download", methods=["GET"])
+    def debug_profile_download(self, req, **kwargs):
+        refusal = self._debug_refusal(req)
+        if refusal is not None:
+            return refusal
+        download = self.profiler.download()
+        if download is None:
+            return Response(status=404, body=b"No finished profile")
+        name, content_type, body = download
+        resp = Response(content_type=content_type, body=body)
+        resp.headers["Content-Disposition"] = f'attachment; filename="{name}"'
+        return resp
+
+    @route("debug_memory", "/debug/memory", methods=["GET"])
+    def debug_memory(self, req, **kwargs):
+        refusal = self._debug_refusal(req)
+        if refusal is not None:
+            return refusal
+        try:
+            top = min(int(req.GET.get("top", 20)), 1000)
+            snapshot = self.profiler.memory_snapshot(top, group=req.GET.get("group", "lineno"))
+        except ValueError as e:
+            return Response(status=400, body=str(e).encode("utf-8"))
+        except RuntimeError as e:
+            return Response(status=409, body=str(e).encode("utf-8"))
+        return self._json(snapshot)
+
+    @route("debug_memory_start", "/debug/memory/start", methods=["POST"])
+    def debug_memory_start(self, req, **kwargs):
+        refusal = self._debug_refusal(req)
+        if refusal is not None:
+            return refusal
+        try:
+            status = self.profiler.memory_start(
+                int(req.params.get("frames", 1)), seconds=float(req.params.get("seconds", 300)),
+            )
+        except ValueError as e:
+            return Response(status=400, body=str(e).encode("utf-8"))
+        except RuntimeError as e:
+            return Response(status=409, body=str(e).encode("utf-8"))
+        return self._json(status)
+
+    @route("debug_memory_stop", "/debug/memory/stop", methods=["POST"])
+    def debug_memory_stop(self, req, **kwargs):
+        refusal = self._debug_refusal(req)
+        if refusal is not None:
+            return refusal
+        self.profiler.memory_stop()
+        return self._json(self.profiler.status())
@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+# record: payload length, timestamp in microseconds, then compact JSON {"level", "msg", "extra"}
+_RECORD = struct.Struct("!IQ")
+# sparse index entry: timestamp in microseconds, byte offset of the record
+_INDEX = struct.Struct("!QQ")
+
+_SEGMENT_SUFFIX = ".seg"
+_INDEX_SUFFIX = ".idx"
+_STOP = object()
+
+
+def _iso(ts_us: int) -> str:
+    return datetime.fromtimestamp(ts_us / 1_000_000, timezone.utc).isoformat(timespec="milliseconds")
+
+
+class _Segment:
+    __slots__ = ("path", "first_ts", "last_ts", "size", "index_ts", "index_off")
+
+    def __init__(self, path: str, first_ts: int) -> None:
+        self.path = path
+        self.first_ts = first_ts
+        self.last_ts = first_ts
+        self.size = 0
+        self.index_ts = array("q")
+        self.index_off = array("q")
+
+    @property
+    def index_path(self) -> str:
+        return self.path[: -len(_SEGMENT_SUFFIX)] + _INDEX_SUFFIX
+
+    def start_offset(self, ts_us: int) -> int:
+        """Offset of an indexed record at or before the first record with ts >= `ts_us`."""
+        i = bisect_left(self.index_ts, ts_us) - 1
+        return self.index_off[i] if i >= 0 else 0
+
+
+class EventJournal:
+    """
+    Append-only on-disk event log. Records go into segment files that
+    rotate by size and age; every `index_bytes` a (timestamp, offset) pair is
+    added to the segment's sparse index. `append` only enqueues, so callers
+    on the packet path never wait on disk; a background thread writes in
+    batches. Queries memory-map the segments overlapping the time range and
+    start scanning at the nearest indexed record. Under eventlet, pass the
+    unpatched threading and queue modules as `threads` and `queues` so the
+    writer is a native thread and its disk writes never block the hub.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = 64 * 1024 * 1024,
+        segment_s: float = 3600.0,
+        retention_s: float = 7 * 24 * 3600.0,
+        max_bytes: int = 1024 * 1024 * 1024,
+        index_bytes: int = 64 * 1024,
+        max_pending: int = 100_000,
+        threads: Any = threading,
+        queues: Any = queue,
+    ) -> None:
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.segment_us = int(segment_s * 1_000_000)
+        self.retention_us = int(retention_s * 1_000_000)
+        self.max_bytes = max_bytes
+        self.index_bytes = index_bytes
+
+        self._threads = threads
+        self._queues = queues
+        self._queue: "queue.Queue[Any]" = queues.Queue(maxsize=max_pending)
+        self._lock = threads.Lock()
+        self._segments: List[_Segment] = []
+        self._file = None
+        self._index_file = None
+        self._last_indexed = -1
+        self._last_ts = 0
+        self._thread: Optional[threading.Thread] = None
+
+        self.written = 0
+        self.dropped = 0
+        self.segments_deleted = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    # ---- writing ----
+
+    def start(self) -> "EventJournal":
+        if self._thread is None:
+            self._thread = self._threads.Thread(target=self._run, name="event-journal", daemon=True)
+            self._thread.start()
+        return self
+
+    def append(self, ts: float, level: str, msg: str, extra: Dict[str, Any]) -> bool:
+        """Queue one event (`ts` in epoch seconds); False if the writer is behind and it was dropped."""
+        try:
+            self._queue.put_nowait((int(ts * 1_000_000), level, msg, extra))
+            return True
+        except self._queues.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self) -> None:
+        """Wait until everything queued so far is on disk."""
+        self._queue.join()
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            self._close_active()
+
+    def _run(self) -> None:
+        q = self._queue
+        while True:
+            batch = [q.get()]
+            while len(batch) < 1024:
+                try:
+                    batch.append(q.get_nowait())
+                except self._queues.Empty:
+                    break
+            stop = False
+            with self._lock:
+                for item in batch:
+                    if item is _STOP:
+                        stop = True
+                    else:
+                        self._write(*item)
+                if self._file is not None:
+                    self._file.flush()
+                    self._index_file.flush()
+                self._enforce_retention(self._last_ts)
+            for _ in batch:
+                q.task_done()
+            if stop:
+                return
+
+    def _write(self, ts_us: int, level: str, msg: str, extra: Dict[str, Any]) -> None:
+        # keep timestamps non-decreasing so the index can be bisected
+        ts_us = max(ts_us, self._last_ts)
+        self._last_ts = ts_us
+        seg = self._segments[-1] if self._file is not None else None
+        if seg is None or seg.size >= self.segment_bytes or ts_us - seg.first_ts >= self.segment_us:
+            seg = self._rotate(ts_us)
+
+        payload = json.dumps(
+            {"level": level, "msg": msg, "extra": extra}, ensure_ascii=False, separators=(",", ":"), default=str
+        ).encode("utf-8")
+        offset = seg.size
+        if self._last_indexed < 0 or offset - self._last_indexed >= self.index_bytes:
+            seg.index_ts.append(ts_us)
+            seg.index_off.append(offset)
+            self._index_file.write(_INDEX.pack(ts_us, offset))
+            self._last_indexed = offset
+        self._file.write(_RECORD.pack(len(payload), ts_us))
+        self._file.write(payload)
+        seg.size += _RECORD.size + len(payload)
+        seg.last_ts = ts_us
+        self.written += 1
+
+    def _rotate(self, ts_us: int) -> _Segment:
+        self._close_active()
+        seg = _Segment(os.path.join(self.directory, f"{ts_us:020d}{_SEGMENT_SUFFIX}"), ts_us)
+        if self._segments and self._segments[-1].first_ts == ts_us:
+            # a segment starting at this microsecond already exists
+            seg = _Segment(os.path.join(self.directory, f"{ts_us + 1:020d}{_SEGMENT_SUFFIX}"), ts_us + 1)
+        self._file = open(seg.path, "ab")
+        self._index_file = open(seg.index_path, "ab")
+        self._last_indexed = -1
+        self._segments.append(seg)
+        return seg
+
+    def _close_active(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._index_file.close()
+            self._file = self._index_file = None
+
+    def _enforce_retention(self, now_us: int) -> None:
+        total = sum(s.size for s in self._segments)
+        # never delete the segment being written to
+        while len(self._segments) > 1:
+            oldest = self._segments[0]
+            if total <= self.max_bytes and oldest.last_ts >= now_us - self.retention_us:
+                break
+            for path in (oldest.path, oldest.index_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= oldest.size
+            self._segments.pop(0)
+            self.segments_deleted += 1
+
+    def enforce_retention(self, now: Optional[float] = None) -> None:
+        now_us = int((time.time() if now is None else now) * 1_000_000)
+        with self._lock:
+            self._enforce_retention(now_us)
+
+    # ---- loading existing segments ----
+
+    def _load(self) -> None:
+        names = sorted(n for n in os.listdir(self.directory) if n.endswith(_SEGMENT_SUFFIX))
+        for name in names:
+            try:
+                first_ts = int(name[: -len(_SEGMENT_SUFFIX)])
+            except ValueError:
+                continue
+            seg = _Segment(os.path.join(self.directory, name), first_ts)
+            seg.size = os.path.getsize(seg.path)
+            if seg.size == 0:
+                continue
+            try:
+                with open(seg.index_path, "rb") as f:
+                    raw = f.read()
+                for ts_us, offset in _INDEX.iter_unpack(raw[: len(raw) - len(raw) % _INDEX.size]):
+                    seg.index_ts.append(ts_us)
+                    seg.index_off.append(offset)
+            except FileNotFoundError:
+                pass
+            # last timestamp: scan from the last indexed record; a torn tail record is cut off
+            end = seg.index_off[-1] if len(seg.index_off) else 0
+            with open(seg.path, "rb") as f:
+                f.seek(end)
+                data = f.read()
+            pos = 0
+            while pos + _RECORD.size <= len(data):
+                length, ts_us = _RECORD.unpack_from(data, pos)
+                if pos + _RECORD.size + length > len(data):
+                    break
+                seg.last_ts = ts_us
+                pos += _RECORD.size + length
+            if end + pos < seg.size:
+                with open(seg.path, "r+b") as f:
+                    f.truncate(end + pos)
+                seg.size = end + pos
+            self._segments.append(seg)
+        if self._segments:
+            self._last_ts = self._segments[-1].last_ts
+
+    # ---- queries ----
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            segments = list(self._segments)
+        return {
+            "segments": len(segments),
+            "bytes": sum(s.size for s in segments),
+            "written": self.written,
+            "dropped": self.dropped,
+            "pending": self._queue.qsize(),
+            "segments_deleted": self.segments_deleted,
+        }
+
+    def query(
+        self,
+        start: float,
+        end: float,
+        level: Optional[str] = None,
+        msg: Optional[str] = None,
+        limit: int = 1000,
+    ) -> List[Dict[str, Any]]:
+        """
+        Events with `start <= ts <= end` (epoch seconds), oldest first,
+        optionally filtered by exact level and by a substring of msg.
+        """
+        start_us = int(start * 1_000_000)
+        end_us = int(end * 1_000_000)
+        with self._lock:
+            segments = [
+                (s, s.size) for s in self._segments
+                if s.first_ts <= end_us and s.last_ts >= start_us and s.size
+            ]
+        level_b = level.upper() if level else None
+        msg_b = json.dumps(msg, ensure_ascii=False)[1:-1].encode("utf-8") if msg else None
+
+        out: List[Dict[str, Any]] = []
+        for seg, size in segments:
+            try:
+                f = open(seg.path, "rb")
+            except FileNotFoundError:
+                continue  # removed by retention after we listed it
+            with f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                limit_pos = min(size, len(mm))
+                pos = seg.start_offset(start_us)
+                while pos + _RECORD.size <= limit_pos:
+                    length, ts_us = _RECORD.unpack_from(mm, pos)
+                    body_at = pos + _RECORD.size
+                    pos = body_at + length
+                    if pos > limit_pos or ts_us > end_us:
+                        break
+                    if ts_us < start_us:
+                        continue
+                    raw = mm[body_at:pos]
+                    if msg_b is not None and msg_b not in raw:
+                        continue
+                    record = json.loads(raw)
+                    if level_b is not None and record["level"] != level_b:
+                        continue
+                    if msg is not None and msg not in record["msg"]:
+                        continue
+                    record["ts"] = _iso(ts_us)
+                    out.append(record)
+                    if len(out) >= limit:
+                        return out
+        return out
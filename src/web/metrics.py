@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# seconds; handler stages are expected to take microseconds to a few milliseconds
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025,
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1,
+)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        # one slot per bucket plus +Inf; not cumulative until rendered
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+class _Family:
+    __slots__ = ("name", "kind", "help", "label", "children", "fn", "sample_every", "skip")
+
+    def __init__(self, name: str, kind: str, help: str, label: Optional[str] = None,
+                 fn: Optional[Callable[[], Any]] = None) -> None:
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.label = label
+        # label value -> Histogram or number ("" when the family has no label)
+        self.children: Dict[Any, Any] = {}
+        self.fn = fn
+        self.sample_every = 1
+        self.skip = 0
+
+
+class StageTimer:
+    """Times consecutive stages of one handler call into a histogram labelled by stage."""
+
+    __slots__ = ("_family", "_buckets", "_clock", "_start", "_last")
+
+    def __init__(self, family: _Family, buckets: Tuple[float, ...], clock: Callable[[], float]) -> None:
+        self._family = family
+        self._buckets = buckets
+        self._clock = clock
+        self._start = self._last = clock()
+
+    def _histogram(self, stage: str) -> Histogram:
+        hist = self._family.children.get(stage)
+        if hist is None:
+            hist = self._family.children[stage] = Histogram(self._buckets)
+        return hist
+
+    def mark(self, stage: str) -> None:
+        """Record the time since the previous mark (or the start) under `stage`."""
+        now = self._clock()
+        value = now - self._last
+        self._last = now
+        # Histogram.observe inlined; this runs several times per packet
+        hist = self._family.children.get(stage) or self._histogram(stage)
+        hist.counts[bisect_left(self._buckets, value)] += 1
+        hist.sum += value
+
+    def finish(self) -> None:
+        self._histogram("total").observe(self._clock() - self._start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def mark(self, stage: str) -> None:
+        pass
+
+    def finish(self) -> None:
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """
+    Fixed-bucket histograms, labelled counters and callback gauges, rendered
+    in the Prometheus text format. Updates take no lock: handlers run on
+    eventlet green threads, and a lost increment under real threads only
+    makes a counter slightly low. With `enabled=False` timers and counters
+    are no-ops, so the handlers pay one attribute check per call.
+
+    Timing a stage costs about as much as a cheap stage itself, so a hot
+    histogram can time only one call in `sample_every`; it then describes
+    the latency distribution, and the counters give exact rates.
+    """
+
+    def __init__(self, enabled: bool = True, buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+                 clock: Callable[[], float] = time.perf_counter) -> None:
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._clock = clock
+        self._families: Dict[str, _Family] = {}
+
+    def _family(self, name: str, kind: str, help: str, label: Optional[str]) -> _Family:
+        family = self._families.get(name)
+        if family is None:
+            family = self._families[name] = _Family(name, kind, help, label)
+        return family
+
+    def histogram(self, name: str, help: str, label: str = "stage", sample_every: int = 1) -> None:
+        self._family(name, "histogram", help, label).sample_every = max(1, sample_every)
+
+    def counter(self, name: str, help: str, label: Optional[str] = None,
+                fn: Optional[Callable[[], Any]] = None) -> None:
+        """With `fn`, the counter is read from it at render time like a gauge instead of `inc`."""
+        self._family(name, "counter", help, label).fn = fn
+
+    def gauge(self, name: str, help: str, fn: Callable[[], Any], label: Optional[str] = None) -> None:
+        """`fn` returns a number, or a {label value: number} dict when `label` is set."""
+        self._family(name, "gauge", help, label).fn = fn
+
+    def timer(self, name: str):
+        if not self.enabled:
+            return NULL_TIMER
+        family = self._families[name]
+        if family.skip:
+            family.skip -= 1
+            return NULL_TIMER
+        family.skip = family.sample_every - 1
+        return StageTimer(family, self.buckets, self._clock)
+
+    def inc(self, name: str, label_value: Any = "", amount: int = 1) -> None:
+        if not self.enabled:
+            return
+        children = self._families[name].children
+        children[label_value] = children.get(label_value, 0) + amount
+
+    def histogram_totals(self, name: str) -> Dict[Any, Tuple[int, float]]:
+        """(count, sum) per label value of a histogram."""
+        return {value: (hist.count, hist.sum) for value, hist in self._families[name].children.items()}
+
+    def render(self) -> bytes:
+        lines: List[str] = []
+        for family in list(self._families.values()):
+            name = family.name
+            lines.append(f"# HELP {name} {family.help}")
+            lines.append(f"# TYPE {name} {family.kind}")
+            if family.fn is not None:
+                values = family.fn()
+                items = values.items() if family.label else [("", values)]
+            else:
+                items = list(family.children.items())
+            for value, child in items:
+                labels = f'{family.label}="{value}"' if family.label else ""
+                if family.kind != "histogram":
+                    lines.append(f"{name}{{{labels}}} {child}" if labels else f"{name} {child}")
+                    continue
+                cumulative = 0
+                for le, n in zip(self.buckets, child.counts):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{{labels},le="{le:g}"}} {cumulative}')
+                cumulative += child.counts[-1]
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+                lines.append(f"{name}_sum{{{labels}}} {child.sum:.9f}")
+                lines.append(f"{name}_count{{{labels}}} {cumulative}")
+        lines.append("")
+        return "\n".join(lines).encode("utf-8")
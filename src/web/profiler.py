@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import cProfile
+import marshal
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Callable, Dict, Optional
+
+MODES = ("cpu", "sample")
+MAX_SECONDS = 300.0
+_REPO_ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../.."))
+
+
+def short_path(filename: str) -> str:
+    """`filename` relative to the repository or to site-packages, for readable reports."""
+    if filename.startswith(_REPO_ROOT + os.sep):
+        return filename[len(_REPO_ROOT) + 1:]
+    _, sep, rest = filename.rpartition("site-packages" + os.sep)
+    return rest if sep else filename
+
+
+def frame_label(code) -> str:
+    return f"{code.co_name} ({short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _Sampler:
+    """Records the stack of every other thread each `interval_s` until stopped or past `deadline`."""
+
+    def __init__(self, interval_s: float, deadline: float, threads: Any) -> None:
+        self.interval_s = interval_s
+        self.deadline = deadline
+        # collapsed stack ("outer;...;inner") -> samples
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threads.Event()
+        self._thread = threads.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        labels: Dict[Any, str] = {}
+        while time.monotonic() < self.deadline:
+            me = sys._getframe()
+            for frame in sys._current_frames().values():
+                if frame is me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = frame_label(code)
+                    stack.append(label)
+                    frame = frame.f_back
+                stack.reverse()
+                self.stacks[";".join(stack)] += 1
+            self.samples += 1
+            if self._stop.wait(self.interval_s):
+                break
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+class Profiler:
+    """
+    On-demand profiling of the running controller. Nothing is hooked until
+    a session starts, so an idle profiler costs nothing.
+
+    `cpu` runs cProfile on the calling OS thread, which with eventlet is
+    every green thread. Its tottime is exact, but cumtime of a function that
+    yields to the hub includes whatever other green threads ran meanwhile.
+    `sample` reads every thread's stack from a native thread every few
+    milliseconds; only the green thread running at that moment is visible,
+    which is the one spending the CPU. Samples in the hub's poll call are
+    idle time.
+
+    A session is time-bounded: `expire` (called from the tick loop) ends it
+    at its deadline. The last result is kept for `summary` and `download`.
+    Memory tracing with tracemalloc is separate and can overlap a session.
+    """
+
+    def __init__(
+        self,
+        handler_file: Optional[str] = None,
+        threads: Any = threading,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        # functions named *_handler in this file are reported as event handlers
+        self.handler_file = None if handler_file is None else os.path.abspath(handler_file)
+        # module providing Thread and Event; under eventlet, the unpatched one so the sampler is a native thread
+        self._threads = threads
+        self._clock = clock
+        self.mode: Optional[str] = None
+        self._started = 0.0
+        self._deadline = 0.0
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[_Sampler] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self._memory_deadline = 0.0
+        self._memory_previous: Optional[tracemalloc.Snapshot] = None
+
+    def start(self, mode: str = "cpu", seconds: float = 30.0, interval_ms: float = 5.0) -> Dict[str, Any]:
+        """Start a session. Raises ValueError for bad arguments and RuntimeError if one is running."""
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        if not 0 < seconds <= MAX_SECONDS:
+            raise ValueError(f"seconds must be in (0, {MAX_SECONDS:g}]")
+        if not 1 <= interval_ms <= 1000:
+            raise ValueError("interval_ms must be between 1 and 1000")
+        if self.mode is not None:
+            raise RuntimeError(f"a {self.mode} profile is already running")
+        self._started = self._clock()
+        self._deadline = self._started + seconds
+        if mode == "cpu":
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        else:
+            # the sampler's deadline is on its own clock, so it stops even if nobody calls expire
+            self._sampler = _Sampler(interval_ms / 1000, time.monotonic() + seconds, self._threads)
+        self.mode = mode
+        return self.status()
+
+    def stop(self) -> Optional[Dict[str, Any]]:
+        """End the running session and keep its result; None if there was none."""
+        if self.mode is None:
+            return None
+        duration = self._clock() - self._started
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.create_stats()
+            self.result = {"mode": "cpu", "seconds": duration, "stats": self._cprofile.stats}
+            self._cprofile = None
+        else:
+            self._sampler.stop()
+            self.result = {
+                "mode": "sample", "seconds": duration, "stacks": self._sampler.stacks,
+                "samples": self._sampler.samples,
+            }
+            self._sampler = None
+        self.mode = None
+        return self.summary()
+
+    def expire(self) -> None:
+        """End whatever is past its deadline."""
+        now = self._clock()
+        if self.mode is not None and now >= self._deadline:
+            self.stop()
+        if self._memory_deadline and now >= self._memory_deadline:
+            self.memory_stop()
+
+    def status(self) -> Dict[str, Any]:
+        status: Dict[str, Any] = {"running": self.mode, "memory_tracing": tracemalloc.is_tracing()}
+        if self.mode is not None:
+            status["elapsed_s"] = round(self._clock() - self._started, 1)
+            status["remaining_s"] = round(max(0.0, self._deadline - self._clock()), 1)
+        if self.result is not None:
+            status["last"] = {"mode": self.result["mode"], "seconds": round(self.result["seconds"], 1)}
+        return status
+
+    def summary(self, top: int = 30) -> Optional[Dict[str, Any]]:
+        """The last result's busiest functions and handler counts, or None before the first session."""
+        result = self.result
+        if result is None:
+            return None
+        summary: Dict[str, Any] = {"mode": result["mode"], "seconds": round(result["seconds"], 1)}
+        if result["mode"] == "cpu":
+            rows = sorted(result["stats"].items(), key=lambda item: item[1][2], reverse=True)
+            summary["functions"] = [
+                {
+                    "function": f"{name} ({short_path(filename)}:{line})",
+                    "calls": calls,
+                    "tottime_ms": round(tottime * 1000, 3),
+                    "cumtime_ms": round(cumtime * 1000, 3),
+                }
+                for (filename, line, name), (_, calls, tottime, cumtime, _) in rows[:top]
+            ]
+            summary["handlers"] = {
+                name: {"calls": calls, "cumtime_ms": round(cumtime * 1000, 3)}
+                for (filename, _, name), (_, calls, _, cumtime, _) in result["stats"].items()
+                if self._is_handler(filename, name)
+            }
+        else:
+            samples = max(1, result["samples"])
+            own: Counter = Counter()
+            for stack, n in result["stacks"].items():
+                own[stack.rpartition(";")[2]] += n
+            summary["samples"] = result["samples"]
+            summary["functions"] = [
+                {"function": label, "samples": n, "percent": round(100 * n / samples, 1)}
+                for label, n in own.most_common(top)
+            ]
+            summary["handlers"] = self._handler_samples(result["stacks"])
+        return summary
+
+    def _is_handler(self, filename: str, name: str) -> bool:
+        return name.endswith("_handler") and os.path.abspath(filename) == self.handler_file
+
+    def _handler_samples(self, stacks: Counter) -> Dict[str, Dict[str, int]]:
+        if self.handler_file is None:
+            return {}
+        prefix = f"({short_path(self.handler_file)}:"
+        counts: Counter = Counter()
+        for stack, n in stacks.items():
+            for label in set(stack.split(";")):
+                name, _, where = label.partition(" ")
+                if name.endswith("_handler") and where.startswith(prefix):
+                    counts[name] += n
+        return {name: {"samples": n} for name, n in counts.items()}
+
+    def download(self) -> Optional[tuple]:
+        """(filename, content type, bytes) of the last result: a pstats file or collapsed stacks."""
+        result = self.result
+        if result is None:
+            return None
+        if result["mode"] == "cpu":
+            # what pstats.Stats.dump_stats writes; load with pstats.Stats(path)
+            return "controller.pstats", "application/octet-stream", marshal.dumps(result["stats"])
+        lines = [f"{stack} {n}" for stack, n in sorted(result["stacks"].items())]
+        # flamegraph.pl / speedscope "collapsed" format
+        return "controller.collapsed", "text/plain; charset=utf-8", ("\n".join(lines) + "\n").encode("utf-8")
+
+    def memory_start(self, frames: int = 1, seconds: float = MAX_SECONDS) -> Dict[str, Any]:
+        """Start tracemalloc for up to `seconds`. Only allocations made after this are seen."""
+        if not 1 <= frames <= 64:
+            raise ValueError("frames must be between 1 and 64")
+        if not 0 < seconds <= 3600:
+            raise ValueError("seconds must be in (0, 3600]")
+        if tracemalloc.is_tracing():
+            raise RuntimeError("memory tracing is already running")
+        tracemalloc.start(frames)
+        self._memory_deadline = self._clock() + seconds
+        self._memory_previous = None
+        return self.status()
+
+    def memory_stop(self) -> None:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._memory_deadline = 0.0
+        self._memory_previous = None
+
+    def memory_snapshot(self, top: int = 20, group: str = "lineno") -> Dict[str, Any]:
+        """
+        The top allocators still holding memory, grouped by "lineno",
+        "filename" or "traceback", with growth since the previous snapshot.
+        Raises RuntimeError when tracing is off.
+        """
+        if group not in ("lineno", "filename", "traceback"):
+            raise ValueError("group must be lineno, filename or traceback")
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("memory tracing is not running")
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+        growth = {}
+        if self._memory_previous is not None:
+            growth = {
+                diff.traceback: diff.size_diff
+                for diff in snapshot.compare_to(self._memory_previous, group)
+            }
+        self._memory_previous = snapshot
+        stats = snapshot.statistics(group)
+        traced, peak = tracemalloc.get_traced_memory()
+        return {
+            "traced_kib": round(traced / 1024, 1),
+            "peak_kib": round(peak / 1024, 1),
+            "overhead_kib": round(tracemalloc.get_tracemalloc_memory() / 1024, 1),
+            "top": [
+                {
+                    "where": [f"{short_path(f.filename)}:{f.lineno}" for f in stat.traceback],
+                    "size_kib": round(stat.size / 1024, 1),
+                    "count": stat.count,
+                    "growth_kib": round(growth.get(stat.traceback, 0) / 1024, 1),
+                }
+                for stat in stats[:top]
+            ],
+        }
@@ -2,6 +2,7 @@
   const $ = (sel) => document.querySelector(sel);
 
   const API_URL = "/api/dashboard";
+  const STREAM_URL = "/api/stream";
 
   const elUpdatedAt = $("#updatedAt");
   const elStatusText = $("#statusText");
@@ -16,6 +17,11 @@
   const eventsBody = $("#eventsBody");
 
   const MAX_POINTS = 120;
+  const MAX_EVENTS = 60;
+
+  // last store version applied; polls after the first ask only for newer data
+  let version = null;
+  let events = [];
 
   const series = {
     labels: [],
@@ -31,6 +37,7 @@
 
   async function fetchJsonSafe(url) {
     const r = await fetch(url, { cache: "no-store" });
+    if (r.status === 304) return null;
     const text = await r.text();
 
     if (!r.ok) {
@@ -246,31 +253,77 @@
     if (elKpiAllowed) elKpiAllowed.textContent = c.allowed_total ?? 0;
 
     const ts = data.timeseries || {};
-    series.labels = (ts.labels || []).slice(-MAX_POINTS);
-    series.flows = (ts.flows_per_sec || []).slice(-MAX_POINTS);
-    series.acl = (ts.acl_drops_per_sec || []).slice(-MAX_POINTS);
-    series.ddos = (ts.ddos_flags_per_sec || []).slice(-MAX_POINTS);
-    series.allowed = (ts.allowed_per_sec || []).slice(-MAX_POINTS);
+    const incoming = {
+      labels: ts.labels || [],
+      flows: ts.flows_per_sec || [],
+      acl: ts.acl_drops_per_sec || [],
+      ddos: ts.ddos_flags_per_sec || [],
+      allowed: ts.allowed_per_sec || [],
+    };
+    const newEvents = Array.isArray(data.last_events) ? data.last_events : [];
+
+    if (data.delta) {
+      for (const k of Object.keys(series)) series[k] = series[k].concat(incoming[k]);
+      events = newEvents.concat(events).slice(0, MAX_EVENTS);
+    } else {
+      for (const k of Object.keys(series)) series[k] = incoming[k].slice(-MAX_POINTS);
+      events = newEvents;
+    }
     clampToMax();
+    if (data.version != null) version = data.version;
 
     drawChart();
-    renderEvents(data.last_events);
+    renderEvents(events);
   }
 
   async function tick() {
     try {
-      const data = await fetchJsonSafe(API_URL);
-      applyData(data);
+      const url = version == null ? API_URL : `${API_URL}?since=${version}`;
+      const data = await fetchJsonSafe(url);
+      if (data) applyData(data);
     } catch (e) {
       console.error(e);
       setStatus("Status: API error (pogledaj Console)");
     }
   }
 
+  let pollTimer = null;
+
+  function startPolling() {
+    if (pollTimer != null) return;
+    tick();
+    pollTimer = setInterval(tick, 1000);
+  }
+
+  // server push; falls back to polling when EventSource is missing or keeps failing
+  function startStream() {
+    if (typeof EventSource === "undefined") return false;
+    const es = new EventSource(STREAM_URL);
+    let failures = 0;
+    const onFrame = (ev) => {
+      failures = 0;
+      try {
+        applyData(JSON.parse(ev.data));
+      } catch (e) {
+        console.error(e);
+      }
+    };
+    es.addEventListener("snapshot", onFrame);
+    es.addEventListener("delta", onFrame);
+    es.onerror = () => {
+      failures += 1;
+      setStatus("Status: stream prekinut, ponovno spajanje…");
+      if (failures >= 3 || es.readyState === EventSource.CLOSED) {
+        es.close();
+        startPolling();
+      }
+    };
+    return true;
+  }
+
   // init
   bindTooltip();
-  tick();
-  setInterval(tick, 1000);
+  if (!startStream()) startPolling();
 
   // redraw on resize
   window.addEventListener("resize", () => drawChart());
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import os
+import stat
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
+
+CONTENT_TYPES = {
+    ".html": "text/html; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+    ".js": "application/javascript; charset=utf-8",
+    ".json": "application/json; charset=utf-8",
+    ".svg": "image/svg+xml",
+    ".png": "image/png",
+    ".ico": "image/x-icon",
+}
+# already compressed, or too small for gzip to pay off
+_NO_GZIP = {".png", ".ico"}
+
+Headers = List[Tuple[str, str]]
+
+
+def content_type(path: str) -> str:
+    return CONTENT_TYPES.get(os.path.splitext(path)[1], "application/octet-stream")
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """True if an Accept-Encoding header allows gzip (q > 0, or a `*` that does)."""
+    if not accept_encoding:
+        return False
+    wildcard = False
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding in ("gzip", "x-gzip"):
+            return q > 0
+        if coding == "*":
+            wildcard = q > 0
+    return wildcard
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against a quoted ETag."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or (tag[2:] if tag.startswith("W/") else tag) == etag:
+            return True
+    return False
+
+
+class Asset:
+    __slots__ = ("content_type", "body", "etag", "gzip_body", "gzip_etag", "mtime_ns", "size", "checked_at")
+
+    def __init__(self, path: str, body: bytes, st: os.stat_result, min_gzip: int, now: float) -> None:
+        self.content_type = content_type(path)
+        self.body = body
+        digest = hashlib.sha256(body).hexdigest()[:20]
+        self.etag = f'"{digest}"'
+        self.gzip_body: Optional[bytes] = None
+        self.gzip_etag = f'"{digest}-gz"'
+        if len(body) >= min_gzip and os.path.splitext(path)[1] not in _NO_GZIP:
+            packed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(packed) < len(body):
+                self.gzip_body = packed
+        self.mtime_ns = st.st_mtime_ns
+        self.size = st.st_size
+        self.checked_at = now
+
+
+class StaticAssets:
+    """
+    Dashboard files held in memory with a precompressed gzip copy and a
+    content-hash ETag. A file is stat'ed at most every `check_s` seconds
+    and reloaded when its mtime or size changes, so edits show up without
+    a restart while a busy dashboard costs no syscalls per request.
+    """
+
+    def __init__(self, root: str, check_s: float = 1.0, min_gzip: int = 256, max_age_s: int = 60,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.root = root
+        self.check_s = check_s
+        self.min_gzip = min_gzip
+        self.max_age_s = max_age_s
+        self._clock = clock
+        self._assets: Dict[str, Asset] = {}
+        self.loads = 0
+        self.not_modified = 0
+
+    def get(self, name: str) -> Optional[Asset]:
+        """The asset at `name` (relative to `root`, already sanitised), or None if it does not exist."""
+        now = self._clock()
+        asset = self._assets.get(name)
+        if asset is not None and now - asset.checked_at < self.check_s:
+            return asset
+        path = os.path.join(self.root, name)
+        try:
+            st = os.stat(path)
+            if not stat.S_ISREG(st.st_mode):
+                raise FileNotFoundError(path)
+            if asset is not None and st.st_mtime_ns == asset.mtime_ns and st.st_size == asset.size:
+                asset.checked_at = now
+                return asset
+            with open(path, "rb") as f:
+                body = f.read()
+        except OSError:
+            self._assets.pop(name, None)
+            return None
+        asset = self._assets[name] = Asset(path, body, st, self.min_gzip, now)
+        self.loads += 1
+        return asset
+
+    def cache_control(self, name: str) -> str:
+        # the page names assets without a version, so it is always revalidated
+        return "no-cache" if name.endswith(".html") else f"public, max-age={self.max_age_s}"
+
+    def respond(self, name: str, asset: Asset, accept_encoding: Optional[str] = None,
+                if_none_match: Optional[str] = None) -> Tuple[int, Headers, bytes]:
+        """(status, headers, body) for a GET of `asset`, honouring Accept-Encoding and If-None-Match."""
+        gzipped = asset.gzip_body is not None and accepts_gzip(accept_encoding)
+        etag = asset.gzip_etag if gzipped else asset.etag
+        headers = [("ETag", etag), ("Cache-Control", self.cache_control(name))]
+        if asset.gzip_body is not None:
+            headers.append(("Vary", "Accept-Encoding"))
+        if etag_matches(if_none_match, etag):
+            self.not_modified += 1
+            return 304, headers, b""
+        headers.append(("Content-Type", asset.content_type))
+        if gzipped:
+            headers.append(("Content-Encoding", "gzip"))
+            return 200, headers, asset.gzip_body
+        return 200, headers, asset.body
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "assets": len(self._assets),
+            "bytes": sum(len(a.body) + len(a.gzip_body or b"") for a in self._assets.values()),
+            "loads": self.loads,
+            "not_modified": self.not_modified,
+        }
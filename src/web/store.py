@@ -1,10 +1,15 @@
 from __future__ import annotations
 import json
 import threading
+import time
+import weakref
 from collections import deque
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Any, Deque, Dict, List
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from src.web.journal import EventJournal
+from src.web.timeseries import TimeSeries
 
 
 def utc_iso() -> str:
@@ -17,6 +22,12 @@ class EventItem:
     level: str
     msg: str
     extra: Dict[str, Any]
+    version: int = 0
+
+
+# slots of a counter shard, also the order of the time series
+_FLOW, _ACL, _DDOS, _ALLOWED = range(4)
+SERIES = ("flows", "acl_drops", "ddos_flags", "allowed")
 
 
 class DashboardStore:
@@ -26,97 +37,273 @@ class DashboardStore:
     - last events
     - timeseries buffers (ring buffers)
     - updated_at tick even without traffic
+
+    Packet counters are recorded without the lock: each writer thread bumps
+    its own cumulative shard, and readers sum the shards. `tick_1s` turns the
+    change since the previous tick into the per-second datapoint, which the
+    TimeSeries rolls up into 10 s, 1 min and 1 h buckets; snapshots carry
+    the last `max_points` seconds and `timeseries` queries any tier.
+
+    Every tick, event and stats update bumps `version`. The serialized
+    snapshot is cached per version, so between ticks pollers get the same
+    bytes (counters refresh at least once a second), and `delta_payload`
+    returns only the points and events newer than a client's version.
+
+    With a `journal`, every logged event is also appended to it, so history
+    older than `last_events` stays queryable.
     """
 
-    def __init__(self, max_points: int = 120, max_events: int = 60) -> None:
+    def __init__(self, max_points: int = 120, max_events: int = 60, journal: Optional[EventJournal] = None) -> None:
         self._lock = threading.Lock()
+        self.journal = journal
 
         self.started_at = utc_iso()
         self.updated_at = utc_iso()
+        self._iso_sec = 0
+        self._iso = self.updated_at
 
         self.events_total = 0
-        self.acl_drops_total = 0
-        self.ddos_flags_total = 0
-        self.allowed_total = 0
-
-        # per-second counters (for graphs)
-        self._sec_flows = 0
-        self._sec_acl = 0
-        self._sec_ddos = 0
-        self._sec_allowed = 0
-
-        self.labels: Deque[str] = deque(maxlen=max_points)
-        self.ts_flows: Deque[int] = deque(maxlen=max_points)
-        self.ts_acl: Deque[int] = deque(maxlen=max_points)
-        self.ts_ddos: Deque[int] = deque(maxlen=max_points)
-        self.ts_allowed: Deque[int] = deque(maxlen=max_points)
+
+        # per-thread cumulative counters; counts of finished threads move to _retired
+        self._local = threading.local()
+        self._shards: List[Tuple[Callable[[], Any], List[int]]] = []
+        self._retired = [0, 0, 0, 0]
+        self._folded = [0, 0, 0, 0]
+
+        self.series = TimeSeries(SERIES)
+        # epoch second of the last point; every tick gets its own second
+        self._last_sec = 0
 
         self.last_events: Deque[EventItem] = deque(maxlen=max_events)
 
-    def tick_1s(self) -> None:
+        # starts at the boot time in microseconds so versions keep increasing across restarts
+        self.version = int(time.time() * 1_000_000)
+        # (version, epoch second) of the points a snapshot carries
+        self.ts_versions: Deque[Tuple[int, int]] = deque(maxlen=max_points)
+        # clients older than these floors missed evicted points/events and need a full snapshot
+        self._points_floor = self.version
+        self._events_floor = self.version
+        self._payload: Tuple[int, bytes] = (-1, b"")
+        self._delta_payloads: Dict[int, bytes] = {}
+        self._delta_version = -1
+
+        # named groups of controller internals (flow programming, admission, ...)
+        self.stats: Dict[str, Dict[str, Any]] = {}
+
+    def _now_iso(self) -> str:
+        # format the timestamp once per wall-clock second
+        sec = int(time.time())
+        if sec != self._iso_sec:
+            self._iso = utc_iso()
+            self._iso_sec = sec
+        return self._iso
+
+    def _shard(self) -> List[int]:
+        try:
+            return self._local.counts
+        except AttributeError:
+            counts = [0, 0, 0, 0]
+            self._local.counts = counts
+            with self._lock:
+                self._shards.append((weakref.ref(threading.current_thread()), counts))
+            return counts
+
+    def _totals(self) -> List[int]:
+        """Sum of all shards; call with the lock held."""
+        totals = list(self._retired)
+        live = []
+        for owner, counts in self._shards:
+            for i in range(4):
+                totals[i] += counts[i]
+            thread = owner()
+            if thread is None or not thread.is_alive():
+                for i in range(4):
+                    self._retired[i] += counts[i]
+            else:
+                live.append((owner, counts))
+        self._shards = live
+        return totals
+
+    def tick_1s(self, now: Optional[float] = None) -> None:
         """Call every second to push a new datapoint into time-series buffers."""
+        now = time.time() if now is None else now
         with self._lock:
-            now = datetime.now().strftime("%H:%M:%S")
-            self.labels.append(now)
-            self.ts_flows.append(self._sec_flows)
-            self.ts_acl.append(self._sec_acl)
-            self.ts_ddos.append(self._sec_ddos)
-            self.ts_allowed.append(self._sec_allowed)
-
-            self._sec_flows = 0
-            self._sec_acl = 0
-            self._sec_ddos = 0
-            self._sec_allowed = 0
+            totals = self._totals()
+            self.version += 1
+            if len(self.ts_versions) == self.ts_versions.maxlen:
+                self._points_floor = self.ts_versions[0][0]
+            # a late tick followed by a prompt one can land in the same second; keep both points
+            sec = max(int(now), self._last_sec + 1)
+            self._last_sec = sec
+            self.ts_versions.append((self.version, sec))
+            self.series.add(sec, [totals[i] - self._folded[i] for i in range(4)])
+            self._folded = totals
 
             self.updated_at = utc_iso()
 
     def log(self, level: str, msg: str, **extra: Any) -> None:
+        ts = self._now_iso()
+        item = EventItem(ts=ts, level=level, msg=msg, extra=extra)
+        if self.journal is not None:
+            self.journal.append(time.time(), level, msg, extra)
         with self._lock:
+            self.version += 1
+            item.version = self.version
+            if len(self.last_events) == self.last_events.maxlen:
+                self._events_floor = self.last_events[-1].version
             self.events_total += 1
-            self.updated_at = utc_iso()
-            self.last_events.appendleft(EventItem(ts=self.updated_at, level=level, msg=msg, extra=extra))
+            self.updated_at = ts
+            self.last_events.appendleft(item)
+
+    def record(self, flow: int = 0, acl_drop: int = 0, ddos_flag: int = 0, allowed: int = 0) -> None:
+        """Add to several packet counters in one lock-free call."""
+        counts = self._shard()
+        counts[_FLOW] += flow
+        counts[_ACL] += acl_drop
+        counts[_DDOS] += ddos_flag
+        counts[_ALLOWED] += allowed
 
     def inc_flow(self) -> None:
-        with self._lock:
-            self._sec_flows += 1
+        self.record(flow=1)
 
     def inc_acl_drop(self) -> None:
-        with self._lock:
-            self.acl_drops_total += 1
-            self._sec_acl += 1
+        self.record(acl_drop=1)
 
     def inc_ddos_flag(self) -> None:
-        with self._lock:
-            self.ddos_flags_total += 1
-            self._sec_ddos += 1
+        self.record(ddos_flag=1)
 
     def inc_allowed(self) -> None:
+        self.record(allowed=1)
+
+    def set_stats(self, name: str, values: Dict[str, Any]) -> None:
         with self._lock:
-            self.allowed_total += 1
-            self._sec_allowed += 1
+            if self.stats.get(name) != values:
+                self.version += 1
+                self.stats[name] = dict(values)
+
+    def _snapshot_locked(self, since: Optional[int] = None) -> Dict[str, Any]:
+        totals = self._totals()
+        points = len(self.ts_versions)
+        events: List[EventItem] = list(self.last_events)
+        if since is not None:
+            points = 0
+            for v, _ in reversed(self.ts_versions):
+                if v <= since:
+                    break
+                points += 1
+            events = [e for e in events if e.version > since]
+        if points:
+            series = self.series.query(self.ts_versions[-points][1], self._last_sec)
+        else:
+            series = {"labels": [], "sum": {name: [] for name in SERIES}}
+
+        return {
+            "version": self.version,
+            "started_at": self.started_at,
+            "updated_at": self.updated_at,
+            "counters": {
+                "events_total": self.events_total,
+                "acl_drops_total": totals[_ACL],
+                "ddos_flags_total": totals[_DDOS],
+                "allowed_total": totals[_ALLOWED],
+            },
+            "timeseries": {
+                "labels": series["labels"],
+                **{f"{name}_per_sec": series["sum"][name] for name in SERIES},
+            },
+            "last_events": [
+                {"ts": e.ts, "level": e.level, "msg": e.msg, "extra": e.extra} for e in events
+            ],
+            "stats": {name: dict(values) for name, values in self.stats.items()},
+        }
 
     def snapshot(self) -> Dict[str, Any]:
         with self._lock:
-            return {
-                "started_at": self.started_at,
-                "updated_at": self.updated_at,
-                "counters": {
-                    "events_total": self.events_total,
-                    "acl_drops_total": self.acl_drops_total,
-                    "ddos_flags_total": self.ddos_flags_total,
-                    "allowed_total": self.allowed_total,
-                },
-                "timeseries": {
-                    "labels": list(self.labels),
-                    "flows_per_sec": list(self.ts_flows),
-                    "acl_drops_per_sec": list(self.ts_acl),
-                    "ddos_flags_per_sec": list(self.ts_ddos),
-                    "allowed_per_sec": list(self.ts_allowed),
-                },
-                "last_events": [
-                    {"ts": e.ts, "level": e.level, "msg": e.msg, "extra": e.extra} for e in list(self.last_events)
-                ],
+            return self._snapshot_locked()
+
+    def export_state(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """(counters and recent events, time-series arrays) for a checkpoint."""
+        with self._lock:
+            state = {
+                "totals": self._totals(),
+                "events_total": self.events_total,
+                "last_sec": self._last_sec,
+                "last_events": [[e.ts, e.level, e.msg, e.extra] for e in reversed(self.last_events)],
             }
+            return state, self.series.export()
+
+    def restore_state(self, state: Dict[str, Any], arrays: Dict[str, Any]) -> None:
+        """Carry counters, recent events and history over from `export_state` of a previous run."""
+        with self._lock:
+            totals = state["totals"]
+            for i in range(4):
+                # counted as already folded, so the next tick does not report them as one second's traffic
+                self._retired[i] += totals[i]
+                self._folded[i] += totals[i]
+            self.events_total += state["events_total"]
+            self._last_sec = max(self._last_sec, state["last_sec"])
+            self.series.restore(arrays)
+            for ts, level, msg, extra in state["last_events"]:
+                self.version += 1
+                self.last_events.appendleft(EventItem(ts=ts, level=level, msg=msg, extra=extra, version=self.version))
+            self.version += 1
+            # clients of this process that predate the restore need a full snapshot
+            self._points_floor = self._events_floor = self.version
+
+    def timeseries(self, resolution: int = 1, start: Optional[int] = None, end: Optional[int] = None,
+                   points: int = 120) -> Dict[str, Any]:
+        """
+        Buckets at `resolution` seconds between epoch seconds `start` and
+        `end` (default: the last `points` buckets), with per-bucket sums and
+        per-second maxima. Both are clamped between 0 and the last recorded
+        second. Raises ValueError for an unknown resolution.
+        """
+        if resolution not in self.series.resolutions:
+            raise ValueError(f"resolution must be one of {self.series.resolutions}")
+        with self._lock:
+            # nothing lies past the last second, and far-off bounds would overflow the bucket arrays
+            end = self._last_sec if end is None else max(0, min(end, self._last_sec))
+            start = end - resolution * points + 1 if start is None else max(0, min(start, end + 1))
+            return dict(self.series.query(start, end, resolution), start=start, end=end)
+
+    def delta(self, since: int) -> Dict[str, Any]:
+        """
+        Points and events newer than `since`. Falls back to a full snapshot
+        (`"delta": false`) when the client's version is unknown or older than
+        data that has already been evicted.
+        """
+        with self._lock:
+            if since > self.version or since < self._points_floor or since < self._events_floor:
+                return dict(self._snapshot_locked(), delta=False)
+            return dict(self._snapshot_locked(since), since=since, delta=True)
+
+    def snapshot_payload(self) -> Tuple[int, bytes]:
+        """(version, compact JSON) of the full snapshot, serialized once per version."""
+        version, body = self._payload
+        if version == self.version:
+            return version, body
+        snap = self.snapshot()
+        body = _dumps(snap)
+        self._payload = (snap["version"], body)
+        return snap["version"], body
+
+    def delta_payload(self, since: int) -> Tuple[int, bytes]:
+        version = self.version
+        if self._delta_version != version:
+            self._delta_payloads = {}
+            self._delta_version = version
+        body = self._delta_payloads.get(since)
+        if body is None:
+            snap = self.delta(since)
+            body = _dumps(snap)
+            if snap["version"] == version and len(self._delta_payloads) < 64:
+                self._delta_payloads[since] = body
+            version = snap["version"]
+        return version, body
 
     def snapshot_json(self) -> str:
-        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+        return self.snapshot_payload()[1].decode("utf-8")
+
+
+def _dumps(obj: Dict[str, Any]) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import queue
+import threading
+from typing import Dict, Iterator, List, Optional
+
+from src.web.store import DashboardStore
+
+KEEPALIVE = b": keepalive\n\n"
+
+
+def sse_frame(event: str, version: int, body: bytes) -> bytes:
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (version, event.encode("ascii"), body)
+
+
+class Subscriber:
+    __slots__ = ("queue", "version", "resyncs")
+
+    def __init__(self, max_queue: int) -> None:
+        self.queue: "queue.Queue[bytes]" = queue.Queue(maxsize=max_queue)
+        # store version this client has been sent up to; None means it needs a full snapshot
+        self.version: Optional[int] = None
+        self.resyncs = 0
+
+    def offer(self, frame: bytes) -> bool:
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except queue.Full:
+            # a slow client: drop its backlog and send it a full snapshot next time
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            self.version = None
+            self.resyncs += 1
+            return False
+
+
+class StreamHub:
+    """
+    Server-Sent Events fan-out for the dashboard. `publish` runs once per
+    tick and serializes one frame per distinct client version (normally
+    exactly one, shared by every subscriber). Each client has a bounded
+    queue, so a stalled browser loses its backlog and is resynchronized with
+    a full snapshot instead of holding up the controller.
+    """
+
+    def __init__(self, store: DashboardStore, max_queue: int = 16, max_clients: int = 1000,
+                 keepalive_s: float = 15.0) -> None:
+        self.store = store
+        self.max_queue = max_queue
+        self.max_clients = max_clients
+        self.keepalive_s = keepalive_s
+        self._lock = threading.Lock()
+        self._subscribers: List[Subscriber] = []
+
+        self.published = 0
+        self.frames_built = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return {
+            "clients": len(subscribers),
+            "published": self.published,
+            "frames_built": self.frames_built,
+            "resyncs": sum(s.resyncs for s in subscribers),
+        }
+
+    def subscribe(self) -> Optional[Subscriber]:
+        """Register a client and queue the current full snapshot; None when at capacity."""
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                return None
+            sub = Subscriber(self.max_queue)
+            self._subscribers.append(sub)
+        version, body = self.store.snapshot_payload()
+        sub.offer(sse_frame("snapshot", version, body))
+        sub.version = version
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+
+    def publish(self) -> int:
+        """Push what changed since each client's version; returns the number of frames queued."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        frames: Dict[Optional[int], tuple] = {}
+        queued = 0
+        for sub in subscribers:
+            since = sub.version
+            if since is not None and since == self.store.version:
+                continue
+            built = frames.get(since)
+            if built is None:
+                if since is None:
+                    version, body = self.store.snapshot_payload()
+                    built = (version, sse_frame("snapshot", version, body))
+                else:
+                    version, body = self.store.delta_payload(since)
+                    built = (version, sse_frame("delta", version, body))
+                frames[since] = built
+                self.frames_built += 1
+            if sub.offer(built[1]):
+                sub.version = built[0]
+                queued += 1
+        self.published += 1
+        return queued
+
+    def iterate(self, sub: Subscriber) -> Iterator[bytes]:
+        """Response body for one client; unsubscribes when the connection closes."""
+        try:
+            while True:
+                try:
+                    yield sub.queue.get(timeout=self.keepalive_s)
+                except queue.Empty:
+                    yield KEEPALIVE
+        finally:
+            self.unsubscribe(sub)
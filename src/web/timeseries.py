@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+_EMPTY = np.iinfo(np.int64).min
+
+# (seconds per bucket, buckets kept): 1 h of seconds, 1 day of 10 s, 1 week of minutes, 90 days of hours
+TIERS: Tuple[Tuple[int, int], ...] = ((1, 3600), (10, 8640), (60, 10080), (3600, 2160))
+
+
+def _label_format(resolution: int) -> str:
+    if resolution < 60:
+        return "%H:%M:%S"
+    if resolution < 3600:
+        return "%H:%M"
+    return "%m-%d %H:%M"
+
+
+class _Tier:
+    __slots__ = ("resolution", "slots", "stamps", "sums", "maxes")
+
+    def __init__(self, resolution: int, slots: int, width: int) -> None:
+        self.resolution = resolution
+        self.slots = slots
+        # bucket number (epoch second // resolution) held by each slot
+        self.stamps = np.full(slots, _EMPTY, dtype=np.int64)
+        self.sums = np.zeros((slots, width), dtype=np.int64)
+        self.maxes = np.zeros((slots, width), dtype=np.int64)
+
+
+class TimeSeries:
+    """
+    Fixed-memory per-second counters for a few named series, rolled up as
+    they arrive into coarser tiers that keep the sum and the per-second
+    maximum of each bucket. Every tier is a NumPy ring indexed by epoch
+    second // resolution, so a slot is reused once its bucket falls out of
+    the tier's window and a stale slot is recognised by its stamp. Labels
+    are only formatted by `query`.
+    """
+
+    def __init__(self, names: Sequence[str], tiers: Sequence[Tuple[int, int]] = TIERS) -> None:
+        self.names = tuple(names)
+        self._tiers = {resolution: _Tier(resolution, slots, len(self.names)) for resolution, slots in tiers}
+
+    @property
+    def resolutions(self) -> List[int]:
+        return sorted(self._tiers)
+
+    def retention(self, resolution: int) -> int:
+        """Seconds of history kept at `resolution`."""
+        tier = self._tiers[resolution]
+        return tier.resolution * tier.slots
+
+    def add(self, sec: int, values: Sequence[int]) -> None:
+        """Add one second's values (in `names` order) to every tier."""
+        row = np.asarray(values, dtype=np.int64)
+        for tier in self._tiers.values():
+            bucket = sec // tier.resolution
+            i = bucket % tier.slots
+            if tier.stamps[i] != bucket:
+                tier.stamps[i] = bucket
+                tier.sums[i] = row
+                tier.maxes[i] = row
+            else:
+                tier.sums[i] += row
+                np.maximum(tier.maxes[i], row, out=tier.maxes[i])
+
+    def query(self, start: int, end: int, resolution: int = 1) -> Dict[str, Any]:
+        """
+        Buckets at `resolution` overlapping epoch seconds [start, end] that
+        hold data, oldest first. Raises KeyError for a resolution without a
+        tier.
+        """
+        tier = self._tiers[resolution]
+        last = end // resolution
+        first = max(start // resolution, last - tier.slots + 1)
+        buckets = np.arange(first, last + 1, dtype=np.int64)
+        slots = buckets % tier.slots
+        held = tier.stamps[slots] == buckets
+        buckets, slots = buckets[held], slots[held]
+        stamps = (buckets * resolution).tolist()
+        fmt = _label_format(resolution)
+        sums = tier.sums[slots].T.tolist()
+        maxes = tier.maxes[slots].T.tolist()
+        return {
+            "resolution": resolution,
+            "t": stamps,
+            "labels": [time.strftime(fmt, time.localtime(t)) for t in stamps],
+            "sum": dict(zip(self.names, sums)),
+            "max": dict(zip(self.names, maxes)),
+        }
+
+    def export(self) -> Dict[str, np.ndarray]:
+        """Copies of every tier's arrays, named `<resolution>_stamps`, `_sums` and `_maxes`."""
+        arrays = {}
+        for resolution, tier in self._tiers.items():
+            arrays[f"{resolution}_stamps"] = tier.stamps.copy()
+            arrays[f"{resolution}_sums"] = tier.sums.copy()
+            arrays[f"{resolution}_maxes"] = tier.maxes.copy()
+        return arrays
+
+    def restore(self, arrays: Dict[str, np.ndarray]) -> List[int]:
+        """Load `export` output; tiers whose shape changed since are skipped. Returns the resolutions loaded."""
+        loaded = []
+        for resolution, tier in self._tiers.items():
+            parts = [arrays.get(f"{resolution}_{name}") for name in ("stamps", "sums", "maxes")]
+            if any(p is None for p in parts) or parts[0].shape != tier.stamps.shape \
+                    or parts[1].shape != tier.sums.shape or parts[2].shape != tier.maxes.shape:
+                continue
+            tier.stamps[:], tier.sums[:], tier.maxes[:] = parts
+            loaded.append(resolution)
+        return loaded
+
+    def nbytes(self) -> int:
+        return sum(t.stamps.nbytes + t.sums.nbytes + t.maxes.nbytes for t in self._tiers.values())
@@ -0,0 +1,128 @@
+"""
+Just enough of Ryu, eventlet and webob to import SdnSecurityApp and
+DashboardWSGI without them installed. Handlers are plain methods, hub.spawn
+records its target instead of starting a greenthread, and tpool.execute
+runs inline.
+"""
+import importlib
+import logging
+import queue
+import sys
+import types
+
+# (function, args) of every hub.spawn since the last take_spawned()
+SPAWNED = []
+
+
+def take_spawned():
+    spawned = list(SPAWNED)
+    SPAWNED.clear()
+    return spawned
+
+
+class Headers(dict):
+    def extend(self, pairs):
+        for name, value in pairs:
+            self[name] = value
+
+
+class Response:
+    def __init__(self, status=200, body=b"", content_type="text/html; charset=UTF-8", app_iter=None, **kwargs):
+        self.status_int = status
+        self.body = body
+        self.app_iter = app_iter
+        self.headers = Headers({"Content-Type": content_type})
+        self.etag = None
+        self.cache_control = None
+
+    @property
+    def content_type(self):
+        return self.headers.get("Content-Type")
+
+    def json(self):
+        import json
+        return json.loads(self.body)
+
+
+class ControllerBase:
+    def __init__(self, req, link, data, **config):
+        self.req = req
+        self.link = link
+        self.data = data
+
+
+class Event:
+    """ryu.lib.hub.Event without a hub: wait returns at once."""
+
+    def __init__(self):
+        self._set = False
+
+    def set(self):
+        self._set = True
+
+    def clear(self):
+        self._set = False
+
+    def is_set(self):
+        return self._set
+
+    def wait(self, timeout=None):
+        return self._set
+
+
+def _route(name, path, methods=None, requirements=None):
+    return lambda fn: fn
+
+
+def _set_ev_cls(ev_cls, dispatchers=None):
+    return lambda fn: fn
+
+
+class RyuApp:
+    def __init__(self, *args, **kwargs):
+        self.logger = logging.getLogger(type(self).__name__)
+        self.events = queue.Queue()
+
+    def stop(self):
+        pass
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+
+def install():
+    """Put the stand-ins in sys.modules, replacing any real Ryu and eventlet already imported."""
+    _module("eventlet", monkey_patch=lambda *a, **kw: None)
+    _module("eventlet.patcher", original=importlib.import_module)
+    _module("eventlet.tpool", execute=lambda fn, *args, **kwargs: fn(*args, **kwargs))
+    for sub in ("patcher", "tpool"):
+        setattr(sys.modules["eventlet"], sub, sys.modules[f"eventlet.{sub}"])
+
+    _module("ryu")
+    _module("ryu.base")
+    _module("ryu.base.app_manager", RyuApp=RyuApp)
+    _module("ryu.controller")
+    ofp_event = _module("ryu.controller.ofp_event")
+    ofp_event.__getattr__ = lambda name: name
+    _module("ryu.controller.handler", CONFIG_DISPATCHER="config", DEAD_DISPATCHER="dead",
+            MAIN_DISPATCHER="main", set_ev_cls=_set_ev_cls)
+    _module("ryu.ofproto")
+    _module("ryu.ofproto.ofproto_v1_3", OFP_VERSION=0x04)
+    _module("ryu.lib")
+    _module("ryu.lib.hub", spawn=lambda fn, *args, **kwargs: SPAWNED.append((fn, args)),
+            sleep=lambda seconds=0: None, Event=Event)
+    _module("ryu.app")
+    _module("ryu.app.wsgi", ControllerBase=ControllerBase, Response=Response, route=_route,
+            WSGIApplication=object)
+    for name in ("base", "controller", "ofproto", "lib", "app"):
+        setattr(sys.modules["ryu"], name, sys.modules[f"ryu.{name}"])
+    sys.modules["ryu.base"].app_manager = sys.modules["ryu.base.app_manager"]
+    sys.modules["ryu.controller"].ofp_event = ofp_event
+    sys.modules["ryu.controller"].handler = sys.modules["ryu.controller.handler"]
+    sys.modules["ryu.ofproto"].ofproto_v1_3 = sys.modules["ryu.ofproto.ofproto_v1_3"]
+    sys.modules["ryu.lib"].hub = sys.modules["ryu.lib.hub"]
+    sys.modules["ryu.app"].wsgi = sys.modules["ryu.app.wsgi"]
@@ -0,0 +1,138 @@
+import os
+import random
+import tempfile
+import unittest
+
+from src.controller.acl import AclClassifier, AclPolicy, parse_rules
+
+
+def first_match(rules, src_ip, dst_ip, proto, dst_port):
+    for rule in sorted(rules, key=lambda r: (-r.priority, r.order)):
+        if rule.matches(src_ip, dst_ip, proto, dst_port):
+            return rule
+    return None
+
+
+class ParseRulesTest(unittest.TestCase):
+    def test_parses_prefixes_protocols_ranges_and_priorities(self):
+        rules = parse_rules([
+            "# comment",
+            "deny 10.0.0.1 10.0.0.2 tcp 22",
+            "",
+            "allow 10.0.0.0/24 any udp 1000-2000 priority=200  # trailing",
+        ])
+
+        self.assertEqual(len(rules), 2)
+        self.assertEqual(rules[0].src_cidr(), "10.0.0.1/32")
+        self.assertEqual((rules[0].proto, rules[0].port_lo, rules[0].port_hi), (6, 22, 22))
+        self.assertEqual(rules[1].dst_cidr(), "0.0.0.0/0")
+        self.assertEqual((rules[1].port_lo, rules[1].port_hi, rules[1].priority), (1000, 2000, 200))
+        self.assertEqual(rules[1].order, 1)
+
+    def test_rejects_malformed_lines_with_the_line_number(self):
+        for line in ("drop any any tcp 22", "deny any any icmp 22", "deny any any tcp 70000", "deny any any tcp"):
+            with self.assertRaisesRegex(ValueError, "line 1"):
+                parse_rules([line])
+
+
+class AclClassifierTest(unittest.TestCase):
+    def setUp(self):
+        self.rules = parse_rules([
+            "deny  10.0.0.1     10.0.0.2  tcp  22",
+            "allow 10.0.0.0/24  10.0.0.2  tcp  20-30",
+            "deny  10.0.0.0/24  10.0.0.2  tcp  any",
+            "deny  any          10.0.0.3  udp  53 priority=50",
+            "allow any          10.0.0.3  any  any priority=60",
+            "deny  10.0.0.9     any       icmp any",
+        ])
+        self.classifier = AclClassifier(self.rules)
+
+    def test_first_match_in_file_order(self):
+        self.assertIs(self.classifier.lookup("10.0.0.1", "10.0.0.2", 6, 22), self.rules[0])
+        self.assertIs(self.classifier.lookup("10.0.0.5", "10.0.0.2", 6, 22), self.rules[1])
+        self.assertIs(self.classifier.lookup("10.0.0.5", "10.0.0.2", 6, 443), self.rules[2])
+
+    def test_priority_beats_file_order(self):
+        self.assertIs(self.classifier.lookup("192.168.1.1", "10.0.0.3", 17, 53), self.rules[4])
+
+    def test_wildcard_ports_match_portless_packets_but_ranges_do_not(self):
+        self.assertIs(self.classifier.lookup("10.0.0.9", "8.8.8.8", 1, None), self.rules[5])
+        self.assertIs(self.classifier.lookup("10.0.0.5", "10.0.0.2", 6, None), self.rules[2])
+
+    def test_unmatched_traffic_has_no_rule(self):
+        self.assertIsNone(self.classifier.lookup("10.0.1.1", "10.0.0.2", 6, 22))
+        self.assertIsNone(self.classifier.lookup("10.0.0.1", "10.0.0.2", 17, 22))
+
+    def test_agrees_with_a_linear_first_match_scan(self):
+        rng = random.Random(3)
+
+        def prefix():
+            return rng.choice(["any", f"10.{rng.randint(0, 3)}.0.0/16", f"10.0.{rng.randint(0, 3)}.0/24",
+                               f"10.0.{rng.randint(0, 3)}.{rng.randint(0, 7)}"])
+
+        def ports():
+            lo = rng.randint(0, 100)
+            return rng.choice(["any", str(lo), f"{lo}-{lo + rng.randint(0, 40)}"])
+
+        lines = [
+            f"{rng.choice(['allow', 'deny'])} {prefix()} {prefix()} {rng.choice(['tcp', 'udp', 'any'])} {ports()} "
+            f"priority={rng.choice([100, 100, 150])}"
+            for _ in range(300)
+        ]
+        rules = parse_rules(lines)
+        classifier = AclClassifier(rules)
+
+        for _ in range(3000):
+            packet = (f"10.{rng.randint(0, 3)}.{rng.randint(0, 3)}.{rng.randint(0, 7)}",
+                      f"10.0.{rng.randint(0, 3)}.{rng.randint(0, 7)}",
+                      rng.choice([1, 6, 17]), None)
+            if packet[2] != 1:
+                packet = packet[:3] + (rng.randint(0, 150),)
+            self.assertIs(classifier.lookup(*packet), first_match(rules, *packet), packet)
+
+
+class AclPolicyTest(unittest.TestCase):
+    def test_reload_swaps_the_rule_set_only_when_the_file_changes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "acl.rules")
+            with open(path, "w") as f:
+                f.write("deny 10.0.0.1 10.0.0.2 tcp 22\n")
+            policy = AclPolicy.from_file(path)
+
+            self.assertTrue(policy.is_denied("10.0.0.1", "10.0.0.2", 6, 22))
+            self.assertFalse(policy.reload_if_changed())
+
+            with open(path, "w") as f:
+                f.write("deny 10.0.0.1 10.0.0.2 udp 53\n")
+            os.utime(path, (0, 12345))
+
+            self.assertTrue(policy.reload_if_changed())
+            self.assertFalse(policy.is_denied("10.0.0.1", "10.0.0.2", 6, 22))
+            self.assertTrue(policy.is_denied("10.0.0.1", "10.0.0.2", 17, 53))
+
+    def test_a_broken_file_keeps_the_current_policy(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "acl.rules")
+            with open(path, "w") as f:
+                f.write("deny 10.0.0.1 10.0.0.2 tcp 22\n")
+            policy = AclPolicy.from_file(path)
+
+            with open(path, "w") as f:
+                f.write("deny 10.0.0.1\n")
+            os.utime(path, (0, 12345))
+
+            with self.assertRaises(ValueError):
+                policy.reload_if_changed()
+            self.assertFalse(policy.reload_if_changed())
+            self.assertTrue(policy.is_denied("10.0.0.1", "10.0.0.2", 6, 22))
+
+    def test_shipped_policy_blocks_h1_ssh_to_h2(self):
+        path = os.path.join(os.path.dirname(__file__), "..", "src", "controller", "acl_rules.txt")
+        policy = AclPolicy.from_file(path)
+
+        self.assertTrue(policy.is_denied("10.0.0.1", "10.0.0.2", 6, 22))
+        self.assertFalse(policy.is_denied("10.0.0.1", "10.0.0.2", 6, 80))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+import unittest
+from types import SimpleNamespace
+
+from src.controller.acl import parse_rules
+from src.controller.acl import ip_to_int
+from src.controller.acl_flows import (
+    ACL_COOKIE, ACL_DROP_PRIORITY, AclFlowProgrammer, covering_match_fields, overlaps_any, reactive_denies,
+    rule_match_fields,
+)
+
+
+class FakeParser:
+    @staticmethod
+    def OFPMatch(**fields):
+        return fields
+
+    @staticmethod
+    def OFPFlowMod(**kwargs):
+        kwargs.pop("datapath")
+        return SimpleNamespace(**kwargs)
+
+
+class FakeDatapath:
+    ofproto = SimpleNamespace(
+        OFPFC_ADD=0, OFPFC_DELETE=3, OFPFC_DELETE_STRICT=4,
+        OFPTT_ALL=0xFF, OFPP_ANY=0xFFFFFFFF, OFPG_ANY=0xFFFFFFFF,
+    )
+    ofproto_parser = FakeParser
+
+    def __init__(self, dpid=1):
+        self.id = dpid
+        self.sent = []
+
+    def send_msg(self, msg):
+        self.sent.append(msg)
+
+    def flow_mods(self, command):
+        return [m for m in self.sent if m.command == command]
+
+
+class RuleMatchFieldsTest(unittest.TestCase):
+    def test_prefixes_become_masked_fields_and_protocol_picks_the_port_field(self):
+        udp, tcp = parse_rules([
+            "deny 10.0.0.0/24 10.0.0.2 udp 53",
+            "deny any 10.0.0.2 tcp 22",
+        ])
+
+        self.assertEqual(rule_match_fields(udp), [{
+            "eth_type": 0x0800,
+            "ipv4_src": ("10.0.0.0", "255.255.255.0"),
+            "ipv4_dst": "10.0.0.2",
+            "ip_proto": 17,
+            "udp_dst": 53,
+        }])
+        self.assertEqual(rule_match_fields(tcp)[0]["tcp_dst"], 22)
+        self.assertNotIn("ipv4_src", rule_match_fields(tcp)[0])
+
+    def test_ranges_expand_per_port_and_any_protocol_covers_tcp_and_udp(self):
+        rule, wide = parse_rules(["deny any any any 20-21", "deny any any tcp 1-1000"])
+
+        self.assertEqual(
+            sorted((m["ip_proto"], m.get("tcp_dst", m.get("udp_dst"))) for m in rule_match_fields(rule)),
+            [(6, 20), (6, 21), (17, 20), (17, 21)],
+        )
+        self.assertIsNone(rule_match_fields(wide))
+
+    def test_covering_matches_drop_ports_that_cannot_be_expanded(self):
+        narrow, wide = parse_rules(["deny any 10.0.0.2 tcp 22", "deny any 10.0.0.2 tcp 1-1000"])
+
+        self.assertEqual(covering_match_fields(narrow), rule_match_fields(narrow))
+        self.assertEqual(covering_match_fields(wide), [{"eth_type": 0x0800, "ipv4_dst": "10.0.0.2", "ip_proto": 6}])
+
+
+class AclFlowProgrammerTest(unittest.TestCase):
+    def test_switch_connect_clears_stale_acl_flows_and_installs_permanent_drops(self):
+        dp = FakeDatapath()
+        rules = parse_rules(["deny 10.0.0.1 10.0.0.2 tcp 22", "deny 10.0.0.1 10.0.0.2 udp 53"])
+
+        self.assertEqual(AclFlowProgrammer().install_all(dp, rules), 2)
+
+        self.assertEqual(dp.sent[0].command, dp.ofproto.OFPFC_DELETE)
+        self.assertEqual(dp.sent[0].cookie, ACL_COOKIE)
+        adds = dp.flow_mods(dp.ofproto.OFPFC_ADD)
+        self.assertEqual(len(adds), 2)
+        for mod in adds:
+            self.assertEqual((mod.priority, mod.idle_timeout, mod.hard_timeout), (ACL_DROP_PRIORITY, 0, 0))
+            self.assertEqual(mod.instructions, [])
+        self.assertEqual(
+            sorted((m.match["ip_proto"], m.match.get("tcp_dst", m.match.get("udp_dst"))) for m in adds),
+            [(6, 22), (17, 53)],
+        )
+
+    def test_policy_change_sends_only_the_difference(self):
+        dp = FakeDatapath()
+        programmer = AclFlowProgrammer()
+        programmer.install_all(dp, parse_rules(["deny 10.0.0.1 10.0.0.2 tcp 22", "deny 10.0.0.1 10.0.0.2 udp 53"]))
+        dp.sent.clear()
+
+        added, removed = programmer.sync(dp, parse_rules([
+            "deny 10.0.0.1 10.0.0.2 tcp 22",
+            "deny 10.0.0.3 10.0.0.2 tcp 23",
+        ]))
+
+        self.assertEqual((added, removed), (1, 1))
+        [delete] = dp.flow_mods(dp.ofproto.OFPFC_DELETE_STRICT)
+        self.assertEqual((delete.match["udp_dst"], delete.priority), (53, ACL_DROP_PRIORITY))
+        [add] = dp.flow_mods(dp.ofproto.OFPFC_ADD)
+        self.assertEqual(add.match["ipv4_src"], "10.0.0.3")
+        self.assertEqual(programmer.sync(dp, parse_rules([
+            "deny 10.0.0.1 10.0.0.2 tcp 22",
+            "deny 10.0.0.3 10.0.0.2 tcp 23",
+        ])), (0, 0))
+
+    def test_denies_shadowed_by_a_higher_ranked_allow_stay_on_the_controller(self):
+        dp = FakeDatapath()
+        rules = parse_rules([
+            "allow 10.0.0.1 any tcp 22",
+            "deny 10.0.0.0/24 10.0.0.2 tcp any",
+            "deny 10.0.0.3 10.0.0.4 udp 53",
+        ])
+
+        self.assertEqual(AclFlowProgrammer().install_all(dp, rules), 1)
+        [add] = dp.flow_mods(dp.ofproto.OFPFC_ADD)
+        self.assertEqual(add.match["udp_dst"], 53)
+
+    def test_reactive_denies_are_the_ones_not_offloaded(self):
+        rules = parse_rules([
+            "allow 10.0.0.1 any tcp 22",
+            "deny 10.0.0.0/24 10.0.0.2 tcp any",
+            "deny 10.0.0.3 10.0.0.4 tcp 1000-2000",
+            "deny 10.0.0.3 10.0.0.4 udp 53",
+        ])
+
+        reactive = reactive_denies(rules)
+
+        self.assertEqual([r.port_hi for r in reactive], [None, 2000])
+        self.assertTrue(overlaps_any(reactive, (ip_to_int("10.0.0.9"), 32), (ip_to_int("10.0.0.2"), 32)))
+        self.assertFalse(overlaps_any(reactive, (ip_to_int("10.0.0.9"), 32), (ip_to_int("10.0.0.4"), 32)))
+        self.assertTrue(overlaps_any(reactive, (ip_to_int("10.0.0.0"), 24), (ip_to_int("10.0.0.4"), 32)))
+
+    def test_datapaths_are_tracked_separately(self):
+        programmer = AclFlowProgrammer()
+        rules = parse_rules(["deny 10.0.0.1 10.0.0.2 tcp 22"])
+        programmer.install_all(FakeDatapath(1), rules)
+        programmer.install_all(FakeDatapath(2), rules)
+
+        programmer.forget(1)
+
+        self.assertEqual(len(programmer.installed(1)), 0)
+        self.assertEqual(len(programmer.installed(2)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
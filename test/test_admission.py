@@ -0,0 +1,62 @@
+import unittest
+
+from src.controller.admission import ADMIT, PENALIZE, SHED, PacketInAdmission
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class PacketInAdmissionTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.admission = PacketInAdmission(rate_pps=10, burst=3, penalty_s=5, clock=self.clock)
+
+    def test_burst_is_admitted_then_the_source_is_penalized_once_and_shed(self):
+        verdicts = [self.admission.admit("h3") for _ in range(6)]
+
+        self.assertEqual(verdicts, [ADMIT, ADMIT, ADMIT, PENALIZE, SHED, SHED])
+        self.assertEqual(self.admission.stats(), {
+            "admitted": 3, "shed": 3, "penalized": 1, "tracked_sources": 1,
+        })
+
+    def test_sources_have_independent_buckets(self):
+        for _ in range(4):
+            self.admission.admit("h3")
+
+        self.assertEqual(self.admission.admit("h1"), ADMIT)
+
+    def test_tokens_refill_at_the_configured_rate(self):
+        for _ in range(3):
+            self.admission.admit("h1")
+
+        self.clock.now += 0.15
+        self.assertEqual(self.admission.admit("h1"), ADMIT)
+        self.assertEqual(self.admission.admit("h1"), PENALIZE)
+
+    def test_penalty_expires_and_the_bucket_has_refilled(self):
+        for _ in range(4):
+            self.admission.admit("h3")
+
+        self.clock.now += 4.9
+        self.assertEqual(self.admission.admit("h3"), SHED)
+        self.clock.now += 0.2
+        self.assertEqual([self.admission.admit("h3") for _ in range(3)], [ADMIT] * 3)
+
+    def test_least_recently_seen_sources_are_dropped_at_capacity(self):
+        admission = PacketInAdmission(rate_pps=10, burst=1, max_sources=2, clock=self.clock)
+        admission.admit("h1")
+        admission.admit("h2")
+        admission.admit("h1")
+        admission.admit("h3")
+
+        self.assertEqual(admission.stats()["tracked_sources"], 2)
+        self.assertEqual(admission.admit("h2"), ADMIT)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+from src.controller.analytics import DETECT, EVENT, AnalyticsQueue
+
+
+class AnalyticsQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.queue = AnalyticsQueue(capacity=4, shed_events_at=0.5)
+
+    def test_records_drain_in_order_and_in_batches(self):
+        for i in range(3):
+            self.assertTrue(self.queue.put(DETECT, i))
+
+        self.assertEqual(self.queue.drain(2), [(DETECT, 0), (DETECT, 1)])
+        self.assertEqual(self.queue.drain(2), [(DETECT, 2)])
+        self.assertEqual(self.queue.drain(2), [])
+        stats = self.queue.stats()
+        self.assertEqual((stats["processed"], stats["batches"], stats["max_depth"]), (3, 2, 3))
+
+    def test_events_are_shed_before_detector_records(self):
+        self.assertTrue(self.queue.put(EVENT, "a"))
+        self.assertTrue(self.queue.put(DETECT, 1))
+        self.assertFalse(self.queue.put(EVENT, "b"))
+        self.assertTrue(self.queue.put(DETECT, 2))
+        self.assertTrue(self.queue.put(DETECT, 3))
+        self.assertFalse(self.queue.put(DETECT, 4))
+
+        self.assertEqual(len(self.queue), 4)
+        self.assertEqual(self.queue.shed, {DETECT: 1, EVENT: 1})
+        self.assertEqual(self.queue.stats()["enqueued"], 4)
+
+    def test_room_frees_up_as_the_worker_drains(self):
+        for i in range(4):
+            self.queue.put(DETECT, i)
+        self.queue.drain(3)
+
+        self.assertTrue(self.queue.put(EVENT, "a"))
+        self.assertEqual(self.queue.drain(10), [(DETECT, 3), (EVENT, "a")])
+
+    def test_the_worker_is_woken_only_when_the_queue_stops_being_empty(self):
+        wakeups = []
+        queue = AnalyticsQueue(capacity=4, on_ready=lambda: wakeups.append(len(queue)))
+
+        queue.put(DETECT, 1)
+        queue.put(DETECT, 2)
+        queue.drain(2)
+        queue.put(EVENT, "a")
+
+        self.assertEqual(wakeups, [1, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
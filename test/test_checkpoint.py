@@ -0,0 +1,135 @@
+import os
+import tempfile
+import unittest
+
+from src.controller.checkpoint import Checkpointer, read_checkpoint, write_checkpoint
+from src.controller.l2_learning import L2Learning
+from src.controller.port_scan import PortScanDetector
+from src.controller.quarantine import Quarantine
+from src.controller.scan_sketch import SketchScanDetector
+from src.web.store import DashboardStore
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class CheckpointTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "state", "checkpoint.npz")
+        self.mono = FakeClock(1000.0)
+        self.wall = FakeClock(1_700_000_000.0)
+
+    def controller(self):
+        l2 = L2Learning(mac_age_s=300, arp_age_s=300)
+        detector = PortScanDetector(window_s=5, threshold_ports=3)
+        store = DashboardStore()
+        return l2, detector, store, Checkpointer(self.path, l2, detector, store, clock=self.mono, wall=self.wall)
+
+    def test_state_survives_a_restart(self):
+        l2, detector, store, checkpointer = self.controller()
+        l2.learn_mac(1, "00:00:00:00:00:01", 3, now=self.mono.now - 100)
+        l2.learn_mac(1, "00:00:00:00:00:02", 4, now=self.mono.now - 290)
+        l2.learn_arp("10.0.0.1", "00:00:00:00:00:01", now=self.mono.now)
+        detector.flag("10.0.0.2", 22, now=self.wall.now - 1)
+        detector.flag("10.0.0.2", 23, now=self.wall.now)
+        store.record(flow=5, acl_drop=2)
+        store.tick_1s(now=self.wall.now)
+        store.log("WARN", "ACL DROP", src="10.0.0.1")
+        checkpointer.save(checkpointer.capture())
+
+        # the new process has its own monotonic clock and comes up 20 s later
+        self.mono.now = 5.0
+        self.wall.now += 20
+        l2, detector, store, checkpointer = self.controller()
+        restored = checkpointer.load()
+
+        self.assertEqual(restored["age_s"], 20.0)
+        self.assertEqual(l2.port(1, "00:00:00:00:00:01", now=self.mono.now), 3)
+        # 290 s old at the checkpoint, past the 300 s age after the downtime
+        self.assertIsNone(l2.port(1, "00:00:00:00:00:02", now=self.mono.now))
+        self.assertEqual(l2.mac_for("10.0.0.1", now=self.mono.now), "00:00:00:00:00:01")
+        self.assertEqual(restored["scan_windows"], 1)
+        snapshot = store.snapshot()
+        self.assertEqual(snapshot["counters"]["acl_drops_total"], 2)
+        self.assertEqual(snapshot["counters"]["events_total"], 1)
+        self.assertEqual(snapshot["last_events"][0]["msg"], "ACL DROP")
+        self.assertEqual(store.timeseries(resolution=10, end=int(self.wall.now))["sum"]["flows"], [5])
+
+    def test_restored_scan_window_keeps_counting(self):
+        _, detector, _, checkpointer = self.controller()
+        now = self.wall.now
+        self.assertFalse(detector.should_alert("10.0.0.2", 1, now=now - 2, src_ip="10.0.0.66"))
+        self.assertFalse(detector.should_alert("10.0.0.2", 2, now=now - 1, src_ip="10.0.0.66"))
+        checkpointer.save(checkpointer.capture())
+
+        _, detector, _, checkpointer = self.controller()
+        checkpointer.load()
+
+        self.assertTrue(detector.should_alert("10.0.0.2", 3, now=now + 1, src_ip="10.0.0.1"))
+        self.assertTrue(detector.is_scanner("10.0.0.2", "10.0.0.66"))
+        self.assertFalse(detector.is_scanner("10.0.0.2", "10.0.0.9"))
+
+    def test_restored_totals_are_not_reported_as_one_second(self):
+        _, _, store, checkpointer = self.controller()
+        store.record(flow=100)
+        checkpointer.save(checkpointer.capture())
+
+        _, _, store, checkpointer = self.controller()
+        checkpointer.load()
+        store.record(flow=1)
+        store.tick_1s(now=self.wall.now + 5)
+
+        self.assertEqual(store.snapshot()["timeseries"]["flows_per_sec"], [1])
+
+    def test_quarantine_survives_a_restart(self):
+        quarantine = Quarantine(base_s=60, clock=self.wall)
+        quarantine.offend("10.0.0.9")
+        checkpointer = Checkpointer(self.path, L2Learning(), PortScanDetector(5, 40), DashboardStore(),
+                                    clock=self.mono, wall=self.wall, quarantine=quarantine)
+        checkpointer.save(checkpointer.capture())
+
+        self.wall.now += 20
+        quarantine = Quarantine(base_s=60, clock=self.wall)
+        restored = Checkpointer(self.path, L2Learning(), PortScanDetector(5, 40), DashboardStore(),
+                                clock=self.mono, wall=self.wall, quarantine=quarantine).load()
+
+        self.assertEqual(restored["quarantined"], 1)
+        self.assertEqual(quarantine.blocked(), {"10.0.0.9": 40})
+
+    def test_sketch_detector_survives_a_restart(self):
+        detector = SketchScanDetector(5, 40, width=256)
+        for i in range(45):
+            detector.should_alert("10.0.0.2", 1000 + i, now=self.wall.now - 1, src_ip="10.0.0.66")
+        checkpointer = Checkpointer(self.path, L2Learning(), detector, DashboardStore(),
+                                    clock=self.mono, wall=self.wall)
+        checkpointer.save(checkpointer.capture())
+
+        self.wall.now += 2
+        restored_detector = SketchScanDetector(5, 40, width=256)
+        restored = Checkpointer(self.path, L2Learning(), restored_detector, DashboardStore(),
+                                clock=self.mono, wall=self.wall).load()
+
+        self.assertEqual(restored["scan_alerts"], 1)
+        self.assertTrue(restored_detector.is_scanner("10.0.0.2", "10.0.0.66"))
+        self.assertFalse(restored_detector.should_alert("10.0.0.2", 2000, now=self.wall.now, src_ip="10.0.0.66"))
+
+    def test_missing_and_corrupt_files(self):
+        self.assertIsNone(read_checkpoint(self.path))
+        write_checkpoint(self.path, {"x": 1}, {})
+        self.assertEqual(read_checkpoint(self.path)[0]["x"], 1)
+        with open(self.path, "wb") as f:
+            f.write(b"not a checkpoint")
+
+        with self.assertRaises(ValueError):
+            read_checkpoint(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
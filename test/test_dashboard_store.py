@@ -1,4 +1,5 @@
 import json
+import threading
 import unittest
 
 from src.web.store import DashboardStore
@@ -51,6 +52,117 @@ class DashboardStoreTest(unittest.TestCase):
 
         self.assertEqual(snapshot["last_events"][0]["msg"], "Dashboard ready")
 
+    def test_record_updates_several_counters_in_one_call(self):
+        store = DashboardStore()
+
+        store.record(flow=1, allowed=1)
+        store.record(flow=1, acl_drop=1)
+        store.tick_1s()
+
+        snapshot = store.snapshot()
+
+        self.assertEqual(snapshot["counters"]["allowed_total"], 1)
+        self.assertEqual(snapshot["counters"]["acl_drops_total"], 1)
+        self.assertEqual(snapshot["timeseries"]["flows_per_sec"], [2])
+
+    def test_counts_from_concurrent_and_finished_writer_threads_are_kept(self):
+        store = DashboardStore()
+
+        def writer():
+            for _ in range(1000):
+                store.record(flow=1, allowed=1)
+
+        threads = [threading.Thread(target=writer) for _ in range(4)]
+        for t in threads:
+            t.start()
+        store.inc_flow()
+        for t in threads:
+            t.join()
+        store.tick_1s()
+        store.record(flow=1)
+        store.tick_1s()
+
+        snapshot = store.snapshot()
+
+        self.assertEqual(snapshot["counters"]["allowed_total"], 4000)
+        self.assertEqual(snapshot["timeseries"]["flows_per_sec"], [4001, 1])
+
+    def test_snapshot_payload_is_serialized_once_per_version(self):
+        store = DashboardStore()
+        version, body = store.snapshot_payload()
+
+        self.assertIs(store.snapshot_payload()[1], body)
+        self.assertEqual(json.loads(body)["version"], version)
+
+        store.tick_1s()
+        newer, _ = store.snapshot_payload()
+
+        self.assertGreater(newer, version)
+
+    def test_delta_returns_only_points_and_events_after_a_version(self):
+        store = DashboardStore(max_points=5, max_events=5)
+        store.tick_1s()
+        store.log("INFO", "old")
+        since = store.snapshot()["version"]
+        store.inc_acl_drop()
+        store.tick_1s()
+        store.log("WARN", "new")
+
+        delta = store.delta(since)
+
+        self.assertTrue(delta["delta"])
+        self.assertEqual(delta["timeseries"]["acl_drops_per_sec"], [1])
+        self.assertEqual(len(delta["timeseries"]["labels"]), 1)
+        self.assertEqual([e["msg"] for e in delta["last_events"]], ["new"])
+        self.assertEqual(delta["counters"]["acl_drops_total"], 1)
+
+        current = store.delta(delta["version"])
+        self.assertEqual(current["timeseries"]["labels"], [])
+        self.assertEqual(current["last_events"], [])
+
+    def test_delta_falls_back_to_a_full_snapshot_for_unknown_or_evicted_versions(self):
+        store = DashboardStore(max_points=2, max_events=2)
+        since = store.snapshot()["version"]
+        for _ in range(3):
+            store.tick_1s()
+
+        self.assertFalse(store.delta(since)["delta"])
+        self.assertEqual(len(store.delta(since)["timeseries"]["labels"]), 2)
+        self.assertFalse(store.delta(store.snapshot()["version"] + 1)["delta"])
+
+    def test_timeseries_queries_rolled_up_resolutions(self):
+        store = DashboardStore()
+        for sec in range(600, 630):
+            store.record(flow=2, acl_drop=sec % 2)
+            store.tick_1s(now=sec)
+
+        tens = store.timeseries(resolution=10)
+
+        self.assertEqual(tens["t"], [600, 610, 620])
+        self.assertEqual(tens["sum"]["flows"], [20, 20, 20])
+        self.assertEqual(tens["max"]["acl_drops"], [1, 1, 1])
+        self.assertEqual(store.timeseries(resolution=1, start=625, end=629)["sum"]["acl_drops"], [1, 0, 1, 0, 1])
+        with self.assertRaises(ValueError):
+            store.timeseries(resolution=7)
+
+    def test_ticks_within_one_second_keep_separate_points(self):
+        store = DashboardStore()
+        store.inc_flow()
+        store.tick_1s(now=100.2)
+        store.tick_1s(now=100.9)
+
+        self.assertEqual(store.snapshot()["timeseries"]["flows_per_sec"], [1, 0])
+
+    def test_stats_groups_are_copied_into_the_snapshot(self):
+        store = DashboardStore()
+        values = {"flow_mods_sent": 3}
+        store.set_stats("flow_programmer", values)
+        values["flow_mods_sent"] = 4
+
+        snapshot = store.snapshot()
+
+        self.assertEqual(snapshot["stats"], {"flow_programmer": {"flow_mods_sent": 3}})
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,145 @@
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import ryu_stubs
+
+ryu_stubs.install()
+
+from src.controller.quarantine import Quarantine  # noqa: E402
+from src.web.dashboard_wsgi import DashboardWSGI  # noqa: E402
+from src.web.journal import EventJournal  # noqa: E402
+from src.web.profiler import Profiler  # noqa: E402
+from src.web.static_assets import STATIC_DIR, StaticAssets  # noqa: E402
+from src.web.store import DashboardStore  # noqa: E402
+
+T0 = 1_700_000_000.0
+TOKEN = "s3cret"
+ADMIN = "adm1n"
+
+
+def request(params=None, remote_addr="127.0.0.1", token=None):
+    headers = {} if token is None else {"Authorization": f"Bearer {token}"}
+    params = dict(params or {})
+    return SimpleNamespace(GET=params, params=params, headers=headers, remote_addr=remote_addr, if_none_match=())
+
+
+class DashboardWSGITest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.journal = EventJournal(tmp.name).start()
+        self.addCleanup(self.journal.close)
+        self.store = DashboardStore(journal=self.journal)
+        self.quarantine = Quarantine(base_s=60.0)
+        self.released = []
+
+    def controller(self, **data):
+        def release_source(src_ip, forget=False):
+            self.released.append((src_ip, forget))
+            return self.quarantine.release(src_ip, forget=forget)
+
+        data = dict({
+            "store": self.store, "journal": self.journal, "assets": StaticAssets(STATIC_DIR),
+            "quarantine": self.quarantine, "release_source": release_source,
+        }, **data)
+        return DashboardWSGI(None, None, data)
+
+    def test_timeseries_returns_the_requested_buckets(self):
+        for sec in range(5):
+            self.store.record(flow=2)
+            self.store.tick_1s(now=T0 + sec)
+
+        resp = self.controller().api_timeseries(request({"from": T0, "to": T0 + 4}))
+
+        self.assertEqual(resp.status_int, 200)
+        series = resp.json()
+        self.assertEqual((series["start"], series["end"]), (int(T0), int(T0) + 4))
+
+    def test_timeseries_rejects_bad_parameters(self):
+        wsgi = self.controller()
+
+        self.assertEqual(wsgi.api_timeseries(request({"resolution": "x"})).status_int, 400)
+        self.assertEqual(wsgi.api_timeseries(request({"resolution": 7})).status_int, 400)
+        self.assertEqual(wsgi.api_timeseries(request({"from": "soon"})).status_int, 400)
+        self.assertEqual(wsgi.api_timeseries(request({"from": "inf"})).status_int, 400)
+        self.assertEqual(wsgi.api_timeseries(request({"to": "nan"})).status_int, 400)
+        self.assertEqual(wsgi.api_timeseries(request({"to": "1e400"})).status_int, 400)
+
+    def test_timeseries_clamps_far_off_bounds_to_recorded_seconds(self):
+        for sec in range(5):
+            self.store.record(flow=2)
+            self.store.tick_1s(now=T0 + sec)
+
+        resp = self.controller().api_timeseries(request({"from": -1e30, "to": 1e300}))
+        early = self.controller().api_timeseries(request({"from": 1e300, "to": -1e30}))
+
+        self.assertEqual(resp.status_int, 200)
+        self.assertEqual(resp.json()["end"], int(T0) + 4)
+        self.assertEqual(resp.json()["sum"]["flows"], [2] * 5)
+        self.assertEqual((early.status_int, early.json()["t"]), (200, []))
+
+    def test_events_come_from_the_journal(self):
+        for i in range(5):
+            self.journal.append(T0 + i, "WARN" if i % 2 else "INFO", "ACL DROP", {"i": i})
+        self.journal.flush()
+
+        resp = self.controller().api_events(request({"from": T0, "to": T0 + 10, "level": "warn"}))
+
+        body = resp.json()
+        self.assertEqual(resp.status_int, 200)
+        self.assertEqual([e["extra"]["i"] for e in body["events"]], [1, 3])
+        self.assertFalse(body["truncated"])
+        self.assertEqual(self.controller().api_events(request({"limit": "many"})).status_int, 400)
+        self.assertEqual(self.controller(journal=None).api_events(request()).status_int, 404)
+
+    def test_quarantine_release_needs_the_admin_token_not_the_debug_token(self):
+        self.quarantine.offend("10.0.0.5")
+
+        unset = self.controller(debug_token=TOKEN).api_quarantine_release(request({"src": "10.0.0.5"}, token=TOKEN))
+        debug = self.controller(debug_token=TOKEN, admin_token=ADMIN).api_quarantine_release(
+            request({"src": "10.0.0.5"}, token=TOKEN))
+
+        self.assertEqual(unset.status_int, 403)
+        self.assertEqual(debug.status_int, 401)
+        self.assertEqual(self.released, [])
+
+    def test_quarantine_release_checks_peer_and_token(self):
+        self.quarantine.offend("10.0.0.5")
+        wsgi = self.controller(admin_token=ADMIN)
+
+        remote = wsgi.api_quarantine_release(request({"src": "10.0.0.5"}, remote_addr="10.0.0.9", token=ADMIN))
+        wrong = wsgi.api_quarantine_release(request({"src": "10.0.0.5"}, token="guess"))
+
+        self.assertEqual(remote.status_int, 403)
+        self.assertEqual((wrong.status_int, wrong.headers["WWW-Authenticate"]), (401, "Bearer"))
+        self.assertEqual(self.released, [])
+
+    def test_quarantine_release_lifts_the_block(self):
+        self.quarantine.offend("10.0.0.5")
+        wsgi = self.controller(admin_token=ADMIN)
+
+        resp = wsgi.api_quarantine_release(request({"src": "10.0.0.5", "forget": "1"}, token=ADMIN))
+
+        self.assertEqual((resp.status_int, resp.json()), (200, {"released": "10.0.0.5"}))
+        self.assertEqual(self.released, [("10.0.0.5", True)])
+        self.assertEqual(self.quarantine.remaining("10.0.0.5"), 0)
+        self.assertEqual(wsgi.api_quarantine_release(request({"src": "10.0.0.5"}, token=ADMIN)).status_int, 404)
+        self.assertEqual(wsgi.api_quarantine_release(request({"src": "nope"}, token=ADMIN)).status_int, 400)
+
+    def test_debug_endpoints_are_off_without_a_profiler(self):
+        resp = self.controller(debug_token=TOKEN).debug_profile(request(token=TOKEN))
+
+        self.assertEqual(resp.status_int, 404)
+
+    def test_debug_endpoints_need_loopback_and_the_bearer_token(self):
+        wsgi = self.controller(debug_token=TOKEN, profiler=Profiler())
+
+        self.assertEqual(wsgi.debug_profile(request()).status_int, 401)
+        self.assertEqual(wsgi.debug_profile(request(remote_addr="10.0.0.9", token=TOKEN)).status_int, 403)
+        resp = wsgi.debug_profile(request(token=TOKEN))
+        self.assertEqual((resp.status_int, resp.json()["running"]), (200, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+
+from src.controller.flow_granularity import (
+    FINE, FINE_COOKIE, FINE_PRIORITY, PAIR, PAIR_COOKIE, PAIR_PRIORITY, SUBNET, SUBNET_COOKIE, SUBNET_PRIORITY, FlowGranularity,
+)
+
+
+def promote(policy, src_ip, dst_ip="10.0.0.2", now=100.0):
+    for i in range(policy.promote_after_flows):
+        policy.observe(src_ip, dst_ip, now=now - 100 + i * policy.promote_after_s / policy.promote_after_flows)
+    policy.observe(src_ip, dst_ip, now=now)
+
+
+class FlowGranularityTest(unittest.TestCase):
+    def test_new_sources_get_port_specific_flows(self):
+        policy = FlowGranularity()
+
+        fields, priority, cookie = policy.rule("10.0.0.1", "10.0.0.2", 6, 443, now=0)
+
+        self.assertEqual(fields["tcp_dst"], 443)
+        self.assertEqual((priority, cookie), (FINE_PRIORITY, FINE_COOKIE))
+
+    def test_promotion_needs_both_time_and_clean_flows(self):
+        policy = FlowGranularity(promote_after_s=60, promote_after_flows=20)
+
+        for i in range(100):
+            policy.observe("10.0.0.1", "10.0.0.2", now=i * 0.1)
+        self.assertEqual(policy.level("10.0.0.1", "10.0.0.2", now=10), FINE)
+        policy.observe("10.0.0.1", "10.0.0.2", now=61)
+
+        fields, priority, cookie = policy.rule("10.0.0.1", "10.0.0.2", 6, 443, now=61)
+        self.assertEqual(fields, {"eth_type": 0x0800, "ipv4_src": "10.0.0.1", "ipv4_dst": "10.0.0.2"})
+        self.assertEqual((priority, cookie), (PAIR_PRIORITY, PAIR_COOKIE | 0x0A000001))
+
+    def test_new_peers_of_a_trusted_source_stay_port_specific(self):
+        policy = FlowGranularity(promote_after_s=60)
+        promote(policy, "10.0.0.1")
+
+        policy.observe("10.0.0.1", "10.0.0.9", now=100)
+
+        self.assertEqual(policy.level("10.0.0.1", "10.0.0.9", now=159), FINE)
+        self.assertEqual(policy.level("10.0.0.1", "10.0.0.9", now=160), PAIR)
+
+    def test_enough_trusted_sources_widen_to_the_subnet(self):
+        policy = FlowGranularity(subnet_min_sources=3)
+
+        for host in (1, 2):
+            promote(policy, f"10.0.1.{host}")
+        self.assertEqual(policy.level("10.0.1.1", "10.0.0.2", now=100), PAIR)
+        promote(policy, "10.0.1.3")
+
+        fields, priority, cookie = policy.rule("10.0.1.1", "10.0.0.2", 17, 53, now=100)
+        self.assertEqual(fields["ipv4_src"], ("10.0.1.0", "255.255.255.0"))
+        self.assertEqual((priority, cookie), (SUBNET_PRIORITY, SUBNET_COOKIE | 0x0A000100))
+        self.assertEqual(policy.level("10.0.2.1", "10.0.0.2", now=100), FINE)
+
+    def test_alert_demotes_source_and_subnet_for_the_probation(self):
+        policy = FlowGranularity(subnet_min_sources=2, probation_s=600)
+        for host in (1, 2, 3):
+            promote(policy, f"10.0.1.{host}")
+
+        cookies = policy.demote("10.0.1.1", now=100)
+
+        self.assertEqual(cookies, [PAIR_COOKIE | 0x0A000101, SUBNET_COOKIE | 0x0A000100])
+        self.assertEqual(policy.level("10.0.1.1", "10.0.0.2", now=101), FINE)
+        self.assertEqual(policy.level("10.0.1.2", "10.0.0.2", now=101), PAIR)
+        self.assertEqual(policy.level("10.0.1.2", "10.0.0.2", now=701), SUBNET)
+        promote(policy, "10.0.1.1", now=650)
+        self.assertEqual(policy.level("10.0.1.1", "10.0.0.2", now=650), FINE)
+        self.assertEqual(policy.stats()["demotions"], 1)
+
+    def test_subnet_demotion_keeps_its_sources_trusted(self):
+        policy = FlowGranularity(subnet_min_sources=2, probation_s=600)
+        for host in (1, 2):
+            promote(policy, f"10.0.1.{host}")
+
+        cookies = policy.demote_subnet("10.0.1.0", now=100)
+
+        self.assertEqual(cookies, [SUBNET_COOKIE | 0x0A000100])
+        self.assertEqual(policy.level("10.0.1.1", "10.0.0.2", now=101), PAIR)
+        self.assertEqual(policy.level("10.0.1.1", "10.0.0.2", now=701), SUBNET)
+        self.assertNotIn("10.0.1.0", policy._sources)
+
+    def test_untrusted_sources_of_a_subnet_level_subnet_need_a_punt(self):
+        policy = FlowGranularity(subnet_min_sources=2, probation_s=600)
+        promote(policy, "10.0.1.1")
+        self.assertFalse(policy.needs_punt("10.0.1.9", now=100))
+
+        promote(policy, "10.0.1.2")
+
+        self.assertTrue(policy.needs_punt("10.0.1.9", now=100))
+        self.assertFalse(policy.needs_punt("10.0.1.1", now=100))
+        self.assertFalse(policy.needs_punt("10.0.2.9", now=100))
+        policy.demote("10.0.1.1", now=100)
+        self.assertFalse(policy.needs_punt("10.0.1.9", now=101))
+
+    def test_vetoed_coarse_flows_fall_back_to_finer_ones(self):
+        policy = FlowGranularity(subnet_min_sources=1, coarse_ok=lambda src, dst: src[1] == 32)
+        promote(policy, "10.0.1.1")
+
+        self.assertEqual(policy.rule("10.0.1.1", "10.0.0.2", 6, 22, now=100)[1], PAIR_PRIORITY)
+        policy.coarse_ok = lambda src, dst: False
+        self.assertEqual(policy.rule("10.0.1.1", "10.0.0.2", 6, 22, now=100)[1], FINE_PRIORITY)
+
+    def test_forgotten_sources_lose_their_trust(self):
+        policy = FlowGranularity(max_sources=2)
+        promote(policy, "10.0.0.1")
+
+        policy.observe("10.0.0.2", "10.0.0.9", now=100)
+        policy.observe("10.0.0.3", "10.0.0.9", now=100)
+
+        self.assertEqual(policy.level("10.0.0.1", "10.0.0.2", now=100), FINE)
+        self.assertEqual(policy.stats()["trusted"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+import unittest
+from types import SimpleNamespace
+
+from src.controller.flow_programmer import FlowProgrammer
+
+
+class FakeParser:
+    @staticmethod
+    def OFPMatch(**fields):
+        return fields
+
+    @staticmethod
+    def OFPInstructionActions(kind, actions):
+        return ("apply", list(actions))
+
+    @staticmethod
+    def OFPInstructionMeter(meter_id, kind):
+        return ("meter", meter_id)
+
+    @staticmethod
+    def OFPFlowMod(**kwargs):
+        kwargs.pop("datapath")
+        return SimpleNamespace(kind="flow_mod", xid=None, **kwargs)
+
+    @staticmethod
+    def OFPBarrierRequest(dp):
+        return SimpleNamespace(kind="barrier", xid=None)
+
+
+class FakeDatapath:
+    ofproto = SimpleNamespace(OFPIT_APPLY_ACTIONS=4, OFPIT_METER=6)
+    ofproto_parser = FakeParser
+
+    def __init__(self, dpid=1):
+        self.id = dpid
+        self.sent = []
+        self._xid = 0
+
+    def set_xid(self, msg):
+        self._xid += 1
+        msg.xid = self._xid
+
+    def send_msg(self, msg):
+        self.sent.append(msg)
+
+    def kinds(self):
+        return [m.kind for m in self.sent]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+FIELDS = {"eth_type": 0x0800, "ipv4_src": "10.0.0.1", "ipv4_dst": "10.0.0.2", "ip_proto": 6, "tcp_dst": 80}
+
+
+class FlowProgrammerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.programmer = FlowProgrammer(batch_size=3, dedupe_s=1.0, clock=self.clock)
+        self.dp = FakeDatapath()
+
+    def test_duplicates_of_a_pending_flow_are_suppressed(self):
+        self.assertTrue(self.programmer.add_flow(self.dp, 50, FIELDS, ["out:2"], tag=2))
+        self.assertFalse(self.programmer.add_flow(self.dp, 50, dict(reversed(list(FIELDS.items()))), ["out:2"], tag=2))
+
+        self.assertEqual(self.dp.sent, [])
+        self.programmer.flush()
+
+        self.assertEqual(self.dp.kinds(), ["flow_mod", "barrier"])
+        self.assertEqual(self.programmer.stats()["flow_mods_sent"], 1)
+        self.assertEqual(self.programmer.stats()["flow_mods_suppressed"], 1)
+
+    def test_recently_sent_flows_are_suppressed_until_the_dedupe_window_passes(self):
+        self.programmer.add_flow(self.dp, 50, FIELDS, ["out:2"], tag=2)
+        self.programmer.flush()
+
+        self.clock.now += 0.5
+        self.assertFalse(self.programmer.add_flow(self.dp, 50, FIELDS, ["out:2"], tag=2))
+        self.clock.now += 0.6
+        self.assertTrue(self.programmer.add_flow(self.dp, 50, FIELDS, ["out:2"], tag=2))
+
+    def test_a_different_tag_or_priority_is_a_different_flow(self):
+        self.programmer.add_flow(self.dp, 50, FIELDS, ["flood"], tag="flood")
+
+        self.assertTrue(self.programmer.add_flow(self.dp, 50, FIELDS, ["out:2"], tag=2))
+        self.assertTrue(self.programmer.add_flow(self.dp, 150, FIELDS, []))
+
+    def test_full_batches_flush_with_a_barrier(self):
+        for port in (80, 81, 82):
+            self.programmer.add_flow(self.dp, 50, dict(FIELDS, tcp_dst=port), ["out:2"], tag=2)
+
+        self.assertEqual(self.dp.kinds(), ["flow_mod"] * 3 + ["barrier"])
+        self.assertEqual(self.programmer.stats()["pending"], 0)
+
+    def test_barrier_reply_confirms_the_batch_and_refreshes_dedupe(self):
+        self.programmer.add_flow(self.dp, 50, FIELDS, ["out:2"], tag=2)
+        self.programmer.flush()
+        barrier = self.dp.sent[-1]
+
+        self.clock.now += 0.9
+        self.programmer.barrier_reply(self.dp.id, barrier.xid)
+        self.clock.now += 0.5
+
+        self.assertFalse(self.programmer.add_flow(self.dp, 50, FIELDS, ["out:2"], tag=2))
+        self.assertEqual(self.programmer.stats()["batches_confirmed"], 1)
+
+    def test_metered_flows_put_the_meter_instruction_first(self):
+        self.programmer.add_flow(self.dp, 0, {}, ["controller"], idle_timeout=0, meter_id=1, tag="metered")
+        self.programmer.flush()
+
+        self.assertEqual(self.dp.sent[0].instructions, [("meter", 1), ("apply", ["controller"])])
+
+    def test_datapaths_are_batched_independently(self):
+        other = FakeDatapath(2)
+        self.programmer.add_flow(self.dp, 50, FIELDS, ["out:2"], tag=2)
+        self.programmer.add_flow(other, 50, FIELDS, ["out:2"], tag=2)
+
+        self.programmer.flush(other)
+
+        self.assertEqual(self.dp.sent, [])
+        self.assertEqual(other.kinds(), ["flow_mod", "barrier"])
+
+    def test_sending_now_flushes_pending_flows_first(self):
+        self.programmer.add_flow(self.dp, 50, {"eth_dst": "00:00:00:00:00:02"}, ["out:2"], tag=2)
+
+        self.programmer.send_now(self.dp, SimpleNamespace(kind="delete", xid=None))
+
+        self.assertEqual(self.dp.kinds(), ["flow_mod", "barrier", "delete"])
+        self.assertEqual(self.programmer.stats()["pending"], 0)
+
+    def test_a_cookie_delete_sent_now_follows_a_queued_coarse_flow(self):
+        subnet = {"eth_type": 0x0800, "ipv4_src": "10.0.0.1", "ipv4_dst": ("10.0.1.0", "255.255.255.0")}
+        self.programmer.add_flow(self.dp, 40, subnet, ["out:2"], tag=2, cookie=0x5D)
+
+        self.programmer.send_now(self.dp, SimpleNamespace(kind="flow_mod", xid=None, command="delete", cookie=0x5D))
+
+        self.assertEqual(self.dp.kinds(), ["flow_mod", "barrier", "flow_mod"])
+        add, delete = self.dp.sent[0], self.dp.sent[2]
+        self.assertEqual((add.cookie, add.priority), (0x5D, 40))
+        self.assertEqual(delete.command, "delete")
+
+    def test_cancel_drops_pending_adds_for_a_match(self):
+        self.programmer.add_flow(self.dp, 50, FIELDS, ["out:2"], tag=2)
+        self.programmer.add_flow(self.dp, 50, dict(FIELDS, tcp_dst=81), ["out:2"], tag=2)
+
+        self.assertEqual(self.programmer.cancel(self.dp, 50, dict(FIELDS)), 1)
+        self.assertEqual(self.programmer.cancel(self.dp, 45, FIELDS), 0)
+        self.programmer.flush()
+
+        self.assertEqual([m.match["tcp_dst"] for m in self.dp.sent if m.kind == "flow_mod"], [81])
+
+
+if __name__ == "__main__":
+    unittest.main()
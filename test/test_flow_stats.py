@@ -0,0 +1,114 @@
+import threading
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.controller.flow_stats import RateTable, VolumetricMonitor
+
+
+def flow(match, packets, byte_count, priority=50):
+    return SimpleNamespace(table_id=0, priority=priority, match=match, packet_count=packets, byte_count=byte_count)
+
+
+class RateTableTest(unittest.TestCase):
+    def feed(self, table, rates, seconds, start=0.0):
+        """Poll once a second with each key growing by its rate in bytes/s; returns every anomaly."""
+        keys = list(range(len(rates)))
+        totals = np.zeros(len(rates), dtype=np.int64)
+        anomalies = []
+        for t in range(seconds):
+            anomalies += table.update(keys, totals // 1000, totals, start + t)
+            totals += np.asarray(rates, dtype=np.int64)
+        return anomalies
+
+    def test_rates_are_deltas_over_the_poll_interval(self):
+        table = RateTable()
+
+        table.update(["a", "b"], [0, 0], [0, 0], 10.0)
+        table.update(["a", "b"], [100, 10], [125_000, 1_000], 12.0)
+
+        top = table.top(2)
+        self.assertEqual(top[0], ("a", 500_000.0, 50.0))
+        self.assertEqual(top[1], ("b", 4_000.0, 5.0))
+
+    def test_steady_flows_raise_nothing(self):
+        table = RateTable(min_bps=1e3)
+
+        self.assertEqual(self.feed(table, [1_000_000] * 100, 30), [])
+
+    def test_surge_alerts_once_and_rearms(self):
+        table = RateTable(min_bps=1e3, flood_bps=1e12)
+        keys = [0, 1]
+        totals = np.zeros(2, dtype=np.int64)
+        fired = []
+        for t, rate in enumerate([1000] * 10 + [100_000] * 5 + [1000] * 5 + [100_000] * 2):
+            fired.append([a.key for a in table.update(keys, totals, totals, float(t))])
+            totals += np.array([1000, rate])
+
+        self.assertEqual([t for t, keys in enumerate(fired) if keys], [11, 21])
+        self.assertEqual(fired[11], [1])
+
+    def test_flood_rate_alerts_without_warmup(self):
+        table = RateTable(flood_bps=1e9)
+
+        table.update(["a"], [0], [0], 0.0)
+        anomalies = table.update(["a"], [10_000_000], [1_000_000_000], 1.0)
+
+        self.assertEqual([a.key for a in anomalies], ["a"])
+
+    def test_counter_reset_counts_from_zero(self):
+        table = RateTable()
+
+        table.update(["a"], [0], [1_000_000], 0.0)
+        table.update(["a"], [10], [1_000], 1.0)
+
+        self.assertEqual(table.top(1)[0][1], 8_000.0)
+
+    def test_idle_keys_expire_and_table_grows(self):
+        table = RateTable(idle_s=10, capacity=4)
+
+        table.update(list(range(100)), np.zeros(100), np.zeros(100), 0.0)
+        table.update([5, 7], [1, 1], [100, 200], 20.0)
+
+        self.assertEqual(table.expire(20.0), 98)
+        self.assertEqual(len(table), 2)
+        self.assertEqual([key for key, _, _ in table.top(5)], [7, 5])
+
+
+class VolumetricMonitorTest(unittest.TestCase):
+    def test_flow_and_port_replies_are_scored_per_datapath(self):
+        monitor = VolumetricMonitor(flood_bps=1e6)
+        match = {"ipv4_dst": "10.0.0.2"}.items
+
+        monitor.ingest_flows(1, [flow(SimpleNamespace(items=match), 0, 0)], now=0.0)
+        monitor.ingest_flows(2, [flow(SimpleNamespace(items=match), 0, 0)], now=0.0)
+        anomalies = monitor.ingest_flows(1, [flow(SimpleNamespace(items=match), 1000, 1_000_000)], now=1.0)
+
+        self.assertEqual([a.key[0] for a in anomalies], [1])
+        port = SimpleNamespace(port_no=3, rx_packets=0, rx_bytes=0)
+        monitor.ingest_ports(1, [port], now=0.0)
+        stats = monitor.stats()
+        self.assertEqual((stats["flows"], stats["ports"], stats["anomalies"]), (2, 1, 1))
+        self.assertEqual(stats["top_flows"][0]["match"], {"ipv4_dst": "10.0.0.2"})
+
+    def test_concurrent_flow_and_port_ingests_all_finish(self):
+        monitor = VolumetricMonitor()
+        flows = [flow(SimpleNamespace(items={"ipv4_dst": f"10.0.0.{i}"}.items), 0, 0) for i in range(200)]
+        ports = [SimpleNamespace(port_no=i, rx_packets=0, rx_bytes=0) for i in range(200)]
+        workers = []
+        for dpid in range(1, 5):
+            workers.append(threading.Thread(target=monitor.ingest_flows, args=(dpid, flows, 0.0)))
+            workers.append(threading.Thread(target=monitor.ingest_ports, args=(dpid, ports, 0.0)))
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=10)
+
+        self.assertFalse(any(worker.is_alive() for worker in workers))
+        stats = monitor.stats()
+        self.assertEqual((stats["flows"], stats["ports"]), (800, 800))
+
+
+if __name__ == "__main__":
+    unittest.main()
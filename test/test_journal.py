@@ -0,0 +1,145 @@
+import importlib.util
+import os
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+
+from src.web.journal import EventJournal
+from src.web.store import DashboardStore
+
+T0 = 1_700_000_000.0
+
+
+class EventJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def journal(self, **kwargs):
+        j = EventJournal(self.dir, **kwargs).start()
+        self.addCleanup(j.close)
+        return j
+
+    def fill(self, j, n, step=1.0):
+        for i in range(n):
+            level = "WARN" if i % 2 else "INFO"
+            j.append(T0 + i * step, level, "ACL DROP" if i % 3 == 0 else "Switch connected", {"i": i})
+        j.flush()
+
+    def test_time_range_query_returns_events_in_order(self):
+        j = self.journal(index_bytes=128)
+        self.fill(j, 100)
+
+        events = j.query(T0 + 10, T0 + 19)
+
+        self.assertEqual([e["extra"]["i"] for e in events], list(range(10, 20)))
+        self.assertTrue(events[0]["ts"].startswith("2023-11-14T22:13:30"))
+
+    def test_level_and_msg_filters(self):
+        j = self.journal()
+        self.fill(j, 30)
+
+        events = j.query(T0, T0 + 30, level="warn", msg="ACL")
+
+        self.assertEqual([e["extra"]["i"] for e in events], [3, 9, 15, 21, 27])
+
+    def test_limit(self):
+        j = self.journal()
+        self.fill(j, 30)
+
+        self.assertEqual(len(j.query(T0, T0 + 30, limit=7)), 7)
+
+    def test_segments_rotate_by_size_and_queries_span_them(self):
+        j = self.journal(segment_bytes=500)
+        self.fill(j, 100)
+
+        self.assertGreater(j.stats()["segments"], 5)
+        self.assertEqual(len(j.query(T0, T0 + 100, limit=1000)), 100)
+
+    def test_segments_rotate_by_age(self):
+        j = self.journal(segment_s=10)
+        self.fill(j, 30)
+
+        self.assertEqual(j.stats()["segments"], 3)
+
+    def test_retention_by_size_drops_oldest_segments(self):
+        j = self.journal(segment_bytes=500, max_bytes=2000)
+        self.fill(j, 200)
+
+        stats = j.stats()
+        self.assertLessEqual(stats["bytes"], 2000 + 500 + 100)
+        self.assertGreater(stats["segments_deleted"], 0)
+        self.assertEqual(j.query(T0, T0 + 200)[-1]["extra"]["i"], 199)
+        self.assertEqual(j.query(T0, T0 + 10), [])
+
+    def test_retention_by_age(self):
+        j = self.journal(segment_s=10, retention_s=1000)
+        self.fill(j, 30)
+
+        j.enforce_retention(now=T0 + 1015)
+
+        self.assertEqual(j.stats()["segments"], 2)
+
+    def test_reopening_keeps_history_and_truncates_a_torn_record(self):
+        j = EventJournal(self.dir, index_bytes=64).start()
+        self.fill(j, 20)
+        j.close()
+        seg = sorted(n for n in os.listdir(self.dir) if n.endswith(".seg"))[-1]
+        with open(os.path.join(self.dir, seg), "ab") as f:
+            f.write(b"\x00\x00\x01")
+
+        j = self.journal(index_bytes=64)
+        j.append(T0 + 20, "INFO", "after restart", {})
+        j.flush()
+
+        events = j.query(T0 + 15, T0 + 25)
+        self.assertEqual([e["msg"] for e in events][-1], "after restart")
+        self.assertEqual(len(events), 6)
+
+    def test_append_never_blocks_when_the_writer_is_behind(self):
+        j = EventJournal(self.dir, max_pending=2)
+
+        self.assertTrue(j.append(T0, "INFO", "a", {}))
+        self.assertTrue(j.append(T0, "INFO", "b", {}))
+        self.assertFalse(j.append(T0, "INFO", "c", {}))
+        self.assertEqual(j.stats()["dropped"], 1)
+
+    def test_writer_runs_on_the_given_threading_and_queue_modules(self):
+        # a separate copy of queue, like eventlet's patcher.original("queue"), has its own Full
+        spec = importlib.util.find_spec("queue")
+        queues = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(queues)
+        started = []
+
+        def thread(**kwargs):
+            started.append(kwargs["name"])
+            return threading.Thread(**kwargs)
+
+        threads = SimpleNamespace(Lock=threading.Lock, Thread=thread)
+        j = EventJournal(self.dir, max_pending=1, threads=threads, queues=queues)
+
+        self.assertTrue(j.append(T0, "INFO", "a", {}))
+        self.assertFalse(j.append(T0, "INFO", "b", {}))
+        j.start()
+        self.addCleanup(j.close)
+        j.flush()
+        self.assertEqual(started, ["event-journal"])
+        self.assertEqual([e["msg"] for e in j.query(T0, T0 + 1)], ["a"])
+
+    def test_store_log_is_journaled(self):
+        j = self.journal()
+        store = DashboardStore(journal=j)
+
+        store.log("WARN", "DDoS flagged", dst="10.0.0.2")
+        j.flush()
+
+        events = j.query(0, 4_000_000_000)
+        self.assertEqual(events[0]["extra"], {"dst": "10.0.0.2"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import unittest
+
+from src.controller.l2_learning import ARP_REPLY, ARP_REQUEST, AgingTable, L2Learning, arp_reply, parse_arp
+
+
+class AgingTableTest(unittest.TestCase):
+    def test_entries_expire_after_max_age(self):
+        table = AgingTable(capacity=10, max_age_s=5)
+
+        table.put("a", 1, now=10)
+
+        self.assertEqual(table.get("a", now=14), 1)
+        self.assertIsNone(table.get("a", now=15))
+        self.assertEqual(len(table), 0)
+
+    def test_least_recently_put_is_evicted_past_capacity(self):
+        table = AgingTable(capacity=2, max_age_s=60)
+
+        table.put("a", 1, now=1)
+        table.put("b", 2, now=2)
+        table.put("a", 1, now=3)
+        table.put("c", 3, now=4)
+
+        self.assertIsNone(table.get("b", now=5))
+        self.assertEqual((table.get("a", now=5), table.get("c", now=5)), (1, 3))
+        self.assertEqual(table.evicted, 1)
+
+    def test_put_reports_a_changed_live_value(self):
+        table = AgingTable(capacity=10, max_age_s=5)
+
+        self.assertIsNone(table.put("a", 1, now=1))
+        self.assertIsNone(table.put("a", 1, now=2))
+        self.assertEqual(table.put("a", 2, now=3), 1)
+        self.assertIsNone(table.put("a", 3, now=9))
+
+    def test_put_without_replace_keeps_a_live_value(self):
+        table = AgingTable(capacity=10, max_age_s=5)
+
+        table.put("a", 1, now=1)
+
+        self.assertEqual(table.put("a", 2, now=2, replace=False), 1)
+        self.assertEqual(table.get("a", now=2), 1)
+        self.assertIsNone(table.put("a", 2, now=6, replace=False))
+        self.assertEqual(table.get("a", now=6), 2)
+
+    def test_reverse_index_follows_changes_expiry_and_eviction(self):
+        table = AgingTable(capacity=3, max_age_s=5, reverse=True)
+
+        table.put("a", 1, now=1)
+        table.put("b", 1, now=2)
+        table.put("c", 2, now=3)
+        table.put("a", 2, now=4)
+        self.assertEqual((table.keys_for(1), table.keys_for(2)), (["b"], ["c", "a"]))
+
+        table.put("d", 2, now=4)
+        table.put("e", 3, now=4)
+        self.assertEqual(table.keys_for(1), [])
+        self.assertEqual(table.keys_for(2), ["a", "d"])
+
+        self.assertIsNone(table.get("a", now=9))
+        self.assertEqual(table.keys_for(2), ["d"])
+        self.assertEqual(table._keys.get(1), None)
+
+
+class L2LearningTest(unittest.TestCase):
+    def test_mac_tables_are_per_datapath_and_detect_moves(self):
+        l2 = L2Learning()
+
+        l2.learn_mac(1, "00:00:00:00:00:01", 1, now=0)
+        l2.learn_mac(2, "00:00:00:00:00:01", 4, now=0)
+        moved = l2.learn_mac(1, "00:00:00:00:00:01", 3, now=1)
+
+        self.assertEqual(moved, 1)
+        self.assertEqual(l2.port(1, "00:00:00:00:00:01", now=1), 3)
+        self.assertEqual(l2.port(2, "00:00:00:00:00:01", now=1), 4)
+        self.assertEqual(l2.stats()["moves"], 1)
+
+    def test_arp_bindings_map_ips_to_macs(self):
+        l2 = L2Learning()
+
+        l2.learn_arp("10.0.0.1", "00:00:00:00:00:01", now=0)
+        l2.learn_arp("10.0.0.11", "00:00:00:00:00:01", now=0)
+        l2.learn_arp("10.0.0.2", "00:00:00:00:00:02", now=0)
+
+        self.assertEqual(l2.mac_for("10.0.0.2", now=1), "00:00:00:00:00:02")
+        self.assertEqual(l2.ips_for("00:00:00:00:00:01"), ["10.0.0.1", "10.0.0.11"])
+
+    def test_a_conflicting_claim_keeps_the_binding_and_stops_answers_for_the_ip(self):
+        l2 = L2Learning(arp_age_s=60)
+        l2.learn_arp("10.0.0.1", "00:00:00:00:00:01", now=0)
+
+        conflict = l2.learn_arp("10.0.0.1", "00:00:00:00:00:66", now=1)
+
+        self.assertEqual(conflict, "00:00:00:00:00:01")
+        self.assertIsNone(l2.mac_for("10.0.0.1", now=1))
+        self.assertEqual(l2.ips_for("00:00:00:00:00:01"), ["10.0.0.1"])
+        self.assertEqual(l2.ips_for("00:00:00:00:00:66"), [])
+        self.assertEqual(l2.stats()["arp_changes"], 1)
+
+    def test_a_genuine_change_takes_over_once_the_old_binding_ages_out(self):
+        l2 = L2Learning(arp_age_s=60)
+        l2.learn_arp("10.0.0.1", "00:00:00:00:00:01", now=0)
+        l2.learn_arp("10.0.0.1", "00:00:00:00:00:66", now=30)
+
+        self.assertIsNone(l2.learn_arp("10.0.0.1", "00:00:00:00:00:66", now=61))
+        self.assertIsNone(l2.mac_for("10.0.0.1", now=61))
+        self.assertEqual(l2.mac_for("10.0.0.1", now=90), "00:00:00:00:00:66")
+
+    def test_entries_age_on_the_given_clock(self):
+        now = [0.0]
+        l2 = L2Learning(mac_age_s=60, arp_age_s=60, clock=lambda: now[0])
+
+        l2.learn_mac(1, "00:00:00:00:00:01", 1)
+        l2.learn_arp("10.0.0.1", "00:00:00:00:00:01")
+        now[0] = 60.0
+
+        self.assertIsNone(l2.port(1, "00:00:00:00:00:01"))
+        self.assertIsNone(l2.mac_for("10.0.0.1"))
+
+
+class ArpFrameTest(unittest.TestCase):
+    def test_reply_round_trips_through_the_parser(self):
+        frame = arp_reply("00:00:00:00:00:01", "10.0.0.1", "00:00:00:00:00:02", "10.0.0.2")
+
+        self.assertEqual(frame[:6], bytes.fromhex("000000000001"))
+        self.assertEqual(parse_arp(frame), (ARP_REPLY, "00:00:00:00:00:02", "10.0.0.2", "10.0.0.1"))
+
+    def test_request_is_parsed_and_non_arp_is_ignored(self):
+        request = bytearray(arp_reply("ff:ff:ff:ff:ff:ff", "10.0.0.2", "00:00:00:00:00:01", "10.0.0.1"))
+        request[20:22] = ARP_REQUEST.to_bytes(2, "big")
+
+        self.assertEqual(parse_arp(bytes(request)), (ARP_REQUEST, "00:00:00:00:00:01", "10.0.0.1", "10.0.0.2"))
+        self.assertIsNone(parse_arp(bytes(request[:12]) + b"\x08\x00" + bytes(request[14:])))
+        self.assertIsNone(parse_arp(request[:30]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+
+from src.web.metrics import NULL_TIMER, Metrics
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.metrics = Metrics(buckets=(0.001, 0.01), clock=self.clock)
+        self.metrics.histogram("handler_seconds", "Handler time by stage.")
+        self.metrics.counter("packets_total", "Packets.", label="dpid")
+
+    def test_stage_timer_records_each_stage_and_the_total(self):
+        timer = self.metrics.timer("handler_seconds")
+        self.clock.now = 0.0005
+        timer.mark("parse")
+        self.clock.now = 0.0055
+        timer.mark("acl")
+        timer.finish()
+
+        text = self.metrics.render().decode()
+
+        self.assertIn('handler_seconds_bucket{stage="parse",le="0.001"} 1', text)
+        self.assertIn('handler_seconds_bucket{stage="acl",le="0.001"} 0', text)
+        self.assertIn('handler_seconds_bucket{stage="acl",le="0.01"} 1', text)
+        self.assertIn('handler_seconds_bucket{stage="total",le="+Inf"} 1', text)
+        self.assertIn('handler_seconds_count{stage="total"} 1', text)
+        self.assertIn("# TYPE handler_seconds histogram", text)
+
+    def test_buckets_are_cumulative_and_inclusive(self):
+        for value in (0.001, 0.002, 5.0):
+            timer = self.metrics.timer("handler_seconds")
+            self.clock.now += value
+            timer.finish()
+
+        text = self.metrics.render().decode()
+
+        self.assertIn('handler_seconds_bucket{stage="total",le="0.001"} 1', text)
+        self.assertIn('handler_seconds_bucket{stage="total",le="0.01"} 2', text)
+        self.assertIn('handler_seconds_bucket{stage="total",le="+Inf"} 3', text)
+
+    def test_counters_and_gauges(self):
+        self.metrics.inc("packets_total", 1)
+        self.metrics.inc("packets_total", 1)
+        self.metrics.inc("packets_total", 2, amount=5)
+        self.metrics.gauge("queue_depth", "Queued events.", lambda: 7)
+
+        text = self.metrics.render().decode()
+
+        self.assertIn('packets_total{dpid="1"} 2', text)
+        self.assertIn('packets_total{dpid="2"} 5', text)
+        self.assertIn("queue_depth 7", text)
+
+    def test_counter_read_from_a_callback(self):
+        self.metrics.counter("shed_total", "Records shed.", label="kind", fn=lambda: {"event": 3, "detect": 0})
+
+        text = self.metrics.render().decode()
+
+        self.assertIn("# TYPE shed_total counter", text)
+        self.assertIn('shed_total{kind="event"} 3', text)
+        self.assertIn('shed_total{kind="detect"} 0', text)
+
+    def test_sampling_times_one_call_in_n(self):
+        metrics = Metrics(clock=self.clock)
+        metrics.histogram("handler_seconds", "Handler time by stage.", sample_every=4)
+
+        timers = [metrics.timer("handler_seconds") for _ in range(8)]
+        for timer in timers:
+            timer.finish()
+
+        self.assertEqual(sum(t is not NULL_TIMER for t in timers), 2)
+        self.assertIn('handler_seconds_count{stage="total"} 2', metrics.render().decode())
+
+    def test_disabled_metrics_record_nothing(self):
+        metrics = Metrics(enabled=False)
+        metrics.histogram("handler_seconds", "Handler time by stage.")
+        metrics.counter("packets_total", "Packets.", label="dpid")
+
+        self.assertIs(metrics.timer("handler_seconds"), NULL_TIMER)
+        metrics.inc("packets_total", 1)
+
+        self.assertNotIn("packets_total{", metrics.render().decode())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import struct
+import unittest
+
+from src.controller.packet_headers import PacketHeaders, parse_headers
+
+H1_MAC = "00:00:00:00:00:01"
+H2_MAC = "00:00:00:00:00:02"
+
+
+def ethernet(dst=H2_MAC, src=H1_MAC, ethertype=0x0800, vlans=()):
+    header = bytes.fromhex(dst.replace(":", "")) + bytes.fromhex(src.replace(":", ""))
+    for vid in vlans:
+        header += struct.pack("!HH", 0x8100, vid)
+    return header + struct.pack("!H", ethertype)
+
+
+def ipv4(proto, src="10.0.0.1", dst="10.0.0.2", ihl=5, frag=0):
+    options = b"\x01" * ((ihl - 5) * 4)
+    return struct.pack(
+        "!BBHHHBBH4s4s", 0x40 | ihl, 0, 0, 0, frag, 64, proto, 0,
+        bytes(map(int, src.split("."))), bytes(map(int, dst.split("."))),
+    ) + options
+
+
+def ports(src_port, dst_port):
+    return struct.pack("!HH", src_port, dst_port) + b"\0" * 16
+
+
+class PacketHeadersTest(unittest.TestCase):
+    def test_tcp_frame_yields_addresses_protocol_and_destination_port(self):
+        hdr = parse_headers(ethernet() + ipv4(6) + ports(40000, 22))
+
+        self.assertEqual(hdr, PacketHeaders(H1_MAC, H2_MAC, 0x0800, "10.0.0.1", "10.0.0.2", 6, 22))
+        self.assertTrue(hdr.is_ipv4)
+
+    def test_udp_frame_after_ip_options_reads_the_right_port(self):
+        hdr = parse_headers(ethernet() + ipv4(17, ihl=7) + ports(5353, 53))
+
+        self.assertEqual(hdr.proto, 17)
+        self.assertEqual(hdr.dst_port, 53)
+
+    def test_vlan_tag_is_skipped(self):
+        hdr = parse_headers(ethernet(vlans=(10,)) + ipv4(6) + ports(40000, 443))
+
+        self.assertEqual(hdr.ethertype, 0x0800)
+        self.assertEqual(hdr.dst_port, 443)
+
+    def test_non_ipv4_frame_has_only_l2_fields(self):
+        hdr = parse_headers(ethernet(dst="ff:ff:ff:ff:ff:ff", ethertype=0x0806) + b"\0" * 28)
+
+        self.assertEqual(hdr.dst_mac, "ff:ff:ff:ff:ff:ff")
+        self.assertEqual(hdr.ethertype, 0x0806)
+        self.assertFalse(hdr.is_ipv4)
+        self.assertIsNone(hdr.dst_port)
+
+    def test_icmp_and_non_first_fragments_have_no_port(self):
+        self.assertIsNone(parse_headers(ethernet() + ipv4(1) + b"\0" * 8).dst_port)
+        self.assertIsNone(parse_headers(ethernet() + ipv4(6, frag=0x0010) + ports(40000, 22)).dst_port)
+
+    def test_truncated_transport_header_keeps_ip_fields(self):
+        hdr = parse_headers(ethernet() + ipv4(6) + b"\x9c")
+
+        self.assertEqual(hdr.dst_ip, "10.0.0.2")
+        self.assertIsNone(hdr.dst_port)
+
+    def test_unusual_frames_are_left_to_the_full_parser(self):
+        self.assertIsNone(parse_headers(b"\0" * 10))
+        self.assertIsNone(parse_headers(ethernet() + b"\x45\0\0"))
+        self.assertIsNone(parse_headers(ethernet(vlans=(10, 20)) + ipv4(6) + ports(1, 2)))
+        self.assertIsNone(parse_headers(ethernet() + ipv4(6, ihl=4) + ports(1, 2)))
+
+    def test_accepts_bytearray_frames(self):
+        hdr = parse_headers(bytearray(ethernet() + ipv4(17) + ports(1, 123)))
+
+        self.assertEqual(hdr.dst_port, 123)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -41,6 +41,71 @@ class PortScanDetectorTest(unittest.TestCase):
         self.assertFalse(detector.should_alert("10.0.0.2", 1003, now=18))
         self.assertTrue(detector.should_alert("10.0.0.2", 1004, now=19))
 
+    def test_repeated_ports_are_counted_by_their_latest_sighting(self):
+        detector = PortScanDetector(window_s=5, threshold_ports=3)
+
+        detector.flag("10.0.0.2", 1000, now=10)
+        detector.flag("10.0.0.2", 1001, now=11)
+        detector.flag("10.0.0.2", 1000, now=15)
+        self.assertTrue(detector.flag("10.0.0.2", 1002, now=16))
+        self.assertEqual(detector.tracked_entries, 2 + 1)
+
+    def test_idle_destinations_are_evicted(self):
+        detector = PortScanDetector(window_s=5, threshold_ports=3)
+
+        detector.flag("10.0.0.2", 1000, now=10)
+        detector.flag("10.0.0.3", 1000, now=12)
+        detector.flag("10.0.0.4", 1000, now=16)
+
+        self.assertEqual(detector.tracked_destinations, 2)
+        self.assertEqual(detector.tracked_entries, 2)
+
+    def test_entry_cap_drops_the_least_recently_active_destination(self):
+        detector = PortScanDetector(window_s=5, threshold_ports=3, max_entries=3)
+
+        detector.flag("10.0.0.2", 1000, now=10)
+        detector.flag("10.0.0.2", 1001, now=10)
+        detector.flag("10.0.0.3", 1000, now=11)
+        detector.flag("10.0.0.3", 1001, now=11)
+
+        self.assertEqual(detector.tracked_destinations, 1)
+        self.assertEqual(detector.tracked_entries, 2)
+        self.assertTrue(detector.flag("10.0.0.3", 1002, now=12))
+
+    def test_a_busy_servers_client_is_not_blamed_for_a_scan(self):
+        detector = PortScanDetector(window_s=5, threshold_ports=10, source_ports=4)
+
+        for i in range(9):
+            detector.flag("10.0.0.2", 80, now=10 + i * 0.1, src_ip="10.0.0.1")
+            detector.flag("10.0.0.2", 2000 + i, now=10 + i * 0.1, src_ip="10.0.0.66")
+        # the client's request to a second service is the probe that crosses the threshold
+        self.assertTrue(detector.should_alert("10.0.0.2", 443, now=11, src_ip="10.0.0.1"))
+
+        self.assertFalse(detector.is_scanner("10.0.0.2", "10.0.0.1"))
+        self.assertTrue(detector.is_scanner("10.0.0.2", "10.0.0.66"))
+
+    def test_every_source_of_a_distributed_scan_is_attributed(self):
+        detector = PortScanDetector(window_s=5, threshold_ports=10, source_ports=4)
+
+        alerts = [detector.should_alert("10.0.0.2", base + port, now=10, src_ip=src)
+                  for base, src in ((2000, "10.0.0.66"), (3000, "10.0.0.67")) for port in range(6)]
+
+        self.assertEqual(alerts.count(True), 1)
+        self.assertTrue(detector.is_scanner("10.0.0.2", "10.0.0.66"))
+        self.assertTrue(detector.is_scanner("10.0.0.2", "10.0.0.67"))
+        self.assertFalse(detector.is_scanner("10.0.0.3", "10.0.0.66"))
+
+    def test_expired_ports_no_longer_count_toward_a_source(self):
+        detector = PortScanDetector(window_s=5, threshold_ports=4, source_ports=3)
+
+        for port in range(3):
+            detector.flag("10.0.0.2", 2000 + port, now=10, src_ip="10.0.0.66")
+        for port in range(4):
+            detector.flag("10.0.0.2", 3000 + port, now=16, src_ip="10.0.0.1")
+
+        self.assertFalse(detector.is_scanner("10.0.0.2", "10.0.0.66"))
+        self.assertTrue(detector.is_scanner("10.0.0.2", "10.0.0.1"))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,120 @@
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import unittest
+
+from src.web.profiler import Profiler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def packet_in_handler(n):
+    return sum(i * i for i in range(n))
+
+
+def spin_handler(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class ProfilerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.profiler = Profiler(handler_file=__file__, clock=self.clock)
+        self.addCleanup(self.profiler.stop)
+        self.addCleanup(self.profiler.memory_stop)
+
+    def test_idle_profiler_hooks_nothing(self):
+        self.assertIsNone(sys.getprofile())
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertEqual(self.profiler.status(), {"running": None, "memory_tracing": False})
+        self.assertIsNone(self.profiler.summary())
+        self.assertIsNone(self.profiler.download())
+
+    def test_cpu_profile_counts_handler_calls_and_downloads_as_pstats(self):
+        self.profiler.start("cpu", seconds=10)
+        for _ in range(3):
+            packet_in_handler(1000)
+        summary = self.profiler.stop()
+
+        self.assertEqual(summary["handlers"]["packet_in_handler"]["calls"], 3)
+        self.assertIsNone(sys.getprofile())
+        name, _, body = self.profiler.download()
+        self.assertTrue(name.endswith(".pstats"))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, name)
+            with open(path, "wb") as f:
+                f.write(body)
+            stats = pstats.Stats(path)
+        self.assertTrue(any(func[2] == "packet_in_handler" for func in stats.stats))
+
+    def test_sampler_sees_the_busy_thread(self):
+        stop = threading.Event()
+        worker = threading.Thread(target=spin_handler, args=(stop,))
+        worker.start()
+        self.addCleanup(worker.join)
+        self.addCleanup(stop.set)
+        self.profiler.start("sample", seconds=10, interval_ms=1)
+        time.sleep(0.2)
+        summary = self.profiler.stop()
+
+        self.assertGreater(summary["samples"], 10)
+        self.assertGreater(summary["handlers"]["spin_handler"]["samples"], 10)
+        name, _, body = self.profiler.download()
+        self.assertTrue(name.endswith(".collapsed"))
+        line = next(line for line in body.decode().splitlines() if "spin_handler" in line)
+        stack, count = line.rsplit(" ", 1)
+        self.assertIn(";spin_handler (test/test_profiler.py:", stack)
+        self.assertGreater(int(count), 0)
+
+    def test_session_ends_at_its_deadline(self):
+        self.profiler.start("cpu", seconds=5)
+        self.clock.now = 4.9
+        self.profiler.expire()
+        self.assertEqual(self.profiler.status()["running"], "cpu")
+
+        self.clock.now = 5.0
+        self.profiler.expire()
+
+        self.assertIsNone(self.profiler.status()["running"])
+        self.assertEqual(self.profiler.status()["last"]["mode"], "cpu")
+
+    def test_bad_arguments_and_overlapping_sessions(self):
+        with self.assertRaises(ValueError):
+            self.profiler.start("trace")
+        with self.assertRaises(ValueError):
+            self.profiler.start("cpu", seconds=3600)
+        self.profiler.start("cpu")
+        with self.assertRaises(RuntimeError):
+            self.profiler.start("sample")
+
+    def test_memory_snapshot_names_the_allocating_line_and_its_growth(self):
+        with self.assertRaises(RuntimeError):
+            self.profiler.memory_snapshot()
+        self.profiler.memory_start(seconds=60)
+        held = [bytearray(1024) for _ in range(100)]
+        first = self.profiler.memory_snapshot(top=5)
+        held += [bytearray(1024) for _ in range(400)]
+        second = self.profiler.memory_snapshot(top=5)
+
+        self.assertIn("test/test_profiler.py:", first["top"][0]["where"][0])
+        self.assertGreater(second["top"][0]["size_kib"], 400)
+        self.assertGreater(second["top"][0]["growth_kib"], 300)
+        self.clock.now = 60
+        self.profiler.expire()
+        self.assertFalse(tracemalloc.is_tracing())
+        del held
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+
+from src.controller.quarantine import Quarantine
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class QuarantineTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.quarantine = Quarantine(base_s=60, factor=2, max_s=300, forget_s=3600,
+                                     allow=["10.0.0.0/30", ""], clock=self.clock)
+
+    def test_repeat_offences_escalate_up_to_the_cap(self):
+        lengths = []
+        for _ in range(5):
+            lengths.append(self.quarantine.offend("10.0.1.5"))
+            self.clock.now += lengths[-1]
+
+        self.assertEqual(lengths, [60, 120, 240, 300, 300])
+        self.assertEqual(self.quarantine.offences("10.0.1.5"), 5)
+
+    def test_alert_while_blocked_does_not_escalate(self):
+        self.quarantine.offend("10.0.1.5")
+        self.clock.now += 20
+
+        self.assertEqual(self.quarantine.offend("10.0.1.5"), 40)
+        self.assertEqual(self.quarantine.offences("10.0.1.5"), 1)
+        self.assertEqual(self.quarantine.remaining("10.0.1.5"), 40)
+
+    def test_allowlisted_sources_are_never_blocked(self):
+        self.assertEqual(self.quarantine.offend("10.0.0.2"), 0)
+
+        self.assertEqual(self.quarantine.remaining("10.0.0.2"), 0)
+        self.assertEqual(self.quarantine.stats()["allowlisted"], 1)
+        self.assertEqual(self.quarantine.offend("10.0.0.4"), 60)
+
+    def test_expiry_and_forgetting(self):
+        self.quarantine.offend("10.0.1.5")
+        self.clock.now += 59
+        self.assertEqual(self.quarantine.expire(), [])
+        self.clock.now += 1
+
+        self.assertEqual(self.quarantine.expire(), ["10.0.1.5"])
+        self.assertEqual(self.quarantine.remaining("10.0.1.5"), 0)
+        self.assertEqual(self.quarantine.expire(), [])
+        # an offence within forget_s still counts
+        self.clock.now += 3000
+        self.assertEqual(self.quarantine.offend("10.0.1.5"), 120)
+        self.clock.now += 120 + 3601
+        self.quarantine.expire()
+        self.assertEqual(self.quarantine.entries(), [])
+        self.assertEqual(self.quarantine.offend("10.0.1.5"), 60)
+
+    def test_release(self):
+        self.assertFalse(self.quarantine.release("10.0.1.5"))
+        self.quarantine.offend("10.0.1.5")
+        self.quarantine.offend("10.0.1.6")
+
+        self.assertTrue(self.quarantine.release("10.0.1.5"))
+        self.assertTrue(self.quarantine.release("10.0.1.6", forget=True))
+
+        self.assertEqual(self.quarantine.blocked(), {})
+        self.assertEqual(self.quarantine.offend("10.0.1.5"), 120)
+        self.assertEqual(self.quarantine.offend("10.0.1.6"), 60)
+        self.assertEqual(self.quarantine.stats()["released"], 2)
+
+    def test_entries_list_blocked_sources_first(self):
+        self.quarantine.offend("10.0.1.5")
+        self.clock.now += 60
+        self.quarantine.offend("10.0.1.6")
+        self.clock.now += 10
+
+        rows = self.quarantine.entries()
+
+        self.assertEqual([row["src"] for row in rows], ["10.0.1.6", "10.0.1.5"])
+        self.assertEqual(rows[0]["remaining_s"], 50)
+        self.assertEqual(self.quarantine.blocked(), {"10.0.1.6": 50})
+
+    def test_state_round_trip(self):
+        self.quarantine.offend("10.0.1.5")
+        restored = Quarantine(base_s=60, factor=2, max_s=300, clock=self.clock)
+
+        self.assertEqual(restored.restore_state(self.quarantine.export_state()), 1)
+        self.assertEqual(restored.remaining("10.0.1.5"), 60)
+        self.clock.now += 60
+        self.assertEqual(restored.offend("10.0.1.5"), 120)
+
+
+if __name__ == "__main__":
+    unittest.main()
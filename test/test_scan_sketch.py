@@ -0,0 +1,137 @@
+import unittest
+
+from src.controller.scan_sketch import HORIZONTAL, VERTICAL, SketchScanDetector
+
+
+class SketchScanDetectorTest(unittest.TestCase):
+    def test_vertical_scan_is_flagged_near_the_threshold(self):
+        detector = SketchScanDetector(window_s=5, threshold_ports=40)
+
+        flags = [detector.flag("10.0.0.2", 1000 + i, now=10 + i * 0.01) for i in range(60)]
+
+        # hashing is seeded, so the estimate (and this index) is the same in every run
+        self.assertEqual(flags.index(True), 39)
+
+    def test_repeated_ports_are_not_a_scan(self):
+        detector = SketchScanDetector(window_s=5, threshold_ports=10)
+
+        for i in range(500):
+            self.assertFalse(detector.flag("10.0.0.2", (22, 80, 443)[i % 3], now=10 + i * 0.001))
+
+    def test_old_slices_expire(self):
+        detector = SketchScanDetector(window_s=5, threshold_ports=10)
+
+        for i in range(8):
+            detector.flag("10.0.0.2", 1000 + i, now=10)
+        self.assertFalse(detector.flag("10.0.0.2", 2000, now=16))
+        for i in range(5):
+            detector.flag("10.0.0.2", 3000 + i, now=16)
+        self.assertFalse(detector.flag("10.0.0.2", 4000, now=16))
+
+    def test_horizontal_sweep_is_flagged_per_source_and_port(self):
+        detector = SketchScanDetector(window_s=5, threshold_ports=40, threshold_hosts=20)
+
+        alerts = [
+            detector.should_alert(f"10.0.1.{i}", 445, now=10 + i * 0.01, src_ip="10.0.0.3")
+            for i in range(1, 40)
+        ]
+
+        self.assertEqual(sum(alerts), 1)
+        self.assertEqual(detector.last_alert, None)
+        # one pair of host bits collides, so the 21st host is the first to reach an estimate of 20
+        self.assertEqual(alerts.index(True) + 1, 21)
+
+    def test_alert_kind_and_alert_once(self):
+        detector = SketchScanDetector(window_s=5, threshold_ports=5)
+
+        kinds = []
+        for i in range(10):
+            if detector.should_alert("10.0.0.2", 1000 + i, now=10, src_ip="10.0.0.3"):
+                kinds.append(detector.last_alert)
+
+        self.assertEqual(kinds, [VERTICAL])
+
+    def test_many_destinations_in_a_small_sketch_do_not_look_like_scans(self):
+        detector = SketchScanDetector(window_s=5, threshold_ports=40, width=64)
+
+        flagged = sum(detector.flag(f"10.{i >> 8 & 0xFF}.{i & 0xFF}.1", (80, 443)[i % 2], now=10) for i in range(20_000))
+
+        self.assertEqual(flagged, 0)
+        self.assertLessEqual(len(detector.stats()["heavy_hitters"]), 5)
+
+    def test_horizontal_kind_is_reported(self):
+        detector = SketchScanDetector(window_s=5, threshold_ports=40, threshold_hosts=3)
+
+        kinds = [
+            detector.last_alert
+            for i in range(5)
+            if detector.should_alert(f"10.0.1.{i}", 445, now=10, src_ip="10.0.0.3")
+        ]
+
+        self.assertEqual(kinds, [HORIZONTAL])
+
+    def test_scanners_are_told_apart_from_a_busy_servers_clients(self):
+        detector = SketchScanDetector(window_s=5, threshold_ports=40)
+
+        for i in range(60):
+            detector.should_alert("10.0.0.2", 80 if i % 2 else 443, now=10, src_ip="10.0.0.1")
+            detector.should_alert("10.0.0.2", 2000 + i, now=10, src_ip="10.0.0.66")
+            detector.should_alert("10.0.0.2", 3000 + i, now=10, src_ip="10.0.0.67")
+
+        self.assertFalse(detector.is_scanner("10.0.0.2", "10.0.0.1"))
+        self.assertTrue(detector.is_scanner("10.0.0.2", "10.0.0.66"))
+        self.assertTrue(detector.is_scanner("10.0.0.2", "10.0.0.67"))
+
+    def test_a_sweeping_source_is_a_scanner_until_its_sweep_drops_under_the_threshold(self):
+        detector = SketchScanDetector(window_s=5, threshold_ports=40, threshold_hosts=3)
+
+        for i in range(5):
+            detector.should_alert(f"10.0.1.{i}", 445, now=10, src_ip="10.0.0.3")
+
+        self.assertTrue(detector.is_scanner("10.0.2.1", "10.0.0.3"))
+        self.assertFalse(detector.is_scanner("10.0.1.4", "10.0.0.4"))
+        # the window has moved past the sweep
+        detector.should_alert("10.0.1.9", 445, now=20, src_ip="10.0.0.3")
+        self.assertFalse(detector.is_scanner("10.0.2.1", "10.0.0.3"))
+
+    def test_an_evicted_sweep_no_longer_makes_its_source_a_scanner(self):
+        detector = SketchScanDetector(window_s=5, threshold_ports=40, threshold_hosts=3, max_alerts=1)
+
+        for src in ("10.0.0.3", "10.0.0.4"):
+            for i in range(3):
+                detector.should_alert(f"10.0.1.{i}", 445, now=10, src_ip=src)
+
+        self.assertFalse(detector.is_scanner("10.0.2.1", "10.0.0.3"))
+        self.assertTrue(detector.is_scanner("10.0.2.1", "10.0.0.4"))
+
+    def test_state_round_trips_into_a_fresh_detector(self):
+        detector = SketchScanDetector(window_s=5, threshold_ports=40, threshold_hosts=3, width=256)
+        for i in range(45):
+            detector.should_alert("10.0.0.2", 1000 + i, now=10, src_ip="10.0.0.66")
+        for i in range(4):
+            detector.should_alert(f"10.0.1.{i}", 445, now=10, src_ip="10.0.0.3")
+
+        state, builders = detector.export_state()
+        restored = SketchScanDetector(window_s=5, threshold_ports=40, threshold_hosts=3, width=256)
+
+        self.assertEqual(restored.restore_state(state, {name: build() for name, build in builders.items()}), 2)
+        self.assertTrue(restored.is_scanner("10.0.0.2", "10.0.0.66"))
+        self.assertTrue(restored.is_scanner("10.0.2.1", "10.0.0.3"))
+        self.assertEqual(restored.stats(), detector.stats())
+        # still in alert, so the next probe does not alert again
+        self.assertFalse(restored.should_alert("10.0.0.2", 2000, now=10.5, src_ip="10.0.0.66"))
+
+    def test_state_from_a_differently_sized_sketch_is_ignored(self):
+        detector = SketchScanDetector(window_s=5, threshold_ports=5, width=256)
+        for i in range(10):
+            detector.should_alert("10.0.0.2", 1000 + i, now=10, src_ip="10.0.0.66")
+        state, builders = detector.export_state()
+
+        restored = SketchScanDetector(window_s=5, threshold_ports=5, width=512)
+
+        self.assertEqual(restored.restore_state(state, {name: build() for name, build in builders.items()}), 0)
+        self.assertFalse(restored.is_scanner("10.0.0.2", "10.0.0.66"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,294 @@
+import os
+import struct
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import ryu_stubs
+
+ryu_stubs.install()
+
+from bench.corpus import build_frame, ip_bytes, mac_bytes  # noqa: E402
+from bench.fake_datapath import FakeDatapath  # noqa: E402
+from src.controller.acl_flows import ACL_DROP_PRIORITY  # noqa: E402
+from src.controller.flow_granularity import (  # noqa: E402
+    FINE_COOKIE, FINE_PRIORITY, PAIR_COOKIE, SOURCE_PUNT_PRIORITY, SUBNET_COOKIE, SUBNET_PRIORITY,
+)
+from src.controller.flow_stats import RateAnomaly  # noqa: E402
+from src.controller.l2_learning import ARP_ETH_TYPE, ARP_REQUEST, IPV4_PUNT_PRIORITY  # noqa: E402
+from src.controller.quarantine import QUARANTINE_PRIORITY  # noqa: E402
+from src.controller.sdn_security_app import SdnSecurityApp  # noqa: E402
+
+
+def mac(h):
+    return "00:00:00:00:00:%02x" % h
+
+
+def ip(h):
+    return f"10.0.0.{h}"
+
+
+def tcp(src, dst, port):
+    return build_frame(mac(src), mac(dst), ip(src), ip(dst), 6, 40000, port)
+
+
+def arp_request(src, dst, claim=None):
+    """`src` asks for `dst`; `claim` makes it announce another host's IP as its own."""
+    sender_ip = ip(src if claim is None else claim)
+    payload = struct.pack("!HHBBH6s4s6s4s", 1, 0x0800, 6, 4, ARP_REQUEST, mac_bytes(mac(src)), ip_bytes(sender_ip),
+                          b"\0" * 6, ip_bytes(ip(dst)))
+    return build_frame(mac(src), "ff:ff:ff:ff:ff:ff", ethertype=ARP_ETH_TYPE, payload=payload)
+
+
+class WSGIRegistry:
+    def __init__(self):
+        self.controllers = []
+
+    def register(self, controller, data=None):
+        self.controllers.append((controller, data))
+
+
+class AppTestCase(unittest.TestCase):
+    """A fresh app with one FakeDatapath connected; `env` adds SDN_* settings."""
+
+    env = {}
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.env = dict(self.env, SDN_JOURNAL_DIR=tmp.name, SDN_CHECKPOINT="")
+        self.app = self.build_app()
+        self.dp = FakeDatapath(1)
+        self.app.switch_features_handler(SimpleNamespace(msg=SimpleNamespace(datapath=self.dp)))
+
+    def build_app(self):
+        app = SdnSecurityApp(wsgi=WSGIRegistry(), env=self.env)
+        self.addCleanup(app.journal.close)
+        ryu_stubs.take_spawned()
+        return app
+
+    def packet_in(self, frame, in_port):
+        self.app.packet_in_handler(SimpleNamespace(msg=SimpleNamespace(
+            datapath=self.dp, match={"in_port": in_port}, data=frame,
+        )))
+
+    def run_spawned(self):
+        for fn, args in ryu_stubs.take_spawned():
+            fn(*args)
+
+    def analyze(self):
+        self.app._analyze(self.app.analytics.drain(len(self.app.analytics)))
+
+    def sent(self, msg_type):
+        self.app.flow_programmer.flush()
+        return [m for m in self.dp.sent if m.msg_type == msg_type]
+
+    def flows(self, priority):
+        add = self.dp.ofproto.OFPFC_ADD
+        return [m for m in self.sent("OFPFlowMod") if m.fields.get("command", add) == add and m.priority == priority]
+
+    def logged(self):
+        return [e["msg"] for e in self.app.store.snapshot()["last_events"]]
+
+    def events(self, msg):
+        return [e["extra"] for e in self.app.store.snapshot()["last_events"] if e["msg"] == msg]
+
+
+class SwitchConnectTest(AppTestCase):
+    def test_punt_and_acl_flows_are_installed_and_flows_requested(self):
+        punts = self.flows(0) + self.flows(IPV4_PUNT_PRIORITY)
+        acl = self.flows(ACL_DROP_PRIORITY)
+
+        self.assertEqual(len(punts), 2)
+        self.assertEqual(punts[0].instructions[0].args[1][0].args[0], self.dp.ofproto.OFPP_CONTROLLER)
+        self.assertEqual([m.match.tcp_dst for m in acl], [22])
+        self.assertEqual(len(self.sent("OFPFlowStatsRequest")), 1)
+        self.assertIn(1, self.app.datapaths)
+
+    def test_flows_kept_by_the_switch_are_adopted_not_reinstalled(self):
+        match = {"eth_type": 0x0800, "ipv4_src": ip(3), "ipv4_dst": ip(4), "ip_proto": 6, "tcp_dst": 80}
+        output = SimpleNamespace(type=self.dp.ofproto.OFPAT_OUTPUT, port=4)
+        stat = SimpleNamespace(table_id=0, priority=FINE_PRIORITY, match=match, idle_timeout=30, hard_timeout=0,
+                               packet_count=5, byte_count=500, cookie=0,
+                               instructions=[SimpleNamespace(type=4, actions=[output])])
+        self.app.flow_stats_reply_handler(SimpleNamespace(msg=SimpleNamespace(datapath=self.dp, body=[stat], flags=0)))
+        # the handler only hands the reply on; the shadow table is updated by the spawned work
+        self.assertEqual(self.app.shadow.adopted, 0)
+        self.run_spawned()
+        self.packet_in(tcp(4, 3, 80), 4)
+        self.packet_in(tcp(3, 4, 80), 3)
+
+        self.assertEqual([m.match.ipv4_src for m in self.flows(FINE_PRIORITY)], [ip(4)])
+        self.assertIn("Flows adopted", self.logged())
+
+
+class PacketInTest(AppTestCase):
+    def test_allowed_traffic_gets_a_fine_flow_to_the_learned_port(self):
+        self.packet_in(tcp(4, 3, 80), 4)
+        self.packet_in(tcp(3, 4, 80), 3)
+
+        flow = self.flows(FINE_PRIORITY)[-1]
+        self.assertEqual(flow.match.fields, {"eth_type": 0x0800, "ipv4_src": ip(3), "ipv4_dst": ip(4),
+                                             "ip_proto": 6, "tcp_dst": 80})
+        self.assertEqual(flow.instructions[0].args[1][0].args[0], 4)
+        self.assertEqual(self.sent("OFPPacketOut")[-1].actions[0].args[0], 4)
+        self.assertEqual(len(self.app.analytics), 2)
+        self.assertTrue(self.app._analytics_ready.is_set())
+
+    def test_denied_traffic_gets_a_drop_flow_and_no_packet_out(self):
+        self.packet_in(tcp(1, 2, 22), 1)
+
+        drops = [m for m in self.flows(ACL_DROP_PRIORITY) if m.match.fields.get("ipv4_src") == ip(1)
+                 and "ipv4_dst" in m.match.fields and m.idle_timeout]
+        self.assertEqual(drops[0].instructions[0].args[1], [])
+        self.assertEqual(self.sent("OFPPacketOut"), [])
+        self.assertEqual(self.app.store.snapshot()["counters"]["acl_drops_total"], 1)
+
+    def test_arp_for_a_known_ip_is_answered_until_a_second_mac_claims_it(self):
+        self.packet_in(arp_request(3, 4), 3)
+        self.packet_in(arp_request(5, 3), 5)
+        answered = self.sent("OFPPacketOut")[-1]
+        self.assertEqual(answered.actions[0].args[0], 5)
+
+        self.packet_in(arp_request(6, 4, claim=3), 6)
+        self.packet_in(arp_request(5, 3), 5)
+
+        self.assertEqual(self.sent("OFPPacketOut")[-1].actions[0].args[0], self.dp.ofproto.OFPP_FLOOD)
+        self.assertEqual(self.app.l2.arp.get(ip(3), self.app.l2._clock()), mac(3))
+        self.analyze()
+        self.assertIn("ARP binding disputed", self.logged())
+
+    def test_a_flooding_source_mac_is_shed_on_the_switch(self):
+        for i in range(400):
+            self.packet_in(tcp(3, 4, 1000 + i % 10), 3)
+
+        shed = self.flows(self.app.shed_priority)
+        self.assertEqual([m.match.fields for m in shed], [{"eth_src": mac(3)}])
+        self.assertGreater(self.app.admission.shed, 0)
+
+
+class AclReloadTest(AppTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.acl_path = os.path.join(tmp.name, "acl_rules.txt")
+        self.write_acl("deny 10.0.0.1 10.0.0.2 tcp 22\n", mtime=1)
+        self.env = {"SDN_ACL_FILE": self.acl_path}
+        super().setUp()
+
+    def write_acl(self, text, mtime):
+        with open(self.acl_path, "w") as f:
+            f.write(text)
+        os.utime(self.acl_path, (mtime, mtime))
+
+    def deletes(self):
+        delete = self.dp.ofproto.OFPFC_DELETE
+        return [m for m in self.sent("OFPFlowMod") if m.fields.get("command") == delete]
+
+    def test_fine_flows_covered_by_a_new_reactive_deny_are_deleted(self):
+        self.packet_in(tcp(4, 3, 80), 4)
+        self.packet_in(tcp(3, 4, 80), 3)
+        self.assertEqual(self.flows(FINE_PRIORITY)[-1].fields["cookie"], FINE_COOKIE)
+        before = len(self.deletes())
+
+        # too many ports to offload, so the deny is only enforced on Packet-In
+        self.write_acl("deny 10.0.0.1 10.0.0.2 tcp 22\ndeny 10.0.0.3 10.0.0.4 tcp 1-1000\n", mtime=2)
+        self.app.reload_acl()
+
+        fine = [m for m in self.deletes()[before:] if m.fields["cookie"] == FINE_COOKIE]
+        self.assertEqual([m.match.fields for m in fine],
+                         [{"eth_type": 0x0800, "ipv4_src": ip(3), "ipv4_dst": ip(4), "ip_proto": 6}])
+        self.assertEqual(fine[0].fields["cookie_mask"], 0xFF << 40)
+
+    def test_an_unchanged_file_deletes_nothing(self):
+        self.packet_in(tcp(3, 4, 80), 3)
+        before = len(self.deletes())
+
+        self.app.reload_acl()
+
+        self.assertEqual(len(self.deletes()), before)
+
+
+class SubnetPuntTest(AppTestCase):
+    def trust(self, *hosts):
+        granularity = self.app.granularity
+        for h in hosts:
+            for i in range(granularity.promote_after_flows):
+                granularity.observe(ip(h), ip(2), now=i * 3.0)
+            granularity.observe(ip(h), ip(2), now=granularity.promote_after_s)
+
+    def punted(self):
+        return [m.match.fields["ipv4_src"] for m in self.flows(SOURCE_PUNT_PRIORITY)]
+
+    def test_new_hosts_are_punted_above_their_subnets_flows(self):
+        self.packet_in(arp_request(20, 2), 20)
+        self.assertEqual(self.punted(), [])
+
+        self.trust(11, 12, 13, 14)
+        self.packet_in(arp_request(21, 2), 21)
+        self.packet_in(arp_request(11, 2), 11)
+        self.packet_in(tcp(22, 2, 80), 22)
+
+        self.assertEqual(self.punted(), [ip(21), ip(22)])
+        punt = self.flows(SOURCE_PUNT_PRIORITY)[0]
+        self.assertEqual(punt.instructions[0].args[1][0].args[0], self.dp.ofproto.OFPP_CONTROLLER)
+        self.assertEqual(punt.idle_timeout, 30)
+
+
+class VolumetricAnomalyTest(AppTestCase):
+    def test_an_anomalous_subnet_flow_is_deleted_by_its_cookie(self):
+        match = (("eth_type", 0x0800), ("ipv4_src", ("10.0.1.0", "255.255.255.0")), ("ipv4_dst", ip(2)))
+        anomaly = RateAnomaly((1, 0, SUBNET_PRIORITY, match), bps=5e8, pps=4e4, zscore=9.0)
+        self.app.volumetric.ingest_flows = lambda dpid, body: [anomaly]
+        before = len(self.sent("OFPFlowMod"))
+
+        self.app._ingest_stats("flow", 1, [])
+
+        delete = self.dp.ofproto.OFPFC_DELETE
+        cookies = [m.fields["cookie"] for m in self.sent("OFPFlowMod")[before:] if m.fields.get("command") == delete]
+        self.assertEqual(cookies, [SUBNET_COOKIE | 0x0A000100])
+        self.assertNotIn(PAIR_COOKIE | 0x0A000100, cookies)
+        self.assertNotIn("10.0.1.0", self.app.granularity._sources)
+
+
+class ScanQuarantineTest(AppTestCase):
+    env = {"SDN_QUARANTINE": "1"}
+
+    def test_a_scan_is_flagged_and_its_source_quarantined(self):
+        for port in range(1000, 1000 + self.app.ddos_threshold_ports):
+            self.packet_in(tcp(5, 6, port), 5)
+        self.analyze()
+
+        blocks = self.flows(QUARANTINE_PRIORITY)
+        self.assertEqual([m.match.fields["ipv4_src"] for m in blocks], [ip(5)])
+        self.assertEqual(blocks[0].hard_timeout, 60)
+        self.assertIn("DDoS flagged", self.logged())
+        self.assertIn("Source quarantined", self.logged())
+
+        packet_outs = len(self.sent("OFPPacketOut"))
+        self.packet_in(tcp(5, 6, 2000), 5)
+        self.assertEqual(len(self.sent("OFPPacketOut")), packet_outs)
+
+    def test_a_scanner_joining_a_flagged_scan_is_quarantined_with_its_reason(self):
+        for port in range(1000, 1000 + self.app.ddos_threshold_ports):
+            self.packet_in(tcp(5, 6, port), 5)
+        self.analyze()
+        for port in range(2000, 2000 + self.app.port_scan_detector.source_ports):
+            self.packet_in(tcp(7, 6, port), 7)
+        self.analyze()
+
+        self.assertEqual(len(self.events("DDoS flagged")), 1)
+        reasons = {e["src"]: (e["reason"], e["dst"]) for e in self.events("Source quarantined")}
+        self.assertEqual(reasons, {ip(5): ("vertical", ip(6)), ip(7): ("ongoing scan", ip(6))})
+
+    def test_the_scanned_target_is_not_quarantined(self):
+        for port in range(1000, 1000 + self.app.ddos_threshold_ports):
+            self.packet_in(tcp(5, 6, port), 5)
+        self.packet_in(tcp(6, 5, 40000), 6)
+        self.analyze()
+
+        self.assertEqual(self.app.quarantine.remaining(ip(6)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+
+from src.controller.shadow_table import ShadowFlowTable, match_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fwd(i):
+    fields = {"eth_type": 0x0800, "ipv4_dst": f"10.0.0.{i}"}
+    return match_key(50, fields.items()), fields
+
+
+class ShadowFlowTableTest(unittest.TestCase):
+    def test_match_key_ignores_field_order(self):
+        self.assertEqual(
+            match_key(50, [("ipv4_dst", "10.0.0.1"), ("eth_type", 0x0800)]),
+            match_key(50, {"eth_type": 0x0800, "ipv4_dst": "10.0.0.1"}.items()),
+        )
+
+    def test_present_skips_only_flows_with_the_same_tag(self):
+        table = ShadowFlowTable()
+        key, fields = fwd(1)
+        table.record(1, key, fields, tag=3, idle_timeout=30)
+
+        self.assertTrue(table.present(1, key, tag=3))
+        self.assertFalse(table.present(1, key, tag=4))
+        self.assertFalse(table.present(2, key, tag=3))
+        self.assertEqual(table.skipped, 1)
+
+    def test_least_recently_active_flow_is_evicted_at_capacity(self):
+        clock = FakeClock()
+        table = ShadowFlowTable(capacity=3, clock=clock)
+        flows = [fwd(i) for i in range(4)]
+        for key, fields in flows[:3]:
+            table.record(1, key, fields, idle_timeout=30)
+        clock.now = 1
+        table.stats_requested(1)
+        # flow 0 carried traffic since it was installed, flows 1 and 2 did not
+        table.reconcile(1, [(flows[0][0], 10), (flows[1][0], 0), (flows[2][0], 0)])
+
+        victims = table.record(1, flows[3][0], flows[3][1], idle_timeout=30)
+
+        self.assertEqual(victims, [(50, flows[1][1])])
+        self.assertEqual(table.occupancy(1), 3)
+        self.assertEqual(table.evicted, 1)
+
+    def test_flow_back_soon_after_eviction_outranks_new_ones(self):
+        table = ShadowFlowTable(capacity=2)
+        first, second, third, fourth = fwd(1), fwd(2), fwd(3), fwd(4)
+        table.record(1, *first, idle_timeout=30)
+        table.record(1, *second, idle_timeout=30)
+        table.record(1, *third, idle_timeout=30)
+
+        # first was evicted for third; a Packet-In brings it straight back
+        self.assertEqual(table.record(1, *first, idle_timeout=30), [(50, second[1])])
+        self.assertEqual(table.record(1, *fourth, idle_timeout=30), [(50, third[1])])
+        self.assertTrue(table.present(1, first[0]))
+
+    def test_high_priority_and_permanent_flows_are_never_evicted(self):
+        table = ShadowFlowTable(capacity=2, evict_below=100)
+        table.record(1, match_key(150, [("ipv4_src", "10.0.0.9")]), {"ipv4_src": "10.0.0.9"}, idle_timeout=20)
+        table.record(1, match_key(0, []), {}, idle_timeout=0)
+
+        key, fields = fwd(1)
+        victims = table.record(1, key, fields, idle_timeout=30)
+
+        self.assertEqual(victims, [])
+        self.assertEqual(table.occupancy(1), 3)
+
+    def test_reserved_entries_count_towards_capacity(self):
+        table = ShadowFlowTable(capacity=3)
+        table.set_reserved(1, 2)
+        first, second = fwd(1), fwd(2)
+        table.record(1, *first, idle_timeout=30)
+
+        self.assertEqual(table.record(1, *second, idle_timeout=30), [(50, first[1])])
+
+    def test_flow_removed_counts_reasons_and_ignores_unknown_flows(self):
+        table = ShadowFlowTable()
+        key, fields = fwd(1)
+        table.record(1, key, fields, idle_timeout=30)
+
+        self.assertTrue(table.flow_removed(1, key, 0))
+        self.assertFalse(table.flow_removed(1, key, 0))
+        self.assertFalse(table.present(1, key))
+        self.assertEqual(table.stats()["removed"]["idle_timeout"], 1)
+
+    def test_adopted_flows_are_skipped_and_ranked_by_traffic(self):
+        table = ShadowFlowTable(capacity=3)
+        idle, busy, recorded = fwd(1), fwd(2), fwd(3)
+        table.record(1, *recorded, tag=7, idle_timeout=30)
+
+        adopted = table.adopt(1, [
+            (idle[0], idle[1], 5, 30, 0, 0),
+            (busy[0], busy[1], 6, 30, 0, 900),
+            (recorded[0], recorded[1], 9, 30, 0, 10),
+        ])
+
+        self.assertEqual(adopted, 2)
+        self.assertTrue(table.present(1, busy[0], tag=6))
+        self.assertTrue(table.present(1, recorded[0], tag=7))
+        # the idle adopted flow goes before the busy one
+        self.assertEqual(table.record(1, *fwd(4), idle_timeout=30)[0], (50, recorded[1]))
+        self.assertEqual(table.record(1, *fwd(5), idle_timeout=30)[0], (50, idle[1]))
+
+    def test_reconcile_drops_flows_missing_from_the_reply(self):
+        clock = FakeClock()
+        table = ShadowFlowTable(clock=clock)
+        lost, kept, late = fwd(1), fwd(2), fwd(3)
+        table.record(1, *lost, idle_timeout=30)
+        table.record(1, *kept, idle_timeout=30)
+        clock.now = 1
+        table.stats_requested(1)
+        clock.now = 2
+        # installed after the request was sent, so the reply cannot list it yet
+        table.record(1, *late, idle_timeout=30)
+
+        self.assertEqual(table.reconcile(1, [(kept[0], 5)]), 1)
+        self.assertFalse(table.present(1, lost[0]))
+        self.assertTrue(table.present(1, kept[0]))
+        self.assertTrue(table.present(1, late[0]))
+        # a reply nobody asked for changes nothing
+        self.assertEqual(table.reconcile(1, []), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from src.web.static_assets import StaticAssets, accepts_gzip, etag_matches
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class StaticAssetsTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.clock = FakeClock()
+        self.assets = StaticAssets(self.dir.name, check_s=1.0, clock=self.clock)
+        self.write("app.js", b"console.log('dashboard');\n" * 40)
+
+    def write(self, name, body, mtime=None):
+        path = os.path.join(self.dir.name, name)
+        with open(path, "wb") as f:
+            f.write(body)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def test_gzip_is_served_only_when_accepted(self):
+        asset = self.assets.get("app.js")
+
+        status, headers, body = self.assets.respond("app.js", asset, "gzip, deflate, br")
+        self.assertEqual(status, 200)
+        self.assertEqual(dict(headers)["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(body), asset.body)
+        self.assertEqual(dict(headers)["Vary"], "Accept-Encoding")
+
+        status, headers, body = self.assets.respond("app.js", asset, "identity")
+        self.assertNotIn("Content-Encoding", dict(headers))
+        self.assertEqual(body, asset.body)
+        self.assertEqual(dict(headers)["Content-Type"], "application/javascript; charset=utf-8")
+
+    def test_matching_etag_gets_304_per_encoding(self):
+        asset = self.assets.get("app.js")
+        _, headers, _ = self.assets.respond("app.js", asset, "gzip")
+        etag = dict(headers)["ETag"]
+
+        status, headers, body = self.assets.respond("app.js", asset, "gzip", f'"other", {etag}')
+        self.assertEqual((status, body), (304, b""))
+        self.assertEqual(dict(headers)["ETag"], etag)
+        # the identity representation has its own tag
+        self.assertEqual(self.assets.respond("app.js", asset, None, etag)[0], 200)
+        self.assertEqual(self.assets.not_modified, 1)
+
+    def test_changed_file_is_reloaded_after_check_interval(self):
+        first = self.assets.get("app.js")
+        self.write("app.js", b"changed", mtime=first.mtime_ns / 1e9 + 10)
+
+        self.assertIs(self.assets.get("app.js"), first)
+        self.clock.now = 1.0
+        reloaded = self.assets.get("app.js")
+
+        self.assertEqual(reloaded.body, b"changed")
+        self.assertNotEqual(reloaded.etag, first.etag)
+        self.assertEqual(self.assets.loads, 2)
+
+    def test_small_files_are_not_gzipped_and_missing_ones_are_none(self):
+        self.write("tiny.css", b"body{}")
+
+        asset = self.assets.get("tiny.css")
+
+        self.assertIsNone(asset.gzip_body)
+        self.assertNotIn("Vary", dict(self.assets.respond("tiny.css", asset, "gzip")[1]))
+        self.assertIsNone(self.assets.get("missing.js"))
+        self.assertIsNone(self.assets.get(""))
+
+    def test_html_is_always_revalidated(self):
+        self.assertEqual(self.assets.cache_control("index.html"), "no-cache")
+        self.assertEqual(self.assets.cache_control("app.js"), "public, max-age=60")
+
+
+class HeaderParsingTest(unittest.TestCase):
+    def test_accepts_gzip(self):
+        self.assertTrue(accepts_gzip("gzip"))
+        self.assertTrue(accepts_gzip("br;q=1.0, gzip;q=0.8"))
+        self.assertTrue(accepts_gzip("*"))
+        self.assertFalse(accepts_gzip("gzip;q=0, *"))
+        self.assertFalse(accepts_gzip("deflate"))
+        self.assertFalse(accepts_gzip(None))
+
+    def test_etag_matches_uses_weak_comparison(self):
+        self.assertTrue(etag_matches('W/"abc"', '"abc"'))
+        self.assertTrue(etag_matches("*", '"abc"'))
+        self.assertFalse(etag_matches('"abcd"', '"abc"'))
+        self.assertFalse(etag_matches(None, '"abc"'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import json
+import unittest
+
+from src.web.store import DashboardStore
+from src.web.stream import KEEPALIVE, StreamHub
+
+
+def parse(frame):
+    fields = dict(line.split(": ", 1) for line in frame.decode("utf-8").strip().split("\n"))
+    return fields["event"], int(fields["id"]), json.loads(fields["data"])
+
+
+class StreamHubTest(unittest.TestCase):
+    def setUp(self):
+        self.store = DashboardStore(max_points=10, max_events=10)
+        self.hub = StreamHub(self.store, max_queue=2, max_clients=3, keepalive_s=0.01)
+
+    def test_new_subscribers_start_with_a_full_snapshot(self):
+        sub = self.hub.subscribe()
+
+        event, version, data = parse(sub.queue.get_nowait())
+
+        self.assertEqual(event, "snapshot")
+        self.assertEqual(version, self.store.version)
+        self.assertEqual(sub.version, self.store.version)
+        self.assertNotIn("delta", data)
+
+    def test_one_delta_frame_is_shared_by_all_current_subscribers(self):
+        subs = [self.hub.subscribe() for _ in range(3)]
+        for sub in subs:
+            sub.queue.get_nowait()
+
+        self.store.record(flow=2, allowed=2)
+        self.store.tick_1s()
+        self.assertEqual(self.hub.publish(), 3)
+
+        frames = [sub.queue.get_nowait() for sub in subs]
+        self.assertTrue(all(f is frames[0] for f in frames))
+        self.assertEqual(self.hub.frames_built, 1)
+        event, _, data = parse(frames[0])
+        self.assertEqual(event, "delta")
+        self.assertTrue(data["delta"])
+        self.assertEqual(data["timeseries"]["flows_per_sec"], [2])
+
+    def test_nothing_is_queued_when_the_store_has_not_changed(self):
+        sub = self.hub.subscribe()
+        sub.queue.get_nowait()
+
+        self.assertEqual(self.hub.publish(), 0)
+        self.assertTrue(sub.queue.empty())
+
+    def test_a_slow_subscriber_is_resynced_with_a_snapshot(self):
+        slow = self.hub.subscribe()
+        for _ in range(2):
+            self.store.tick_1s()
+            self.hub.publish()
+
+        self.assertEqual(slow.resyncs, 1)
+        self.assertIsNone(slow.version)
+        self.assertTrue(slow.queue.empty())
+
+        self.store.tick_1s()
+        self.hub.publish()
+        event, version, _ = parse(slow.queue.get_nowait())
+        self.assertEqual(event, "snapshot")
+        self.assertEqual(slow.version, version)
+
+    def test_clients_over_the_limit_are_refused(self):
+        for _ in range(3):
+            self.assertIsNotNone(self.hub.subscribe())
+
+        self.assertIsNone(self.hub.subscribe())
+
+    def test_closing_the_response_unsubscribes(self):
+        sub = self.hub.subscribe()
+        body = self.hub.iterate(sub)
+
+        self.assertEqual(parse(next(body))[0], "snapshot")
+        self.assertEqual(next(body), KEEPALIVE)
+        body.close()
+
+        self.assertEqual(self.hub.stats()["clients"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+from src.web.timeseries import TimeSeries
+
+
+class TimeSeriesTest(unittest.TestCase):
+    def test_seconds_roll_up_into_sum_and_max(self):
+        series = TimeSeries(("flows", "drops"), tiers=((1, 60), (10, 6)))
+        for sec in range(100, 125):
+            series.add(sec, [sec - 100, 1])
+
+        tens = series.query(100, 124, resolution=10)
+
+        self.assertEqual(tens["t"], [100, 110, 120])
+        self.assertEqual(tens["sum"]["flows"], [45, 145, 110])
+        self.assertEqual(tens["max"]["flows"], [9, 19, 24])
+        self.assertEqual(tens["sum"]["drops"], [10, 10, 5])
+        self.assertEqual(len(tens["labels"]), 3)
+
+    def test_missing_seconds_are_left_out(self):
+        series = TimeSeries(("flows",), tiers=((1, 60),))
+        series.add(10, [1])
+        series.add(12, [3])
+
+        result = series.query(9, 13)
+
+        self.assertEqual(result["t"], [10, 12])
+        self.assertEqual(result["sum"]["flows"], [1, 3])
+
+    def test_ring_keeps_only_the_newest_buckets(self):
+        series = TimeSeries(("flows",), tiers=((1, 5), (10, 100)))
+        for sec in range(20):
+            series.add(sec, [sec])
+
+        self.assertEqual(series.query(0, 19)["t"], [15, 16, 17, 18, 19])
+        # the coarser tier still has all of it
+        self.assertEqual(series.query(0, 19, resolution=10)["sum"]["flows"], [45, 145])
+        self.assertEqual(series.retention(1), 5)
+
+    def test_reused_slot_starts_from_the_new_value(self):
+        series = TimeSeries(("flows",), tiers=((1, 4),))
+        series.add(1, [7])
+        series.add(5, [2])
+
+        self.assertEqual(series.query(0, 5)["sum"]["flows"], [2])
+        self.assertEqual(series.query(0, 5)["max"]["flows"], [2])
+
+    def test_unknown_resolution_and_empty_ranges(self):
+        series = TimeSeries(("flows",), tiers=((1, 10),))
+
+        with self.assertRaises(KeyError):
+            series.query(0, 10, resolution=60)
+        self.assertEqual(series.query(0, 10)["sum"], {"flows": []})
+
+
+if __name__ == "__main__":
+    unittest.main()